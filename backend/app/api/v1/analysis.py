@@ -1,70 +1,225 @@
-from fastapi import APIRouter
+import asyncio
+from functools import lru_cache
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
+from app.core.cache import TwoTierCache, analysis_cache_key, get_analysis_cache
+from app.core.config import settings
+from app.core.responses import encoded_response
+from app.services.dependency_engine import dependency_graph_for_commit
+from app.services.file_tree import FileTree
+from app.services.import_graph import import_graph_for_commit, open_import_graph
+from app.services.incremental_analyzer import (
+    ANALYZER_VERSION,
+    ManifestStore,
+    summarize_manifest,
+)
 
 router = APIRouter()
 
+@lru_cache()
+def get_manifest_store() -> ManifestStore:
+    """Manifest store dependency for FastAPI"""
+    return ManifestStore(settings.ANALYSIS_DATA_DIR)
+
+def _latest_commit(store: ManifestStore, repo_id: str) -> str:
+    commit = store.latest_commit(repo_id)
+    if commit is None:
+        raise HTTPException(status_code=404, detail="Repository has not been analyzed")
+    return commit
+
+def _architecture(tree: FileTree) -> Dict:
+    """Top-level directories that contain files act as the coarse layers"""
+    layers = [
+        tree.node_name(child)
+        for child in tree.children(0)
+        if tree.is_dir(child) and tree.children(child)
+    ]
+    return {"layers": layers, "patterns": []}
+
+def _build_overview(store: ManifestStore, repo_id: str, commit: str) -> Dict:
+    manifest = store.load(repo_id, commit)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Analysis manifest not found")
+    summary = summarize_manifest(manifest)
+    return {
+        "repo_id": manifest["repo_id"],
+        "entry_points": summary["entry_points"],
+        "dependencies": summary["dependencies"],
+        "dependency_errors": summary["dependency_errors"],
+        "architecture": _architecture(summary["tree"]),
+        "statistics": summary["statistics"],
+    }
+
 class AnalysisResult(BaseModel):
     repo_id: str
     entry_points: List[dict]
     dependencies: List[dict]
+    dependency_errors: List[dict] = []
     architecture: dict
     statistics: dict
 
-@router.get("/{repo_id}/overview", response_model=AnalysisResult)
-async def get_analysis_overview(repo_id: str):
+# Encoded by hand (see encoded_response); AnalysisResult only documents the shape
+@router.get("/{repo_id}/overview", response_class=ORJSONResponse,
+            responses={200: {"model": AnalysisResult}})
+async def get_analysis_overview(
+    request: Request,
+    repo_id: str,
+    cache: TwoTierCache = Depends(get_analysis_cache),
+    store: ManifestStore = Depends(get_manifest_store),
+):
     """
     Get high-level analysis of repository
     
-    TODO: Implement:
-    1. Identify entry points (main.py, index.ts, etc.)
-    2. Parse dependencies (package.json, requirements.txt)
-    3. Generate architecture overview
-    4. Calculate statistics (LOC, file counts, etc.)
+    Entry points, dependencies and statistics come from the manifest of
+    the latest analyzed commit. Results are cached per (repo_id, commit,
+    analyzer version), so the manifest is only loaded on a cache miss.
+    Encoded with orjson, or MessagePack for `Accept: application/msgpack`.
+    """
+    commit = await asyncio.to_thread(_latest_commit, store, repo_id)
+    key = analysis_cache_key("overview", repo_id, commit, ANALYZER_VERSION)
+
+    async def compute():
+        return await asyncio.to_thread(_build_overview, store, repo_id, commit)
+
+    return encoded_response(request, await cache.get_or_compute(key, compute))
+
+@router.get("/{repo_id}/data-flow")
+async def get_data_flow(
+    repo_id: str,
+    limit: int = Query(100, ge=1, le=1000),
+    cache: TwoTierCache = Depends(get_analysis_cache),
+    store: ManifestStore = Depends(get_manifest_store),
+):
+    """
+    Get data flow analysis
+    
+    Flows are directory-level import edges weighted by the number of
+    file imports behind them, heaviest first, from the import graph of
+    the latest analyzed commit. Import cycles and the most-imported files
+    are included.
     """
+    commit = await asyncio.to_thread(_latest_commit, store, repo_id)
+    key = analysis_cache_key(f"data-flow:{limit}", repo_id, commit, ANALYZER_VERSION)
+
+    async def compute():
+        return await asyncio.to_thread(_build_data_flow, store, repo_id, commit, limit)
+
+    return await cache.get_or_compute(key, compute)
+
+def _build_data_flow(store: ManifestStore, repo_id: str, commit: str, limit: int) -> Dict:
+    graph = import_graph_for_commit(store, repo_id, commit)
+    if graph is None:
+        raise HTTPException(status_code=404, detail="Import graph not found")
     return {
         "repo_id": repo_id,
-        "entry_points": [
-            {
-                "file": "src/index.ts",
-                "type": "application_entry",
-                "description": "Main application entry point"
-            }
-        ],
-        "dependencies": [
-            {"name": "react", "version": "^18.0.0", "type": "production"},
-            {"name": "typescript", "version": "^5.0.0", "type": "development"}
+        "commit": commit,
+        "flows": graph.module_flows(limit),
+        "cycles": [
+            {"size": len(members), "files": [graph.nodes[i] for i in members[:50]]}
+            for members in graph.cycles[:20]
         ],
-        "architecture": {
-            "layers": ["frontend", "api", "database"],
-            "patterns": ["MVC", "REST API"]
-        },
+        "hubs": graph.top_hubs(10),
         "statistics": {
-            "total_files": 127,
-            "total_lines": 15420,
-            "languages": {"TypeScript": 65, "JavaScript": 25, "CSS": 10}
-        }
+            "files": len(graph.nodes),
+            "imports": graph.edge_count,
+            "directories": len(graph.modules),
+            "cycles": len(graph.cycles),
+        },
     }
 
-@router.get("/{repo_id}/data-flow")
-async def get_data_flow(repo_id: str):
+@router.get("/{repo_id}/dependencies")
+async def get_dependencies(
+    repo_id: str,
+    package: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=5000),
+    cache: TwoTierCache = Depends(get_analysis_cache),
+    store: ManifestStore = Depends(get_manifest_store),
+):
     """
-    Get data flow analysis
+    Get the dependency graph
     
-    TODO: Implement import graph analysis and data flow mapping
+    Packages from every manifest and lockfile of the latest analyzed
+    commit, deduplicated across workspaces, direct ones first and then by
+    how many packages depend on them. With `package`, also its transitive
+    dependencies and the direct dependencies that pull it in. Files that
+    failed to parse are listed under `errors`.
     """
-    return {
+    commit = await asyncio.to_thread(_latest_commit, store, repo_id)
+    key = analysis_cache_key(f"dependencies:{package}:{limit}", repo_id, commit, ANALYZER_VERSION)
+
+    async def compute():
+        return await asyncio.to_thread(_build_dependencies, store, repo_id, commit, package, limit)
+
+    return await cache.get_or_compute(key, compute)
+
+def _build_dependencies(store: ManifestStore, repo_id: str, commit: str, package: Optional[str], limit: int) -> Dict:
+    report = dependency_graph_for_commit(store, repo_id, commit)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Dependency graph not found")
+    graph = report["graph"]
+    dependents = graph.dependents()
+    ranked = sorted(range(len(graph.packages)), key=lambda i: (i not in graph.direct, -len(dependents[i]), i))
+    result = {
         "repo_id": repo_id,
-        "flows": [
-            {
-                "from": "frontend/pages/api",
-                "to": "backend/controllers",
-                "type": "http_request"
-            },
+        "commit": commit,
+        "manifests": report["manifests"],
+        "lockfiles": report["lockfiles"],
+        "workspaces": report["workspaces"],
+        "errors": report["errors"],
+        "statistics": graph.statistics(),
+        "packages": [
+            {**graph.describe(i), "direct": i in graph.direct, "declared_in": graph.direct.get(i, []),
+             "dependents": len(dependents[i]), "dependencies": len(graph.edges[i])}
+            for i in ranked[:limit]
+        ],
+    }
+    if package is not None:
+        matches = graph.find(package)
+        if not matches:
+            raise HTTPException(status_code=404, detail="Package not found in dependency graph")
+        result["package"] = [
             {
-                "from": "backend/controllers",
-                "to": "database/models",
-                "type": "data_access"
+                **graph.describe(i),
+                "dependencies": [graph.describe(j) for j in graph.reachable([i])[:limit]],
+                "required_by": [graph.describe(j) for j in graph.reachable([i], reverse=True) if j in graph.direct],
             }
+            for i in matches
         ]
-    }
+    return result
+
+@router.get("/{repo_id}/imports/{file_path:path}")
+async def get_file_imports(
+    repo_id: str,
+    file_path: str,
+    transitive: bool = False,
+    store: ManifestStore = Depends(get_manifest_store),
+):
+    """
+    Get what a file imports and what depends on it
+    
+    With `transitive`, `affected` lists every file that reaches this one
+    through any chain of imports.
+    """
+    
+    def lookup():
+        graph = open_import_graph(store, repo_id)
+        if graph is None:
+            raise HTTPException(status_code=404, detail="Repository has not been analyzed")
+        if file_path not in graph.node_ids:
+            raise HTTPException(status_code=404, detail="File not found in import graph")
+        result = {
+            "file": file_path,
+            "fan_in": graph.fan_in(file_path),
+            "fan_out": graph.fan_out(file_path),
+            "imports": graph.imports(file_path),
+            "imported_by": graph.dependents(file_path),
+            "cycle_size": graph.cycle_size(file_path),
+            "cycle": graph.cycle(file_path, 100),
+        }
+        if transitive:
+            result["affected"] = graph.transitive_dependents(file_path)
+        return result
+    
+    return await asyncio.to_thread(lookup)
@@ -1,6 +1,22 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+import asyncio
+import json
+import time
+from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, field_validator
 from typing import List, Optional
+from app.api.v1.analysis import get_manifest_store
+from app.core.metrics import SPAN_LATENCY, span
+from app.services.answer_cache import AnswerCache, get_answer_cache, normalize_question
+from app.services.context_packer import ContextPacker, get_context_packer
+from app.services.embedding_service import EmbeddingPipeline, get_embedding_pipeline
+from app.services.import_graph import import_graph_for_commit
+from app.services.incremental_analyzer import ManifestStore, check_repo_id
+from app.services.lexical_index import open_lexical_index, reciprocal_rank_fusion
+from app.services.llm_service import get_chat_model
+from app.services.symbol_index import Symbol, symbol_index_for_commit
+from app.services.vector_index import open_repo_index
 
 router = APIRouter()
 
@@ -12,55 +28,202 @@ class ChatRequest(BaseModel):
     repo_id: str
     message: str
     history: Optional[List[ChatMessage]] = []
+    stream: bool = False
+
+    @field_validator("repo_id")
+    @classmethod
+    def _repo_id_stays_in_the_store(cls, repo_id: str) -> str:
+        return check_repo_id(repo_id)
 
 class ChatResponse(BaseModel):
     message: str
     sources: List[dict]
     suggestions: List[str]
+    cached: bool = False
+
+def hybrid_search(index, lexical, question: str, query_vector, k: int) -> List[dict]:
+    """Reciprocal-rank fusion of vector and BM25 results, hydrated from the vector index"""
+    vector_hits = index.query(query_vector, k * 3)
+    if lexical is None:
+        return vector_hits[:k]
+    lexical_hits = lexical.search(question, k * 3)
+    fused = reciprocal_rank_fusion([vector_hits, lexical_hits])[:k]
+    missing = [
+        (hit["path"], hit["start_line"], hit["end_line"])
+        for hit in fused if "content" not in hit
+    ]
+    chunks = index.chunks_for_spans(missing)
+    hits = []
+    for hit in fused:
+        if "content" not in hit:
+            chunk = chunks.get((hit["path"], hit["start_line"], hit["end_line"]))
+            if chunk is None:
+                continue
+            hit = dict(chunk, score=hit["score"], fused_score=hit["fused_score"])
+        hits.append(hit)
+    return hits
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @router.post("/query", response_model=ChatResponse)
-async def chat_query(request: ChatRequest):
+async def chat_query(
+    request: ChatRequest,
+    embeddings: EmbeddingPipeline = Depends(get_embedding_pipeline),
+    store: ManifestStore = Depends(get_manifest_store),
+    answers: AnswerCache = Depends(get_answer_cache),
+    llm = Depends(get_chat_model),
+    packer: ContextPacker = Depends(get_context_packer),
+):
     """
     Answer questions about the codebase using RAG
     
-    TODO: Implement:
-    1. Convert question to embedding
-    2. Search vector database for relevant code chunks
-    3. Build context with retrieved chunks
-    4. Generate answer using LLM
-    5. Return with source citations
+    Retrieval fuses the repository's vector and lexical indexes. Answers are
+    cached per commit and retrieved chunk set, and reused for questions
+    whose embedding is within ANSWER_CACHE_THRESHOLD of a cached one;
+    follow-ups with history always go to the model. The prompt is packed to
+    CHAT_CONTEXT_TOKENS from merged, deduplicated and diversity-ranked
+    chunks plus the most recent history.
+    
+    With `stream`, the response is Server-Sent Events: `sources` first,
+    then `token` events as the model generates, then `done`.
     """
+    index = await asyncio.to_thread(open_repo_index, store, request.repo_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="Repository has not been indexed")
     
-    # Placeholder response
-    return {
-        "message": "The authentication is implemented in `src/auth/auth.service.ts`. It uses JWT tokens with passport.js middleware. The login flow starts at the `/api/auth/login` endpoint.",
-        "sources": [
-            {
-                "file": "src/auth/auth.service.ts",
-                "lines": [15, 45],
-                "snippet": "export class AuthService {\n  async login(credentials) {\n    // JWT generation logic\n  }\n}"
-            }
-        ],
-        "suggestions": [
-            "How does the authentication middleware work?",
-            "Where are JWT tokens validated?",
-            "What's the token expiration time?"
-        ]
-    }
+    # Retrieving on the normalized question lets trivial rephrasings share
+    # both the retrieved chunks and the cached answer
+    question = normalize_question(request.message)
+    with span("chat.embed_query"):
+        query_vector = await embeddings.embed_query(question)
+    with span("chat.retrieve"):
+        lexical = await asyncio.to_thread(open_lexical_index, store, request.repo_id)
+        hits = await asyncio.to_thread(hybrid_search, index, lexical, question, query_vector, 8)
+    
+    sources = [
+        {
+            "file": hit["path"],
+            "lines": [hit["start_line"], hit["end_line"]],
+            "snippet": hit["content"],
+            "score": round(hit.get("fused_score", hit["score"]), 4),
+        }
+        for hit in hits
+    ]
+    suggestions = [
+        f"What does `{symbol}` do?"
+        for hit in hits[:3] for symbol in hit["symbols"][:1]
+    ]
+    
+    cache_key = None
+    cached = None
+    if hits and not request.history:
+        cache_key = answers.key(request.repo_id, index.commit, getattr(llm, "model", ""),
+                                (hit["content_hash"] for hit in hits))
+        cached = await answers.lookup(cache_key, query_vector)
+    
+    async def tokens():
+        if not hits:
+            yield "No relevant code was found for this question."
+            return
+        if cached is not None:
+            yield cached["answer"]
+            return
+        history = [turn.model_dump() for turn in request.history or []]
+        parts = []
+        with span("chat.pack"):
+            context = await asyncio.to_thread(packer.pack, request.message, hits, history)
+        # Total includes time the client takes to read a streamed answer
+        started = time.perf_counter()
+        with span("chat.llm"):
+            async for token in llm.stream(context.messages):
+                if not parts:
+                    SPAN_LATENCY.observe(time.perf_counter() - started, "chat.llm_first_token")
+                parts.append(token)
+                yield token
+        if cache_key is not None:
+            await answers.store(cache_key, query_vector, request.message, "".join(parts))
+    
+    if not request.stream:
+        message = "".join([token async for token in tokens()])
+        return {"message": message, "sources": sources, "suggestions": suggestions, "cached": cached is not None}
+    
+    async def event_stream():
+        yield _sse("sources", {"sources": sources, "suggestions": suggestions})
+        parts = []
+        try:
+            async for token in tokens():
+                parts.append(token)
+                yield _sse("token", {"text": token})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        yield _sse("done", {"message": "".join(parts), "cached": cached is not None})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/{repo_id}/context/{file_path:path}")
-async def get_file_context(repo_id: str, file_path: str):
+async def get_file_context(
+    repo_id: str,
+    file_path: str,
+    store: ManifestStore = Depends(get_manifest_store),
+):
     """
-    Get AI-generated explanation of a specific file
+    Get an explanation of a specific file
     
-    TODO: Implement file-specific context generation
+    Assembled from data precomputed during analysis: the file's symbols
+    (with signatures and doc lines) and its place in the import graph.
     """
+    
+    def build():
+        commit = store.latest_commit(repo_id)
+        if commit is None:
+            raise HTTPException(status_code=404, detail="Repository has not been analyzed")
+        symbols = symbol_index_for_commit(store, repo_id, commit)
+        if symbols is None:
+            raise HTTPException(status_code=404, detail="Symbol index not found")
+        defined = symbols.for_file(file_path)
+        if defined is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        graph = import_graph_for_commit(store, repo_id, commit)
+        in_graph = graph is not None and file_path in graph.node_ids
+        return _file_context(
+            file_path,
+            defined,
+            graph.imports(file_path) if in_graph else [],
+            graph.dependents(file_path) if in_graph else [],
+        )
+    
+    return await asyncio.to_thread(build)
+
+def _plural(count: int, noun: str) -> str:
+    if count == 1:
+        return f"1 {noun}"
+    return f"{count} {noun}{'es' if noun.endswith('s') else 's'}"
+
+def _file_context(file_path: str, symbols: List[Symbol], imports: List[str], dependents: List[str]) -> dict:
+    counts = Counter(symbol.kind for symbol in symbols)
+    described = ", ".join(_plural(count, kind) for kind, count in counts.most_common())
+    summary = f"Defines {described}." if described else "Defines no functions or classes."
+    if dependents:
+        summary += f" Imported by {_plural(len(dependents), 'file')}."
     return {
         "file": file_path,
-        "summary": "This file implements the authentication service...",
+        "summary": summary,
         "key_functions": [
-            {"name": "login", "purpose": "Authenticates user credentials"},
-            {"name": "generateToken", "purpose": "Creates JWT token"}
+            {
+                "name": symbol.qualified_name,
+                "kind": symbol.kind,
+                "signature": symbol.signature,
+                "lines": [symbol.start_line, symbol.end_line],
+                "purpose": symbol.doc,
+            }
+            for symbol in symbols
         ],
-        "dependencies": ["jsonwebtoken", "bcrypt"]
+        "dependencies": imports,
+        "dependents": dependents,
     }
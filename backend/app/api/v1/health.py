@@ -1,12 +1,78 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.cache import get_analysis_cache
+from app.core.database import get_async_engine, get_engine, pool_status
+from app.core.metrics import registry
+from app.services.analysis_pipeline import get_job_manager
+from app.services.answer_cache import get_answer_cache
+from app.services.github_client import get_response_cache
 
 router = APIRouter()
 
+def _queue_status() -> dict:
+    manager = get_job_manager()
+    return {
+        "queued": manager.queue_depth,
+        "running": manager.running,
+        "workers": manager.max_workers,
+        "saturation": round(manager.running / manager.max_workers, 3) if manager.max_workers else 0.0,
+    }
+
+def _cache_status() -> dict:
+    answers = get_answer_cache()
+    caches = {
+        "analysis": get_analysis_cache().local,
+        "answers_local": answers.cache.local,
+        "github": get_response_cache(),
+    }
+    status = {
+        name: {"hit_rate": round(cache.hit_rate, 3), "hits": cache.hits, "misses": cache.misses,
+               "bytes": cache.current_bytes}
+        for name, cache in caches.items()
+    }
+    # Semantic hits: a near-duplicate question reusing a cached answer
+    status["answers"] = {"hit_rate": round(answers.hit_rate, 3), "hits": answers.hits, "misses": answers.misses}
+    return status
+
+def _pool_status() -> dict:
+    return {"db": pool_status(get_engine()), "async_db": pool_status(get_async_engine()), "workers": _queue_status()}
+
+registry.gauge(
+    "analysis_jobs", "Analysis jobs by state", ("state",),
+    lambda: {("queued",): get_job_manager().queue_depth, ("running",): get_job_manager().running},
+)
+registry.gauge(
+    "cache_hit_ratio", "Hit ratio since process start", ("cache",),
+    lambda: {(name,): stats["hit_rate"] for name, stats in _cache_status().items()},
+)
+registry.gauge(
+    "pool_saturation", "Checked-out share of each pool's capacity", ("pool",),
+    lambda: {(name,): stats["saturation"] for name, stats in _pool_status().items() if "saturation" in stats},
+)
+
 @router.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """
+    Health check endpoint
+
+    Also reports the analysis job queue, cache hit rates since start-up
+    and how saturated the database and worker pools are.
+    """
     return {
         "status": "healthy",
         "service": "Codebase Onboarding API",
-        "version": "0.1.0"
+        "version": "0.1.0",
+        "queue": _queue_status(),
+        "caches": _cache_status(),
+        "pools": _pool_status(),
     }
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics
+
+    Request latency per route template, pipeline and chat span durations,
+    and the gauges behind /health, in the text exposition format.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,7 +1,20 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, field_validator
 from typing import List, Optional
+from dataclasses import asdict
 from datetime import datetime
+from app.services.analysis_pipeline import get_job_manager, repo_id_from_url
+from app.api.v1.analysis import get_manifest_store
+from app.core.responses import encoded_response
+from app.services.file_tree import file_tree_for_commit
+from app.services.incremental_analyzer import ManifestStore, check_repo_id
+from app.services.job_manager import JobManager, JobQueueFull
+from app.services.lexical_index import open_lexical_index
+from app.services.path_index import path_index_for_commit
+from app.services.symbol_index import symbol_index_for_commit
 
 router = APIRouter()
 
@@ -19,6 +32,12 @@ class Repository(BaseModel):
 class AnalyzeRequest(BaseModel):
     repo_url: str
     branch: str = "main"
+    repo_id: Optional[str] = None
+
+    @field_validator("repo_id")
+    @classmethod
+    def _repo_id_stays_in_the_store(cls, repo_id: Optional[str]) -> Optional[str]:
+        return repo_id if repo_id is None else check_repo_id(repo_id)
 
 @router.get("/", response_model=List[Repository])
 async def list_repositories():
@@ -44,47 +63,176 @@ async def list_repositories():
         }
     ]
 
-@router.post("/analyze")
-async def analyze_repository(request: AnalyzeRequest):
+@router.post("/analyze", status_code=202)
+async def analyze_repository(
+    request: AnalyzeRequest,
+    jobs: JobManager = Depends(get_job_manager),
+):
     """
     Trigger analysis of a repository
     
-    TODO: Implement:
-    1. Clone repository
-    2. Parse file structure
-    3. Extract code chunks
-    4. Generate embeddings
-    5. Store in vector database
-    6. Run architecture analysis
+    Queues clone, scan, chunk, embed and index stages on the background
+    worker pool. Identical in-flight requests share one job.
     """
+    try:
+        repo_id = request.repo_id or check_repo_id(repo_id_from_url(request.repo_url))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        job = await jobs.submit(repo_id, request.repo_url, request.branch)
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Analysis queue is full, retry later")
+    
     return {
-        "status": "processing",
+        "status": job.status,
         "message": "Repository analysis started",
         "repo_url": request.repo_url,
-        "job_id": "placeholder_job_123"
+        "repo_id": job.repo_id,
+        "job_id": job.id
     }
 
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, jobs: JobManager = Depends(get_job_manager)):
+    """Get status and per-stage progress of an analysis job"""
+    # Finished jobs are read back from the database
+    snapshot = await asyncio.to_thread(jobs.get, job_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return snapshot
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, jobs: JobManager = Depends(get_job_manager)):
+    """Cancel a queued or running analysis job"""
+    # Cancelling a queued job persists its final state
+    if not await asyncio.to_thread(jobs.cancel, job_id):
+        raise HTTPException(status_code=409, detail="Job is not active")
+    return {"job_id": job_id, "status": "cancelling"}
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, jobs: JobManager = Depends(get_job_manager)):
+    """Stream job progress as Server-Sent Events until the job finishes"""
+    
+    async def event_stream():
+        found = False
+        async for snapshot in jobs.subscribe(job_id):
+            if snapshot is None:
+                yield ": keep-alive\n\n"
+                continue
+            found = True
+            yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+        if not found:
+            yield f"event: error\ndata: {json.dumps({'detail': 'Job not found'})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/{repo_id}/structure")
-async def get_repository_structure(repo_id: str):
+async def get_repository_structure(
+    request: Request,
+    repo_id: str,
+    path: str = "",
+    cursor: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=1000),
+    view: str = Query("listing", pattern="^(listing|tree)$"),
+    store: ManifestStore = Depends(get_manifest_store),
+):
     """
-    Get repository file structure
+    Get one directory's children from the latest analyzed commit
     
-    TODO: Return parsed file tree with metadata
+    Expand deeper directories by passing their `path`; page through
+    large directories with the returned `next_cursor`.
+    
+    `view=tree` instead returns the whole subtree under `path` in one
+    response, as parallel arrays (see FileTree.to_columns). Send
+    `Accept: application/msgpack` for MessagePack instead of JSON.
     """
-    return {
-        "repo_id": repo_id,
-        "structure": {
-            "name": "root",
-            "type": "directory",
-            "children": [
-                {
-                    "name": "src",
-                    "type": "directory",
-                    "children": [
-                        {"name": "index.ts", "type": "file", "language": "typescript"}
-                    ]
-                },
-                {"name": "package.json", "type": "file", "language": "json"}
-            ]
-        }
-    }
+    
+    def list_directory():
+        commit = store.latest_commit(repo_id)
+        if commit is None:
+            raise HTTPException(status_code=404, detail="Repository has not been analyzed")
+        index = path_index_for_commit(store, repo_id, commit)
+        if index is None:
+            raise HTTPException(status_code=404, detail="Analysis manifest not found")
+        try:
+            listing = index.list_directory(path, cursor, limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if listing is None:
+            raise HTTPException(status_code=404, detail="Directory not found")
+        return {"repo_id": repo_id, "commit": commit, **listing}
+    
+    def subtree():
+        commit = store.latest_commit(repo_id)
+        if commit is None:
+            raise HTTPException(status_code=404, detail="Repository has not been analyzed")
+        tree = file_tree_for_commit(store, repo_id, commit)
+        if tree is None:
+            raise HTTPException(status_code=404, detail="Analysis manifest not found")
+        node = tree.find(path)
+        if node is None:
+            raise HTTPException(status_code=404, detail="Path not found")
+        return {"repo_id": repo_id, "commit": commit, **tree.to_columns(node)}
+    
+    content = await asyncio.to_thread(subtree if view == "tree" else list_directory)
+    return encoded_response(request, content)
+
+
+@router.get("/{repo_id}/search")
+async def search_code(
+    repo_id: str,
+    q: str = Query(..., min_length=1),
+    mode: str = Query("text", pattern="^(text|substring)$"),
+    limit: int = Query(20, ge=1, le=200),
+    store: ManifestStore = Depends(get_manifest_store),
+):
+    """
+    Lexical code search over the latest analyzed commit
+    
+    `text` ranks chunks by BM25 over identifier tokens (camelCase and
+    snake_case names also match their parts); `substring` matches any
+    identifier containing `q`.
+    """
+    
+    def search():
+        index = open_lexical_index(store, repo_id)
+        if index is None:
+            raise HTTPException(status_code=404, detail="Repository has not been indexed")
+        if mode == "substring":
+            return index.search_substring(q, limit)
+        return index.search(q, limit)
+    
+    hits = await asyncio.to_thread(search)
+    return {"repo_id": repo_id, "query": q, "mode": mode, "results": hits}
+
+
+@router.get("/{repo_id}/symbols")
+async def find_symbols(
+    repo_id: str,
+    name: Optional[str] = None,
+    prefix: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    store: ManifestStore = Depends(get_manifest_store),
+):
+    """
+    Find function, class and method definitions by exact name or name prefix
+    
+    Matching is case-insensitive.
+    """
+    if not name and not prefix:
+        raise HTTPException(status_code=400, detail="Pass name or prefix")
+    
+    def lookup():
+        commit = store.latest_commit(repo_id)
+        index = symbol_index_for_commit(store, repo_id, commit) if commit else None
+        if index is None:
+            raise HTTPException(status_code=404, detail="Repository has not been indexed")
+        if name:
+            return index.lookup(name, limit)
+        return index.search_prefix(prefix, limit)
+    
+    symbols = await asyncio.to_thread(lookup)
+    return {"repo_id": repo_id, "symbols": [asdict(symbol) for symbol in symbols]}
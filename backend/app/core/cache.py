@@ -0,0 +1,233 @@
+"""
+Two-tier result cache: in-process LRU in front of Redis
+"""
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+
+
+class LRUCache:
+    """In-process LRU that evicts by total stored bytes rather than entry count"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._data: "OrderedDict[str, bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.current_bytes -= len(old)
+        self._data[key] = value
+        self.current_bytes += len(value)
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.current_bytes -= len(evicted)
+
+    def delete(self, key: str):
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.current_bytes -= len(old)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class InMemoryBackend:
+    """Stand-in for Redis in tests and single-process deployments"""
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+
+    def _live(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._live(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (value, expires_at)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def acquire(self, key: str, token: str, ttl: int) -> bool:
+        if self._live(key) is not None:
+            return False
+        await self.set(key, token.encode(), ttl)
+        return True
+
+    async def release(self, key: str, token: str):
+        if self._live(key) == token.encode():
+            del self._data[key]
+
+
+class RedisBackend:
+    """Shared second tier backed by the Redis at REDIS_URL"""
+
+    # Delete the lock only if we still own it
+    RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url: str):
+        from redis import asyncio as aioredis
+        self.client = aioredis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        await self.client.set(key, value, ex=ttl)
+
+    async def delete(self, key: str):
+        await self.client.delete(key)
+
+    async def acquire(self, key: str, token: str, ttl: int) -> bool:
+        return bool(await self.client.set(key, token, nx=True, ex=ttl))
+
+    async def release(self, key: str, token: str):
+        await self.client.eval(self.RELEASE_SCRIPT, 1, key, token)
+
+
+class TwoTierCache:
+    """
+    Read-through cache with single-flight protection.
+
+    Concurrent misses for the same key inside one process share a single
+    compute task; across processes a short-lived backend lock elects one
+    computer while the others poll the backend for its result.
+    """
+
+    def __init__(self, local: LRUCache, backend, ttl: Optional[int] = None,
+                 lock_ttl: int = 300, poll_interval: float = 0.1):
+        self.local = local
+        self.backend = backend
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.computations = 0
+
+    async def _backend_call(self, method: str, *args):
+        """Backend errors degrade to a miss instead of failing the request"""
+        try:
+            return await getattr(self.backend, method)(*args)
+        except Exception:
+            return None
+
+    async def get(self, key: str) -> Optional[Dict]:
+        raw = self.local.get(key)
+        if raw is None:
+            raw = await self._backend_call('get', key)
+            if raw is None:
+                return None
+            self.local.set(key, raw)
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Dict):
+        raw = json.dumps(value, default=str).encode()
+        self.local.set(key, raw)
+        await self._backend_call('set', key, raw, self.ttl)
+
+    async def invalidate(self, key: str):
+        self.local.delete(key)
+        await self._backend_call('delete', key)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+
+        # The computation is its own task, so a caller that goes away (a
+        # client disconnecting) does not cancel it for everyone else waiting
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute_once(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._settle(key, done))
+        return await asyncio.shield(task)
+
+    def _settle(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark retrieved so a failure nobody is left to await is not logged
+        if not task.cancelled():
+            task.exception()
+
+    async def _compute_once(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        lock_key = f'{key}:lock'
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_ttl
+
+        while True:
+            acquired = await self._backend_call('acquire', lock_key, token, self.lock_ttl)
+            # A failing backend returns None: compute locally rather than wait
+            if acquired or acquired is None:
+                break
+            await asyncio.sleep(self.poll_interval)
+            cached = await self.get(key)
+            if cached is not None:
+                return cached
+            if time.monotonic() > deadline:
+                break
+
+        try:
+            self.computations += 1
+            value = await compute()
+            await self.set(key, value)
+            return value
+        finally:
+            if acquired:
+                await self._backend_call('release', lock_key, token)
+
+
+def analysis_cache_key(kind: str, repo_id: str, commit: str, analyzer_version: int) -> str:
+    """Cache key for one analysis result of a specific commit"""
+    return f'analysis:{kind}:{repo_id}:{commit}:v{analyzer_version}'
+
+
+@lru_cache()
+def get_analysis_cache() -> TwoTierCache:
+    """Analysis cache dependency for FastAPI"""
+    if settings.REDIS_URL.startswith('memory://'):
+        backend = InMemoryBackend()
+    else:
+        backend = RedisBackend(settings.REDIS_URL)
+    return TwoTierCache(
+        LRUCache(settings.ANALYSIS_CACHE_MAX_BYTES),
+        backend,
+        ttl=settings.ANALYSIS_CACHE_TTL_SECONDS,
+    )
@@ -9,11 +9,22 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800
     
     # GitHub OAuth
     GITHUB_CLIENT_ID: str
     GITHUB_CLIENT_SECRET: str
     GITHUB_REDIRECT_URI: str
+    GITHUB_API_URL: str = "https://api.github.com"
+    GITHUB_TIMEOUT_SECONDS: float = 30.0
+    GITHUB_MAX_CONNECTIONS: int = 20
+    GITHUB_CONCURRENCY: int = 8
+    GITHUB_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    GITHUB_RATE_LIMIT_RESERVE: int = 10
+    GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS: float = 60.0
     
     # OpenAI
     OPENAI_API_KEY: str
@@ -31,6 +42,42 @@ class Settings(BaseSettings):
     MAX_REPO_SIZE_MB: int = 500
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     LLM_MODEL: str = "gpt-4o-mini"
+    LLM_BACKEND: str = "openai"
+    CHAT_CONTEXT_TOKENS: int = 6000
+    CHAT_HISTORY_TOKENS: int = 1500
+    ANSWER_CACHE_THRESHOLD: float = 0.95
+    ANSWER_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    ANSWER_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    ANALYSIS_DATA_DIR: str = "./data/analysis"
+    ANALYSIS_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    ANALYSIS_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    ANALYSIS_MAX_WORKERS: int = 2
+    ANALYSIS_MAX_QUEUED: int = 100
+    ANALYSIS_MAX_FILE_BYTES: int = 1024 * 1024
+    ANALYSIS_EXCLUDE: str = ""
+    ANALYSIS_SKIP_GENERATED: bool = True
+    DEPENDENCY_CACHE_DIR: str = "./data/dependencies"
+    BLOB_STORE_PATH: str = "./data/blobs.sqlite"
+    BLOB_STORE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    ANALYSIS_SHARD_WORKERS: int = 0
+    ANALYSIS_SHARD_TRANSPORT: str = "process"
+    CHUNK_MAX_TOKENS: int = 800
+    EMBEDDING_BACKEND: str = "openai"
+    EMBEDDING_CACHE_PATH: str = "./data/embeddings.sqlite"
+    EMBEDDING_BATCH_TOKENS: int = 64000
+    EMBEDDING_CONCURRENCY: int = 4
+    VECTOR_INDEX_DTYPE: str = "float32"
+    VECTOR_EXACT_MAX_ROWS: int = 50000
+    CLONE_CACHE_DIR: str = "./data/clones"
+    CLONE_CACHE_MAX_BYTES: int = 10 * 1024 * 1024 * 1024
+    CLONE_MAX_FILE_BYTES: int = 5 * 1024 * 1024
+    CLONE_PARTIAL: bool = True
+    ANALYSIS_PERSIST_DB: bool = False
+    INGEST_BATCH_ROWS: int = 5000
+    WARMUP_ON_STARTUP: bool = False
+    PROFILING_ENABLED: bool = False
+    PROFILING_INTERVAL_MS: int = 5
+    PROFILING_DIR: str = "./data/profiles"
     
     class Config:
         env_file = ".env"
@@ -1,17 +1,127 @@
-from sqlalchemy import create_engine
+from functools import lru_cache
+from typing import TYPE_CHECKING
+from sqlalchemy import Engine, create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver (asyncpg / aiosqlite)"""
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect in ("postgres", "postgresql"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+
+def _pool_options(url: str, pool_size: int) -> dict:
+    if url.startswith("sqlite"):
+        # SQLite serializes writers anyway; pool sizing does not apply
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": pool_size,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def _tune_sqlite(engine):
+    """WAL lets API reads proceed while a bulk ingest is writing"""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.execute("PRAGMA busy_timeout = 30000")
+        cursor.close()
+
+
+def create_ingest_engine() -> "AsyncEngine":
+    """
+    Async engine without pooling, for event loops that run once (pipeline
+    worker threads); pooled asyncpg connections cannot cross event loops
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+    url = async_database_url(settings.DATABASE_URL)
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    ingest_engine = create_async_engine(url, poolclass=NullPool, connect_args=connect_args)
+    _tune_sqlite(ingest_engine.sync_engine)
+    return ingest_engine
+
+
+# Engines are built on first use: creating one loads the DBAPI driver (and
+# sqlalchemy.ext.asyncio), which processes that never touch the database skip
+
+@lru_cache()
+def get_engine() -> Engine:
+    """Sync engine for JobManager worker threads: one connection each plus the loop"""
+    sync_engine = create_engine(
+        settings.DATABASE_URL,
+        **_pool_options(settings.DATABASE_URL, settings.ANALYSIS_MAX_WORKERS + 2),
+    )
+    _tune_sqlite(sync_engine)
+    return sync_engine
+
+
+@lru_cache()
+def get_session_factory() -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+@lru_cache()
+def get_async_engine() -> "AsyncEngine":
+    from sqlalchemy.ext.asyncio import create_async_engine
+    async_engine = create_async_engine(
+        async_database_url(settings.DATABASE_URL),
+        **_pool_options(settings.DATABASE_URL, settings.DB_POOL_SIZE),
+    )
+    _tune_sqlite(async_engine.sync_engine)
+    return async_engine
+
+
+@lru_cache()
+def get_async_session_factory() -> "async_sessionmaker":
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    return async_sessionmaker(get_async_engine(), expire_on_commit=False, autoflush=False)
+
+
+async def dispose_engines():
+    """Close pooled connections of whichever engines were created"""
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+
 
 Base = declarative_base()
 
-def get_db():
-    """Database dependency for FastAPI"""
-    db = SessionLocal()
-    try:
+def pool_status(engine) -> dict:
+    """Checked-out connections against the pool's capacity (QueuePool only)"""
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {"pool": type(pool).__name__}
+    capacity = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "saturation": round(pool.checkedout() / capacity, 3) if capacity else 0.0,
+    }
+
+async def get_db():
+    """Async database dependency for FastAPI"""
+    async with get_async_session_factory()() as db:
         yield db
-    finally:
-        db.close()
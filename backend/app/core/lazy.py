@@ -0,0 +1,54 @@
+"""
+Deferred imports for heavy optional-at-startup modules
+"""
+import importlib
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that imports it on first attribute access.
+
+    After loading, the real module's namespace is copied onto the stand-in,
+    so later attribute lookups are plain dict hits with no overhead. Loading
+    is guarded by a lock: the first access may come from a worker thread and
+    the event loop at the same time.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lazy_lock = threading.Lock()
+        self._lazy_module = None
+
+    def _lazy_load(self):
+        if self._lazy_module is None:
+            with self._lazy_lock:
+                if self._lazy_module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__.update(
+                        (key, value) for key, value in vars(module).items() if not key.startswith('_lazy_')
+                    )
+                    self._lazy_module = module
+        return self._lazy_module
+
+    def __getattr__(self, attr: str):
+        # Only reached for names not yet copied (before loading, or names a
+        # module resolves through its own __getattr__)
+        return getattr(self._lazy_load(), attr)
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    `np = lazy_import('numpy')` behaves like `import numpy as np` except
+    that the import runs at first use. Modules using it in annotations need
+    `from __future__ import annotations`.
+    """
+    return LazyModule(name)
+
+
+def ensure_loaded(*modules: types.ModuleType):
+    """Import lazy modules now (startup warm-up); real modules are left alone"""
+    for module in modules:
+        if isinstance(module, LazyModule):
+            module._lazy_load()
@@ -0,0 +1,122 @@
+"""
+Per-request sampling profiler and timing middleware
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, List, Optional
+
+from app.core.metrics import REQUEST_LATENCY
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack from a background thread.
+
+    Samples are aggregated as collapsed stacks (`a;b;c count` per line),
+    the input format of flamegraph.pl and speedscope. Sampling never
+    touches the profiled thread, so the overhead is one `sys._current_frames`
+    call per interval.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self) -> 'SamplingProfiler':
+        self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> 'SamplingProfiler':
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+
+# Hooks receive (route, collapsed stacks, wall seconds) after a profiled request
+_profile_hooks: List[Callable[[str, str, float], None]] = []
+
+
+def add_profile_hook(hook: Callable[[str, str, float], None]):
+    _profile_hooks.append(hook)
+
+
+def write_profile_hook(directory: str) -> Callable[[str, str, float], None]:
+    """Hook that writes each profile to `directory` as a .folded file"""
+    def write(route: str, collapsed: str, seconds: float):
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r'[^\w.-]+', '_', route).strip('_') or 'root'
+        path = os.path.join(directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{name}-{int(seconds * 1000)}ms.folded')
+        with open(path, 'w') as f:
+            f.write(collapsed)
+    return write
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware recording request latency per route template.
+
+    The route template (`/api/v1/repos/{repo_id}/search`) rather than the
+    raw path keeps label cardinality bounded; unmatched paths share one
+    label. Latency runs until the last body chunk is sent, so streamed
+    responses count in full.
+
+    When `profiling` is on, a request carrying the `X-Profile: 1` header is
+    sampled and the collapsed stacks are handed to the registered hooks.
+    """
+
+    def __init__(self, app, profiling: bool = False, interval: float = 0.005):
+        self.app = app
+        self.profiling = profiling
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        profiler = None
+        if self.profiling and (b'x-profile', b'1') in scope.get('headers', []):
+            profiler = SamplingProfiler(interval=self.interval).start()
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get('route')
+            template = getattr(route, 'path', None) or 'unmatched'
+            REQUEST_LATENCY.observe(elapsed, scope.get('method', ''), template, str(status['code']))
+            if profiler is not None:
+                collapsed = profiler.stop().collapsed()
+                for hook in _profile_hooks:
+                    hook(template, collapsed, elapsed)
@@ -0,0 +1,27 @@
+"""
+Response encoding negotiated from the Accept header
+"""
+from typing import Any
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def encoded_response(request: Request, content: Any) -> Response:
+    """
+    MessagePack when the client accepts it and msgpack is installed,
+    otherwise JSON encoded by orjson. Either is several times faster than
+    the default encoder on large trees of lists and dicts.
+    """
+    accept = request.headers.get('accept', '')
+    if any(media_type in accept for media_type in MSGPACK_TYPES):
+        try:
+            import msgpack
+        except ImportError:
+            pass
+        else:
+            return Response(msgpack.packb(content, use_bin_type=True), media_type='application/msgpack',
+                            headers={'Vary': 'Accept'})
+    return ORJSONResponse(content, headers={'Vary': 'Accept'})
@@ -1,7 +1,18 @@
+import asyncio
+import time
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.v1 import health, auth, repositories, analysis, chat
+from app.core.database import Base, dispose_engines, get_engine
+from app.core.profiling import TimingMiddleware, add_profile_hook, write_profile_hook
+from app.core.cache import get_analysis_cache
+from app.services.analysis_pipeline import get_job_manager
+from app.services.answer_cache import get_answer_cache
+from app.services.context_packer import get_context_packer
+from app.services.embedding_service import get_embedding_pipeline
+from app.services.github_client import close_http_client, get_http_client
+from app.services.llm_service import get_chat_model
 
 app = FastAPI(
     title="Codebase Onboarding API",
@@ -18,6 +29,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency; `X-Profile: 1` samples a request when PROFILING_ENABLED
+app.add_middleware(
+    TimingMiddleware,
+    profiling=settings.PROFILING_ENABLED,
+    interval=settings.PROFILING_INTERVAL_MS / 1000,
+)
+if settings.PROFILING_ENABLED:
+    add_profile_hook(write_profile_hook(settings.PROFILING_DIR))
+
 # Include routers
 app.include_router(health.router, prefix="/api/v1", tags=["health"])
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
@@ -25,16 +45,52 @@ app.include_router(repositories.router, prefix="/api/v1/repos", tags=["repositor
 app.include_router(analysis.router, prefix="/api/v1/analysis", tags=["analysis"])
 app.include_router(chat.router, prefix="/api/v1/chat", tags=["chat"])
 
+def warm_up() -> dict:
+    """
+    Build every process-wide service now instead of on its first request
+
+    Imports the deferred libraries (numpy, GitPython, httpx, the OpenAI and
+    Redis clients, tiktoken) and opens a database connection. Returns the
+    seconds spent per step.
+    """
+    from app.core.lazy import ensure_loaded
+    from app.services import answer_cache, github_client, incremental_analyzer
+
+    steps = {
+        "imports": lambda: ensure_loaded(answer_cache.np, github_client.httpx, incremental_analyzer.git),
+        "database": lambda: get_engine().connect().close(),
+        "embeddings": get_embedding_pipeline,
+        "chat_model": get_chat_model,
+        "tokenizer": lambda: (get_context_packer(), get_job_manager().pipeline.chunker),
+        "caches": lambda: (get_analysis_cache(), get_answer_cache()),
+        "http": get_http_client,
+    }
+    timings = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        step()
+        timings[name] = round(time.perf_counter() - started, 3)
+    return timings
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
     print("🚀 Starting Codebase Onboarding API...")
+    Base.metadata.create_all(bind=get_engine())
+    get_job_manager().recover()
+    if settings.WARMUP_ON_STARTUP:
+        # Startup completes (and the server accepts requests) once warm
+        timings = await asyncio.to_thread(warm_up)
+        print(f"🔥 Warmed up in {sum(timings.values()):.2f}s: {timings}")
     print(f"📝 Documentation available at: http://{settings.API_HOST}:{settings.API_PORT}/docs")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     print("👋 Shutting down Codebase Onboarding API...")
+    get_job_manager().shutdown()
+    await close_http_client()
+    await dispose_engines()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,71 @@
+"""
+Analysis output tables: files, chunks, symbols and chunk vectors
+"""
+from sqlalchemy import Column, Index, Integer, LargeBinary, String, Text
+from app.core.database import Base
+
+
+class AnalyzedFile(Base):
+    """One file of an analyzed commit"""
+    __tablename__ = "analyzed_files"
+
+    repo_id = Column(String(255), primary_key=True)
+    commit = Column(String(64), primary_key=True)
+    path = Column(Text, primary_key=True)
+    language = Column(String(32))
+    size = Column(Integer, nullable=False)
+    lines = Column(Integer)
+
+
+class ChunkRecord(Base):
+    """A CodeChunk of an analyzed commit; content_hash keys its vector"""
+    __tablename__ = "code_chunks"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    repo_id = Column(String(255), nullable=False)
+    commit = Column(String(64), nullable=False)
+    path = Column(Text, nullable=False)
+    language = Column(String(32))
+    start_line = Column(Integer, nullable=False)
+    end_line = Column(Integer, nullable=False)
+    kind = Column(String(32), nullable=False)
+    # JSON-encoded list of symbol names
+    symbols = Column(Text, nullable=False)
+    token_count = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=False, index=True)
+    content = Column(Text, nullable=False)
+
+    __table_args__ = (Index("ix_code_chunks_repo_commit_path", "repo_id", "commit", "path"),)
+
+
+class SymbolRecord(Base):
+    """A definition found by the symbol index"""
+    __tablename__ = "code_symbols"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    repo_id = Column(String(255), nullable=False)
+    commit = Column(String(64), nullable=False)
+    path = Column(Text, nullable=False)
+    name = Column(String(255), nullable=False)
+    qualified_name = Column(Text, nullable=False)
+    kind = Column(String(32), nullable=False)
+    start_line = Column(Integer, nullable=False)
+    end_line = Column(Integer, nullable=False)
+    signature = Column(Text, nullable=False)
+    doc = Column(Text)
+
+    __table_args__ = (
+        Index("ix_code_symbols_repo_commit_name", "repo_id", "commit", "name"),
+        Index("ix_code_symbols_repo_commit_path", "repo_id", "commit", "path"),
+    )
+
+
+class ChunkVector(Base):
+    """Content-addressed chunk embedding, shared across repositories"""
+    __tablename__ = "chunk_vectors"
+
+    model = Column(String(64), primary_key=True)
+    content_hash = Column(String(64), primary_key=True)
+    dimensions = Column(Integer, nullable=False)
+    # Packed little-endian float32
+    vector = Column(LargeBinary, nullable=False)
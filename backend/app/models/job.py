@@ -0,0 +1,22 @@
+"""
+Analysis job table
+"""
+from datetime import datetime
+from sqlalchemy import Column, DateTime, String, Text
+from app.core.database import Base
+
+
+class AnalysisJob(Base):
+    """One /repos/analyze request and its per-stage progress"""
+    __tablename__ = "analysis_jobs"
+
+    id = Column(String(32), primary_key=True)
+    repo_id = Column(String(255), index=True, nullable=False)
+    repo_url = Column(Text, nullable=False)
+    branch = Column(String(255), nullable=False)
+    status = Column(String(32), index=True, nullable=False)
+    # JSON-encoded {stage: {"status", "progress", "message"}}
+    stages = Column(Text, nullable=False)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
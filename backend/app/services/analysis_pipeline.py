@@ -0,0 +1,428 @@
+"""
+Stages of the repository analysis pipeline
+"""
+import asyncio
+import os
+import re
+import shutil
+from dataclasses import asdict
+from functools import lru_cache, partial
+from typing import Dict, Iterator, Optional
+
+from app.core.config import settings
+from app.core.database import create_ingest_engine, get_session_factory
+import app.models.analysis  # noqa: F401  (registers the tables for create_all)
+from app.services.blob_store import cached_chunks, cached_mapping, cached_records, get_blob_store
+from app.services.clone_manager import get_clone_manager
+from app.services.code_chunker import CHUNKS_VERSION, CodeChunker, default_token_counter, read_chunks, write_chunks
+from app.services.dependency_engine import get_lockfile_cache
+from app.services.embedding_service import EmbeddingPipeline, get_embedding_pipeline
+from app.services.file_tree import file_tree_for_commit
+from app.services.github_service import GitHubService
+from app.services.import_graph import IMPORTS_VERSION, build_import_graph, load_extracted
+from app.services.import_graph import extract_repository as extract_imports
+from app.services.incremental_analyzer import IncrementalAnalyzer, ManifestStore
+from app.services.job_manager import JobManager
+from app.services.lexical_index import LexicalIndex
+from app.services.path_index import path_index_for_commit
+from app.services.repo_scanner import ScannedFile
+from app.services.shard_executor import get_shard_executor
+from app.services.symbol_index import SYMBOLS_VERSION, Symbol, SymbolIndex
+from app.services.symbol_index import extract_repository as extract_symbols
+from app.services.vector_index import VectorIndex, publish, staging_directory
+
+
+def repo_id_from_url(repo_url: str) -> str:
+    """
+    Derive a path-safe repository id ("owner--name") from a clone URL.
+
+    GitHub owners cannot contain "--", so the id stays unambiguous. Raises
+    ValueError for a URL without an owner and a name.
+    """
+    cleaned = re.sub(r'\.git$', '', repo_url.rstrip('/'))
+    parts = [part for part in re.split(r'[/:]', cleaned) if part]
+    if len(parts) < 2:
+        raise ValueError(f'Expected a repository URL ending in owner/name: {repo_url}')
+    owner, name = parts[-2], parts[-1]
+    return f'{owner}--{name}'
+
+
+def _sizes(files: Dict[str, Dict]) -> Dict[str, int]:
+    """Manifest file sizes, which the sharded executor balances shards by"""
+    return {path: record['size'] for path, record in files.items()}
+
+
+def _blobs(files: Dict[str, Dict]) -> Dict[str, str]:
+    """Manifest blob SHAs, which per-file results are stored under"""
+    return {path: record['blob'] for path, record in files.items() if record.get('blob')}
+
+
+def _encode_symbols(symbols) -> list:
+    return [{key: value for key, value in asdict(symbol).items() if key != 'path'} for symbol in symbols]
+
+
+def _decode_symbols(path: str, stored: list) -> list:
+    return [Symbol(path=path, **fields) for fields in stored]
+
+
+class AnalysisPipeline:
+    """
+    Blocking pipeline stages run by JobManager worker threads.
+
+    Each stage receives a JobContext; shared state between stages (the
+    clone path, the analysis result) lives in ctx.state.
+    """
+
+    STAGES = ['clone', 'scan', 'graph', 'symbols', 'chunk', 'embed', 'index', 'persist']
+
+    def __init__(self, store: ManifestStore, access_token: Optional[str] = None,
+                 chunker: Optional[CodeChunker] = None, embeddings: Optional[EmbeddingPipeline] = None):
+        self.store = store
+        self.access_token = access_token
+        self._chunker = chunker
+        self.embeddings = embeddings
+
+    @property
+    def chunker(self) -> CodeChunker:
+        # Built on first use: loading the tokenizer is not free
+        if self._chunker is None:
+            self._chunker = CodeChunker(
+                max_tokens=settings.CHUNK_MAX_TOKENS,
+                token_counter=default_token_counter(settings.EMBEDDING_MODEL),
+            )
+        return self._chunker
+
+    def run_stage(self, name: str, ctx):
+        getattr(self, f'stage_{name}')(ctx)
+
+    def cleanup(self, state: Dict):
+        # The worktree stays in the clone cache for the next analysis
+        checkout = state.pop('checkout', None)
+        if checkout is not None:
+            get_clone_manager().release(checkout)
+        baseline = state.pop('baseline', None)
+        if baseline is not None:
+            self.store.unpin(*baseline)
+
+    def stage_clone(self, ctx):
+        ctx.report(0.0, f'Cloning {ctx.job.repo_url}@{ctx.job.branch}')
+        github = GitHubService(self.access_token)
+        checkout = github.clone_repository_sync(ctx.job.repo_url, ctx.job.branch)
+        ctx.state['checkout'] = checkout
+        ctx.state['repo_path'] = checkout.path
+        ctx.report(1.0, f'Checked out {checkout.commit[:12]}')
+
+    def stage_scan(self, ctx):
+        ctx.report(0.0, 'Scanning files')
+        analyzer = IncrementalAnalyzer(ctx.state['repo_path'], ctx.job.repo_id, self.store,
+                                       dependency_cache=get_lockfile_cache())
+        # Later stages read the previous commit's artifacts; a concurrent
+        # analysis of the same repository must not prune them meanwhile
+        baseline = self.store.pin_latest(ctx.job.repo_id)
+        if baseline is not None:
+            ctx.state['baseline'] = (ctx.job.repo_id, baseline)
+        result = analyzer.analyze(baseline)
+        ctx.state['analysis'] = result
+        ctx.state['commit'] = result['commit']
+        ctx.report(0.9, 'Indexing paths')
+        path_index_for_commit(self.store, ctx.job.repo_id, result['commit'])
+        file_tree_for_commit(self.store, ctx.job.repo_id, result['commit'])
+        changes = result['changes']
+        ctx.report(1.0, (
+            f"{result['statistics']['total_files']} files "
+            f"({len(changes['added'])} added, {len(changes['modified'])} modified, "
+            f"{len(changes['deleted'])} deleted)"
+        ))
+
+    def stage_graph(self, ctx):
+        """
+        Build the commit's import graph.
+
+        Raw imports of unchanged files are carried over from the previous
+        commit's graph; only changed files are re-read.
+        """
+        repo_id, commit = ctx.job.repo_id, ctx.state['commit']
+        analysis = ctx.state['analysis']
+        directory = self.store.artifact_path(repo_id, commit, 'imports')
+        if os.path.exists(os.path.join(directory, 'graph.json')):
+            ctx.report(1.0, 'Import graph up to date')
+            return
+
+        previous = None
+        if analysis['previous_commit']:
+            previous = load_extracted(self.store.artifact_path(repo_id, analysis['previous_commit'], 'imports'))
+        changes = analysis['changes']
+        files = self.store.load(repo_id, commit)['files']
+        executor = get_shard_executor()
+        extract = partial(executor.extract_imports, sizes=_sizes(files)) if executor else extract_imports
+        if self.store.blob_store:
+            extract = cached_mapping(self.store.blob_store, f'imports/v{IMPORTS_VERSION}', _blobs(files), extract)
+        ctx.report(0.0, 'Extracting imports')
+        graph = build_import_graph(
+            ctx.state['repo_path'],
+            directory,
+            files,
+            previous=previous,
+            changed=changes['added'] + changes['modified'],
+            extract=extract,
+        )
+        ctx.report(1.0, (
+            f'{len(graph.nodes)} files, {graph.edge_count} imports, '
+            f'{len(graph.cycles)} cycles across {len(graph.modules)} directories'
+        ))
+
+    def stage_symbols(self, ctx):
+        """
+        Build the commit's symbol index.
+
+        On incremental runs the previous commit's index is copied and only
+        changed files are re-parsed.
+        """
+        repo_id, commit = ctx.job.repo_id, ctx.state['commit']
+        analysis = ctx.state['analysis']
+        db_path = self.store.artifact_path(repo_id, commit, 'symbols.sqlite')
+        if os.path.exists(db_path):
+            ctx.report(1.0, 'Symbol index up to date')
+            return
+
+        previous = None
+        if analysis['previous_commit']:
+            previous = self.store.artifact_path(repo_id, analysis['previous_commit'], 'symbols.sqlite')
+            if not os.path.exists(previous):
+                previous = None
+
+        files = self.store.load(repo_id, commit)['files']
+        changes = analysis['changes']
+        targets = changes['added'] + changes['modified'] if previous else sorted(files)
+        targets = [
+            (path, files[path]['language']) for path in targets
+            if path in files and files[path]['language']
+        ]
+        executor = get_shard_executor()
+        extract = partial(executor.extract_symbols, sizes=_sizes(files)) if executor else extract_symbols
+        if self.store.blob_store:
+            extract = cached_records(self.store.blob_store, f'symbols/v{SYMBOLS_VERSION}', _blobs(files), extract,
+                                     _encode_symbols, _decode_symbols)
+        ctx.report(0.0, f'Extracting symbols from {len(targets)} files')
+        SymbolIndex.build(
+            db_path, ctx.state['repo_path'], targets,
+            previous=previous, removed=changes['deleted'] if previous else (),
+            extract=extract,
+        )
+        ctx.report(1.0, f'{len(targets)} files parsed for symbols')
+
+    def stage_chunk(self, ctx):
+        """
+        Write the commit's chunks to a JSON-lines artifact.
+
+        On incremental runs, chunks of unchanged files are streamed over
+        from the previous commit's artifact and only changed files are
+        re-chunked.
+        """
+        repo_id, commit = ctx.job.repo_id, ctx.state['commit']
+        analysis = ctx.state['analysis']
+        chunks_path = self.store.artifact_path(repo_id, commit, 'chunks.jsonl')
+        ctx.state['chunks_path'] = chunks_path
+        if os.path.exists(chunks_path):
+            ctx.state['chunk_count'] = None
+            ctx.report(1.0, 'Chunks up to date')
+            return
+
+        manifest = self.store.load(repo_id, commit)
+        previous_path = None
+        if analysis['previous_commit']:
+            previous_path = self.store.artifact_path(repo_id, analysis['previous_commit'], 'chunks.jsonl')
+            if not os.path.exists(previous_path):
+                previous_path = None
+
+        changes = analysis['changes']
+        changed = set(changes['added']) | set(changes['modified']) | set(changes['deleted'])
+        targets = [
+            ScannedFile(path, path.rsplit('/', 1)[-1], os.path.splitext(path)[1], record['size'], record['language'])
+            for path, record in manifest['files'].items()
+            if previous_path is None or path in changed
+        ]
+
+        executor = get_shard_executor()
+        chunk_files = self.chunker.iter_chunks
+        # The executor shards one call across its workers; inline, batches keep progress moving
+        batch_files = (len(targets) or 1) if executor else 200
+        if executor:
+            chunk_files = partial(executor.iter_chunks, max_tokens=self.chunker.max_tokens,
+                                  model=settings.EMBEDDING_MODEL)
+        if self.store.blob_store:
+            kind = f'chunks/v{CHUNKS_VERSION}/{self.chunker.max_tokens}/{settings.EMBEDDING_MODEL}'
+            chunk_files = cached_chunks(self.store.blob_store, kind, _blobs(manifest['files']), chunk_files)
+
+        def generate() -> Iterator:
+            if previous_path:
+                for chunk in read_chunks(previous_path):
+                    if chunk.path not in changed:
+                        yield chunk
+            workers = f' on {executor.transport.workers} workers' if executor else ''
+            for start in range(0, len(targets), batch_files):
+                ctx.report(start / max(len(targets), 1), f'Chunking {start}/{len(targets)} files{workers}')
+                yield from chunk_files(ctx.state['repo_path'], targets[start:start + batch_files])
+
+        count = write_chunks(chunks_path, generate())
+        ctx.state['chunk_count'] = count
+        ctx.report(1.0, f'{count} chunks ({len(targets)} files chunked)')
+
+    def stage_embed(self, ctx):
+        """Embed every chunk whose content hash is not already cached"""
+        pipeline = self.embeddings or get_embedding_pipeline()
+        total = ctx.state.get('chunk_count')
+
+        def on_progress(stats):
+            if total:
+                ctx.report(stats['chunks'] / total, f"{stats['embedded']} chunks embedded")
+
+        stats = asyncio.run(pipeline.embed_chunks(read_chunks(ctx.state['chunks_path']), on_progress))
+        ctx.report(1.0, (
+            f"{stats['unique']} unique chunks: {stats['cached']} cached, "
+            f"{stats['embedded']} embedded in {stats['batches']} batches"
+        ))
+
+    def stage_index(self, ctx):
+        """Build the commit's lexical index and bring the vector index up to date"""
+        self._index_lexical(ctx)
+        self._index_vectors(ctx)
+
+    def _index_lexical(self, ctx):
+        directory = self.store.artifact_path(ctx.job.repo_id, ctx.state['commit'], 'lexical')
+        if os.path.exists(os.path.join(directory, 'meta.json')):
+            return
+        ctx.report(0.0, 'Building lexical index')
+        index = LexicalIndex.build(directory, read_chunks(ctx.state['chunks_path']))
+        ctx.report(0.2, f"Lexical index: {index.meta['documents']} chunks, {index.meta['postings']} postings")
+
+    def _index_vectors(self, ctx):
+        """
+        Bring the repository's vector index up to the analyzed commit.
+
+        When the index reflects the previous commit, rows for changed and
+        deleted files are tombstoned and only changed files are re-added;
+        otherwise the index is rebuilt from the chunk artifact in a staging
+        directory and published over the live one once complete, so chat
+        never reads a half-built index.
+        """
+        repo_id, commit = ctx.job.repo_id, ctx.state['commit']
+        analysis = ctx.state['analysis']
+        directory = os.path.join(self.store.repo_dir(repo_id), 'vectors')
+        index = VectorIndex(directory) if os.path.exists(os.path.join(directory, 'meta.json')) else None
+        if index is not None and index.commit == commit:
+            ctx.report(1.0, 'Vector index up to date')
+            return
+
+        changes = analysis['changes']
+        incremental = (
+            index is not None
+            and analysis['incremental']
+            and index.commit == analysis['previous_commit']
+        )
+        live = directory
+        if incremental:
+            touched = set(changes['added']) | set(changes['modified'])
+            index.delete_paths(touched | set(changes['deleted']))
+        else:
+            directory = staging_directory(live)
+            index = None
+            touched = None
+        try:
+            self._fill_vectors(ctx, directory, index, touched)
+        except BaseException:
+            if directory != live:
+                shutil.rmtree(directory, ignore_errors=True)
+            raise
+        if directory != live:
+            publish(directory, live)
+
+    def _fill_vectors(self, ctx, directory: str, index: Optional[VectorIndex], touched: Optional[set]):
+        commit = ctx.state['commit']
+
+        pipeline = self.embeddings or get_embedding_pipeline()
+        total = ctx.state.get('chunk_count')
+        added = 0
+        batch = []
+
+        def flush(index):
+            vectors = pipeline.cache.get_many(pipeline.model, [chunk.content_hash for chunk in batch])
+            ready = [chunk for chunk in batch if chunk.content_hash in vectors]
+            if not ready:
+                return index
+            if index is None:
+                dimensions = len(vectors[ready[0].content_hash])
+                index = VectorIndex(directory, dimensions, settings.VECTOR_INDEX_DTYPE)
+            index.add([vectors[chunk.content_hash] for chunk in ready], ready)
+            return index
+
+        for i, chunk in enumerate(read_chunks(ctx.state['chunks_path'])):
+            if touched is not None and chunk.path not in touched:
+                continue
+            batch.append(chunk)
+            if len(batch) >= 1000:
+                index = flush(index)
+                added += len(batch)
+                batch = []
+                if total:
+                    ctx.report(i / total, f'{added} chunks indexed')
+        if batch:
+            index = flush(index)
+            added += len(batch)
+
+        if index is None:
+            ctx.skip('No chunks to index')
+            return
+        if index.count > settings.VECTOR_EXACT_MAX_ROWS and not index.meta['ivf_lists']:
+            ctx.report(0.95, 'Building IVF index')
+            index.build_ivf()
+        index.set_commit(commit)
+        ctx.report(1.0, f'{added} chunks indexed, {index.count} total')
+
+
+    def stage_persist(self, ctx):
+        """Bulk-write the commit's files, chunks, symbols and vectors to the database"""
+        if not settings.ANALYSIS_PERSIST_DB:
+            ctx.skip('Database persistence disabled')
+            return
+        repo_id, commit = ctx.job.repo_id, ctx.state['commit']
+        pipeline = self.embeddings or get_embedding_pipeline()
+        files = self.store.load(repo_id, commit)['files']
+        symbols = SymbolIndex(self.store.artifact_path(repo_id, commit, 'symbols.sqlite'))
+        hashes = sorted({chunk.content_hash for chunk in read_chunks(ctx.state['chunks_path'])})
+
+        # Deferred: the dialect-specific insert constructs are slow to import
+        from app.services.bulk_ingest import BulkIngestor
+
+        async def ingest():
+            engine = create_ingest_engine()
+            try:
+                return await BulkIngestor(engine, settings.INGEST_BATCH_ROWS).ingest(
+                    repo_id, commit,
+                    files=files.items(),
+                    chunks=read_chunks(ctx.state['chunks_path']),
+                    symbols=symbols.iter_all(),
+                    vectors=pipeline.cache.iter_packed(pipeline.model, hashes),
+                    model=pipeline.model,
+                )
+            finally:
+                await engine.dispose()
+
+        ctx.report(0.0, 'Writing analysis to the database')
+        counts = asyncio.run(ingest())
+        ctx.report(1.0, (
+            f"{counts['files']} files, {counts['chunks']} chunks, "
+            f"{counts['symbols']} symbols and {counts['vectors']} vectors stored"
+        ))
+
+
+@lru_cache()
+def get_job_manager() -> JobManager:
+    """Process-wide job manager dependency for FastAPI"""
+    pipeline = AnalysisPipeline(ManifestStore(settings.ANALYSIS_DATA_DIR, blob_store=get_blob_store()))
+    return JobManager(
+        pipeline,
+        get_session_factory(),
+        max_workers=settings.ANALYSIS_MAX_WORKERS,
+        max_queued=settings.ANALYSIS_MAX_QUEUED,
+    )
@@ -0,0 +1,109 @@
+"""
+Semantic cache of chat answers
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import re
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from app.core.cache import InMemoryBackend, LRUCache, RedisBackend, TwoTierCache
+from app.core.config import settings
+from app.core.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_question(text: str) -> str:
+    """Case, spacing and trailing punctuation do not change what is asked"""
+    return WHITESPACE.sub(' ', text).strip().rstrip('?!.').strip().lower()
+
+
+def chunk_set_digest(content_hashes: Iterable[str]) -> str:
+    """Order-insensitive identity of the retrieved chunks"""
+    return hashlib.sha1('\n'.join(sorted(set(content_hashes))).encode('utf-8')).hexdigest()
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class AnswerCache:
+    """
+    Answers keyed by commit, retrieved chunks and question meaning.
+
+    A bucket holds the answers given at one commit of a repository for
+    one exact set of retrieved chunks (by content hash); within it, a
+    question hits when its embedding is within `threshold` cosine
+    similarity of a cached question. Re-analysis moves the repository to
+    a new commit and so to new buckets; the old ones expire with the
+    cache TTL.
+    """
+
+    def __init__(self, cache: TwoTierCache, threshold: float = 0.95, max_per_bucket: int = 16):
+        self.cache = cache
+        self.threshold = threshold
+        self.max_per_bucket = max_per_bucket
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(repo_id: str, commit: str, model: str, content_hashes: Iterable[str]) -> str:
+        return f'answers:{repo_id}:{commit}:{model}:{chunk_set_digest(content_hashes)}'
+
+    async def lookup(self, key: str, vector: Sequence[float]) -> Optional[Dict]:
+        """Closest cached answer at or above the threshold, with its similarity"""
+        bucket = await self.cache.get(key)
+        best, best_score = None, self.threshold
+        if bucket:
+            query = _unit(vector)
+            for entry in bucket['entries']:
+                cached = np.frombuffer(base64.b64decode(entry['vector']), dtype=np.float32)
+                if cached.shape != query.shape:
+                    continue
+                score = float(np.dot(query, cached))
+                if score >= best_score:
+                    best, best_score = entry, score
+        if best is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {'question': best['question'], 'answer': best['answer'], 'similarity': round(best_score, 4)}
+
+    async def store(self, key: str, vector: Sequence[float], question: str, answer: str):
+        bucket = await self.cache.get(key) or {'entries': []}
+        entries: List[Dict] = bucket['entries']
+        entries.append({
+            'question': question,
+            'vector': base64.b64encode(_unit(vector).tobytes()).decode('ascii'),
+            'answer': answer,
+            'created_at': time.time(),
+        })
+        await self.cache.set(key, {'entries': entries[-self.max_per_bucket:]})
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@lru_cache()
+def get_answer_cache() -> AnswerCache:
+    """Answer cache dependency for FastAPI"""
+    if settings.REDIS_URL.startswith('memory://'):
+        backend = InMemoryBackend()
+    else:
+        backend = RedisBackend(settings.REDIS_URL)
+    cache = TwoTierCache(
+        LRUCache(settings.ANSWER_CACHE_MAX_BYTES),
+        backend,
+        ttl=settings.ANSWER_CACHE_TTL_SECONDS,
+    )
+    return AnswerCache(cache, threshold=settings.ANSWER_CACHE_THRESHOLD)
@@ -0,0 +1,309 @@
+"""
+Content-addressed store of per-file analysis results
+"""
+import os
+import sqlite3
+import time
+from functools import lru_cache
+from itertools import groupby
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import orjson
+
+from app.core.config import settings
+from app.services.code_chunker import CodeChunk
+
+# A hit refreshes an artifact's last use at most this often
+TOUCH_SECONDS = 60
+BATCH = 500
+
+
+def artifact_key(blob: str, language: Optional[str] = None) -> str:
+    """Results that depend on the language as well as the content are keyed by both"""
+    return f'{blob}/{language}' if language else blob
+
+
+def manifest_blobs(manifest: Dict) -> List[str]:
+    """Distinct blob SHAs of a manifest's files"""
+    return sorted({record['blob'] for record in manifest['files'].values() if record.get('blob')})
+
+
+class BlobStore:
+    """
+    Per-file derived results keyed by git blob SHA, shared by every
+    repository and branch: a file that is identical in a fork, an old
+    branch or another repository is analyzed once.
+
+    `kind` names the result and the version of the code producing it
+    ("symbols/v1", "chunks/v1/800/<model>"), so a changed analyzer misses
+    instead of reading stale results. Blobs are reference counted by the
+    manifests that contain them; once the store is over `max_bytes`, the
+    least recently used results of unreferenced blobs are evicted first,
+    then those of referenced blobs, which are only a cache.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS artifacts (
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        blob TEXT NOT NULL,
+        value BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        used INTEGER NOT NULL,
+        PRIMARY KEY (kind, key)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS artifacts_used ON artifacts (used);
+    CREATE INDEX IF NOT EXISTS artifacts_blob ON artifacts (blob);
+    CREATE TABLE IF NOT EXISTS blobs (
+        blob TEXT PRIMARY KEY,
+        refs INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS totals (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        bytes INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO totals VALUES (0, 0);
+    CREATE TRIGGER IF NOT EXISTS artifacts_insert AFTER INSERT ON artifacts
+        BEGIN UPDATE totals SET bytes = bytes + NEW.size; END;
+    CREATE TRIGGER IF NOT EXISTS artifacts_update AFTER UPDATE OF size ON artifacts
+        BEGIN UPDATE totals SET bytes = bytes + NEW.size - OLD.size; END;
+    CREATE TRIGGER IF NOT EXISTS artifacts_delete AFTER DELETE ON artifacts
+        BEGIN UPDATE totals SET bytes = bytes - OLD.size; END;
+    """
+
+    def __init__(self, db_path: str, max_bytes: int):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.executescript(self.SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get_many(self, kind: str, keys: Sequence[str]) -> Dict[str, object]:
+        """Cached results for the subset of `keys` the store holds"""
+        found: Dict[str, object] = {}
+        now = int(time.time())
+        conn = self._connect()
+        try:
+            for i in range(0, len(keys), BATCH):
+                batch = keys[i:i + BATCH]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(
+                    f'SELECT key, value FROM artifacts WHERE kind = ? AND key IN ({placeholders})',
+                    [kind, *batch],
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = orjson.loads(value)
+                if rows:
+                    conn.execute(
+                        f'UPDATE artifacts SET used = ? WHERE kind = ? AND key IN ({placeholders}) AND used < ?',
+                        [now, kind, *batch, now - TOUCH_SECONDS],
+                    )
+            conn.commit()
+        finally:
+            conn.close()
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, kind: str, values: Dict[str, object]):
+        """Store results by key; the blob SHA is the key up to any `/language`"""
+        if not values:
+            return
+        now = int(time.time())
+        rows = []
+        for key, value in values.items():
+            encoded = orjson.dumps(value)
+            rows.append((kind, key, key.split('/', 1)[0], encoded, len(encoded), now))
+        conn = self._connect()
+        try:
+            conn.executemany(
+                'INSERT INTO artifacts (kind, key, blob, value, size, used) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (kind, key) DO UPDATE SET value = excluded.value, size = excluded.size, '
+                'used = excluded.used',
+                rows,
+            )
+            conn.commit()
+            over = self._total(conn) > self.max_bytes
+        finally:
+            conn.close()
+        if over:
+            self.evict()
+
+    def _total(self, conn: sqlite3.Connection) -> int:
+        return conn.execute('SELECT bytes FROM totals').fetchone()[0]
+
+    def retain(self, blobs: Iterable[str]):
+        """Count a reference from one manifest to each blob"""
+        conn = self._connect()
+        try:
+            conn.executemany(
+                'INSERT INTO blobs (blob, refs) VALUES (?, 1) ON CONFLICT (blob) DO UPDATE SET refs = refs + 1',
+                [(blob,) for blob in blobs],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def release(self, blobs: Iterable[str]):
+        """Drop one manifest's references; the results stay until evicted"""
+        conn = self._connect()
+        try:
+            conn.executemany('UPDATE blobs SET refs = refs - 1 WHERE blob = ?', [(blob,) for blob in blobs])
+            conn.execute('DELETE FROM blobs WHERE refs <= 0')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def evict(self, target: Optional[int] = None) -> int:
+        """
+        Delete least recently used results until the store is under
+        `target` bytes (90% of max_bytes by default), unreferenced blobs
+        first. Returns the number of results deleted.
+        """
+        if target is None:
+            target = int(self.max_bytes * 0.9)
+        deleted = 0
+        conn = self._connect()
+        try:
+            total = self._total(conn)
+            for referenced in (False, True):
+                if total <= target:
+                    break
+                doomed = []
+                rows = conn.execute(
+                    'SELECT kind, key, size FROM artifacts a WHERE '
+                    f"{'' if referenced else 'NOT '}EXISTS (SELECT 1 FROM blobs b WHERE b.blob = a.blob) "
+                    'ORDER BY used'
+                )
+                for kind, key, size in rows:
+                    if total <= target:
+                        break
+                    doomed.append((kind, key))
+                    total -= size
+                conn.executemany('DELETE FROM artifacts WHERE kind = ? AND key = ?', doomed)
+                deleted += len(doomed)
+            conn.commit()
+        finally:
+            conn.close()
+        return deleted
+
+    def statistics(self) -> Dict:
+        conn = self._connect()
+        try:
+            artifacts, = conn.execute('SELECT COUNT(*) FROM artifacts').fetchone()
+            referenced, = conn.execute('SELECT COUNT(*) FROM blobs').fetchone()
+            total = self._total(conn)
+        finally:
+            conn.close()
+        return {'artifacts': artifacts, 'bytes': total, 'referenced_blobs': referenced,
+                'hits': self.hits, 'misses': self.misses}
+
+
+# Wrappers that put the store in front of an analyzer. Each takes the
+# commit's {path: blob SHA}; files without a blob are always computed.
+
+def cached_mapping(store: BlobStore, kind: str, blobs: Dict[str, str],
+                   extract: Callable[[str, List[Tuple[str, str]]], Dict[str, object]]):
+    """`extract(repo_path, [(path, language)]) -> {path: result}`, computing only the misses"""
+    def run(repo_path: str, sources: Sequence[Tuple[str, str]]) -> Dict[str, object]:
+        keys = {path: artifact_key(blobs[path], language) for path, language in sources if blobs.get(path)}
+        cached = store.get_many(kind, list(keys.values()))
+        result = {path: cached[key] for path, key in keys.items() if key in cached}
+        missing = [source for source in sources if source[0] not in result]
+        if missing:
+            extracted = extract(repo_path, missing)
+            store.put_many(kind, {keys[path]: value for path, value in extracted.items() if path in keys})
+            result.update(extracted)
+        return result
+    return run
+
+
+def cached_records(store: BlobStore, kind: str, blobs: Dict[str, str],
+                   extract: Callable[[str, List[Tuple[str, str]]], Iterable[Tuple[str, str, object]]],
+                   encode: Callable[[object], object], decode: Callable[[str, object], object]):
+    """
+    `extract(repo_path, [(path, language)])` yielding (path, language,
+    result): cached results first, then the misses as they are computed.
+    `encode` strips the path from a result and `decode` puts it back.
+    """
+    def run(repo_path: str, sources: Sequence[Tuple[str, str]]) -> Iterator[Tuple[str, str, object]]:
+        keys = {path: artifact_key(blobs[path], language) for path, language in sources if blobs.get(path)}
+        cached = store.get_many(kind, list(keys.values()))
+        missing = []
+        for path, language in sources:
+            key = keys.get(path)
+            if key in cached:
+                yield path, language, decode(path, cached[key])
+            else:
+                missing.append((path, language))
+        pending = {}
+        for path, language, result in extract(repo_path, missing):
+            if path in keys:
+                pending[keys[path]] = encode(result)
+                if len(pending) >= BATCH:
+                    store.put_many(kind, pending)
+                    pending = {}
+            yield path, language, result
+        store.put_many(kind, pending)
+    return run
+
+
+def cached_chunks(store: BlobStore, kind: str, blobs: Dict[str, str],
+                  chunk: Callable[[str, List], Iterable[CodeChunk]]):
+    """
+    `chunk(repo_path, scanned_files)` yielding CodeChunks file by file,
+    chunking only the misses. Cached and computed chunks are merged back
+    into the order of `files`.
+    """
+    def run(repo_path: str, files: Sequence) -> Iterator[CodeChunk]:
+        keys = {f.path: artifact_key(blobs[f.path], f.language) for f in files if blobs.get(f.path)}
+        cached = store.get_many(kind, list(keys.values()))
+        missing = [f for f in files if keys.get(f.path) not in cached]
+        produced = groupby(chunk(repo_path, missing), key=lambda c: c.path) if missing else iter(())
+        # Groups computed ahead of their turn; a file can yield no chunks at all
+        ready: Dict[str, List[CodeChunk]] = {}
+        pending = {}
+        for scanned in files:
+            key = keys.get(scanned.path)
+            if key in cached:
+                for fields in cached[key]:
+                    yield CodeChunk(path=scanned.path, **fields)
+                continue
+            for path, chunks in produced:
+                ready[path] = list(chunks)
+                if path == scanned.path:
+                    break
+            chunks = ready.pop(scanned.path, [])
+            if key is not None:
+                pending[key] = [_without_path(c.to_dict()) for c in chunks]
+                if len(pending) >= BATCH:
+                    store.put_many(kind, pending)
+                    pending = {}
+            yield from chunks
+        store.put_many(kind, pending)
+    return run
+
+
+def _without_path(fields: Dict) -> Dict:
+    fields.pop('path', None)
+    return fields
+
+
+@lru_cache()
+def get_blob_store() -> Optional[BlobStore]:
+    """Process-wide blob store, or None when BLOB_STORE_MAX_BYTES is 0"""
+    if settings.BLOB_STORE_MAX_BYTES <= 0:
+        return None
+    return BlobStore(settings.BLOB_STORE_PATH, settings.BLOB_STORE_MAX_BYTES)
@@ -0,0 +1,133 @@
+"""
+Bulk ingest of analysis output into the database
+"""
+import json
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Table, delete, insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.models.analysis import AnalyzedFile, ChunkRecord, ChunkVector, SymbolRecord
+from app.services.code_chunker import CodeChunk
+from app.services.symbol_index import Symbol
+
+FILES = AnalyzedFile.__table__
+CHUNKS = ChunkRecord.__table__
+SYMBOLS = SymbolRecord.__table__
+VECTORS = ChunkVector.__table__
+
+
+def _batches(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class BulkIngestor:
+    """
+    Writes one commit's files, chunks, symbols and vectors in a single
+    transaction.
+
+    Rows are streamed in batches of `batch_rows`. On Postgres with asyncpg
+    each batch goes through COPY; elsewhere it is one executemany, which
+    SQLAlchemy turns into multi-row INSERTs. Re-ingesting a commit replaces
+    its rows. Vectors are content-addressed and shared between commits and
+    repositories, so existing ones are left alone.
+    """
+
+    def __init__(self, engine: AsyncEngine, batch_rows: int = 5000):
+        self.engine = engine
+        self.batch_rows = batch_rows
+
+    @property
+    def _copy_supported(self) -> bool:
+        return self.engine.dialect.name == 'postgresql' and self.engine.dialect.driver == 'asyncpg'
+
+    async def ingest(self, repo_id: str, commit: str, files: Iterable[Tuple[str, Dict]] = (),
+                     chunks: Iterable[CodeChunk] = (), symbols: Iterable[Symbol] = (),
+                     vectors: Iterable[Tuple[str, bytes]] = (), model: Optional[str] = None) -> Dict[str, int]:
+        """
+        Replace the commit's rows and return the number written per table.
+
+        `files` are (path, manifest record) pairs; `vectors` are
+        (content hash, packed float32) pairs embedded with `model`.
+        """
+        async with self.engine.begin() as conn:
+            for table in (FILES, CHUNKS, SYMBOLS):
+                await conn.execute(delete(table).where(table.c.repo_id == repo_id, table.c.commit == commit))
+
+            counts = {
+                'files': await self._copy(conn, FILES, (
+                    (repo_id, commit, path, record.get('language'), record['size'], record.get('lines'))
+                    for path, record in files
+                )),
+                'chunks': await self._copy(conn, CHUNKS, (
+                    (repo_id, commit, c.path, c.language, c.start_line, c.end_line, c.kind,
+                     json.dumps(c.symbols), c.token_count, c.content_hash, c.content)
+                    for c in chunks
+                )),
+                'symbols': await self._copy(conn, SYMBOLS, (
+                    (repo_id, commit, s.path, s.name, s.qualified_name, s.kind, s.start_line,
+                     s.end_line, s.signature, s.doc)
+                    for s in symbols
+                )),
+                'vectors': 0,
+            }
+            if model:
+                counts['vectors'] = await self._copy_vectors(conn, (
+                    (model, digest, len(blob) // 4, blob) for digest, blob in vectors
+                ))
+        return counts
+
+    @staticmethod
+    def _columns(table: Table) -> Sequence[str]:
+        # Surrogate ids are generated by the database
+        return [column.name for column in table.columns if not (column.primary_key and column.autoincrement is True)]
+
+    async def _copy(self, conn: AsyncConnection, table: Table, rows: Iterable[tuple]) -> int:
+        columns = self._columns(table)
+        written = 0
+        if self._copy_supported:
+            raw = (await conn.get_raw_connection()).driver_connection
+            for batch in _batches(rows, self.batch_rows):
+                await raw.copy_records_to_table(table.name, records=batch, columns=columns)
+                written += len(batch)
+            return written
+
+        statement = insert(table)
+        for batch in _batches(rows, self.batch_rows):
+            await conn.execute(statement, [dict(zip(columns, row)) for row in batch])
+            written += len(batch)
+        return written
+
+    async def _copy_vectors(self, conn: AsyncConnection, rows: Iterable[tuple]) -> int:
+        """Insert vectors that are not stored yet; returns the rows offered"""
+        columns = self._columns(VECTORS)
+        written = 0
+        if self._copy_supported:
+            # COPY cannot skip conflicts, so stage through a temp table
+            await conn.execute(text(
+                'CREATE TEMP TABLE IF NOT EXISTS ingest_vectors '
+                '(LIKE chunk_vectors INCLUDING DEFAULTS) ON COMMIT DROP'
+            ))
+            raw = (await conn.get_raw_connection()).driver_connection
+            for batch in _batches(rows, self.batch_rows):
+                await raw.copy_records_to_table('ingest_vectors', records=batch, columns=columns)
+                written += len(batch)
+            await conn.execute(text(
+                'INSERT INTO chunk_vectors SELECT * FROM ingest_vectors ON CONFLICT DO NOTHING'
+            ))
+            return written
+
+        dialect_insert = sqlite_insert if self.engine.dialect.name == 'sqlite' else pg_insert
+        statement = dialect_insert(VECTORS).on_conflict_do_nothing()
+        for batch in _batches(rows, self.batch_rows):
+            await conn.execute(statement, [dict(zip(columns, row)) for row in batch])
+            written += len(batch)
+        return written
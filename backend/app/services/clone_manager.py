@@ -0,0 +1,369 @@
+"""
+Cached bare mirrors and per-commit worktrees for repository checkouts
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from app.core.config import settings
+from app.services.code_parser import CodeParserService
+
+
+class CloneError(Exception):
+    """A repository could not be fetched or checked out"""
+
+
+class RepoTooLarge(CloneError):
+    """The checkout would exceed MAX_REPO_SIZE_MB"""
+
+
+@dataclass
+class Checkout:
+    """A leased worktree; release it through CloneManager.release"""
+    url: str
+    ref: str
+    commit: str
+    path: str
+
+
+def _escape_pattern(path: str) -> str:
+    """Escape a literal path for a gitignore-style sparse-checkout pattern"""
+    return '/' + re.sub(r'([\\*?\[\]!# ])', r'\\\1', path)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+    return total
+
+
+class CloneManager:
+    """
+    Keeps one bare, blob-filtered mirror per repository and checks out
+    commits as worktrees of it.
+
+    Repeat analyses of a repository only fetch new objects, and a commit
+    that is already checked out is reused as is. Mirrors are partial
+    clones (`--filter=blob:limit=<max_file_bytes>`), so blobs above the
+    per-file cap are never downloaded; checkouts exclude those paths with
+    sparse-checkout, and a commit whose remaining files exceed
+    `max_repo_bytes` is refused before anything is checked out.
+
+    Mirrors and worktrees share one disk budget, enforced by evicting the
+    least recently used entries that are not currently leased. Every
+    method blocks; use the `a`-prefixed variants from async code.
+
+    Credentials are passed to git through the environment for each
+    command, never written into mirror config.
+    """
+
+    def __init__(self, base_dir: str, max_bytes: int, max_repo_bytes: int,
+                 max_file_bytes: Optional[int] = None, partial: bool = True):
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self.max_repo_bytes = max_repo_bytes
+        self.max_file_bytes = max_file_bytes
+        self.partial = partial
+        self._lock = threading.Lock()
+        self._repo_locks: Dict[str, threading.Lock] = {}
+        self._leases: Dict[str, int] = {}
+        os.makedirs(os.path.join(base_dir, 'mirrors'), exist_ok=True)
+        os.makedirs(os.path.join(base_dir, 'worktrees'), exist_ok=True)
+        self._index_path = os.path.join(base_dir, 'index.json')
+        self._entries = self._load_index()
+
+    # Bookkeeping
+
+    def _load_index(self) -> Dict[str, Dict]:
+        try:
+            with open(self._index_path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {path: entry for path, entry in entries.items() if os.path.exists(path)}
+
+    def _save_index(self):
+        tmp_path = f'{self._index_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _touch(self, path: str, kind: str, key: str, size: Optional[int] = None):
+        with self._lock:
+            entry = self._entries.setdefault(path, {'kind': kind, 'key': key, 'size': 0})
+            if size is not None:
+                entry['size'] = size
+            entry['last_used'] = time.time()
+            self._save_index()
+
+    def _repo_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._repo_locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def repo_key(url: str) -> str:
+        """Filesystem-safe cache key for a clone URL, ignoring credentials"""
+        parts = urlsplit(url)
+        clean = urlunsplit((parts.scheme, parts.hostname or '', parts.path, '', '')) if parts.scheme else url
+        clean = re.sub(r'(\.git)?/*$', '', clean)
+        name = re.sub(r'[^\w.-]+', '-', clean.rsplit('/', 1)[-1])[:40]
+        return f"{name}-{hashlib.sha1(clean.encode('utf-8')).hexdigest()[:12]}"
+
+    def mirror_path(self, url: str) -> str:
+        return os.path.join(self.base_dir, 'mirrors', f'{self.repo_key(url)}.git')
+
+    @staticmethod
+    def _env(url: str, access_token: Optional[str]) -> Dict[str, str]:
+        env = {}
+        parts = urlsplit(url)
+        if access_token and parts.scheme in ('http', 'https'):
+            credentials = base64.b64encode(f'x-access-token:{access_token}'.encode()).decode()
+            env.update({
+                'GIT_CONFIG_COUNT': '1',
+                'GIT_CONFIG_KEY_0': f'http.{parts.scheme}://{parts.hostname}/.extraheader',
+                'GIT_CONFIG_VALUE_0': f'AUTHORIZATION: basic {credentials}',
+            })
+        return env
+
+    def _git(self, cwd: Optional[str], args: Sequence[str], env: Optional[Dict[str, str]] = None,
+             stdin: Optional[str] = None) -> str:
+        result = subprocess.run(
+            ['git', *args], cwd=cwd, input=stdin, capture_output=True, text=True,
+            env={**os.environ, 'GIT_TERMINAL_PROMPT': '0', **(env or {})},
+        )
+        if result.returncode != 0:
+            raise CloneError(f'git {args[0]} failed: {result.stderr.strip()}')
+        return result.stdout
+
+    # Mirrors
+
+    def mirror(self, url: str, access_token: Optional[str] = None, fetch: bool = True) -> str:
+        """Create or update the bare mirror for `url` and return its path"""
+        key = self.repo_key(url)
+        path = self.mirror_path(url)
+        env = self._env(url, access_token)
+        with self._repo_lock(key):
+            if not os.path.exists(os.path.join(path, 'HEAD')):
+                shutil.rmtree(path, ignore_errors=True)
+                args = ['clone', '--mirror', '--quiet']
+                if self.partial:
+                    limit = self.max_file_bytes
+                    args.append(f'--filter=blob:limit={limit}' if limit else '--filter=blob:none')
+                self._git(None, [*args, url, path], env)
+            elif fetch:
+                self._git(path, ['fetch', '--prune', '--quiet', 'origin'], env)
+            self._touch(path, 'mirror', key, _dir_size(path))
+        return path
+
+    def resolve(self, url: str, ref: str, access_token: Optional[str] = None) -> str:
+        """Commit SHA for a branch, tag or commit in the (refreshed) mirror"""
+        path = self.mirror(url, access_token)
+        try:
+            return self._git(path, ['rev-parse', '--verify', '--quiet', f'{ref}^{{commit}}']).strip()
+        except CloneError:
+            raise CloneError(f'Ref not found: {ref}')
+
+    def _tree_plan(self, mirror: str, commit: str,
+                   env: Optional[Dict[str, str]] = None) -> Tuple[int, List[str]]:
+        """
+        Bytes the checkout will take, and paths to leave out of it.
+
+        Only blobs already in the mirror are sized, which never triggers a
+        lazy fetch; anything the partial clone filtered out is over the
+        per-file cap by construction and is excluded. Manifests and
+        lockfiles are the exception: dependency analysis reads them at any
+        size, so their filtered-out blobs are fetched explicitly.
+        """
+        blobs: Dict[str, List[str]] = {}
+        for record in self._git(mirror, ['ls-tree', '-r', '-z', '--full-tree', commit]).split('\0'):
+            if not record:
+                continue
+            meta, path = record.split('\t', 1)
+            _, obj_type, sha = meta.split()
+            if obj_type == 'blob':
+                blobs.setdefault(sha, []).append(path)
+
+        missing = set()
+        if self.partial:
+            objects = self._git(mirror, ['rev-list', '--objects', '--no-walk', '--missing=print', commit])
+            missing = {line[1:] for line in objects.splitlines() if line.startswith('?')}
+            wanted = sorted(
+                sha for sha in missing if sha in blobs
+                and any(os.path.basename(path) in CodeParserService.CONFIG_FILES for path in blobs[sha])
+            )
+            if wanted:
+                self._git(mirror, ['fetch', '--quiet', '--no-tags', '--no-write-fetch-head', 'origin', *wanted], env)
+                missing.difference_update(wanted)
+
+        present = [sha for sha in blobs if sha not in missing]
+        total = 0
+        if present:
+            sizes = self._git(mirror, ['cat-file', '--batch-check=%(objectsize)'], stdin='\n'.join(present) + '\n')
+            # Identical files share a blob but each takes its own space on disk
+            total = sum(int(size) * len(blobs[sha]) for sha, size in zip(present, sizes.split()))
+        excluded = sorted(path for sha in missing if sha in blobs for path in blobs[sha])
+        return total, excluded
+
+    # Worktrees
+
+    def checkout(self, url: str, ref: str = 'main', access_token: Optional[str] = None,
+                 sparse: Optional[Sequence[str]] = None) -> Checkout:
+        """
+        Lease a worktree of `ref` (branch, tag or commit).
+
+        `sparse` optionally restricts the checkout to gitignore-style
+        patterns. Raises RepoTooLarge when the files to check out exceed
+        `max_repo_bytes`.
+        """
+        commit = self.resolve(url, ref, access_token)
+        key = self.repo_key(url)
+        mirror = self.mirror_path(url)
+        variant = commit
+        if sparse:
+            variant += '-' + hashlib.sha1('\0'.join(sparse).encode('utf-8')).hexdigest()[:8]
+        path = os.path.join(self.base_dir, 'worktrees', key, variant)
+
+        with self._repo_lock(key):
+            if not os.path.exists(os.path.join(path, '.git')):
+                self._add_worktree(mirror, commit, path, self._env(url, access_token), sparse)
+            with self._lock:
+                self._leases[path] = self._leases.get(path, 0) + 1
+        self._touch(path, 'worktree', key, None if path in self._entries else _dir_size(path))
+        self.evict()
+        return Checkout(url, ref, commit, path)
+
+    def _add_worktree(self, mirror: str, commit: str, path: str, env: Dict[str, str],
+                      sparse: Optional[Sequence[str]]):
+        size, excluded = self._tree_plan(mirror, commit, env)
+        if not sparse and size > self.max_repo_bytes:
+            raise RepoTooLarge(
+                f'Repository is {size / (1024 * 1024):.1f} MB at {commit[:12]}, '
+                f'over the {self.max_repo_bytes / (1024 * 1024):.0f} MB limit'
+            )
+
+        shutil.rmtree(path, ignore_errors=True)
+        self._git(mirror, ['worktree', 'prune'])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._git(mirror, ['worktree', 'add', '--detach', '--no-checkout', path, commit], env)
+        try:
+            patterns = list(sparse) if sparse else ['/*']
+            patterns += ['!' + _escape_pattern(excluded_path) for excluded_path in excluded]
+            if patterns != ['/*']:
+                self._git(path, ['sparse-checkout', 'set', '--no-cone', '--stdin'], env, '\n'.join(patterns) + '\n')
+            self._git(path, ['checkout', '--quiet', '--detach', commit], env)
+            if sparse and _dir_size(path) > self.max_repo_bytes:
+                raise RepoTooLarge(f'Sparse checkout of {commit[:12]} is over the size limit')
+        except CloneError:
+            self._remove_worktree(mirror, path)
+            raise
+
+    def _remove_worktree(self, mirror: str, path: str):
+        shutil.rmtree(path, ignore_errors=True)
+        if os.path.exists(mirror):
+            try:
+                self._git(mirror, ['worktree', 'prune'])
+            except CloneError:
+                pass
+
+    def release(self, checkout: Checkout):
+        """Return a leased worktree to the cache"""
+        with self._lock:
+            remaining = self._leases.get(checkout.path, 0) - 1
+            if remaining > 0:
+                self._leases[checkout.path] = remaining
+            else:
+                self._leases.pop(checkout.path, None)
+
+    async def acheckout(self, url: str, ref: str = 'main', access_token: Optional[str] = None,
+                        sparse: Optional[Sequence[str]] = None) -> Checkout:
+        return await asyncio.to_thread(self.checkout, url, ref, access_token, sparse)
+
+    async def amirror(self, url: str, access_token: Optional[str] = None) -> str:
+        return await asyncio.to_thread(self.mirror, url, access_token)
+
+    # Eviction
+
+    @property
+    def used_bytes(self) -> int:
+        with self._lock:
+            return sum(entry['size'] for entry in self._entries.values())
+
+    def evict(self) -> List[str]:
+        """
+        Drop least recently used entries until the cache fits its budget.
+
+        Leased worktrees are never evicted, nor are mirrors with a leased
+        worktree; evicting a mirror removes its remaining worktrees.
+        """
+        evicted = []
+        while True:
+            with self._lock:
+                total = sum(entry['size'] for entry in self._entries.values())
+                if total <= self.max_bytes:
+                    break
+                busy = {self._entries[path]['key'] for path in self._leases if path in self._entries}
+                candidates = sorted(
+                    (
+                        (entry['last_used'], path) for path, entry in self._entries.items()
+                        if path not in self._leases
+                        and not (entry['kind'] == 'mirror' and entry['key'] in busy)
+                    ),
+                )
+                if not candidates:
+                    break
+                _, path = candidates[0]
+                entry = self._entries.pop(path)
+                doomed = [path]
+                if entry['kind'] == 'mirror':
+                    doomed += [p for p, e in self._entries.items() if e['key'] == entry['key']]
+                    for worktree in doomed[1:]:
+                        self._entries.pop(worktree)
+                self._save_index()
+
+            with self._repo_lock(entry['key']):
+                if entry['kind'] == 'mirror':
+                    for worktree in doomed[1:]:
+                        shutil.rmtree(worktree, ignore_errors=True)
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    mirror = os.path.join(self.base_dir, 'mirrors', f"{entry['key']}.git")
+                    self._remove_worktree(mirror, path)
+            evicted.extend(doomed)
+        return evicted
+
+
+@lru_cache()
+def get_clone_manager() -> CloneManager:
+    """Process-wide clone cache configured from settings"""
+    return CloneManager(
+        settings.CLONE_CACHE_DIR,
+        max_bytes=settings.CLONE_CACHE_MAX_BYTES,
+        max_repo_bytes=settings.MAX_REPO_SIZE_MB * 1024 * 1024,
+        max_file_bytes=settings.CLONE_MAX_FILE_BYTES or None,
+        partial=settings.CLONE_PARTIAL,
+    )
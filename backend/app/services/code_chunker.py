@@ -0,0 +1,454 @@
+"""
+Syntax-aware streaming code chunker
+"""
+import ast
+import hashlib
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from app.services.repo_scanner import ScannedFile, ScanResult
+
+# Bump when chunk boundaries or fields change; chunks stored per blob are keyed by it
+CHUNKS_VERSION = 1
+
+BRACE_LANGUAGES = {'javascript', 'typescript', 'java', 'go', 'rust', 'php', 'cpp', 'c', 'csharp'}
+
+# Languages where a single quote always opens a string rather than a char literal
+SINGLE_QUOTE_STRINGS = {'javascript', 'typescript', 'php'}
+BACKTICK_STRINGS = {'javascript', 'typescript', 'go'}
+
+DECLARATION = re.compile(
+    r'^\s*(?:export\s+)?(?:default\s+)?(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?'
+    r'(?:(?:public|private|protected|internal|static|abstract|final|sealed|partial|virtual|override|unsafe)\s+)*'
+    r'(?:(?P<cls>class|interface|struct|enum|trait|impl(?:<[^>]*>)?|namespace|module)\s+(?P<cname>[A-Za-z_$][\w$]*)'
+    r'|(?:function\s*\*?|fn|func(?:\s*\([^)]*\))?|def)\s+(?P<fname>[A-Za-z_$][\w$]*)'
+    r'|(?:const|let|var)\s+(?P<vname>[A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?(?:function|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>))'
+)
+# Methods and C-style functions: `name(args) {` with an optional return type in front
+CALLABLE = re.compile(r'^\s*(?:[\w$<>\[\],.*&:]+\s+)*(?P<name>[A-Za-z_$~][\w$]*)\s*\([^;]*$')
+CONTROL_WORDS = {'if', 'for', 'while', 'switch', 'catch', 'return', 'else', 'do', 'try', 'new', 'sizeof'}
+LEADING_TRIVIA = re.compile(r'^\s*(?://|/\*|\*|@|#\[|///)')
+RUBY_BLOCK = re.compile(r'^(?P<indent>\s*)(?P<kind>def|class|module)\s+(?P<name>[\w.:?!=]+)')
+
+
+@dataclass
+class CodeChunk:
+    """A contiguous span of one file sized to the token budget"""
+    path: str
+    language: str
+    start_line: int
+    end_line: int
+    content: str
+    kind: str
+    symbols: List[str]
+    token_count: int
+    content_hash: str
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class _Unit:
+    """A syntactic unit (function, class, statement run) as 1-based inclusive lines"""
+    start: int
+    end: int
+    kind: str
+    name: Optional[str] = None
+    children: Optional[Callable[[], List['_Unit']]] = field(default=None, repr=False)
+
+
+def content_hash(content: str) -> str:
+    """Stable hash used to skip unchanged chunks downstream"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def default_token_counter(model: Optional[str] = None) -> Callable[[str], int]:
+    """
+    tiktoken counter for `model`, falling back to cl100k_base, then to a
+    4-characters-per-token estimate when tiktoken or its BPE files are
+    unavailable.
+    """
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding('cl100k_base')
+        except KeyError:
+            encoding = tiktoken.get_encoding('cl100k_base')
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        return lambda text: (len(text) + 3) // 4
+
+
+class CodeChunker:
+    """
+    Splits source files at function and class boundaries.
+
+    Python uses `ast`; brace languages use a small lexer that tracks brace
+    depth outside strings and comments; Ruby uses def/class/module ... end
+    indentation. Adjacent small units are packed together up to
+    `max_tokens`; oversized classes are split into their members and
+    anything still too large falls back to line windows.
+    """
+
+    def __init__(self, max_tokens: int = 800, token_counter: Optional[Callable[[str], int]] = None,
+                 max_file_bytes: int = 1024 * 1024):
+        self.max_tokens = max_tokens
+        self.count_tokens = token_counter or default_token_counter()
+        self.max_file_bytes = max_file_bytes
+
+    def chunk_file(self, path: str, language: Optional[str], source: str) -> List[CodeChunk]:
+        """Chunk one file's source text"""
+        lines = source.splitlines()
+        if not lines:
+            return []
+
+        language = language or 'unknown'
+        if language == 'python':
+            units = self._python_units(source, lines)
+        elif language in BRACE_LANGUAGES:
+            depths = _brace_depths(lines, language)
+            units = _brace_units(lines, depths, 1, len(lines), 0)
+        elif language == 'ruby':
+            units = _ruby_units(lines, 1, len(lines), '')
+        else:
+            units = []
+
+        units = _fill_gaps(units, 1, len(lines))
+        chunks = []
+        for start, end, kind, symbols in self._pack(units, lines):
+            content = '\n'.join(lines[start - 1:end])
+            if not content.strip():
+                continue
+            chunks.append(CodeChunk(
+                path=path,
+                language=language,
+                start_line=start,
+                end_line=end,
+                content=content,
+                kind=kind,
+                symbols=symbols,
+                token_count=self.count_tokens(content),
+                content_hash=content_hash(content),
+            ))
+        return chunks
+
+    def iter_chunks(self, repo_path: str, files: Iterable[ScannedFile]) -> Iterator[CodeChunk]:
+        """Yield chunks file by file so only one file is in memory at a time"""
+        for scanned in files:
+            if scanned.language is None or scanned.size > self.max_file_bytes:
+                continue
+            try:
+                with open(os.path.join(repo_path, scanned.path), 'rb') as f:
+                    raw = f.read()
+            except OSError:
+                continue
+            if b'\x00' in raw[:8192]:
+                continue
+            source = raw.decode('utf-8', errors='replace')
+            yield from self.chunk_file(scanned.path, scanned.language, source)
+
+    def iter_repository(self, scan: ScanResult) -> Iterator[CodeChunk]:
+        """Chunk every supported file in a scan result"""
+        return self.iter_chunks(scan.root, scan.files)
+
+    def _python_units(self, source: str, lines: List[str]) -> List[_Unit]:
+        try:
+            tree = ast.parse(source)
+        except (SyntaxError, ValueError):
+            return []
+        return _python_body_units(tree.body)
+
+    def _unit_tokens(self, unit: _Unit, lines: List[str]) -> int:
+        return self.count_tokens('\n'.join(lines[unit.start - 1:unit.end]))
+
+    def _pack(self, units: List[_Unit], lines: List[str]) -> Iterator[Tuple[int, int, str, List[str]]]:
+        """Greedily merge adjacent units into spans within the token budget"""
+        current: List[_Unit] = []
+        current_tokens = 0
+
+        def flush():
+            start, end = current[0].start, current[-1].end
+            symbols = [unit.name for unit in current if unit.name]
+            named = [unit for unit in current if unit.name]
+            kind = named[0].kind if len(named) == 1 else ('module' if not named else 'mixed')
+            return start, end, kind, symbols
+
+        for unit in units:
+            tokens = self._unit_tokens(unit, lines)
+            if tokens > self.max_tokens:
+                if current:
+                    yield flush()
+                    current, current_tokens = [], 0
+                children = unit.children() if unit.children else []
+                if children:
+                    inner = _fill_gaps(children, unit.start, unit.end)
+                    for start, end, kind, symbols in self._pack(inner, lines):
+                        if unit.name and symbols:
+                            symbols = [f'{unit.name}.{symbol}' for symbol in symbols]
+                        elif unit.name:
+                            kind, symbols = unit.kind, [unit.name]
+                        yield start, end, kind, symbols
+                else:
+                    yield from self._split_lines(unit, lines)
+                continue
+
+            if current and current_tokens + tokens > self.max_tokens:
+                yield flush()
+                current, current_tokens = [], 0
+            current.append(unit)
+            current_tokens += tokens
+
+        if current:
+            yield flush()
+
+    def _split_lines(self, unit: _Unit, lines: List[str]) -> Iterator[Tuple[int, int, str, List[str]]]:
+        """Last resort: cut an oversized unit into line windows under the budget"""
+        symbols = [unit.name] if unit.name else []
+        start = unit.start
+        tokens = 0
+        for line_no in range(unit.start, unit.end + 1):
+            line_tokens = self.count_tokens(lines[line_no - 1]) + 1
+            if tokens and tokens + line_tokens > self.max_tokens:
+                yield start, line_no - 1, unit.kind, symbols
+                start, tokens = line_no, 0
+            tokens += line_tokens
+        yield start, unit.end, unit.kind, symbols
+
+
+def _python_body_units(body: List[ast.stmt]) -> List[_Unit]:
+    units = []
+    for node in body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        if isinstance(node, ast.ClassDef):
+            units.append(_Unit(start, node.end_lineno, 'class', node.name,
+                               lambda node=node: _python_body_units(node.body)))
+        else:
+            units.append(_Unit(start, node.end_lineno, 'function', node.name))
+    return units
+
+
+def _fill_gaps(units: List[_Unit], lo: int, hi: int) -> List[_Unit]:
+    """Cover [lo, hi] completely, turning uncovered lines into module units"""
+    filled = []
+    cursor = lo
+    for unit in sorted(units, key=lambda u: u.start):
+        if unit.start > cursor:
+            filled.append(_Unit(cursor, unit.start - 1, 'module'))
+        if unit.end >= cursor:
+            filled.append(unit)
+            cursor = unit.end + 1
+    if cursor <= hi:
+        filled.append(_Unit(cursor, hi, 'module'))
+    return filled
+
+
+def _brace_depths(lines: List[str], language: str) -> List[Tuple[int, int, bool]]:
+    """
+    Per line: (depth at start, depth at end, opens a brace). Strings and
+    comments are skipped so braces inside them do not count.
+    """
+    result = []
+    depth = 0
+    in_block_comment = False
+    in_backtick = False
+    for line in lines:
+        start_depth = depth
+        opens = False
+        i = 0
+        n = len(line)
+        while i < n:
+            ch = line[i]
+            if in_block_comment:
+                end = line.find('*/', i)
+                if end < 0:
+                    break
+                in_block_comment = False
+                i = end + 2
+                continue
+            if in_backtick:
+                if ch == '\\':
+                    i += 2
+                    continue
+                if ch == '`':
+                    in_backtick = False
+                i += 1
+                continue
+            if ch == '/' and line.startswith('//', i):
+                break
+            if ch == '#' and language == 'php':
+                break
+            if ch == '/' and line.startswith('/*', i):
+                in_block_comment = True
+                i += 2
+                continue
+            if ch == '`' and language in BACKTICK_STRINGS:
+                in_backtick = True
+                i += 1
+                continue
+            if ch == '"' or (ch == "'" and language in SINGLE_QUOTE_STRINGS):
+                i = _skip_string(line, i, ch)
+                continue
+            if ch == "'":
+                # Char literal ('a', '\n') or, in Rust, a lifetime ('a)
+                if line.startswith('\\', i + 1):
+                    close = line.find("'", i + 2)
+                    i = close + 1 if close > 0 else i + 1
+                elif i + 2 < n and line[i + 2] == "'":
+                    i += 3
+                else:
+                    i += 1
+                continue
+            if ch == '{':
+                depth += 1
+                opens = True
+            elif ch == '}':
+                depth = max(0, depth - 1)
+            i += 1
+        result.append((start_depth, depth, opens))
+    return result
+
+
+def _skip_string(line: str, i: int, quote: str) -> int:
+    """Index just past the string literal starting at line[i]"""
+    i += 1
+    n = len(line)
+    while i < n:
+        if line[i] == '\\':
+            i += 2
+            continue
+        if line[i] == quote:
+            return i + 1
+        i += 1
+    return n
+
+
+def _brace_unit_name(lines: List[str], start: int, end: int) -> Tuple[str, Optional[str]]:
+    for line_no in range(start, min(end, start + 5) + 1):
+        line = lines[line_no - 1]
+        if LEADING_TRIVIA.match(line) or not line.strip():
+            continue
+        match = DECLARATION.match(line)
+        if match:
+            if match.group('cls'):
+                return 'class', match.group('cname')
+            return 'function', match.group('fname') or match.group('vname')
+        match = CALLABLE.match(line)
+        if match and match.group('name') not in CONTROL_WORDS:
+            return 'function', match.group('name')
+        return 'block', None
+    return 'block', None
+
+
+def _brace_units(lines: List[str], depths: List[Tuple[int, int, bool]], lo: int, hi: int, base: int) -> List[_Unit]:
+    """Split lines [lo, hi] into top-level units at brace depth `base`"""
+    units = []
+    line_no = lo
+    while line_no <= hi:
+        start_depth, _, _ = depths[line_no - 1]
+        line = lines[line_no - 1]
+        if start_depth != base or not line.strip():
+            line_no += 1
+            continue
+
+        start = line_no
+        opened = False
+        end = start
+        while end <= hi:
+            _, end_depth, opens = depths[end - 1]
+            opened = opened or opens
+            stripped = lines[end - 1].rstrip()
+            if end_depth <= base and (opened or stripped.endswith((';', '}', ')'))):
+                break
+            if not opened and end < hi and end_depth <= base:
+                following = lines[end]
+                only_trivia = all(LEADING_TRIVIA.match(lines[k - 1]) for k in range(start, end + 1))
+                if not only_trivia and DECLARATION.match(following):
+                    break
+            end += 1
+        end = min(end, hi)
+
+        kind, name = _brace_unit_name(lines, start, end)
+        if name is None:
+            line_no = end + 1
+            continue
+
+        children = None
+        if kind == 'class' and end - start > 1:
+            children = (lambda s=start, e=end: _brace_units(lines, depths, s + 1, e - 1, base + 1))
+        units.append(_Unit(start, end, kind, name, children))
+        line_no = end + 1
+
+    return _attach_leading_trivia(units, lines, lo)
+
+
+def _attach_leading_trivia(units: List[_Unit], lines: List[str], lo: int) -> List[_Unit]:
+    """Pull doc comments and annotations directly above a unit into it"""
+    previous_end = lo - 1
+    for unit in units:
+        start = unit.start
+        while start - 1 > previous_end and LEADING_TRIVIA.match(lines[start - 2]):
+            start -= 1
+        unit.start = start
+        previous_end = unit.end
+    return units
+
+
+def _ruby_units(lines: List[str], lo: int, hi: int, indent: str) -> List[_Unit]:
+    units = []
+    line_no = lo
+    while line_no <= hi:
+        match = RUBY_BLOCK.match(lines[line_no - 1])
+        if not match or match.group('indent') != indent:
+            line_no += 1
+            continue
+
+        closer = re.compile(rf'^{re.escape(indent)}end\b')
+        end = line_no + 1
+        while end <= hi and not closer.match(lines[end - 1]):
+            end += 1
+        end = min(end, hi)
+
+        kind = 'function' if match.group('kind') == 'def' else 'class'
+        children = None
+        if kind == 'class':
+            inner_indent = _first_indent(lines, line_no + 1, end - 1)
+            if inner_indent is not None:
+                children = (lambda s=line_no, e=end, i=inner_indent: _ruby_units(lines, s + 1, e - 1, i))
+        units.append(_Unit(line_no, end, kind, match.group('name'), children))
+        line_no = end + 1
+    return units
+
+
+def _first_indent(lines: List[str], lo: int, hi: int) -> Optional[str]:
+    for line_no in range(lo, hi + 1):
+        line = lines[line_no - 1]
+        if line.strip():
+            return line[:len(line) - len(line.lstrip())]
+    return None
+
+
+def write_chunks(path: str, chunks: Iterable[CodeChunk]) -> int:
+    """Stream chunks to a JSON-lines artifact; returns how many were written"""
+    count = 0
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk.to_dict()))
+            f.write('\n')
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def read_chunks(path: str) -> Iterator[CodeChunk]:
+    """Stream chunks back from a JSON-lines artifact"""
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield CodeChunk(**json.loads(line))
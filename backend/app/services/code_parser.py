@@ -3,8 +3,13 @@ Code parsing and analysis service
 """
 import os
 from pathlib import Path
-from typing import List, Dict, Set
-import json
+from typing import List, Dict, Set, Optional
+from app.core.config import settings
+from app.services.dependency_engine import DependencyEngine, LockfileCache
+from app.services.file_tree import FileTree
+from app.services.repo_scanner import RepoScanner, ScanResult
+from app.services.line_counter import LineCounter
+from app.services.path_filter import PathFilter
 
 class CodeParserService:
     """Service for parsing and analyzing code files"""
@@ -39,166 +44,111 @@ class CodeParserService:
         'go.mod': 'go',
         'pom.xml': 'java',
         'Gemfile': 'ruby',
+        'package-lock.json': 'node',
+        'npm-shrinkwrap.json': 'node',
+        'yarn.lock': 'node',
+        'poetry.lock': 'python',
+        'uv.lock': 'python',
+        'Pipfile.lock': 'python',
+        'Cargo.lock': 'rust',
+        'Gemfile.lock': 'ruby',
     }
     
-    def __init__(self, repo_path: str):
+    # Common entry point files
+    ENTRY_FILES = [
+        ('main.py', 'python', 'Python application entry'),
+        ('app.py', 'python', 'Python Flask/FastAPI app'),
+        ('__main__.py', 'python', 'Python module entry'),
+        ('index.js', 'javascript', 'JavaScript entry'),
+        ('index.ts', 'typescript', 'TypeScript entry'),
+        ('main.go', 'go', 'Go application entry'),
+        ('main.rs', 'rust', 'Rust application entry'),
+        ('Main.java', 'java', 'Java application entry'),
+    ]
+    
+    def __init__(self, repo_path: str, line_counter: Optional[LineCounter] = None,
+                 scan: Optional[ScanResult] = None):
         self.repo_path = Path(repo_path)
+        self.line_counter = line_counter or LineCounter()
+        self._scan: Optional[ScanResult] = scan
+        self._path_filter: Optional[PathFilter] = None
     
-    def parse_structure(self) -> Dict:
-        """Parse repository file structure"""
-        structure = self._build_tree(self.repo_path)
-        return structure
+    def path_filter(self) -> PathFilter:
+        """What scans leave out: ignored directories, .gitignore, generated files and size caps"""
+        if self._path_filter is None:
+            self._path_filter = PathFilter(
+                str(self.repo_path),
+                self.IGNORE_DIRS,
+                patterns=[pattern.strip() for pattern in settings.ANALYSIS_EXCLUDE.split(',') if pattern.strip()],
+                max_file_bytes=settings.ANALYSIS_MAX_FILE_BYTES or None,
+                max_repo_bytes=settings.MAX_REPO_SIZE_MB * 1024 * 1024 or None,
+                skip_generated=settings.ANALYSIS_SKIP_GENERATED,
+                exempt=self.CONFIG_FILES,
+            )
+        return self._path_filter
     
-    def _build_tree(self, path: Path, max_depth: int = 5, current_depth: int = 0) -> Dict:
-        """Recursively build file tree"""
-        if current_depth > max_depth:
-            return None
-        
-        name = path.name
-        
-        if path.is_file():
-            ext = path.suffix
-            return {
-                'name': name,
-                'type': 'file',
-                'path': str(path.relative_to(self.repo_path)),
-                'language': self.SUPPORTED_EXTENSIONS.get(ext, 'unknown'),
-                'size': path.stat().st_size
-            }
-        
-        elif path.is_dir():
-            # Skip ignored directories
-            if name in self.IGNORE_DIRS:
-                return None
-            
-            children = []
-            try:
-                for child in sorted(path.iterdir()):
-                    child_node = self._build_tree(child, max_depth, current_depth + 1)
-                    if child_node:
-                        children.append(child_node)
-            except PermissionError:
-                pass
-            
-            return {
-                'name': name,
-                'type': 'directory',
-                'path': str(path.relative_to(self.repo_path)),
-                'children': children
-            }
+    def scanner(self) -> RepoScanner:
+        """Build a scanner configured with this service's language tables"""
+        return RepoScanner(
+            str(self.repo_path),
+            self.SUPPORTED_EXTENSIONS,
+            self.IGNORE_DIRS,
+            self.ENTRY_FILES,
+            self.CONFIG_FILES,
+            path_filter=self.path_filter(),
+        )
+    
+    def scan(self, refresh: bool = False) -> ScanResult:
+        """Walk the repository once and share the result across methods"""
+        if self._scan is None or refresh:
+            self._scan = self.scanner().scan()
+        return self._scan
+    
+    def file_tree(self) -> FileTree:
+        """Compact array-backed tree of the scanned files"""
+        return FileTree.build(
+            ((scanned.path, scanned.size, scanned.language) for scanned in self.scan().files),
+            root_name=self.repo_path.name,
+        )
+    
+    def parse_structure(self, max_depth: int = 5) -> Dict:
+        """Parse repository file structure into nested dicts"""
+        return self.file_tree().to_nested(max_depth=max_depth)
     
     def identify_entry_points(self) -> List[Dict]:
         """Identify application entry points"""
-        entry_points = []
-        
-        # Common entry point files
-        entry_files = [
-            ('main.py', 'python', 'Python application entry'),
-            ('app.py', 'python', 'Python Flask/FastAPI app'),
-            ('__main__.py', 'python', 'Python module entry'),
-            ('index.js', 'javascript', 'JavaScript entry'),
-            ('index.ts', 'typescript', 'TypeScript entry'),
-            ('main.go', 'go', 'Go application entry'),
-            ('main.rs', 'rust', 'Rust application entry'),
-            ('Main.java', 'java', 'Java application entry'),
-        ]
-        
-        for file_name, language, description in entry_files:
-            matches = list(self.repo_path.rglob(file_name))
-            for match in matches:
-                # Skip files in node_modules, etc.
-                if any(ignore in match.parts for ignore in self.IGNORE_DIRS):
-                    continue
-                
-                entry_points.append({
-                    'file': str(match.relative_to(self.repo_path)),
-                    'type': 'application_entry',
-                    'language': language,
-                    'description': description
-                })
-        
-        return entry_points
+        return [dict(entry) for entry in self.scan().entry_points]
     
-    def parse_dependencies(self) -> List[Dict]:
-        """Parse project dependencies"""
-        dependencies = []
-        
-        # Parse package.json
-        package_json = self.repo_path / 'package.json'
-        if package_json.exists():
-            try:
-                with open(package_json, 'r') as f:
-                    data = json.load(f)
-                    
-                    for dep, version in data.get('dependencies', {}).items():
-                        dependencies.append({
-                            'name': dep,
-                            'version': version,
-                            'type': 'production',
-                            'language': 'javascript'
-                        })
-                    
-                    for dep, version in data.get('devDependencies', {}).items():
-                        dependencies.append({
-                            'name': dep,
-                            'version': version,
-                            'type': 'development',
-                            'language': 'javascript'
-                        })
-            except:
-                pass
-        
-        # Parse requirements.txt
-        requirements = self.repo_path / 'requirements.txt'
-        if requirements.exists():
-            try:
-                with open(requirements, 'r') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith('#'):
-                            parts = line.split('==')
-                            name = parts[0]
-                            version = parts[1] if len(parts) > 1 else 'unknown'
-                            dependencies.append({
-                                'name': name,
-                                'version': version,
-                                'type': 'production',
-                                'language': 'python'
-                            })
-            except:
-                pass
-        
-        return dependencies
+    def parse_dependencies(self, cache: Optional[LockfileCache] = None) -> List[Dict]:
+        """Parse declared dependencies of every manifest in the repository"""
+        engine = DependencyEngine(str(self.repo_path), self.CONFIG_FILES, cache)
+        report = engine.analyze(dict.fromkeys(self.scan().config_files))
+        return report['dependencies']
     
     def get_statistics(self) -> Dict:
         """Calculate repository statistics"""
         stats = {
             'total_files': 0,
             'total_lines': 0,
+            'binary_files': 0,
             'languages': {},
             'file_types': {}
         }
         
-        for file_path in self.repo_path.rglob('*'):
-            # Skip directories and ignored paths
-            if not file_path.is_file():
-                continue
-            if any(ignore in file_path.parts for ignore in self.IGNORE_DIRS):
-                continue
-            
-            ext = file_path.suffix
-            language = self.SUPPORTED_EXTENSIONS.get(ext, 'other')
-            
-            stats['total_files'] += 1
-            stats['languages'][language] = stats['languages'].get(language, 0) + 1
-            stats['file_types'][ext] = stats['file_types'].get(ext, 0) + 1
-            
-            # Count lines
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    lines = len(f.readlines())
-                    stats['total_lines'] += lines
-            except:
-                pass
+        scan = self.scan()
+        stats['total_files'] = len(scan.files)
+        stats['languages'] = dict(scan.languages)
+        stats['file_types'] = dict(scan.file_types)
+        
+        # Count lines; binary files come back as None, unreadable ones not at all
+        counts = self.line_counter.count([
+            (os.path.join(scan.root, scanned.path), scanned.size)
+            for scanned in scan.files
+        ])
+        for lines in counts.values():
+            if lines is None:
+                stats['binary_files'] += 1
+            else:
+                stats['total_lines'] += lines
         
         return stats
@@ -0,0 +1,252 @@
+"""
+Token-budgeted prompt context from retrieved chunks and chat history
+"""
+import re
+import textwrap
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence
+
+from app.core.config import settings
+from app.services.code_chunker import default_token_counter
+from app.services.llm_service import build_messages, render_excerpt
+
+WORD = re.compile(r'\w+')
+
+# Per-message framing in the chat format, plus the reply primer
+MESSAGE_OVERHEAD = 3
+REPLY_OVERHEAD = 3
+
+
+def _line_count(hit: Dict) -> int:
+    return hit['end_line'] - hit['start_line'] + 1
+
+
+def merge_spans(hits: Sequence[Dict]) -> List[Dict]:
+    """
+    Merge overlapping or touching chunks of the same file into one block.
+
+    A merged block keeps the best score of its parts and is dedented. Overlaps are spliced
+    by line number, which needs each chunk's content to cover exactly its
+    line range; chunks that do not are only merged when they touch.
+    """
+    by_path: Dict[str, List[Dict]] = {}
+    for hit in hits:
+        by_path.setdefault(hit['path'], []).append(hit)
+
+    merged = []
+    for path, spans in by_path.items():
+        spans = sorted(spans, key=lambda hit: (hit['start_line'], hit['end_line']))
+        current = dict(spans[0])
+        for hit in spans[1:]:
+            exact = (
+                current['content'].count('\n') + 1 == _line_count(current)
+                and hit['content'].count('\n') + 1 == _line_count(hit)
+            )
+            touching = hit['start_line'] == current['end_line'] + 1
+            overlapping = hit['start_line'] <= current['end_line']
+            if touching or (overlapping and exact):
+                if hit['end_line'] > current['end_line']:
+                    lines = hit['content'].split('\n')
+                    skip = current['end_line'] - hit['start_line'] + 1 if overlapping else 0
+                    current['content'] += '\n' + '\n'.join(lines[skip:])
+                    current['end_line'] = hit['end_line']
+                current['score'] = max(current['score'], hit['score'])
+            else:
+                merged.append(current)
+                current = dict(hit)
+        merged.append(current)
+    for block in merged:
+        # Line numbers are in the header, so common indentation is dead weight
+        block['content'] = textwrap.dedent(block['content'])
+    return merged
+
+
+def _shingles(words: List[str], size: int = 4) -> FrozenSet[tuple]:
+    if len(words) < size:
+        return frozenset([tuple(words)])
+    return frozenset(tuple(words[i:i + size]) for i in range(len(words) - size + 1))
+
+
+def _jaccard(a: FrozenSet, b: FrozenSet) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class PackedContext:
+    """Chat messages that fit the budget, and what was left out to get there"""
+    messages: List[Dict[str, str]]
+    blocks: List[Dict]
+    tokens: int
+    stats: Dict[str, int] = field(default_factory=dict)
+
+
+class ContextPacker:
+    """
+    Builds the prompt for a question from retrieved chunks and history.
+
+    Retrieved chunks are merged into per-file blocks, near-duplicate code
+    (by word-shingle Jaccard) is dropped, and the rest is ordered by
+    maximal marginal relevance so a second block from the same area only
+    ranks high if it adds new code. Blocks are then packed greedily into
+    what the history and question leave of `max_tokens`, truncating the
+    last one by lines if that is worth it. History is kept newest first
+    within `history_tokens`; the oldest turn that does not fit is cut and
+    anything earlier is reduced to a one-line summary of the questions.
+
+    Token counts are exact for the rendered messages under the counter's
+    encoding, including the chat format's per-message framing.
+    """
+
+    def __init__(self, max_tokens: int = 6000, history_tokens: int = 1500,
+                 token_counter: Optional[Callable[[str], int]] = None,
+                 diversity: float = 0.15, duplicate_threshold: float = 0.8, min_block_tokens: int = 64):
+        self.max_tokens = max_tokens
+        self.history_tokens = history_tokens
+        self.count_tokens = token_counter or default_token_counter()
+        self.diversity = diversity
+        self.duplicate_threshold = duplicate_threshold
+        self.min_block_tokens = min_block_tokens
+
+    def count_messages(self, messages: Sequence[Dict[str, str]]) -> int:
+        return sum(self.count_tokens(m['content']) + MESSAGE_OVERHEAD for m in messages) + REPLY_OVERHEAD
+
+    def pack(self, question: str, hits: Sequence[Dict], history: Sequence[Dict] = ()) -> PackedContext:
+        stats = {'candidates': len(hits)}
+        history, stats['history_turns'], stats['summarized_turns'] = self._pack_history(history)
+        blocks = merge_spans(hits) if hits else []
+        stats['merged'] = len(hits) - len(blocks)
+        blocks, stats['duplicates'] = self._dedupe(blocks)
+        blocks = self._rerank(blocks)
+
+        fixed = self.count_messages(build_messages(question, [], history))
+        available = self.max_tokens - fixed
+        packed, truncated = [], 0
+        for block in blocks:
+            # Rendered cost: the block plus the separator joining it in
+            cost = self.count_tokens(render_excerpt(block)) + 2
+            if cost <= available:
+                packed.append(block)
+                available -= cost
+            elif available >= self.min_block_tokens:
+                block = self._truncate(block, available - 2)
+                if block is not None:
+                    packed.append(block)
+                    truncated += 1
+                    available = 0
+
+        messages = build_messages(question, packed, history)
+        tokens = self.count_messages(messages)
+        # Counting blocks separately can drift by a token or two at the joins
+        while tokens > self.max_tokens and packed:
+            packed.pop()
+            messages = build_messages(question, packed, history)
+            tokens = self.count_messages(messages)
+
+        stats['dropped'] = len(blocks) - len(packed)
+        stats['truncated'] = truncated
+        return PackedContext(messages, packed, tokens, stats)
+
+    def _dedupe(self, blocks: List[Dict]):
+        kept, signatures, dropped = [], [], 0
+        for block in sorted(blocks, key=lambda block: block['score'], reverse=True):
+            words = WORD.findall(block['content'].lower())
+            block['_words'] = frozenset(words)
+            signature = _shingles(words)
+            if any(_jaccard(signature, other) >= self.duplicate_threshold for other in signatures):
+                dropped += 1
+                continue
+            kept.append(block)
+            signatures.append(signature)
+        return kept, dropped
+
+    def _rerank(self, blocks: List[Dict]) -> List[Dict]:
+        """Maximal marginal relevance over word-set similarity"""
+        if not blocks:
+            return []
+        top = max(block['score'] for block in blocks) or 1.0
+        remaining = list(blocks)
+        ordered = []
+        while remaining:
+            def marginal(block):
+                redundancy = max((_jaccard(block['_words'], chosen['_words']) for chosen in ordered), default=0.0)
+                return (1 - self.diversity) * block['score'] / top - self.diversity * redundancy
+            best = max(remaining, key=marginal)
+            remaining.remove(best)
+            ordered.append(best)
+        for block in ordered:
+            del block['_words']
+        return ordered
+
+    def _truncate(self, block: Dict, budget: int) -> Optional[Dict]:
+        """Leading lines of `block` whose rendering fits `budget` tokens"""
+        lines = block['content'].split('\n')
+        lo, hi = 0, len(lines)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            candidate = dict(block, content='\n'.join(lines[:mid]), end_line=block['start_line'] + mid - 1)
+            if self.count_tokens(render_excerpt(candidate)) <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        if lo == 0:
+            return None
+        return dict(block, content='\n'.join(lines[:lo]), end_line=block['start_line'] + lo - 1)
+
+    def _pack_history(self, history: Sequence[Dict]):
+        available = self.history_tokens
+        kept: List[Dict] = []
+        index = len(history) - 1
+        while index >= 0:
+            turn = history[index]
+            cost = self.count_tokens(turn['content']) + MESSAGE_OVERHEAD
+            if cost > available:
+                break
+            kept.append({'role': turn['role'], 'content': turn['content']})
+            available -= cost
+            index -= 1
+
+        if index >= 0 and available > self.min_block_tokens:
+            turn = history[index]
+            content = self._clip(turn['content'], available - MESSAGE_OVERHEAD - 2)
+            if content:
+                kept.append({'role': turn['role'], 'content': content + ' …'})
+                available -= self.count_tokens(content + ' …') + MESSAGE_OVERHEAD
+                index -= 1
+
+        summarized = index + 1
+        if summarized:
+            questions = [turn['content'].split('\n', 1)[0][:80] for turn in history[:summarized] if turn['role'] == 'user']
+            while questions:
+                summary = 'Earlier in this conversation the user asked: ' + '; '.join(questions)
+                if self.count_tokens(summary) + MESSAGE_OVERHEAD <= available:
+                    kept.append({'role': 'system', 'content': summary})
+                    break
+                questions.pop(0)
+        return kept[::-1], len(history) - summarized, summarized
+
+    def _clip(self, text: str, budget: int) -> str:
+        """Longest word-boundary prefix of `text` within `budget` tokens"""
+        if budget <= 0:
+            return ''
+        words = text.split(' ')
+        lo, hi = 0, len(words)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.count_tokens(' '.join(words[:mid])) <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        return ' '.join(words[:lo])
+
+
+@lru_cache()
+def get_context_packer() -> ContextPacker:
+    """Process-wide packer sized from settings"""
+    return ContextPacker(
+        max_tokens=settings.CHAT_CONTEXT_TOKENS,
+        history_tokens=settings.CHAT_HISTORY_TOKENS,
+        token_counter=default_token_counter(settings.LLM_MODEL),
+    )
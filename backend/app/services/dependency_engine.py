@@ -0,0 +1,351 @@
+"""
+Dependency graph across every manifest and lockfile in a repository
+"""
+import hashlib
+import json
+import os
+import posixpath
+from collections import deque
+from fnmatch import fnmatch
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+from app.core.config import settings
+from app.services.dependency_parsers import (
+    LOCKFILE_PREFERENCE,
+    PARSER_VERSION,
+    PARSERS,
+    canonical_name,
+)
+
+# Ecosystem -> language reported on each dependency
+LANGUAGES = {'node': 'javascript'}
+
+# A package: (ecosystem, name, version); version is None when nothing locks it
+Package = Tuple[str, str, Optional[str]]
+
+
+def blob_sha(path: str) -> str:
+    """The git blob SHA of a file, so disk and `git ls-tree` agree on cache keys"""
+    digest = hashlib.sha1(f'blob {os.path.getsize(path)}\0'.encode('ascii'))
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class LockfileCache:
+    """
+    Parsed manifests and lockfiles keyed by content, shared by every repository:
+
+        {base_dir}/v{PARSER_VERSION}/{sha[:2]}/{sha}.json
+
+    A lockfile whose blob SHA was seen before is never parsed again.
+    """
+
+    def __init__(self, base_dir: str):
+        self.base_dir = os.path.join(base_dir, f'v{PARSER_VERSION}')
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, sha: str) -> str:
+        return os.path.join(self.base_dir, sha[:2], f'{sha}.json')
+
+    def get(self, sha: str) -> Optional[Dict]:
+        try:
+            with open(self._path(sha), 'rb') as f:
+                result = orjson.loads(f.read())
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, sha: str, result: Dict):
+        path = self._path(sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(result))
+        os.replace(tmp_path, path)
+
+
+class DependencyGraph:
+    """
+    Deduplicated packages across all lockfiles and manifests of a commit.
+
+    A package locked at the same version by two lockfiles (two workspaces,
+    or a frontend and a docs site) is one node. `edges[i]` lists what
+    package i depends on; `direct` maps each package a manifest declares
+    to the manifests declaring it.
+    """
+
+    def __init__(self, packages: List[Package], edges: List[List[int]], direct: Dict[int, List[str]]):
+        self.packages = packages
+        self.edges = edges
+        self.direct = direct
+        self.ids = {package: i for i, package in enumerate(packages)}
+
+    def dependents(self) -> List[List[int]]:
+        reverse: List[List[int]] = [[] for _ in self.packages]
+        for source, targets in enumerate(self.edges):
+            for target in targets:
+                reverse[target].append(source)
+        return reverse
+
+    def reachable(self, starts: Iterable[int], reverse: bool = False) -> List[int]:
+        """Breadth-first closure from `starts` (excluded), along or against the edges"""
+        adjacency = self.dependents() if reverse else self.edges
+        seen = set(starts)
+        queue = deque(seen)
+        order = []
+        while queue:
+            for target in adjacency[queue.popleft()]:
+                if target not in seen:
+                    seen.add(target)
+                    order.append(target)
+                    queue.append(target)
+        return order
+
+    def find(self, name: str) -> List[int]:
+        return [i for i, (ecosystem, package, _) in enumerate(self.packages)
+                if package == name or package == canonical_name(ecosystem, name)]
+
+    def statistics(self) -> Dict:
+        transitive = self.reachable(self.direct)
+        return {
+            'packages': len(self.packages),
+            'edges': sum(len(targets) for targets in self.edges),
+            'direct': len(self.direct),
+            'transitive': len(set(transitive) - set(self.direct)),
+        }
+
+    def describe(self, i: int) -> Dict:
+        ecosystem, name, version = self.packages[i]
+        return {'ecosystem': ecosystem, 'name': name, 'version': version}
+
+    def to_dict(self) -> Dict:
+        return {
+            'packages': [list(package) for package in self.packages],
+            'edges': self.edges,
+            'direct': {str(i): manifests for i, manifests in self.direct.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DependencyGraph':
+        return cls([tuple(package) for package in data['packages']], data['edges'],
+                   {int(i): manifests for i, manifests in data['direct'].items()})
+
+
+class DependencyEngine:
+    """
+    Parses every manifest and lockfile found by the scan and links them.
+
+    Each manifest is paired with the nearest lockfile of its ecosystem in
+    its own directory or above it, which is where npm, yarn, Cargo and uv
+    workspaces keep theirs. A manifest's declared dependencies resolve
+    through that lockfile to locked versions, and the lockfile's edges
+    give the transitive graph. Dependencies on another package of the
+    same repository are marked `local` instead.
+
+    Parse failures are reported per file in `errors`, never dropped.
+    """
+
+    def __init__(self, repo_path: str, config_files: Dict[str, str], cache: Optional[LockfileCache] = None):
+        self.repo_path = repo_path
+        self.config_files = config_files
+        self.cache = cache
+
+    def discover(self, paths: Iterable[str]) -> List[str]:
+        """Manifests and lockfiles among repository-relative paths"""
+        return sorted(
+            path for path in paths
+            if posixpath.basename(path) in self.config_files and posixpath.basename(path) in PARSERS
+        )
+
+    def parse_file(self, path: str, sha: Optional[str] = None) -> Dict:
+        """Parse one file, from the cache when its content was parsed before"""
+        name = posixpath.basename(path)
+        abs_path = os.path.join(self.repo_path, path)
+        try:
+            if self.cache is not None and sha is None:
+                sha = blob_sha(abs_path)
+            cached = self.cache.get(sha) if self.cache is not None else None
+            if cached is not None:
+                return cached
+            result = PARSERS[name](abs_path)
+        except OSError as e:
+            # Missing or unreadable (a partial clone leaves out huge blobs): not the content's fault
+            return {'kind': 'error', 'error': f'{type(e).__name__}: {e}'}
+        except (UnicodeDecodeError, ValueError, KeyError, TypeError, AttributeError, SyntaxError) as e:
+            # Malformed content; SyntaxError covers XML, TOML and JSON errors are ValueErrors
+            result = {'kind': 'error', 'error': f'{type(e).__name__}: {e}'}
+        # Files that include others are only valid as long as those are unchanged
+        if self.cache is not None and 'includes' not in result:
+            self.cache.put(sha, result)
+        return result
+
+    def analyze(self, files: Dict[str, Optional[str]]) -> Dict:
+        """
+        Dependencies of a commit from {relative path: blob SHA or None}.
+
+        Returns the declared dependencies (one entry per manifest and
+        dependency, with the locked version where there is one), the
+        graph, workspaces and per-file errors.
+        """
+        parsed = {path: self.parse_file(path, files.get(path)) for path in self.discover(files)}
+        errors = [{'file': path, 'error': result['error']} for path, result in parsed.items()
+                  if result['kind'] == 'error']
+        manifests = {path: result for path, result in parsed.items() if result['kind'] == 'manifest'}
+        lockfiles = {path: result for path, result in parsed.items() if result['kind'] == 'lockfile'}
+
+        packages: Dict[Package, int] = {}
+        nodes: List[Package] = []
+        edges: List[set] = []
+
+        def node(package: Package) -> int:
+            i = packages.get(package)
+            if i is None:
+                i = packages[package] = len(nodes)
+                nodes.append(package)
+                edges.append(set())
+            return i
+
+        resolvers = {}
+        for path, lock in lockfiles.items():
+            ecosystem = self.config_files[posixpath.basename(path)]
+            ids = [node((ecosystem, canonical_name(ecosystem, name), version)) for name, version in lock['packages']]
+            for source, targets in zip(ids, lock['requires']):
+                if targets:
+                    edges[source].update(map(ids.__getitem__, targets))
+            resolvers[path] = self._resolver(lock, ids, ecosystem)
+
+        local_names = set()
+        for path, manifest in manifests.items():
+            if manifest.get('name'):
+                ecosystem = self.config_files[posixpath.basename(path)]
+                local_names.add((ecosystem, canonical_name(ecosystem, manifest['name'])))
+
+        dependencies = []
+        direct: Dict[int, List[str]] = {}
+        for path, manifest in manifests.items():
+            ecosystem = self.config_files[posixpath.basename(path)]
+            lock_path = self._lockfile_for(path, ecosystem, lockfiles)
+            owner = canonical_name(ecosystem, manifest['name']) if manifest.get('name') else None
+            for dep in manifest['direct']:
+                name = canonical_name(ecosystem, dep['name'])
+                entry = {
+                    'name': dep['name'],
+                    'version': dep['spec'],
+                    'spec': dep['spec'],
+                    'type': dep['type'],
+                    'language': LANGUAGES.get(ecosystem, ecosystem),
+                    'ecosystem': ecosystem,
+                    'manifest': path,
+                    'lockfile': None,
+                }
+                dependencies.append(entry)
+                if (ecosystem, name) in local_names:
+                    entry['local'] = True
+                    continue
+                i = None
+                if lock_path is not None:
+                    members, hoisted = resolvers[lock_path]
+                    i = members.get(owner, {}).get(name, hoisted.get(name))
+                if i is None:
+                    i = node((ecosystem, name, None))
+                else:
+                    entry['version'] = nodes[i][2]
+                    entry['lockfile'] = lock_path
+                direct.setdefault(i, []).append(path)
+
+        graph = DependencyGraph(nodes, [sorted(targets) for targets in edges], direct)
+        return {
+            'dependencies': dependencies,
+            'graph': graph,
+            'manifests': sorted(manifests),
+            'lockfiles': sorted(lockfiles),
+            'workspaces': self._workspaces(manifests),
+            'errors': errors,
+        }
+
+    def _lockfile_for(self, manifest_path: str, ecosystem: str, lockfiles: Dict[str, Dict]) -> Optional[str]:
+        directory = posixpath.dirname(manifest_path)
+        while True:
+            for name in LOCKFILE_PREFERENCE:
+                candidate = posixpath.join(directory, name)
+                if candidate in lockfiles and self.config_files.get(name) == ecosystem:
+                    return candidate
+            if not directory:
+                return None
+            directory = posixpath.dirname(directory)
+
+    def _resolver(self, lock: Dict, ids: List[int], ecosystem: str) -> Tuple[Dict[str, Dict[str, int]], Dict[str, int]]:
+        """
+        Name lookups into one lockfile's graph nodes: per member package
+        (its own locked dependencies) and for everything else (hoisted).
+        """
+        packages = lock['packages']
+        member_of = {index: canonical_name(ecosystem, name) for name, index in lock['members'].items()}
+        members: Dict[str, Dict[str, int]] = {name: {} for name in member_of.values()}
+        for source, name in member_of.items():
+            for target in lock['requires'][source]:
+                members[name][canonical_name(ecosystem, packages[target][0])] = ids[target]
+        hoisted = {canonical_name(ecosystem, name): ids[index] for name, index in lock['hoisted'].items()}
+        return members, hoisted
+
+    def _workspaces(self, manifests: Dict[str, Dict]) -> List[Dict]:
+        """Workspace roots and the manifests their member patterns match"""
+        workspaces = []
+        for root, manifest in manifests.items():
+            if not manifest.get('workspaces'):
+                continue
+            root_dir = posixpath.dirname(root)
+            name = posixpath.basename(root)
+            members = []
+            for path in manifests:
+                if path == root or posixpath.basename(path) != name:
+                    continue
+                directory = posixpath.dirname(path)
+                if root_dir and not directory.startswith(f'{root_dir}/'):
+                    continue
+                relative = directory[len(root_dir) + 1:] if root_dir else directory
+                if any(fnmatch(relative, pattern.rstrip('/')) for pattern in manifest['workspaces']):
+                    members.append(path)
+            workspaces.append({'root': root, 'patterns': manifest['workspaces'], 'members': members})
+        return workspaces
+
+
+def save_dependency_graph(directory: str, report: Dict):
+    """Write the graph and the file-level report as one JSON artifact"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'graph.json')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'graph': report['graph'].to_dict(),
+            'manifests': report['manifests'],
+            'lockfiles': report['lockfiles'],
+            'workspaces': report['workspaces'],
+            'errors': report['errors'],
+        }, f)
+    os.replace(tmp_path, path)
+
+
+def dependency_graph_for_commit(store, repo_id: str, commit: str) -> Optional[Dict]:
+    """The stored dependency report of an analyzed commit, with its graph loaded"""
+    path = os.path.join(store.artifact_path(repo_id, commit, 'dependencies'), 'graph.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        report = json.load(f)
+    report['graph'] = DependencyGraph.from_dict(report['graph'])
+    return report
+
+
+@lru_cache()
+def get_lockfile_cache() -> LockfileCache:
+    """Process-wide parsed-lockfile cache"""
+    return LockfileCache(settings.DEPENDENCY_CACHE_DIR)
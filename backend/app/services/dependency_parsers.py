@@ -0,0 +1,664 @@
+"""
+Streaming parsers for dependency manifests and lockfiles
+"""
+import json
+import os
+import re
+import sys
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+# Bump when parser output changes, so cached results are not reused
+PARSER_VERSION = 2
+
+# PEP 508: name, optional [extras], then the version spec and ; markers
+REQUIREMENT = re.compile(r'^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*([^;]*)')
+GEM = re.compile(r'''^\s*gem\s+['"]([^'"]+)['"]((?:\s*,\s*['"][^'"]*['"])*)(.*)$''')
+GEM_GROUP = re.compile(r'^\s*group\s+(.+?)\s+do\b')
+QUOTED = re.compile(r'''['"]([^'"]*)['"]''')
+YARN_FIELD = re.compile(r'^("[^"]+"|[^\s:"]+):?\s+(.*)$')
+JSON_WHITESPACE = re.compile(r'[ \t\r\n]*')
+# What may still follow a number decoded up to the end of the buffer: "12" + ".5"
+JSON_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*\Z')
+LOCKED_GEM = re.compile(r'^([^\s(]+)(?: \(([^)]*)\))?$')
+
+
+def canonical_name(ecosystem: str, name: str) -> str:
+    """Spelling-insensitive package name, where the ecosystem treats spellings alike (PEP 503)"""
+    if ecosystem == 'python':
+        return re.sub(r'[-_.]+', '-', name).lower()
+    return name
+
+
+class JsonStream:
+    """
+    Pull parser over a JSON document read in fixed-size chunks.
+
+    Objects are walked member by member with `members`; any other value is
+    decoded whole with `value`. Memory is bounded by the largest value
+    decoded at once, not by the file, so a 200MB package-lock.json is read
+    one package entry at a time.
+    """
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, f: IO[str], chunk_size: int = 1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, at_least: int = 0) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(max(self.chunk_size, at_least))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self.pos = pos = JSON_WHITESPACE.match(self.buffer, self.pos).end()
+            if pos < len(self.buffer):
+                return self.buffer[pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON input')
+
+    def _expect(self, char: str):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f'Expected {char!r} but found {found!r}')
+        self.pos += 1
+
+    def value(self):
+        """Decode the value at the cursor"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Usually a value cut by the chunk boundary; read as much
+                # again so retries stay linear in the value's size
+                if not self._fill(len(self.buffer) - self.pos):
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk,
+            # even when the decoder stopped short of a dangling "." or "e"
+            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and JSON_NUMBER_TAIL.match(self.buffer, end) and self._fill()):
+                continue
+            self.pos = end
+            return value
+
+    def members(self) -> Iterator[str]:
+        """Keys of the object at the cursor; each value must be consumed before the next key"""
+        self._expect('{')
+        if self._peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError('Object keys must be strings')
+            self._expect(':')
+            yield key
+            char = self._peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' or '}}' but found {char!r}")
+
+
+class LockBuilder:
+    """Accumulates one lockfile's packages and what each of them requires"""
+
+    def __init__(self):
+        self.packages: List[List[str]] = []
+        self.requires: List[List[int]] = []
+        self.ids: Dict[Tuple[str, str], int] = {}
+        self.by_name: Dict[str, int] = {}
+        self.members: Dict[str, int] = {}
+
+    def add(self, name: str, version: Optional[str]) -> int:
+        key = (name, version or '')
+        index = self.ids.get(key)
+        if index is None:
+            index = self.ids[key] = len(self.packages)
+            self.packages.append([name, version])
+            self.requires.append([])
+            self.by_name.setdefault(name, index)
+        return index
+
+    def link(self, source: int, target: int):
+        # Lists, not sets: a package requires a handful of others, and there may be 100K packages
+        targets = self.requires[source]
+        if target not in targets:
+            targets.append(target)
+
+    def result(self, hoisted: Optional[Dict[str, int]] = None) -> Dict:
+        return {
+            'kind': 'lockfile',
+            'packages': self.packages,
+            # requires[i]: indexes of the packages package i depends on
+            'requires': [sorted(targets) for targets in self.requires],
+            # Workspace or project packages by name; what they require are their direct dependencies
+            'members': self.members,
+            # The version a bare name resolves to, for manifests that are not members
+            'hoisted': hoisted if hoisted is not None else self.by_name,
+        }
+
+
+def _manifest(name: Optional[str], direct: List[Dict], workspaces: Optional[List[str]] = None) -> Dict:
+    return {'kind': 'manifest', 'name': name, 'direct': direct, 'workspaces': workspaces or []}
+
+
+def _dep(name: str, spec, dep_type: str) -> Dict:
+    spec = '' if spec is None else str(spec).strip()
+    return {'name': name, 'spec': spec or '*', 'type': dep_type}
+
+
+def _pep508(requirement: str, dep_type: str) -> Optional[Dict]:
+    match = REQUIREMENT.match(requirement.strip())
+    if match is None:
+        return None
+    return _dep(match.group(1), match.group(2).strip().strip('()') or '*', dep_type)
+
+
+# Manifests ------------------------------------------------------------------
+
+NPM_SECTIONS = (
+    ('dependencies', 'production'),
+    ('devDependencies', 'development'),
+    ('optionalDependencies', 'optional'),
+    ('peerDependencies', 'peer'),
+)
+
+
+def parse_package_json(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError('package.json is not an object')
+    direct = [
+        _dep(name, spec, dep_type)
+        for section, dep_type in NPM_SECTIONS
+        for name, spec in (data.get(section) or {}).items()
+    ]
+    workspaces = data.get('workspaces') or []
+    if isinstance(workspaces, dict):
+        workspaces = workspaces.get('packages') or []
+    return _manifest(data.get('name'), direct, list(workspaces))
+
+
+def parse_requirements(path: str, _seen: Optional[set] = None) -> Dict:
+    """requirements.txt, following `-r` includes (which make the result uncacheable)"""
+    seen = _seen if _seen is not None else set()
+    seen.add(os.path.realpath(path))
+    direct: List[Dict] = []
+    includes: List[str] = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = re.sub(r'(^|\s)#.*$', '', line).strip()
+            if not line:
+                continue
+            if line.startswith(('-r ', '--requirement')):
+                target = line.split(None, 1)[1] if ' ' in line else line.split('=', 1)[1]
+                included = os.path.join(os.path.dirname(path), target.strip())
+                includes.append(target.strip())
+                if os.path.realpath(included) not in seen:
+                    nested = parse_requirements(included, seen)
+                    direct.extend(nested['direct'])
+                    includes.extend(nested.get('includes', []))
+                continue
+            if line.startswith('-') or '://' in line or line.startswith(('.', '/')):
+                continue
+            dep = _pep508(line, 'production')
+            if dep is not None:
+                # A pin reads as the version itself, as it always has
+                if dep['spec'].startswith('==') and ',' not in dep['spec']:
+                    dep['spec'] = dep['spec'][2:].strip()
+                direct.append(dep)
+    result = _manifest(None, direct)
+    if includes:
+        result['includes'] = includes
+    return result
+
+
+def parse_pyproject(path: str) -> Dict:
+    with open(path, 'rb') as f:
+        data = tomllib.load(f)
+    project = data.get('project') or {}
+    poetry = (data.get('tool') or {}).get('poetry') or {}
+    direct: List[Dict] = []
+
+    for requirement in project.get('dependencies') or []:
+        direct.append(_pep508(requirement, 'production'))
+    for requirements in (project.get('optional-dependencies') or {}).values():
+        direct.extend(_pep508(requirement, 'optional') for requirement in requirements)
+    for requirements in (data.get('dependency-groups') or {}).values():
+        # Groups may include other groups as {include-group = "..."} tables
+        direct.extend(_pep508(r, 'development') for r in requirements if isinstance(r, str))
+
+    poetry_sections = [(poetry.get('dependencies') or {}, 'production'),
+                       (poetry.get('dev-dependencies') or {}, 'development')]
+    poetry_sections += [((group.get('dependencies') or {}), 'development')
+                        for group in (poetry.get('group') or {}).values()]
+    for section, dep_type in poetry_sections:
+        for name, spec in section.items():
+            if name.lower() == 'python':
+                continue
+            if isinstance(spec, dict):
+                spec = spec.get('version') or '*'
+            elif isinstance(spec, list):
+                spec = ' || '.join(str(item.get('version', '*')) for item in spec)
+            direct.append(_dep(name, spec, dep_type))
+
+    uv = (data.get('tool') or {}).get('uv') or {}
+    workspaces = (uv.get('workspace') or {}).get('members') or []
+    return _manifest(project.get('name') or poetry.get('name'), [d for d in direct if d], workspaces)
+
+
+def parse_pipfile(path: str) -> Dict:
+    with open(path, 'rb') as f:
+        data = tomllib.load(f)
+    direct = []
+    for section, dep_type in (('packages', 'production'), ('dev-packages', 'development')):
+        for name, spec in (data.get(section) or {}).items():
+            if isinstance(spec, dict):
+                spec = spec.get('version') or '*'
+            direct.append(_dep(name, spec, dep_type))
+    return _manifest(None, direct)
+
+
+CARGO_SECTIONS = (('dependencies', 'production'), ('dev-dependencies', 'development'),
+                  ('build-dependencies', 'build'))
+
+
+def parse_cargo_toml(path: str) -> Dict:
+    with open(path, 'rb') as f:
+        data = tomllib.load(f)
+    tables = [data] + list((data.get('target') or {}).values())
+    direct = []
+    for table in tables:
+        for section, dep_type in CARGO_SECTIONS:
+            for key, spec in (table.get(section) or {}).items():
+                name = key
+                if isinstance(spec, dict):
+                    name = spec.get('package', key)
+                    spec = spec.get('version') or ('workspace' if spec.get('workspace') else '*')
+                direct.append(_dep(name, spec, dep_type))
+    workspace = data.get('workspace') or {}
+    return _manifest((data.get('package') or {}).get('name'), direct, workspace.get('members') or [])
+
+
+def parse_go_mod(path: str) -> Dict:
+    module, direct, in_block = None, [], False
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('module '):
+                module = line.split()[1]
+            elif line.startswith('require ('):
+                in_block = True
+            elif in_block and line == ')':
+                in_block = False
+            elif line.startswith('require ') or (in_block and line and not line.startswith('//')):
+                code, _, comment = line.partition('//')
+                fields = code.split()
+                if fields[0] == 'require':
+                    fields = fields[1:]
+                # Indirect requirements are transitive dependencies recorded for reproducibility
+                if len(fields) >= 2 and 'indirect' not in comment:
+                    direct.append(_dep(fields[0], fields[1], 'production'))
+    return _manifest(module, direct)
+
+
+def parse_pom(path: str) -> Dict:
+    """pom.xml, streamed with iterparse and cleared as it goes"""
+    direct, modules = [], []
+    name = None
+    stack: List[str] = []
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if event == 'start':
+            stack.append(tag)
+            continue
+        stack.pop()
+        parent = stack[-1] if stack else None
+        if (tag == 'dependency' and parent == 'dependencies'
+                and 'dependencyManagement' not in stack and 'plugin' not in stack):
+            fields = {child.tag.rsplit('}', 1)[-1]: (child.text or '').strip() for child in elem}
+            scope = fields.get('scope')
+            direct.append(_dep(
+                f"{fields.get('groupId', '')}:{fields.get('artifactId', '')}",
+                fields.get('version') or '*',
+                'development' if scope == 'test' else 'production',
+            ))
+        elif tag == 'module' and parent == 'modules':
+            modules.append((elem.text or '').strip())
+        elif tag == 'artifactId' and stack == ['project']:
+            name = (elem.text or '').strip()
+        if parent != 'dependency':
+            elem.clear()
+    return _manifest(name, direct, modules)
+
+
+def parse_gemfile(path: str) -> Dict:
+    direct, groups = [], []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            code = line.split('#', 1)[0]
+            group = GEM_GROUP.match(code)
+            if group:
+                groups.append(group.group(1))
+                continue
+            if re.match(r'^\s*end\b', code) and groups:
+                groups.pop()
+                continue
+            gem = GEM.match(code)
+            if gem is None:
+                continue
+            options = gem.group(3)
+            in_groups = ' '.join(groups) + options
+            dep_type = 'development' if re.search(r':(development|test)\b', in_groups) else 'production'
+            spec = ', '.join(QUOTED.findall(gem.group(2))) or '*'
+            direct.append(_dep(gem.group(1), spec, dep_type))
+    return _manifest(None, direct)
+
+
+# Lockfiles ------------------------------------------------------------------
+
+def _npm_name(install_path: str) -> str:
+    return install_path.rsplit('node_modules/', 1)[-1]
+
+
+def _npm_resolve(installs: Dict[str, int], links: Dict[str, str], from_path: str, name: str) -> Optional[int]:
+    """Node's lookup: the nearest node_modules/<name> walking up from the requiring package"""
+    base = from_path
+    while True:
+        candidate = f'{base}/node_modules/{name}' if base else f'node_modules/{name}'
+        candidate = links.get(candidate, candidate)
+        if candidate in installs:
+            return installs[candidate]
+        if not base:
+            return None
+        cut = base.rfind('/node_modules/')
+        base = base[:cut] if cut >= 0 else ''
+
+
+def parse_package_lock(path: str) -> Dict:
+    """package-lock.json / npm-shrinkwrap.json, v1 to v3, without loading the file whole"""
+    lock = LockBuilder()
+    # Install path -> package index, and what each install requires by name
+    installs: Dict[str, int] = {}
+    pending: List[Tuple[str, Tuple[str, ...]]] = []
+    links: Dict[str, str] = {}
+
+    def install(install_path: str, name: str, version: Optional[str], deps: Iterable[str]):
+        installs[install_path] = lock.add(sys.intern(name), version and sys.intern(version))
+        pending.append((install_path, tuple(map(sys.intern, deps))))
+
+    def add_v1(prefix: str, name: str, entry: Dict):
+        install_path = f'{prefix}node_modules/{name}'
+        install(install_path, name, entry.get('version'), entry.get('requires') or ())
+        for child, child_entry in (entry.get('dependencies') or {}).items():
+            add_v1(f'{install_path}/', child, child_entry)
+
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = JsonStream(f)
+        seen_packages = False
+        for key in stream.members():
+            if key == 'packages':
+                seen_packages = True
+                for install_path in stream.members():
+                    entry = stream.value()
+                    if entry.get('link'):
+                        links[install_path] = entry.get('resolved', '')
+                        continue
+                    deps = [dep for section, _ in NPM_SECTIONS for dep in entry.get(section) or ()]
+                    install(install_path, entry.get('name') or _npm_name(install_path), entry.get('version'), deps)
+            elif key == 'dependencies' and not seen_packages:
+                # v1 nesting: each top-level entry is decoded with its subtree
+                for name in stream.members():
+                    add_v1('', name, stream.value())
+            else:
+                stream.value()
+
+    for install_path, deps in pending:
+        source = installs[install_path]
+        for dep in deps:
+            target = _npm_resolve(installs, links, install_path, dep)
+            if target is not None:
+                lock.link(source, target)
+        # The root project and workspace members live outside node_modules
+        if 'node_modules/' not in install_path:
+            lock.members[lock.packages[source][0]] = source
+    hoisted = {}
+    for install_path, index in installs.items():
+        name = lock.packages[index][0]
+        if install_path == f'node_modules/{name}':
+            hoisted[name] = index
+    return lock.result(hoisted)
+
+
+def _yarn_name(descriptor: str) -> str:
+    at = descriptor.find('@', 1)
+    return descriptor[:at] if at > 0 else descriptor
+
+
+def parse_yarn_lock(path: str) -> Dict:
+    """yarn.lock, classic and Berry formats, line by line"""
+    entries: List[Dict] = []
+    current = None
+    section = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            text = line.rstrip('\r\n')
+            stripped = text.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            indent = len(text) - len(text.lstrip(' '))
+            if indent == 0:
+                current, section = None, None
+                if not stripped.startswith('__metadata'):
+                    descriptors = [part.strip().strip('"') for part in stripped.rstrip(':').split(',')]
+                    current = {'descriptors': descriptors, 'version': None, 'deps': {}}
+                    entries.append(current)
+                continue
+            if current is None:
+                continue
+            if stripped.endswith(':') and ' ' not in stripped:
+                # A nested block: only dependency lists at the entry's top level matter
+                if indent == 2:
+                    section = stripped[:-1]
+                continue
+            match = YARN_FIELD.match(stripped)
+            if match is None:
+                continue
+            key, value = match.group(1).strip('"'), match.group(2).strip().strip('"')
+            if indent == 2:
+                section = None
+                if key == 'version':
+                    current['version'] = value
+            elif indent == 4 and section in ('dependencies', 'optionalDependencies'):
+                current['deps'][key] = value
+
+    lock = LockBuilder()
+    by_descriptor: Dict[str, int] = {}
+    indexes = []
+    for entry in entries:
+        index = lock.add(_yarn_name(entry['descriptors'][0]), entry['version'])
+        indexes.append(index)
+        for descriptor in entry['descriptors']:
+            by_descriptor[descriptor] = index
+            if '@workspace:' in descriptor:
+                lock.members[_yarn_name(descriptor)] = index
+    for entry, index in zip(entries, indexes):
+        for name, spec in entry['deps'].items():
+            target = by_descriptor.get(f'{name}@{spec}')
+            if target is None:
+                target = by_descriptor.get(f'{name}@npm:{spec}', lock.by_name.get(name))
+            if target is not None:
+                lock.link(index, target)
+    return lock.result()
+
+
+def _toml_packages(path: str) -> Iterator[Dict]:
+    """The [[package]] tables of a TOML lockfile, each parsed on its own"""
+    block: List[str] = []
+
+    def flush():
+        parsed = tomllib.loads(''.join(block)).get('package') or []
+        block.clear()
+        return parsed
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('['):
+                header = line.strip()
+                if header == '[[package]]':
+                    if block:
+                        yield from flush()
+                    block.append(line)
+                    continue
+                if not header.startswith(('[package.', '[[package.')):
+                    # Any other table ([metadata], [metadata.files], ...) ends the package
+                    if block:
+                        yield from flush()
+                    continue
+            if block:
+                block.append(line)
+    if block:
+        yield from flush()
+
+
+def _link_by_name(lock: LockBuilder, requires: List[Tuple[int, str]], ecosystem: str):
+    by_name = {canonical_name(ecosystem, name): index for name, index in lock.by_name.items()}
+    for index, name in requires:
+        target = by_name.get(canonical_name(ecosystem, name))
+        if target is not None:
+            lock.link(index, target)
+
+
+def parse_poetry_lock(path: str) -> Dict:
+    lock = LockBuilder()
+    requires = []
+    for package in _toml_packages(path):
+        index = lock.add(package['name'], package.get('version'))
+        requires.extend((index, name) for name in package.get('dependencies') or {})
+    _link_by_name(lock, requires, 'python')
+    return lock.result()
+
+
+def parse_uv_lock(path: str) -> Dict:
+    lock = LockBuilder()
+    requires = []
+    for package in _toml_packages(path):
+        index = lock.add(package['name'], package.get('version'))
+        source = package.get('source') or {}
+        if any(kind in source for kind in ('editable', 'virtual', 'workspace')):
+            lock.members[package['name']] = index
+        groups = [package.get('dependencies') or []]
+        groups += list((package.get('optional-dependencies') or {}).values())
+        groups += list((package.get('dev-dependencies') or {}).values())
+        requires.extend((index, dep['name']) for group in groups for dep in group)
+    _link_by_name(lock, requires, 'python')
+    return lock.result()
+
+
+def parse_cargo_lock(path: str) -> Dict:
+    lock = LockBuilder()
+    requires = []
+    for package in _toml_packages(path):
+        index = lock.add(package['name'], package.get('version'))
+        if 'source' not in package:
+            lock.members[package['name']] = index
+        requires.extend((index, dep) for dep in package.get('dependencies') or [])
+    # Entries are "name", or "name version" when several versions are locked
+    for index, dep in requires:
+        fields = dep.split()
+        target = lock.ids.get((fields[0], fields[1])) if len(fields) > 1 else lock.by_name.get(fields[0])
+        if target is not None:
+            lock.link(index, target)
+    return lock.result()
+
+
+def parse_pipfile_lock(path: str) -> Dict:
+    lock = LockBuilder()
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = JsonStream(f)
+        for key in stream.members():
+            if key not in ('default', 'develop'):
+                stream.value()
+                continue
+            for name in stream.members():
+                version = (stream.value() or {}).get('version') or ''
+                lock.add(name, version.lstrip('=') or None)
+    return lock.result()
+
+
+def parse_gemfile_lock(path: str) -> Dict:
+    lock = LockBuilder()
+    requires = []
+    section, in_specs, current = None, False, None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            text = line.rstrip('\r\n')
+            if not text.strip():
+                continue
+            indent = len(text) - len(text.lstrip(' '))
+            if indent == 0:
+                section, in_specs = text.strip(), False
+                continue
+            if indent == 2:
+                in_specs = text.strip() == 'specs:'
+                continue
+            match = LOCKED_GEM.match(text.strip())
+            if not in_specs or match is None:
+                continue
+            if indent == 4:
+                current = lock.add(match.group(1), match.group(2))
+                # Gems from PATH sections are the project's own
+                if section == 'PATH':
+                    lock.members[match.group(1)] = current
+            elif indent == 6 and current is not None:
+                requires.append((current, match.group(1)))
+    _link_by_name(lock, requires, 'ruby')
+    return lock.result()
+
+
+# File name -> parser; the scanner's CONFIG_FILES says which ecosystem each belongs to
+PARSERS: Dict[str, Callable[[str], Dict]] = {
+    'package.json': parse_package_json,
+    'requirements.txt': parse_requirements,
+    'pyproject.toml': parse_pyproject,
+    'Pipfile': parse_pipfile,
+    'Cargo.toml': parse_cargo_toml,
+    'go.mod': parse_go_mod,
+    'pom.xml': parse_pom,
+    'Gemfile': parse_gemfile,
+    'package-lock.json': parse_package_lock,
+    'npm-shrinkwrap.json': parse_package_lock,
+    'yarn.lock': parse_yarn_lock,
+    'poetry.lock': parse_poetry_lock,
+    'uv.lock': parse_uv_lock,
+    'Pipfile.lock': parse_pipfile_lock,
+    'Cargo.lock': parse_cargo_lock,
+    'Gemfile.lock': parse_gemfile_lock,
+}
+
+# When a directory has several lockfiles for one ecosystem, the first wins
+LOCKFILE_PREFERENCE = [
+    'npm-shrinkwrap.json', 'package-lock.json', 'yarn.lock',
+    'uv.lock', 'poetry.lock', 'Pipfile.lock', 'Cargo.lock', 'Gemfile.lock',
+]
@@ -0,0 +1,288 @@
+"""
+Batched, deduplicated embedding pipeline with a persistent cache
+"""
+import asyncio
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import weakref
+from array import array
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.services.code_chunker import CodeChunk, content_hash
+
+
+class OpenAIEmbedder:
+    """
+    Embeddings from the OpenAI API.
+
+    Pooled connections belong to the event loop that opened them, and jobs
+    embed from their own `asyncio.run` loop on a worker thread while chat
+    embeds from the server loop, so each loop gets its own client. A
+    client is dropped with its loop.
+    """
+
+    def __init__(self, model: str, api_key: str):
+        self.model = model
+        self.api_key = api_key
+        self._clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                from openai import AsyncOpenAI
+                client = self._clients[loop] = AsyncOpenAI(api_key=self.api_key)
+        return client
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        response = await self.client.embeddings.create(model=self.model, input=texts)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+class FakeEmbedder:
+    """
+    Deterministic offline embedder for tests and benchmarks.
+
+    Hashes identifier-like tokens into a fixed number of buckets, so texts
+    sharing vocabulary land near each other and retrieval stays meaningful.
+    """
+
+    TOKEN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|\d+')
+
+    def __init__(self, dimensions: int = 64, model: str = 'fake', latency: float = 0.0):
+        self.dimensions = dimensions
+        self.model = f'{model}-{dimensions}'
+        self.latency = latency
+        self.calls = 0
+
+    def embed_one(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for token in self.TOKEN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self.embed_one(text) for text in texts]
+
+
+class EmbeddingCache:
+    """
+    Content-addressed vector store: (model, content hash) -> float32 vector.
+
+    Shared by every repository, so identical code is embedded once no
+    matter how many repos, branches or files it appears in.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings ('
+                'model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, '
+                'PRIMARY KEY (model, hash)) WITHOUT ROWID'
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        return {digest: array('f', blob).tolist() for digest, blob in self.iter_packed(model, hashes)}
+
+    def iter_packed(self, model: str, hashes: Sequence[str]) -> Iterator[Tuple[str, bytes]]:
+        """(hash, packed float32) for the cached subset of `hashes`"""
+        conn = self._connect()
+        try:
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                yield from conn.execute(
+                    f'SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})',
+                    [model, *batch],
+                )
+        finally:
+            conn.close()
+
+    def put_many(self, model: str, vectors: Dict[str, Sequence[float]]):
+        conn = self._connect()
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)',
+                [(model, digest, array('f', vector).tobytes()) for digest, vector in vectors.items()],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class EmbeddingPipeline:
+    """
+    Embeds chunks in token-bounded batches with bounded concurrency.
+
+    Chunks are deduplicated by content hash and checked against the cache
+    first; only unseen content reaches the embedder. A bounded queue
+    between the batcher and the workers provides backpressure, so memory
+    stays proportional to `concurrency` batches however many chunks stream in.
+    """
+
+    def __init__(self, embedder, cache: EmbeddingCache, max_batch_tokens: int = 64000,
+                 max_batch_items: int = 512, concurrency: int = 4, max_input_tokens: int = 8000,
+                 lookup_size: int = 1000, max_retries: int = 3):
+        self.embedder = embedder
+        self.cache = cache
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.concurrency = concurrency
+        self.max_input_chars = max_input_tokens * 3
+        self.lookup_size = lookup_size
+        self.max_retries = max_retries
+
+    @property
+    def model(self) -> str:
+        return self.embedder.model
+
+    async def embed_query(self, text: str) -> List[float]:
+        """Embed a single query string, through the cache"""
+        digest = content_hash(text)
+        cached = await asyncio.to_thread(self.cache.get_many, self.model, [digest])
+        if digest in cached:
+            return cached[digest]
+        vector = (await self._embed_with_retry([text[:self.max_input_chars]]))[0]
+        await asyncio.to_thread(self.cache.put_many, self.model, {digest: vector})
+        return vector
+
+    async def embed_chunks(self, chunks: Iterable[CodeChunk],
+                           on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Ensure every chunk's content hash has a cached vector"""
+        stats = {'chunks': 0, 'unique': 0, 'cached': 0, 'embedded': 0, 'batches': 0}
+        seen = set()
+        errors: List[BaseException] = []
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [
+            asyncio.create_task(self._worker(queue, stats, errors, on_progress))
+            for _ in range(self.concurrency)
+        ]
+
+        try:
+            pending: Dict[str, CodeChunk] = {}
+            for chunk in chunks:
+                if errors:
+                    break
+                stats['chunks'] += 1
+                if chunk.content_hash in seen:
+                    continue
+                seen.add(chunk.content_hash)
+                pending[chunk.content_hash] = chunk
+                if len(pending) >= self.lookup_size:
+                    await self._enqueue_uncached(pending, queue, stats)
+                    pending = {}
+            if pending:
+                await self._enqueue_uncached(pending, queue, stats)
+
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            raise
+
+        if errors:
+            raise errors[0]
+        stats['unique'] = len(seen)
+        return stats
+
+    async def _enqueue_uncached(self, pending: Dict[str, CodeChunk], queue: asyncio.Queue, stats: Dict):
+        cached = await asyncio.to_thread(self.cache.get_many, self.model, list(pending))
+        stats['cached'] += len(cached)
+
+        batch: List[CodeChunk] = []
+        batch_tokens = 0
+        for digest, chunk in pending.items():
+            if digest in cached:
+                continue
+            tokens = min(chunk.token_count, self.max_input_chars // 3)
+            if batch and (batch_tokens + tokens > self.max_batch_tokens or len(batch) >= self.max_batch_items):
+                await queue.put(batch)
+                batch, batch_tokens = [], 0
+            batch.append(chunk)
+            batch_tokens += tokens
+        if batch:
+            await queue.put(batch)
+
+    async def _worker(self, queue: asyncio.Queue, stats: Dict, errors: List[BaseException],
+                      on_progress: Optional[Callable[[Dict], None]]):
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            # After a failure keep draining so the producer never blocks on a full queue
+            if errors:
+                continue
+            try:
+                vectors = await self._embed_with_retry([chunk.content[:self.max_input_chars] for chunk in batch])
+                await asyncio.to_thread(
+                    self.cache.put_many,
+                    self.model,
+                    {chunk.content_hash: vector for chunk, vector in zip(batch, vectors)},
+                )
+            except Exception as e:
+                errors.append(e)
+                continue
+            stats['embedded'] += len(batch)
+            stats['batches'] += 1
+            if on_progress:
+                on_progress(stats)
+
+    async def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.embedder.embed(texts)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(min(2 ** attempt, 30))
+
+
+def build_embedder(backend: str, model: str, api_key: Optional[str] = None):
+    """Embedder for EMBEDDING_BACKEND ("openai" or "fake")"""
+    if backend == 'fake':
+        return FakeEmbedder()
+    if backend == 'openai':
+        return OpenAIEmbedder(model, api_key)
+    raise ValueError(f'Unknown embedding backend: {backend}')
+
+
+@lru_cache()
+def get_embedding_pipeline() -> EmbeddingPipeline:
+    """Process-wide embedding pipeline configured from settings"""
+    embedder = build_embedder(settings.EMBEDDING_BACKEND, settings.EMBEDDING_MODEL, settings.OPENAI_API_KEY)
+    return EmbeddingPipeline(
+        embedder,
+        EmbeddingCache(settings.EMBEDDING_CACHE_PATH),
+        max_batch_tokens=settings.EMBEDDING_BATCH_TOKENS,
+        concurrency=settings.EMBEDDING_CONCURRENCY,
+    )
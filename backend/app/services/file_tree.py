@@ -0,0 +1,291 @@
+"""
+Compact, array-backed repository file tree
+"""
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b'FTR1'
+# magic, nodes, segment blob bytes, header strings bytes
+HEADER = struct.Struct('<4sIII')
+
+# Language code of directory nodes; file codes index the tree's language table
+DIRECTORY = 255
+
+
+class FileTree:
+    """
+    A repository tree as parallel arrays, one slot per node.
+
+    Nodes are numbered breadth-first from the root (node 0), so the
+    children of a node are contiguous and sorted by name: they are
+    `first_child[i]` up to `first_child[i + 1]` (the array has a trailing
+    sentinel). `name[i]` is the byte offset of the node's name in a blob of
+    NUL-terminated, interned path segments, so repeated names (`index.ts`,
+    `__init__.py`, `src`) are stored once. Full paths are rebuilt from
+    `parent` links only when asked for. Directory sizes are recursive totals.
+
+    The packed form (`to_bytes`) is a header followed by the raw arrays and
+    the blob, so loading it is a handful of `frombytes` calls.
+    """
+
+    def __init__(self, root_name: str, parent: array, name: array, first_child: array, size: array,
+                 language: array, segments: bytes, languages: List[str]):
+        self.root_name = root_name
+        self.parent = parent
+        self.name = name
+        self.first_child = first_child
+        self.size = size
+        self.language_code = language
+        self.segment_blob = segments
+        self.languages = languages
+
+    @classmethod
+    def build(cls, files: Iterable[Tuple[str, int, Optional[str]]], root_name: str = '.') -> 'FileTree':
+        """Build from (relative path, size, language) triples"""
+        language_ids: Dict[Optional[str], int] = {None: 0}
+        languages = ['unknown']
+        # directory path -> {child name: (is_dir, size, language code)}
+        children: Dict[str, Dict[str, Tuple[bool, int, int]]] = {'': {}}
+
+        for path, size, language in files:
+            code = language_ids.get(language)
+            if code is None:
+                if len(languages) >= DIRECTORY:
+                    raise ValueError('Too many distinct languages for a FileTree')
+                code = language_ids[language] = len(languages)
+                languages.append(language)
+            parent, _, name = path.rpartition('/')
+            siblings = children.get(parent)
+            if siblings is None:
+                siblings = children[parent] = {}
+                # First file under this directory: link it and any new ancestors
+                directory = parent
+                while directory:
+                    grandparent, _, dir_name = directory.rpartition('/')
+                    known = grandparent in children
+                    children.setdefault(grandparent, {})[dir_name] = (True, 0, DIRECTORY)
+                    if known:
+                        break
+                    directory = grandparent
+            siblings[name] = (False, size, code)
+
+        offsets: Dict[str, int] = {}
+        blob: List[bytes] = []
+        blob_bytes = 0
+        parent_ids, names, first_child, sizes, codes = [-1], [0], [], [0], [DIRECTORY]
+        # Directory path per node (None for files), consumed breadth-first
+        paths: List[Optional[str]] = ['']
+
+        for node, directory in enumerate(paths):
+            first_child.append(len(paths))
+            if directory is None:
+                continue
+            prefix = f'{directory}/' if directory else ''
+            for child_name, (is_dir, size, code) in sorted(children[directory].items()):
+                offset = offsets.get(child_name)
+                if offset is None:
+                    offset = offsets[child_name] = blob_bytes
+                    encoded = child_name.encode('utf-8') + b'\0'
+                    blob.append(encoded)
+                    blob_bytes += len(encoded)
+                parent_ids.append(node)
+                names.append(offset)
+                sizes.append(size)
+                codes.append(code)
+                paths.append(prefix + child_name if is_dir else None)
+        first_child.append(len(paths))
+
+        # Children come after their parents, so one reverse pass sums totals
+        for node in range(len(paths) - 1, 0, -1):
+            sizes[parent_ids[node]] += sizes[node]
+
+        return cls(root_name, array('i', parent_ids), array('I', names), array('i', first_child),
+                   array('q', sizes), array('B', codes), b''.join(blob), languages)
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def segment(self, offset: int) -> str:
+        blob = self.segment_blob
+        return blob[offset:blob.index(b'\0', offset)].decode('utf-8')
+
+    def node_name(self, node: int) -> str:
+        return self.root_name if node == 0 else self.segment(self.name[node])
+
+    def is_dir(self, node: int) -> bool:
+        return self.language_code[node] == DIRECTORY
+
+    def language(self, node: int) -> Optional[str]:
+        code = self.language_code[node]
+        return None if code == DIRECTORY else self.languages[code]
+
+    def children(self, node: int) -> range:
+        return range(self.first_child[node], self.first_child[node + 1])
+
+    def path(self, node: int) -> str:
+        parts = []
+        while node > 0:
+            parts.append(self.segment(self.name[node]))
+            node = self.parent[node]
+        return '/'.join(reversed(parts))
+
+    def find(self, path: str) -> Optional[int]:
+        """Node id of a relative path ('' for the root), by binary search per level"""
+        node = 0
+        for part in filter(None, path.strip('/').split('/')):
+            children = self.children(node)
+            index = bisect_left(children, part, key=lambda child: self.segment(self.name[child]))
+            if index == len(children) or self.segment(self.name[children[index]]) != part:
+                return None
+            node = children[index]
+        return node
+
+    def walk(self, node: int = 0) -> Iterator[int]:
+        """Node ids of a subtree, breadth-first"""
+        queue = [node]
+        for current in queue:
+            yield current
+            queue.extend(self.children(current))
+
+    def to_nested(self, node: int = 0, max_depth: Optional[int] = None) -> Dict:
+        """The nested {name, type, path, children} form of a subtree"""
+        return self._nested(node, self.path(node), 0, max_depth)
+
+    def _nested(self, node: int, path: str, depth: int, max_depth: Optional[int]) -> Dict:
+        if not self.is_dir(node):
+            return {
+                'name': self.node_name(node),
+                'type': 'file',
+                'path': path,
+                'language': self.language(node),
+                'size': self.size[node],
+            }
+        children = []
+        if max_depth is None or depth < max_depth:
+            prefix = f'{path}/' if path else ''
+            children = [
+                self._nested(child, prefix + self.segment(self.name[child]), depth + 1, max_depth)
+                for child in self.children(node)
+            ]
+        return {
+            'name': self.node_name(node),
+            'type': 'directory',
+            'path': path or '.',
+            'children': children,
+        }
+
+    def to_columns(self, node: int = 0) -> Dict:
+        """
+        Columnar form of a subtree, for clients that rebuild the tree.
+
+        Entry i is named `segments[name_id[i]]` and sits under entry
+        `parent[i]`; entry 0 is the subtree root itself (parent -1, named by
+        `name`). `language[i]` indexes `languages` (null for directories)
+        and `file_count[i]` counts the files beneath a directory.
+        """
+        if node == 0:
+            # Whole tree: every interned segment is used, in blob order
+            segments = self.segment_blob.decode('utf-8').split('\0')[:-1]
+            index_of = {}
+            offset = 0
+            for index, segment in enumerate(segments):
+                index_of[offset] = index
+                offset += (len(segment) if segment.isascii() else len(segment.encode('utf-8'))) + 1
+            name_ids = [None, *map(index_of.__getitem__, self.name[1:])]
+            parent = self.parent.tolist()
+            sizes = self.size.tolist()
+            codes = self.language_code.tolist()
+        else:
+            nodes = list(self.walk(node))
+            local = {old: new for new, old in enumerate(nodes)}
+            parent = [-1] + [local[self.parent[old]] for old in nodes[1:]]
+            used: Dict[int, int] = {}
+            name_ids = [None] + [used.setdefault(self.name[old], len(used)) for old in nodes[1:]]
+            segments = [self.segment(offset) for offset in used]
+            sizes = [self.size[old] for old in nodes]
+            codes = [self.language_code[old] for old in nodes]
+
+        file_count = [0 if code == DIRECTORY else 1 for code in codes]
+        for index in range(len(parent) - 1, 0, -1):
+            file_count[parent[index]] += file_count[index]
+
+        return {
+            'path': self.path(node),
+            'name': self.node_name(node),
+            'count': len(parent),
+            'segments': segments,
+            'name_id': name_ids,
+            'parent': parent,
+            'size': sizes,
+            'file_count': file_count,
+            'language': [None if code == DIRECTORY else code for code in codes],
+            'languages': self.languages,
+        }
+
+    def _arrays(self) -> Tuple[array, ...]:
+        return self.parent, self.name, self.first_child, self.size, self.language_code
+
+    def to_bytes(self) -> bytes:
+        strings = '\0'.join([self.root_name, *self.languages]).encode('utf-8')
+        parts = [HEADER.pack(MAGIC, len(self), len(self.segment_blob), len(strings))]
+        for values in self._arrays():
+            if sys.byteorder == 'big':
+                values = array(values.typecode, values)
+                values.byteswap()
+            parts.append(values.tobytes())
+        parts.append(self.segment_blob)
+        parts.append(strings)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'FileTree':
+        magic, nodes, blob_bytes, string_bytes = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('Not a packed FileTree')
+        view = memoryview(data)
+        offset = HEADER.size
+        arrays = []
+        for typecode, count in (('i', nodes), ('I', nodes), ('i', nodes + 1), ('q', nodes), ('B', nodes)):
+            values = array(typecode)
+            end = offset + values.itemsize * count
+            values.frombytes(view[offset:end])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            arrays.append(values)
+            offset = end
+        blob = bytes(view[offset:offset + blob_bytes])
+        strings = bytes(view[offset + blob_bytes:offset + blob_bytes + string_bytes]).decode('utf-8')
+        root_name, *languages = strings.split('\0')
+        return cls(root_name, *arrays, blob, languages)
+
+    def save(self, path: str):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.to_bytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'FileTree':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+def file_tree_for_commit(store, repo_id: str, commit: str) -> Optional[FileTree]:
+    """Load the packed tree of an analyzed commit, building it from the manifest if missing"""
+    path = store.artifact_path(repo_id, commit, 'tree.bin')
+    if os.path.exists(path):
+        return FileTree.load(path)
+
+    manifest = store.load(repo_id, commit)
+    if manifest is None:
+        return None
+    tree = FileTree.build(
+        ((file_path, record['size'], record['language']) for file_path, record in manifest['files'].items()),
+        root_name=repo_id,
+    )
+    tree.save(path)
+    return tree
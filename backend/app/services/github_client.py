@@ -0,0 +1,247 @@
+"""
+Async GitHub REST client with conditional requests and rate-limit pacing
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import re
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.lazy import lazy_import
+
+httpx = lazy_import('httpx')
+
+LINK_LAST = re.compile(r'<([^>]+)>;\s*rel="last"')
+PAGE_PARAM = re.compile(r'[?&]page=(\d+)')
+
+
+class GitHubAPIError(Exception):
+    """GitHub answered with an error status"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f'GitHub API error {status_code}: {message}')
+        self.status_code = status_code
+
+
+class GitHubRateLimited(GitHubAPIError):
+    """The rate limit is exhausted for longer than the client is willing to wait"""
+
+    def __init__(self, reset_at: float):
+        super().__init__(403, f'rate limit exceeded until {time.strftime("%H:%M:%S", time.gmtime(reset_at))} UTC')
+        self.reset_at = reset_at
+
+
+class RateLimiter:
+    """
+    Paces requests for one token from the X-RateLimit-* headers.
+
+    Once `remaining` falls to `reserve`, new requests wait for the window
+    to reset instead of spending the last calls, unless that means waiting
+    longer than `max_wait` seconds. Concurrent requests are bounded by
+    `concurrency`.
+    """
+
+    def __init__(self, concurrency: int = 8, reserve: int = 10, max_wait: float = 60.0):
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self._slots = asyncio.Semaphore(concurrency)
+
+    async def __aenter__(self):
+        await self._slots.acquire()
+        try:
+            await self.wait()
+        except BaseException:
+            self._slots.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        self._slots.release()
+
+    async def wait(self):
+        while self.remaining is not None and self.remaining <= self.reserve:
+            delay = self.reset_at - time.time()
+            if delay <= 0:
+                self.remaining = None
+                break
+            if delay > self.max_wait:
+                raise GitHubRateLimited(self.reset_at)
+            await asyncio.sleep(delay)
+
+    def update(self, headers: httpx.Headers):
+        remaining = headers.get('x-ratelimit-remaining')
+        reset = headers.get('x-ratelimit-reset')
+        if remaining is not None and remaining.isdigit():
+            self.remaining = int(remaining)
+        if reset is not None and reset.isdigit():
+            self.reset_at = float(reset)
+
+    def backoff(self, headers: httpx.Headers) -> float:
+        """Seconds to wait before retrying a throttled (403/429) response"""
+        retry_after = headers.get('retry-after')
+        if retry_after is not None and retry_after.isdigit():
+            delay = float(retry_after)
+            self.remaining, self.reset_at = 0, time.time() + delay
+        else:
+            self.update(headers)
+            delay = max(self.reset_at - time.time(), 1.0)
+        if delay > self.max_wait:
+            raise GitHubRateLimited(time.time() + delay)
+        return delay
+
+
+class GitHubClient:
+    """
+    Thin async wrapper over the GitHub REST API for one access token.
+
+    Every GET is conditional: responses are cached with their ETag and
+    revalidated with If-None-Match, and a 304 (which GitHub does not count
+    against the rate limit) is answered from the cache. Paginated
+    listings read the last page number from the first response's Link
+    header and fetch the remaining pages concurrently.
+    """
+
+    PER_PAGE = 100
+
+    def __init__(self, access_token: Optional[str], http: httpx.AsyncClient,
+                 cache: Optional[LRUCache] = None, limiter: Optional[RateLimiter] = None,
+                 base_url: str = 'https://api.github.com', max_retries: int = 2):
+        self.access_token = access_token
+        self.http = http
+        self.cache = cache
+        self.limiter = limiter or RateLimiter()
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self._cache_prefix = 'gh:' + hashlib.sha1((access_token or '').encode('utf-8')).hexdigest()[:16] + ':'
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {
+            'Accept': 'application/vnd.github+json',
+            'X-GitHub-Api-Version': '2022-11-28',
+        }
+        if self.access_token:
+            headers['Authorization'] = f'Bearer {self.access_token}'
+        return headers
+
+    async def request(self, path: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Any, httpx.Headers]:
+        """GET `path` and return the decoded body with the response headers"""
+        url = path if path.startswith('http') else f'{self.base_url}{path}'
+        request = self.http.build_request('GET', url, params=params, headers=self._headers())
+        cache_key = self._cache_prefix + str(request.url)
+        cached = self.cache.get(cache_key) if self.cache is not None else None
+        if cached is not None:
+            cached = json.loads(cached)
+            request.headers['If-None-Match'] = cached['etag']
+
+        for attempt in range(self.max_retries + 1):
+            async with self.limiter:
+                response = await self.http.send(request)
+            self.limiter.update(response.headers)
+
+            if response.status_code == 304 and cached is not None:
+                return cached['body'], httpx.Headers(cached['headers'])
+            if response.status_code in (403, 429) and attempt < self.max_retries and (
+                response.headers.get('retry-after') or response.headers.get('x-ratelimit-remaining') == '0'
+            ):
+                await asyncio.sleep(self.limiter.backoff(response.headers))
+                continue
+            break
+
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('message', response.text)
+            except ValueError:
+                message = response.text
+            raise GitHubAPIError(response.status_code, message)
+
+        body = response.json()
+        etag = response.headers.get('etag')
+        if self.cache is not None and etag:
+            link = response.headers.get('link')
+            self.cache.set(cache_key, json.dumps({
+                'etag': etag,
+                'body': body,
+                'headers': {'link': link} if link else {},
+            }).encode('utf-8'))
+        return body, response.headers
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        body, _ = await self.request(path, params)
+        return body
+
+    async def paginate(self, path: str, params: Optional[Dict[str, Any]] = None,
+                       limit: Optional[int] = None) -> List[Any]:
+        """Up to `limit` items of a paginated listing"""
+        per_page = min(self.PER_PAGE, limit) if limit else self.PER_PAGE
+        params = {**(params or {}), 'per_page': per_page}
+        first, headers = await self.request(path, {**params, 'page': 1})
+        items = list(first)
+
+        last_page = 1
+        match = LINK_LAST.search(headers.get('link') or '')
+        if match:
+            page = PAGE_PARAM.search(match.group(1))
+            last_page = int(page.group(1)) if page else 1
+        if limit:
+            last_page = min(last_page, math.ceil(limit / per_page))
+
+        if last_page > 1:
+            pages = await asyncio.gather(*(
+                self.request(path, {**params, 'page': page}) for page in range(2, last_page + 1)
+            ))
+            for body, _ in pages:
+                items.extend(body)
+        return items[:limit] if limit else items
+
+
+@lru_cache()
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide connection pool for GitHub API calls"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.GITHUB_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=settings.GITHUB_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.GITHUB_MAX_CONNECTIONS,
+        ),
+    )
+
+
+@lru_cache()
+def get_response_cache() -> LRUCache:
+    """ETag response cache shared by every token"""
+    return LRUCache(settings.GITHUB_CACHE_MAX_BYTES)
+
+
+@lru_cache(maxsize=1024)
+def get_rate_limiter(access_token: Optional[str]) -> RateLimiter:
+    """Rate limits are per token, so limiters are shared per token"""
+    return RateLimiter(
+        concurrency=settings.GITHUB_CONCURRENCY,
+        reserve=settings.GITHUB_RATE_LIMIT_RESERVE,
+        max_wait=settings.GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS,
+    )
+
+
+def get_github_client(access_token: Optional[str]) -> GitHubClient:
+    return GitHubClient(
+        access_token,
+        get_http_client(),
+        cache=get_response_cache(),
+        limiter=get_rate_limiter(access_token),
+        base_url=settings.GITHUB_API_URL,
+    )
+
+
+async def close_http_client():
+    if get_http_client.cache_info().currsize:
+        await get_http_client().aclose()
+        get_http_client.cache_clear()
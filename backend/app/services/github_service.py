@@ -1,73 +1,71 @@
 """
 GitHub service for repository operations
 """
-from github import Github
-from app.core.config import settings
-import os
-import tempfile
-from git import Repo
+from typing import Optional
+from app.services.clone_manager import Checkout, CloneError, RepoTooLarge, get_clone_manager
+from app.services.github_client import GitHubClient, get_github_client
+import asyncio
 
 class GitHubService:
     """Service for interacting with GitHub API and repositories"""
     
-    def __init__(self, access_token: str):
-        self.github = Github(access_token)
+    def __init__(self, access_token: str, client: Optional[GitHubClient] = None):
         self.access_token = access_token
+        self._client = client
+    
+    @property
+    def client(self) -> GitHubClient:
+        # Built on first use: clone-only callers never touch the API
+        if self._client is None:
+            self._client = get_github_client(self.access_token)
+        return self._client
     
     async def get_user_repos(self, limit: int = 50):
         """Fetch user's repositories"""
-        user = self.github.get_user()
-        repos = user.get_repos()[:limit]
+        repos = await self.client.paginate("/user/repos", {"sort": "updated"}, limit=limit)
         
         return [
             {
-                "id": str(repo.id),
-                "name": repo.name,
-                "full_name": repo.full_name,
-                "description": repo.description,
-                "url": repo.html_url,
-                "language": repo.language,
-                "stars": repo.stargazers_count,
+                "id": str(repo["id"]),
+                "name": repo["name"],
+                "full_name": repo["full_name"],
+                "description": repo["description"],
+                "url": repo["html_url"],
+                "language": repo["language"],
+                "stars": repo["stargazers_count"],
             }
             for repo in repos
         ]
     
-    async def clone_repository(self, repo_url: str, branch: str = "main") -> str:
+    async def clone_repository(self, repo_url: str, branch: str = "main") -> Checkout:
         """
-        Clone a repository to temporary directory
+        Check out a repository from the shared clone cache
         
-        Returns: Path to cloned repository
+        Returns: Leased checkout; pass it to CloneManager.release when done
         """
-        temp_dir = tempfile.mkdtemp(prefix="codebase_")
-        
-        # Add authentication to URL if needed
-        if "github.com" in repo_url and self.access_token:
-            repo_url = repo_url.replace(
-                "https://github.com",
-                f"https://{self.access_token}@github.com"
-            )
-        
+        return await asyncio.to_thread(self.clone_repository_sync, repo_url, branch)
+    
+    def clone_repository_sync(self, repo_url: str, branch: str = "main") -> Checkout:
+        """Blocking clone for worker threads; see clone_repository"""
         try:
-            Repo.clone_from(repo_url, temp_dir, branch=branch, depth=1)
-            return temp_dir
-        except Exception as e:
-            # Cleanup on failure
-            if os.path.exists(temp_dir):
-                import shutil
-                shutil.rmtree(temp_dir)
+            return get_clone_manager().checkout(repo_url, branch, self.access_token)
+        except RepoTooLarge:
+            raise
+        except CloneError as e:
             raise Exception(f"Failed to clone repository: {str(e)}")
     
-    def get_repo_metadata(self, full_name: str):
+    async def get_repo_metadata(self, full_name: str):
         """Get repository metadata from GitHub"""
-        repo = self.github.get_repo(full_name)
+        # The repository payload already carries topics; no second request
+        repo = await self.client.get(f"/repos/{full_name}")
         
         return {
-            "name": repo.name,
-            "description": repo.description,
-            "language": repo.language,
-            "stars": repo.stargazers_count,
-            "forks": repo.forks_count,
-            "open_issues": repo.open_issues_count,
-            "default_branch": repo.default_branch,
-            "topics": repo.get_topics(),
+            "name": repo["name"],
+            "description": repo["description"],
+            "language": repo["language"],
+            "stars": repo["stargazers_count"],
+            "forks": repo["forks_count"],
+            "open_issues": repo["open_issues_count"],
+            "default_branch": repo["default_branch"],
+            "topics": repo.get("topics", []),
         }
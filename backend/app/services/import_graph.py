@@ -0,0 +1,763 @@
+"""
+Import-graph extraction, resolution and compact storage
+"""
+from __future__ import annotations
+
+import json
+import os
+import posixpath
+import re
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from app.core.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+MAX_SOURCE_BYTES = 1024 * 1024
+# Bump when extraction output changes; results stored per blob are keyed by it
+IMPORTS_VERSION = 1
+
+# Import syntax per language. Each extractor returns (specs, declared package);
+# specs are raw strings interpreted by ImportResolver for the same language.
+PY_FROM = re.compile(r'^[ \t]*from[ \t]+([.\w]+)[ \t]+import[ \t]+(\([^)]*\)|[^\n#;]+)', re.M)
+PY_IMPORT = re.compile(r'^[ \t]*import[ \t]+([\w. \t,]+)', re.M)
+JS_IMPORT = re.compile(
+    r'''(?:^|[^\w$.])(?:import|export)\b[^'";]*?\bfrom[ \t]*['"]([^'"\n]+)['"]'''
+    r'''|(?:^|[^\w$.])import[ \t]*\(?[ \t]*['"]([^'"\n]+)['"]'''
+    r'''|(?:^|[^\w$.])require[ \t]*\([ \t]*['"]([^'"\n]+)['"][ \t]*\)''',
+    re.M,
+)
+JAVA_PACKAGE = re.compile(r'^[ \t]*package[ \t]+([\w.]+)[ \t]*;', re.M)
+JAVA_IMPORT = re.compile(r'^[ \t]*import[ \t]+(?:static[ \t]+)?([\w.]+(?:\.\*)?)[ \t]*;', re.M)
+GO_IMPORT_BLOCK = re.compile(r'^import[ \t]*\(([^)]*)\)', re.M)
+GO_IMPORT_LINE = re.compile(r'^import[ \t]+(?:[\w.]+[ \t]+)?"([^"]+)"', re.M)
+GO_QUOTED = re.compile(r'"([^"]+)"')
+RUST_MOD = re.compile(r'^[ \t]*(?:pub(?:\([^)]*\))?[ \t]+)?mod[ \t]+(\w+)[ \t]*;', re.M)
+RUST_USE = re.compile(r'^[ \t]*(?:pub(?:\([^)]*\))?[ \t]+)?use[ \t]+((?:crate|self|super)(?:::\w+)+)', re.M)
+RUBY_REQUIRE = re.compile(r'''^[ \t]*(require_relative|require|load)[ \t(]*['"]([^'"]+)['"]''', re.M)
+PHP_NAMESPACE = re.compile(r'^[ \t]*namespace[ \t]+([\w\\]+)[ \t]*[;{]', re.M)
+PHP_USE = re.compile(r'^[ \t]*use[ \t]+(?:function[ \t]+|const[ \t]+)?([\w\\]+)', re.M)
+PHP_INCLUDE = re.compile(r'''\b(?:require|include)(?:_once)?\b[^;'"]*['"]([^'"]+\.php)['"]''')
+C_INCLUDE = re.compile(r'^[ \t]*#[ \t]*include[ \t]*"([^"]+)"', re.M)
+CS_NAMESPACE = re.compile(r'^[ \t]*namespace[ \t]+([\w.]+)', re.M)
+CS_USING = re.compile(r'^[ \t]*using[ \t]+(?:static[ \t]+)?([\w.]+)[ \t]*;', re.M)
+
+
+def _python_imports(source: str) -> Tuple[List[str], Optional[str]]:
+    specs = []
+    for module, names in PY_FROM.findall(source):
+        for name in names.strip('()').replace('\n', ' ').split(','):
+            name = name.strip().split(' ')[0]
+            if name and name != '*':
+                specs.append(f'{module}:{name}')
+            elif name == '*':
+                specs.append(module)
+    for modules in PY_IMPORT.findall(source):
+        for module in modules.split(','):
+            module = module.strip().split(' ')[0]
+            if module:
+                specs.append(module)
+    return specs, None
+
+
+def _js_imports(source: str) -> Tuple[List[str], Optional[str]]:
+    return [a or b or c for a, b, c in JS_IMPORT.findall(source)], None
+
+
+def _java_imports(source: str) -> Tuple[List[str], Optional[str]]:
+    package = JAVA_PACKAGE.search(source)
+    return JAVA_IMPORT.findall(source), package.group(1) if package else None
+
+
+def _go_imports(source: str) -> Tuple[List[str], Optional[str]]:
+    specs = GO_IMPORT_LINE.findall(source)
+    for block in GO_IMPORT_BLOCK.findall(source):
+        specs.extend(GO_QUOTED.findall(block))
+    return specs, None
+
+
+def _rust_imports(source: str) -> Tuple[List[str], Optional[str]]:
+    return [f'mod:{name}' for name in RUST_MOD.findall(source)] + RUST_USE.findall(source), None
+
+
+def _ruby_imports(source: str) -> Tuple[List[str], Optional[str]]:
+    return [f'{kind}:{target}' for kind, target in RUBY_REQUIRE.findall(source)], None
+
+
+def _php_imports(source: str) -> Tuple[List[str], Optional[str]]:
+    namespace = PHP_NAMESPACE.search(source)
+    specs = [f'use:{name}' for name in PHP_USE.findall(source)]
+    specs.extend(f'file:{target}' for target in PHP_INCLUDE.findall(source))
+    return specs, namespace.group(1) if namespace else None
+
+
+def _c_imports(source: str) -> Tuple[List[str], Optional[str]]:
+    return C_INCLUDE.findall(source), None
+
+
+def _csharp_imports(source: str) -> Tuple[List[str], Optional[str]]:
+    namespace = CS_NAMESPACE.search(source)
+    return CS_USING.findall(source), namespace.group(1) if namespace else None
+
+
+EXTRACTORS = {
+    'python': _python_imports,
+    'javascript': _js_imports,
+    'typescript': _js_imports,
+    'java': _java_imports,
+    'go': _go_imports,
+    'rust': _rust_imports,
+    'ruby': _ruby_imports,
+    'php': _php_imports,
+    'c': _c_imports,
+    'cpp': _c_imports,
+    'csharp': _csharp_imports,
+}
+
+
+def extract_imports(path: str, language: str) -> Dict:
+    """Raw import specs and declared package of one source file"""
+    extractor = EXTRACTORS.get(language)
+    if extractor is None:
+        return {'imports': [], 'package': None}
+    with open(path, 'rb') as f:
+        source = f.read(MAX_SOURCE_BYTES).decode('utf-8', errors='replace')
+    specs, package = extractor(source)
+    return {'imports': list(dict.fromkeys(specs)), 'package': package}
+
+
+def _extract_batch(args: Tuple[str, List[Tuple[str, str]]]) -> List[Tuple[str, Dict]]:
+    """Worker entry point: extract imports for a batch of (relative path, language)"""
+    repo_path, files = args
+    results = []
+    for rel_path, language in files:
+        try:
+            results.append((rel_path, extract_imports(os.path.join(repo_path, rel_path), language)))
+        except OSError:
+            results.append((rel_path, {'imports': [], 'package': None}))
+    return results
+
+
+def extract_repository(repo_path: str, files: Sequence[Tuple[str, str]], max_workers: Optional[int] = None,
+                       batch_files: int = 500, min_parallel_files: int = 2000) -> Dict[str, Dict]:
+    """
+    Extract imports for (relative path, language) pairs.
+
+    Runs on a process pool for large repositories; small inputs run inline
+    since pool start-up would dominate.
+    """
+    batches = [(repo_path, list(files[i:i + batch_files])) for i in range(0, len(files), batch_files)]
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers <= 1 or len(files) < min_parallel_files:
+        return dict(record for batch in batches for record in _extract_batch(batch))
+
+    extracted: Dict[str, Dict] = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for results in pool.map(_extract_batch, batches):
+            extracted.update(results)
+    return extracted
+
+
+def _strip_json_comments(text: str) -> str:
+    return re.sub(r'^\s*//.*$|/\*.*?\*/', '', text, flags=re.M | re.S)
+
+
+class ImportResolver:
+    """
+    Maps raw import specs to repo-relative file paths.
+
+    Only imports that land inside the repository become edges; standard
+    library and third-party packages resolve to nothing. Where a name is
+    ambiguous (e.g. the same Python module under two source roots) the
+    candidate sharing the longest directory prefix with the importer wins.
+
+    Python modules are named relative to source roots only: the repository
+    root, the directory above each top-level package, `src/` directories
+    and project directories (pyproject.toml, setup.py, setup.cfg). A file
+    at app/core/logging.py is `app.core.logging`, never `logging`.
+    """
+
+    JS_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx', '.mjs', '.cjs', '.d.ts')
+    PYTHON_PROJECT_FILES = ('pyproject.toml', 'setup.py', 'setup.cfg')
+
+    def __init__(self, repo_path: str, paths: Iterable[str], extracted: Dict[str, Dict]):
+        self.repo_path = repo_path
+        self.paths = set(paths)
+        self.by_name: Dict[str, List[str]] = {}
+        self.dir_files: Dict[str, List[str]] = {}
+        self.python_modules: Dict[str, List[str]] = {}
+        self.packages: Dict[str, List[str]] = {}
+        self.qualified: Dict[str, List[str]] = {}
+
+        self.python_packages = {
+            path.rpartition('/')[0] for path in self.paths if path.endswith('/__init__.py')
+        }
+        self.python_roots = self._python_roots()
+        for path in sorted(self.paths):
+            directory, _, name = path.rpartition('/')
+            self.by_name.setdefault(name, []).append(path)
+            self.dir_files.setdefault(directory, []).append(path)
+            if name.endswith('.py'):
+                parts = path[:-3].split('/')
+                if parts[-1] == '__init__':
+                    parts = parts[:-1]
+                for i in range(len(parts)):
+                    if '/'.join(parts[:i]) in self.python_roots:
+                        self.python_modules.setdefault('.'.join(parts[i:]), []).append(path)
+
+        for path, record in extracted.items():
+            package = record.get('package')
+            if not package:
+                continue
+            self.packages.setdefault(package, []).append(path)
+            stem = posixpath.splitext(path.rpartition('/')[2])[0]
+            separator = '\\' if path.endswith('.php') else '.'
+            self.qualified.setdefault(f'{package}{separator}{stem}', []).append(path)
+
+        self.go_modules = self._go_modules()
+        self.js_aliases = self._js_aliases()
+
+    def _read(self, rel_path: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.repo_path, rel_path), 'r', encoding='utf-8', errors='replace') as f:
+                return f.read(MAX_SOURCE_BYTES)
+        except OSError:
+            return None
+
+    def _python_roots(self) -> Set[str]:
+        """Directories Python modules are importable from"""
+        roots = {''}
+        for package in self.python_packages:
+            # The directory above the outermost enclosing package
+            top = package
+            while '/' in top and top.rpartition('/')[0] in self.python_packages:
+                top = top.rpartition('/')[0]
+            roots.add(top.rpartition('/')[0] if '/' in top else '')
+        for path in self.paths:
+            directory, _, name = path.rpartition('/')
+            if name in self.PYTHON_PROJECT_FILES:
+                roots.add(directory)
+            parts = directory.split('/')
+            if 'src' in parts:
+                roots.add('/'.join(parts[:parts.index('src') + 1]))
+        return roots
+
+    def _go_modules(self) -> List[Tuple[str, str]]:
+        """(module path, directory) for every go.mod, longest module path first"""
+        modules = []
+        for path in self.by_name.get('go.mod', []):
+            source = self._read(path) or ''
+            match = re.search(r'^module[ \t]+(\S+)', source, re.M)
+            if match:
+                modules.append((match.group(1), path.rpartition('/')[0]))
+        return sorted(modules, key=lambda module: -len(module[0]))
+
+    def _js_aliases(self) -> List[Tuple[str, str, str]]:
+        """(config directory, alias prefix, target directory) from tsconfig/jsconfig `paths`"""
+        aliases = []
+        for name in ('tsconfig.json', 'jsconfig.json'):
+            for path in self.by_name.get(name, []):
+                try:
+                    config = json.loads(_strip_json_comments(self._read(path) or ''))
+                except ValueError:
+                    continue
+                options = config.get('compilerOptions') or {}
+                config_dir = path.rpartition('/')[0]
+                base = posixpath.normpath(posixpath.join(config_dir, options.get('baseUrl', '.')))
+                for alias, targets in (options.get('paths') or {}).items():
+                    if not targets or not alias.endswith('*') or not targets[0].endswith('*'):
+                        continue
+                    target = posixpath.normpath(posixpath.join(base, targets[0][:-1]))
+                    aliases.append((config_dir, alias[:-1], '' if target == '.' else target))
+        return sorted(aliases, key=lambda alias: (-len(alias[0]), -len(alias[1])))
+
+    @staticmethod
+    def _nearest(importer: str, candidates: Sequence[str]) -> Optional[str]:
+        if not candidates:
+            return None
+        if len(candidates) == 1:
+            return candidates[0]
+        parts = importer.split('/')
+
+        def shared(candidate: str) -> int:
+            count = 0
+            for a, b in zip(parts, candidate.split('/')):
+                if a != b:
+                    break
+                count += 1
+            return count
+
+        return max(candidates, key=lambda candidate: (shared(candidate), -len(candidate)))
+
+    def _first_existing(self, candidates: Iterable[str]) -> Optional[str]:
+        for candidate in candidates:
+            candidate = posixpath.normpath(candidate)
+            if candidate in self.paths:
+                return candidate
+        return None
+
+    def _by_suffix(self, importer: str, suffix: str) -> Optional[str]:
+        suffix = suffix.lstrip('/')
+        name = suffix.rpartition('/')[2]
+        return self._nearest(importer, [
+            path for path in self.by_name.get(name, [])
+            if path == suffix or path.endswith('/' + suffix)
+        ])
+
+    def resolve(self, importer: str, language: str, spec: str) -> List[str]:
+        resolver = getattr(self, f'_resolve_{language}', None)
+        if resolver is None:
+            return []
+        targets = resolver(importer, spec)
+        if isinstance(targets, str):
+            targets = [targets]
+        return [target for target in targets or [] if target != importer]
+
+    def _resolve_python(self, importer: str, spec: str):
+        module, _, name = spec.partition(':')
+        if module.startswith('.'):
+            level = len(module) - len(module.lstrip('.'))
+            base = importer.rpartition('/')[0]
+            for _ in range(level - 1):
+                base = base.rpartition('/')[0]
+            rest = module[level:].replace('.', '/')
+            base = posixpath.join(base, rest) if rest else base
+            candidates = []
+            if name:
+                candidates += [posixpath.join(base, name) + '.py', posixpath.join(base, name, '__init__.py')]
+            candidates += [base + '.py', posixpath.join(base, '__init__.py')]
+            return self._first_existing(c.lstrip('/') for c in candidates)
+
+        dotted_names = ([f'{module}.{name}'] if name else []) + [module]
+        directory = importer.rpartition('/')[0]
+        if directory not in self.python_packages:
+            # A script's own directory comes first on its import path
+            for dotted in dotted_names:
+                base = posixpath.join(directory, dotted.replace('.', '/'))
+                target = self._first_existing([base + '.py', posixpath.join(base, '__init__.py')])
+                if target:
+                    return target
+        for dotted in dotted_names:
+            target = self._nearest(importer, self.python_modules.get(dotted, []))
+            if target:
+                return target
+        return None
+
+    def _resolve_js(self, importer: str, spec: str):
+        spec = spec.split('?')[0]
+        if spec.startswith('.'):
+            base = posixpath.join(importer.rpartition('/')[0], spec)
+        else:
+            base = None
+            for config_dir, prefix, target in self.js_aliases:
+                inside = not config_dir or importer.startswith(config_dir + '/')
+                if inside and spec.startswith(prefix):
+                    base = posixpath.join(target, spec[len(prefix):])
+                    break
+            if base is None:
+                return None
+        candidates = [base]
+        candidates += [base + ext for ext in self.JS_EXTENSIONS]
+        candidates += [posixpath.join(base, 'index' + ext) for ext in self.JS_EXTENSIONS]
+        return self._first_existing(candidates)
+
+    _resolve_javascript = _resolve_js
+    _resolve_typescript = _resolve_js
+
+    def _resolve_java(self, importer: str, spec: str):
+        if spec.endswith('.*'):
+            return self.packages.get(spec[:-2], [])
+        # Static imports name a member; walk up until a class matches
+        name = spec
+        while '.' in name:
+            found = self.qualified.get(name)
+            if found:
+                return self._nearest(importer, found)
+            name = name.rpartition('.')[0]
+        return self._by_suffix(importer, spec.replace('.', '/') + '.java')
+
+    def _resolve_go(self, importer: str, spec: str):
+        for module, directory in self.go_modules:
+            if spec == module or spec.startswith(module + '/'):
+                package_dir = posixpath.normpath(posixpath.join(directory, spec[len(module):].lstrip('/')))
+                package_dir = '' if package_dir == '.' else package_dir
+                return [
+                    path for path in self.dir_files.get(package_dir, [])
+                    if path.endswith('.go') and not path.endswith('_test.go')
+                ]
+        return None
+
+    def _resolve_rust(self, importer: str, spec: str):
+        directory, _, name = importer.rpartition('/')
+        stem = name[:-3] if name.endswith('.rs') else name
+        module_dir = directory if stem in ('mod', 'lib', 'main') else posixpath.join(directory, stem)
+
+        if spec.startswith('mod:'):
+            child = posixpath.join(module_dir, spec[4:])
+            return self._first_existing([child + '.rs', posixpath.join(child, 'mod.rs')])
+
+        parts = spec.split('::')
+        head, parts = parts[0], parts[1:]
+        if head == 'crate':
+            base = directory
+            while base and not ({f'{base}/lib.rs', f'{base}/main.rs'} & self.paths):
+                base = base.rpartition('/')[0]
+            if not base and not ({'lib.rs', 'main.rs'} & self.paths):
+                return None
+        elif head == 'super':
+            base = module_dir.rpartition('/')[0]
+            while parts and parts[0] == 'super':
+                base = base.rpartition('/')[0]
+                parts = parts[1:]
+        else:
+            base = module_dir
+
+        # Longest module path first: `use crate::a::b::Item` may name an item
+        for end in range(len(parts), 0, -1):
+            module = posixpath.join(base, *parts[:end])
+            target = self._first_existing([module + '.rs', posixpath.join(module, 'mod.rs')])
+            if target:
+                return target
+        return None
+
+    def _resolve_ruby(self, importer: str, spec: str):
+        kind, _, target = spec.partition(':')
+        if not target.endswith('.rb'):
+            target += '.rb'
+        if kind == 'require_relative':
+            return self._first_existing([posixpath.join(importer.rpartition('/')[0], target)])
+        return (
+            self._first_existing([posixpath.join('lib', target), target])
+            or self._by_suffix(importer, posixpath.join('lib', target))
+        )
+
+    def _resolve_php(self, importer: str, spec: str):
+        kind, _, target = spec.partition(':')
+        if kind == 'file':
+            target = target.lstrip('/')
+            return (
+                self._first_existing([posixpath.join(importer.rpartition('/')[0], target), target])
+                or self._by_suffix(importer, target)
+            )
+        found = self.qualified.get(target)
+        if found:
+            return self._nearest(importer, found)
+        # PSR-4 style guess: the namespace tail mirrors the directory layout
+        parts = target.split('\\')
+        return self._by_suffix(importer, '/'.join(parts[-2:]) + '.php')
+
+    def _resolve_c(self, importer: str, spec: str):
+        return (
+            self._first_existing([posixpath.join(importer.rpartition('/')[0], spec), spec])
+            or self._by_suffix(importer, spec)
+        )
+
+    _resolve_cpp = _resolve_c
+
+    def _resolve_csharp(self, importer: str, spec: str):
+        return self.packages.get(spec, [])
+
+
+def _csr(sources: np.ndarray, targets: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Compressed sparse rows: offsets[n + 1] and targets sorted by source"""
+    order = np.lexsort((targets, sources))
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+    return offsets, targets[order].astype(np.int32)
+
+
+def strongly_connected_components(offsets: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Component id per node (iterative Tarjan, so deep graphs cannot overflow the stack)"""
+    n = len(offsets) - 1
+    offsets = offsets.tolist()
+    targets = targets.tolist()
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    component = [-1] * n
+    stack: List[int] = []
+    counter = 0
+    components = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, offsets[root])]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            node, edge = work[-1]
+            if edge < offsets[node + 1]:
+                work[-1] = (node, edge + 1)
+                child = targets[edge]
+                if index[child] == -1:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack[child] = True
+                    work.append((child, offsets[child]))
+                elif on_stack[child] and index[child] < low[node]:
+                    low[node] = index[child]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[node] < low[parent]:
+                    low[parent] = low[node]
+            if low[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component[member] = components
+                    if member == node:
+                        break
+                components += 1
+
+    return np.asarray(component, dtype=np.int32)
+
+
+class ImportGraph:
+    """
+    File-level import graph in CSR form, with precomputed rollups.
+
+    Forward and reverse adjacency are flat offset/target arrays, so fan-in,
+    fan-out and direct dependents are slice lookups. Strongly connected
+    components (import cycles) and a directory-level module graph with
+    edge weights are computed once at build time and stored alongside.
+    Arrays are saved as .npy files and memory-mapped on open.
+    """
+
+    ARRAYS = (
+        'out_offsets', 'out_targets', 'in_offsets', 'in_targets', 'component', 'module',
+        'flow_sources', 'flow_targets', 'flow_weights', 'hubs',
+    )
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, 'graph.json'), 'r') as f:
+            meta = json.load(f)
+        self.nodes: List[str] = meta['nodes']
+        self.modules: List[str] = meta['modules']
+        self.cycles: List[List[int]] = meta['cycles']
+        self.node_ids = {path: i for i, path in enumerate(self.nodes)}
+        for name in self.ARRAYS:
+            setattr(self, name, np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r'))
+        self._cycle_of = {int(self.component[members[0]]): i for i, members in enumerate(self.cycles)}
+
+    @classmethod
+    def build(cls, directory: str, edges: Iterable[Tuple[str, str]], nodes: Iterable[str] = ()) -> 'ImportGraph':
+        """Build from (importer, imported) path pairs and write to `directory`"""
+        edge_list = list(dict.fromkeys(edges))
+        names = sorted(set(nodes) | {path for edge in edge_list for path in edge})
+        ids = {path: i for i, path in enumerate(names)}
+        n = len(names)
+        sources = np.fromiter((ids[a] for a, _ in edge_list), dtype=np.int64, count=len(edge_list))
+        targets = np.fromiter((ids[b] for _, b in edge_list), dtype=np.int64, count=len(edge_list))
+
+        out_offsets, out_targets = _csr(sources, targets, n)
+        in_offsets, in_targets = _csr(targets, sources, n)
+        component = strongly_connected_components(out_offsets, out_targets)
+
+        members: Dict[int, List[int]] = {}
+        sizes = np.bincount(component, minlength=int(component.max()) + 1 if n else 0)
+        for node in np.flatnonzero(sizes[component] > 1).tolist():
+            members.setdefault(int(component[node]), []).append(node)
+        cycles = sorted(members.values(), key=len, reverse=True)
+
+        module_names = sorted({path.rpartition('/')[0] for path in names})
+        module_ids = {name: i for i, name in enumerate(module_names)}
+        module = np.fromiter((module_ids[path.rpartition('/')[0]] for path in names), dtype=np.int32, count=n)
+        m = len(module_names)
+        if len(sources):
+            module_sources = module[sources].astype(np.int64)
+            module_targets = module[targets].astype(np.int64)
+            cross = module_sources != module_targets
+            keys, weights = np.unique(module_sources[cross] * m + module_targets[cross], return_counts=True)
+            order = np.argsort(-weights, kind='stable')
+            flow_sources = (keys[order] // m).astype(np.int32)
+            flow_targets = (keys[order] % m).astype(np.int32)
+            flow_weights = weights[order].astype(np.int32)
+        else:
+            flow_sources = flow_targets = flow_weights = np.zeros(0, dtype=np.int32)
+
+        fan_in = np.diff(in_offsets)
+        hubs = np.argsort(-fan_in, kind='stable')[:1000].astype(np.int32)
+
+        tmp_dir = f'{directory}.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        arrays = {
+            'out_offsets': out_offsets, 'out_targets': out_targets,
+            'in_offsets': in_offsets, 'in_targets': in_targets,
+            'component': component, 'module': module,
+            'flow_sources': flow_sources, 'flow_targets': flow_targets, 'flow_weights': flow_weights,
+            'hubs': hubs,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), array)
+        with open(os.path.join(tmp_dir, 'graph.json'), 'w') as f:
+            json.dump({'nodes': names, 'modules': module_names, 'cycles': cycles}, f)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_dir, directory)
+        return cls(directory)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.out_targets)
+
+    def _paths(self, ids) -> List[str]:
+        return [self.nodes[i] for i in ids.tolist()]
+
+    def fan_out(self, path: str) -> int:
+        node = self.node_ids[path]
+        return int(self.out_offsets[node + 1] - self.out_offsets[node])
+
+    def fan_in(self, path: str) -> int:
+        node = self.node_ids[path]
+        return int(self.in_offsets[node + 1] - self.in_offsets[node])
+
+    def imports(self, path: str) -> List[str]:
+        """Files `path` imports directly"""
+        node = self.node_ids[path]
+        return self._paths(self.out_targets[self.out_offsets[node]:self.out_offsets[node + 1]])
+
+    def dependents(self, path: str) -> List[str]:
+        """Files that import `path` directly"""
+        node = self.node_ids[path]
+        return self._paths(self.in_targets[self.in_offsets[node]:self.in_offsets[node + 1]])
+
+    def transitive_dependents(self, path: str, limit: int = 10000) -> List[str]:
+        """Everything that depends on `path` through any import chain, nearest first"""
+        start = self.node_ids[path]
+        seen = {start}
+        queue = deque([start])
+        found: List[int] = []
+        while queue and len(found) < limit:
+            node = queue.popleft()
+            for parent in self.in_targets[self.in_offsets[node]:self.in_offsets[node + 1]].tolist():
+                if parent not in seen:
+                    seen.add(parent)
+                    found.append(parent)
+                    queue.append(parent)
+        return [self.nodes[i] for i in found[:limit]]
+
+    def cycle_size(self, path: str) -> int:
+        """Number of files in the import cycle containing `path` (0 when acyclic)"""
+        cycle = self._cycle_of.get(int(self.component[self.node_ids[path]]))
+        return 0 if cycle is None else len(self.cycles[cycle])
+
+    def cycle(self, path: str, limit: int = 1000) -> List[str]:
+        """Other files in the same import cycle as `path`, if any"""
+        node = self.node_ids[path]
+        cycle = self._cycle_of.get(int(self.component[node]))
+        if cycle is None:
+            return []
+        return [self.nodes[i] for i in self.cycles[cycle][:limit + 1] if i != node][:limit]
+
+    def module_flows(self, limit: int = 100) -> List[Dict]:
+        """Heaviest directory-to-directory import flows"""
+        return [
+            {
+                'from': self.modules[source] or '.',
+                'to': self.modules[target] or '.',
+                'type': 'import',
+                'weight': int(weight),
+            }
+            for source, target, weight in zip(
+                self.flow_sources[:limit].tolist(),
+                self.flow_targets[:limit].tolist(),
+                self.flow_weights[:limit].tolist(),
+            )
+        ]
+
+    def top_hubs(self, limit: int = 10) -> List[Dict]:
+        """Most-imported files"""
+        hubs = []
+        for node in self.hubs[:limit].tolist():
+            fan_in = int(self.in_offsets[node + 1] - self.in_offsets[node])
+            if not fan_in:
+                break
+            hubs.append({
+                'file': self.nodes[node],
+                'fan_in': fan_in,
+                'fan_out': int(self.out_offsets[node + 1] - self.out_offsets[node]),
+            })
+        return hubs
+
+
+def build_import_graph(repo_path: str, directory: str, files: Dict[str, Dict],
+                       previous: Optional[Dict[str, Dict]] = None,
+                       changed: Optional[Iterable[str]] = None,
+                       extract: Callable[[str, List[Tuple[str, str]]], Dict[str, Dict]] = extract_repository
+                       ) -> ImportGraph:
+    """
+    Extract, resolve and store the import graph for a manifest's files.
+
+    Raw extraction results are saved next to the graph; pass the previous
+    commit's (`load_extracted`) plus the changed paths to re-read only
+    changed files. Resolution always runs over the whole repository, since
+    an added file can change what other files' imports point at. `extract`
+    replaces `extract_repository`, e.g. with a sharded executor's.
+    """
+    changed = set(changed or ())
+    sources = [
+        (path, record['language']) for path, record in sorted(files.items())
+        if record.get('language') in EXTRACTORS
+    ]
+    extracted = {}
+    if previous is not None:
+        extracted = {
+            path: previous[path] for path, _ in sources
+            if path in previous and path not in changed
+        }
+    extracted.update(extract(repo_path, [source for source in sources if source[0] not in extracted]))
+
+    resolver = ImportResolver(repo_path, files, extracted)
+    edges = []
+    for path, language in sources:
+        for spec in extracted[path]['imports']:
+            for target in resolver.resolve(path, language, spec):
+                edges.append((path, target))
+
+    graph = ImportGraph.build(directory, edges, nodes=(path for path, _ in sources))
+    with open(os.path.join(directory, 'extracted.json'), 'w') as f:
+        json.dump(extracted, f)
+    return graph
+
+
+def load_extracted(directory: str) -> Optional[Dict[str, Dict]]:
+    try:
+        with open(os.path.join(directory, 'extracted.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def import_graph_for_commit(store, repo_id: str, commit: str) -> Optional[ImportGraph]:
+    directory = store.artifact_path(repo_id, commit, 'imports')
+    if not os.path.exists(os.path.join(directory, 'graph.json')):
+        return None
+    return ImportGraph(directory)
+
+
+_open_graphs: Dict[str, ImportGraph] = {}
+
+
+def open_import_graph(store, repo_id: str) -> Optional[ImportGraph]:
+    """Shared import graph for the repository's latest analyzed commit, or None if not built"""
+    commit = store.latest_commit(repo_id)
+    if commit is None:
+        return None
+    graph = _open_graphs.get(repo_id)
+    if graph is None or graph.directory != store.artifact_path(repo_id, commit, 'imports'):
+        graph = import_graph_for_commit(store, repo_id, commit)
+        if graph is None:
+            return None
+        _open_graphs[repo_id] = graph
+    return graph
@@ -0,0 +1,448 @@
+"""
+Incremental re-analysis driven by git diffs between commits
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.core.lazy import lazy_import
+from app.services.blob_store import BlobStore, manifest_blobs
+from app.services.code_parser import CodeParserService
+from app.services.dependency_engine import DependencyEngine, LockfileCache, save_dependency_graph
+from app.services.line_counter import LINES_VERSION
+from app.services.path_filter import CONTROL_FILES
+from app.services.repo_scanner import ScannedFile
+
+git = lazy_import('git')
+
+ANALYZER_VERSION = 3
+
+# Default IncrementalAnalyzer.analyze baseline: whatever LATEST points to
+LATEST = object()
+
+
+def check_repo_id(repo_id: str) -> str:
+    """Return `repo_id` if it can name a directory inside the store; raise ValueError otherwise"""
+    if '..' in repo_id or not repo_id.strip('.'):
+        raise ValueError(f'Invalid repository id: {repo_id!r}')
+    return repo_id
+
+
+class ManifestStore:
+    """
+    Stores one JSON manifest per analyzed commit:
+
+        {base_dir}/{repo_id}/{commit}.json
+        {base_dir}/{repo_id}/LATEST
+
+    With a `blob_store`, every stored manifest holds a reference to each
+    of its files' blobs until it is pruned.
+
+    Pruning never removes the LATEST manifest or one pinned as the
+    baseline of an analysis in progress (`pin_latest`/`unpin`).
+    """
+
+    def __init__(self, base_dir: str, keep: int = 5, blob_store: Optional[BlobStore] = None):
+        self.base_dir = base_dir
+        self.keep = keep
+        self.blob_store = blob_store
+        # (repo_dir, commit) -> analyses using it as their baseline
+        self._pins: Counter = Counter()
+        self._pin_lock = threading.Lock()
+
+    def repo_dir(self, repo_id: str) -> str:
+        """Directory holding a repository's manifests and artifacts"""
+        safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', repo_id)
+        # Dots survive the substitution; ".." would step out of base_dir
+        return os.path.join(self.base_dir, check_repo_id(safe_id))
+
+    def artifact_path(self, repo_id: str, commit: str, suffix: str) -> str:
+        """Path for a per-commit artifact stored next to its manifest"""
+        return os.path.join(self.repo_dir(repo_id), f'{commit}.{suffix}')
+
+    def load(self, repo_id: str, commit: str) -> Optional[Dict]:
+        """Load the manifest for a specific commit"""
+        path = os.path.join(self.repo_dir(repo_id), f'{commit}.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def latest_commit(self, repo_id: str) -> Optional[str]:
+        """Read the LATEST pointer without loading the manifest itself"""
+        pointer = os.path.join(self.repo_dir(repo_id), 'LATEST')
+        if not os.path.exists(pointer):
+            return None
+        with open(pointer, 'r') as f:
+            return f.read().strip()
+
+    def latest(self, repo_id: str) -> Optional[Dict]:
+        """Load the most recently saved manifest for a repository"""
+        commit = self.latest_commit(repo_id)
+        if commit is None:
+            return None
+        return self.load(repo_id, commit)
+
+    def pin_latest(self, repo_id: str) -> Optional[str]:
+        """Read the LATEST commit and keep its manifest and artifacts from being pruned until `unpin`"""
+        with self._pin_lock:
+            commit = self.latest_commit(repo_id)
+            if commit is not None:
+                self._pins[(self.repo_dir(repo_id), commit)] += 1
+            return commit
+
+    def unpin(self, repo_id: str, commit: str):
+        key = (self.repo_dir(repo_id), commit)
+        with self._pin_lock:
+            self._pins[key] -= 1
+            if self._pins[key] <= 0:
+                del self._pins[key]
+
+    def save(self, repo_id: str, manifest: Dict):
+        """Write a manifest atomically and move the LATEST pointer to it"""
+        repo_dir = self.repo_dir(repo_id)
+        os.makedirs(repo_dir, exist_ok=True)
+
+        path = os.path.join(repo_dir, f"{manifest['commit']}.json")
+        replaced = self.load(repo_id, manifest['commit']) if self.blob_store and os.path.exists(path) else None
+        if self.blob_store:
+            manifest['blob_refs'] = True
+        self._write_atomic(repo_dir, path, json.dumps(manifest))
+        if self.blob_store:
+            self.blob_store.retain(manifest_blobs(manifest))
+            self._release(replaced)
+
+        self._write_atomic(repo_dir, os.path.join(repo_dir, 'LATEST'), manifest['commit'])
+
+        self._prune(repo_dir)
+
+    @staticmethod
+    def _write_atomic(repo_dir: str, path: str, text: str):
+        # Unique temp names let concurrent saves of one repository proceed;
+        # the leading dot keeps them clear of `_prune`, which matches by commit
+        fd, tmp_path = tempfile.mkstemp(dir=repo_dir, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _release(self, manifest: Optional[Dict]):
+        # Manifests written without a blob store never took references
+        if manifest is not None and manifest.get('blob_refs'):
+            self.blob_store.release(manifest_blobs(manifest))
+
+    def _prune(self, repo_dir: str):
+        """Keep only the newest manifests, and their artifacts, per repository"""
+        with self._pin_lock:
+            manifests = sorted(
+                (entry for entry in os.scandir(repo_dir) if entry.name.endswith('.json')),
+                key=lambda entry: entry.stat().st_mtime,
+                reverse=True,
+            )
+            pointer = os.path.join(repo_dir, 'LATEST')
+            protected = {commit for directory, commit in self._pins if directory == repo_dir}
+            if os.path.exists(pointer):
+                with open(pointer, 'r') as f:
+                    protected.add(f.read().strip())
+            expired = [
+                entry for entry in manifests[self.keep:]
+                if entry.name.split('.', 1)[0] not in protected
+            ]
+            stale = {entry.name.split('.', 1)[0] for entry in expired}
+            if not stale:
+                return
+            if self.blob_store:
+                for entry in expired:
+                    with open(entry.path, 'r') as f:
+                        self._release(json.load(f))
+            for entry in os.scandir(repo_dir):
+                if entry.name.split('.', 1)[0] not in stale:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.remove(entry.path)
+
+
+class IncrementalAnalyzer:
+    """
+    Analyzes a checked-out commit, reusing the previous commit's manifest.
+
+    The first run scans everything. Later runs take the git diff between the
+    stored commit and the new one, recompute only added and modified files,
+    drop deleted ones, and rebuild structure, statistics, entry points and
+    dependencies from the patched manifest. Manifests and lockfiles are
+    looked up in `dependency_cache` by blob SHA, so only changed ones are
+    parsed again.
+
+    Changed paths go through the scanner's path filter. A change to the
+    filter settings or to any .gitignore or .gitattributes can re-include
+    unchanged files, so it forces a full scan, as does a patched manifest
+    over the repository size cap.
+    """
+
+    def __init__(self, repo_path: str, repo_id: str, store: ManifestStore,
+                 dependency_cache: Optional[LockfileCache] = None):
+        self.repo_path = repo_path
+        self.repo_id = repo_id
+        self.store = store
+        self.parser = CodeParserService(repo_path)
+        self.repo = git.Repo(repo_path)
+        self.path_filter = self.parser.path_filter()
+        self.dependencies = DependencyEngine(repo_path, self.parser.CONFIG_FILES, dependency_cache)
+        self._dependency_report: Optional[Dict] = None
+
+    def analyze(self, baseline: Optional[str] = LATEST) -> Dict:
+        """
+        Analyze HEAD, incrementally when a usable previous manifest exists.
+
+        `baseline` is the commit whose manifest to diff against: by default
+        the LATEST one, or None for a full analysis. Callers that go on to
+        read the baseline's artifacts pin it first (ManifestStore.pin_latest).
+        """
+        commit = self.repo.head.commit.hexsha
+        if baseline is LATEST:
+            previous = self.store.latest(self.repo_id)
+        else:
+            previous = self.store.load(self.repo_id, baseline) if baseline else None
+
+        if previous and not self._reusable(previous):
+            previous = None
+
+        if previous and previous['commit'] == commit:
+            result = self._result(previous, incremental=True, changes=self._empty_changes())
+            result['previous_commit'] = commit
+            return result
+
+        changes = None
+        if previous:
+            changes = self._diff(previous, commit)
+
+        manifest = None
+        if changes is not None:
+            manifest = self._patch_manifest(previous, commit, changes)
+            max_repo_bytes = self.path_filter.max_repo_bytes
+            if max_repo_bytes and sum(record['size'] for record in manifest['files'].values()) > max_repo_bytes:
+                manifest = None
+
+        incremental = manifest is not None
+        if manifest is None:
+            manifest = self._full_manifest(commit)
+            changes = {'added': sorted(manifest['files']), 'modified': [], 'deleted': []}
+
+        save_dependency_graph(self.store.artifact_path(self.repo_id, commit, 'dependencies'), self._dependency_report)
+        self.store.save(self.repo_id, manifest)
+        result = self._result(manifest, incremental=incremental, changes=changes)
+        result['previous_commit'] = previous['commit'] if incremental else None
+        return result
+
+    def _empty_changes(self) -> Dict[str, List[str]]:
+        return {'added': [], 'modified': [], 'deleted': []}
+
+    def _reusable(self, previous: Dict) -> bool:
+        """Whether a stored manifest was built by this analyzer under the same path filter"""
+        return (
+            previous['analyzer_version'] == ANALYZER_VERSION
+            and previous.get('path_filter') == self.path_filter.fingerprint
+            and not previous.get('truncated')
+        )
+
+    def _is_ignored(self, rel_path: str) -> bool:
+        return self.path_filter.exclude_path(rel_path) is not None
+
+    def _blob_shas(self, commit: str) -> Dict[str, str]:
+        """Map every tracked path at a commit to its blob SHA"""
+        output = self.repo.git.ls_tree('-r', '-z', '--full-tree', commit)
+        blobs = {}
+        for record in output.split('\0'):
+            if not record:
+                continue
+            meta, path = record.split('\t', 1)
+            _, obj_type, sha = meta.split()
+            if obj_type == 'blob':
+                blobs[path] = sha
+        return blobs
+
+    def _diff(self, previous: Dict, commit: str) -> Optional[Dict[str, List[str]]]:
+        """
+        Classify changed paths between the stored commit and `commit`.
+
+        Uses `git diff` when the old commit is reachable; shallow clones
+        usually lack it, so fall back to comparing blob SHAs against the
+        manifest. Returns None when neither is possible.
+        """
+        changes = self._empty_changes()
+        try:
+            output = self.repo.git.diff(
+                '--name-status', '-z', '--no-renames', previous['commit'], commit
+            )
+        except git.GitCommandError:
+            output = None
+
+        if output is not None:
+            fields = [field for field in output.split('\0') if field]
+            for status, path in zip(fields[::2], fields[1::2]):
+                if self._is_ignored(path):
+                    continue
+                if path.rpartition('/')[2] in CONTROL_FILES:
+                    return None
+                if status.startswith('A'):
+                    changes['added'].append(path)
+                elif status.startswith('D'):
+                    if path in previous['files']:
+                        changes['deleted'].append(path)
+                elif path in previous['files']:
+                    changes['modified'].append(path)
+                else:
+                    changes['added'].append(path)
+            return changes
+
+        if any(record.get('blob') is None for record in previous['files'].values()):
+            return None
+
+        blobs = {path: sha for path, sha in self._blob_shas(commit).items() if not self._is_ignored(path)}
+        for path, sha in blobs.items():
+            old = previous['files'].get(path)
+            if old is None:
+                changes['added'].append(path)
+            elif old['blob'] != sha:
+                changes['modified'].append(path)
+            else:
+                continue
+            if path.rpartition('/')[2] in CONTROL_FILES:
+                return None
+        changes['deleted'] = [path for path in previous['files'] if path not in blobs]
+        return changes
+
+    def _file_records(self, paths: List[Tuple[str, int]], blobs: Dict[str, str]) -> Dict[str, Dict]:
+        """
+        Compute per-file derived results for (relative path, size) pairs.
+
+        Line counts of blobs already in the store, from any repository,
+        are looked up instead of counted.
+        """
+        lines = self._line_counts(paths, blobs)
+        records = {}
+        for path, size in paths:
+            if path not in lines:
+                # Unreadable: it stays out of the manifest, as if it had vanished
+                continue
+            ext = os.path.splitext(path)[1]
+            records[path] = {
+                'blob': blobs.get(path),
+                'size': size,
+                'language': self.parser.SUPPORTED_EXTENSIONS.get(ext),
+                'lines': lines[path],
+            }
+        return records
+
+    def _line_counts(self, paths: List[Tuple[str, int]], blobs: Dict[str, str]) -> Dict[str, Optional[int]]:
+        store = self.store.blob_store
+        kind = f'lines/v{LINES_VERSION}'
+        cached = store.get_many(kind, sorted({blobs[path] for path, _ in paths if path in blobs})) if store else {}
+        lines = {path: cached[blobs[path]] for path, _ in paths if blobs.get(path) in cached}
+        missing = [(path, size) for path, size in paths if path not in lines]
+        counts = self.parser.line_counter.count([
+            (os.path.join(self.repo_path, path), size) for path, size in missing
+        ])
+        counted = {
+            path: counts[os.path.join(self.repo_path, path)]
+            for path, _ in missing if os.path.join(self.repo_path, path) in counts
+        }
+        if store:
+            store.put_many(kind, {blobs[path]: count for path, count in counted.items() if path in blobs})
+        lines.update(counted)
+        return lines
+
+    def _full_manifest(self, commit: str) -> Dict:
+        scan = self.parser.scan()
+        blobs = self._blob_shas(commit)
+        files = self._file_records([(f.path, f.size) for f in scan.files], blobs)
+        manifest = self._manifest(commit, files)
+        manifest['truncated'] = scan.truncated
+        return manifest
+
+    def _patch_manifest(self, previous: Dict, commit: str, changes: Dict[str, List[str]]) -> Dict:
+        files = dict(previous['files'])
+        for path in changes['deleted']:
+            files.pop(path, None)
+
+        touched = changes['added'] + changes['modified']
+        blobs = self._blob_shas(commit) if touched else {}
+        present = []
+        for path in touched:
+            try:
+                size = os.stat(os.path.join(self.repo_path, path)).st_size
+            except OSError:
+                files.pop(path, None)
+                continue
+            if self.path_filter.exclude_content(path, size):
+                # Now too large or minified: it leaves the manifest like a deletion
+                for kind in ('added', 'modified'):
+                    if path in changes[kind]:
+                        changes[kind].remove(path)
+                if files.pop(path, None) is not None:
+                    changes['deleted'].append(path)
+            else:
+                present.append((path, size))
+        files.update(self._file_records(present, blobs))
+        return self._manifest(commit, files)
+
+    def _manifest(self, commit: str, files: Dict[str, Dict]) -> Dict:
+        # Every manifest and lockfile, wherever it is; unchanged ones come from the cache
+        report = self.dependencies.analyze({path: record.get('blob') for path, record in files.items()})
+        self._dependency_report = report
+        return {
+            'repo_id': self.repo_id,
+            'commit': commit,
+            'analyzer_version': ANALYZER_VERSION,
+            'path_filter': self.path_filter.fingerprint,
+            'files': files,
+            'dependencies': report['dependencies'],
+            'dependency_errors': report['errors'],
+        }
+
+    def _result(self, manifest: Dict, incremental: bool, changes: Dict[str, List[str]]) -> Dict:
+        result = summarize_manifest(manifest, self.repo_path)
+        result['incremental'] = incremental
+        result['changes'] = changes
+        return result
+
+
+def summarize_manifest(manifest: Dict, repo_path: str = '.') -> Dict:
+    """Derive the file tree, statistics and entry points from a stored manifest"""
+    scanned = [
+        ScannedFile(path, path.rsplit('/', 1)[-1], os.path.splitext(path)[1], record['size'], record['language'])
+        for path, record in manifest['files'].items()
+    ]
+    parser = CodeParserService(repo_path)
+    scan = parser.scanner().from_files(scanned)
+    parser = CodeParserService(repo_path, scan=scan)
+
+    lines = [record['lines'] for record in manifest['files'].values()]
+    statistics = {
+        'total_files': len(scan.files),
+        'total_lines': sum(count for count in lines if count is not None),
+        'binary_files': sum(1 for count in lines if count is None),
+        'languages': dict(scan.languages),
+        'file_types': dict(scan.file_types),
+    }
+
+    return {
+        'repo_id': manifest['repo_id'],
+        'commit': manifest['commit'],
+        'tree': parser.file_tree(),
+        'statistics': statistics,
+        'entry_points': parser.identify_entry_points(),
+        'dependencies': manifest['dependencies'],
+        'dependency_errors': manifest.get('dependency_errors', []),
+    }
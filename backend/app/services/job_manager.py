@@ -0,0 +1,333 @@
+"""
+Background job engine for repository analysis
+"""
+import asyncio
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.metrics import span
+from app.models.job import AnalysisJob
+
+PENDING = 'pending'
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+SKIPPED = 'skipped'
+
+TERMINAL_STATES = {COMPLETED, FAILED, CANCELLED}
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job has been cancelled"""
+
+
+class JobQueueFull(Exception):
+    """Raised when the bounded job queue cannot accept more work"""
+
+
+class Job:
+    """In-memory state of one analysis job"""
+
+    def __init__(self, job_id: str, repo_id: str, repo_url: str, branch: str, stages: List[str]):
+        self.id = job_id
+        self.repo_id = repo_id
+        self.repo_url = repo_url
+        self.branch = branch
+        self.status = QUEUED
+        self.stages = {
+            name: {'status': PENDING, 'progress': 0.0, 'message': None}
+            for name in stages
+        }
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.cancel_event = threading.Event()
+
+    @property
+    def progress(self) -> float:
+        if not self.stages:
+            return 1.0
+        return sum(stage['progress'] for stage in self.stages.values()) / len(self.stages)
+
+    def snapshot(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'repo_id': self.repo_id,
+            'repo_url': self.repo_url,
+            'branch': self.branch,
+            'status': self.status,
+            'progress': round(self.progress, 4),
+            'stages': {name: dict(stage) for name, stage in self.stages.items()},
+            'error': self.error,
+        }
+
+
+class JobContext:
+    """Handle passed to pipeline stages for reporting and cancellation"""
+
+    def __init__(self, manager: 'JobManager', job: Job, stage: str, state: Dict[str, Any]):
+        self.manager = manager
+        self.job = job
+        self.stage = stage
+        self.state = state
+
+    def report(self, progress: float, message: Optional[str] = None):
+        """Record progress in [0, 1] for the current stage"""
+        self.check_cancelled()
+        stage = self.job.stages[self.stage]
+        stage['progress'] = max(0.0, min(1.0, progress))
+        if message is not None:
+            stage['message'] = message
+        self.manager._publish(self.job, persist=False)
+
+    def skip(self, message: str):
+        """Mark the current stage as intentionally not run"""
+        stage = self.job.stages[self.stage]
+        stage['status'] = SKIPPED
+        stage['progress'] = 1.0
+        stage['message'] = message
+
+    def check_cancelled(self):
+        if self.job.cancel_event.is_set():
+            raise JobCancelled()
+
+
+class JobManager:
+    """
+    Runs analysis pipelines on a bounded worker pool.
+
+    Jobs are persisted to the analysis_jobs table on every stage
+    transition, identical in-flight requests (same repo URL and branch)
+    share a job, and subscribers receive progress snapshots through
+    per-listener asyncio queues fed from the worker threads.
+    """
+
+    def __init__(self, pipeline, session_factory: Callable, max_workers: int = 2,
+                 max_queued: int = 100, persist_interval: float = 1.0):
+        self.pipeline = pipeline
+        self.session_factory = session_factory
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.persist_interval = persist_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis')
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[Tuple[str, str], str] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._last_persist: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._count(QUEUED)
+
+    @property
+    def running(self) -> int:
+        return self._count(RUNNING)
+
+    def _count(self, status: str) -> int:
+        # Worker threads add and drop jobs; iterate a copy taken under the
+        # lock (reentrant: submit checks queue_depth while holding it)
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sum(1 for job in jobs if job.status == status)
+
+    def recover(self):
+        """Mark jobs left unfinished by a previous process as failed"""
+        db = self.session_factory()
+        try:
+            stale = db.query(AnalysisJob).filter(AnalysisJob.status.in_([QUEUED, RUNNING]))
+            for row in stale:
+                row.status = FAILED
+                row.error = 'Interrupted by server restart'
+            db.commit()
+        finally:
+            db.close()
+
+    async def submit(self, repo_id: str, repo_url: str, branch: str) -> Job:
+        """Queue a job, or return the in-flight job for the same repo and branch"""
+        self._loop = asyncio.get_running_loop()
+        key = (repo_url, branch)
+        with self._lock:
+            active_id = self._active.get(key)
+            if active_id is not None:
+                return self._jobs[active_id]
+            if self.queue_depth >= self.max_queued:
+                raise JobQueueFull()
+
+            job = Job(uuid.uuid4().hex, repo_id, repo_url, branch, list(self.pipeline.STAGES))
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+
+        try:
+            await asyncio.to_thread(self._persist, job)
+        except BaseException:
+            # Never handed to the executor: forget it so later submits start afresh
+            with self._lock:
+                self._jobs.pop(job.id, None)
+                if self._active.get(key) == job.id:
+                    del self._active[key]
+            raise
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Snapshot of a live job, falling back to the persisted row"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.snapshot()
+
+        db = self.session_factory()
+        try:
+            row = db.get(AnalysisJob, job_id)
+            if row is None:
+                return None
+            stages = json.loads(row.stages)
+            return {
+                'job_id': row.id,
+                'repo_id': row.repo_id,
+                'repo_url': row.repo_url,
+                'branch': row.branch,
+                'status': row.status,
+                'progress': round(sum(s['progress'] for s in stages.values()) / max(len(stages), 1), 4),
+                'stages': stages,
+                'error': row.error,
+            }
+        finally:
+            db.close()
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation; queued jobs stop before they start"""
+        job = self._jobs.get(job_id)
+        if job is None or job.status in TERMINAL_STATES:
+            return False
+        job.cancel_event.set()
+        if job.status == QUEUED:
+            self._finish(job, CANCELLED)
+        return True
+
+    async def subscribe(self, job_id: str, heartbeat: float = 15.0) -> AsyncIterator[Optional[Dict]]:
+        """
+        Yield progress snapshots until the job reaches a terminal state.
+
+        Yields None when no update arrived within `heartbeat` seconds so
+        callers can keep idle connections alive.
+        """
+        self._loop = asyncio.get_running_loop()
+        job = self._jobs.get(job_id)
+        if job is None:
+            snapshot = await asyncio.to_thread(self.get, job_id)
+            if snapshot is not None:
+                yield snapshot
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            snapshot = job.snapshot()
+            yield snapshot
+            while snapshot['status'] not in TERMINAL_STATES:
+                try:
+                    snapshot = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                # Collapse bursts so slow clients only see the newest state
+                while not queue.empty():
+                    snapshot = queue.get_nowait()
+                yield snapshot
+        finally:
+            self._subscribers[job_id].discard(queue)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            if job.status not in TERMINAL_STATES:
+                job.cancel_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job):
+        if job.cancel_event.is_set():
+            return
+
+        job.status = RUNNING
+        self._publish(job)
+        state: Dict[str, Any] = {}
+        try:
+            for name in self.pipeline.STAGES:
+                ctx = JobContext(self, job, name, state)
+                ctx.check_cancelled()
+                stage = job.stages[name]
+                stage['status'] = RUNNING
+                self._publish(job)
+
+                with span(f'pipeline.{name}'):
+                    self.pipeline.run_stage(name, ctx)
+
+                if stage['status'] == RUNNING:
+                    stage['status'] = COMPLETED
+                    stage['progress'] = 1.0
+                self._publish(job)
+            self._finish(job, COMPLETED)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            for stage in job.stages.values():
+                if stage['status'] == RUNNING:
+                    stage['status'] = FAILED
+            job.error = str(e)
+            self._finish(job, FAILED)
+        finally:
+            self.pipeline.cleanup(state)
+
+    def _finish(self, job: Job, status: str):
+        with self._lock:
+            if job.status in TERMINAL_STATES:
+                return
+            job.status = status
+            if self._active.get((job.repo_url, job.branch)) == job.id:
+                del self._active[(job.repo_url, job.branch)]
+        self._publish(job)
+        # Finished jobs are served from the table from now on
+        with self._lock:
+            self._last_persist.pop(job.id, None)
+            self._jobs.pop(job.id, None)
+
+    def _publish(self, job: Job, persist: bool = True):
+        now = time.monotonic()
+        if persist or now - self._last_persist.get(job.id, 0.0) >= self.persist_interval:
+            self._persist(job)
+            self._last_persist[job.id] = now
+
+        if self._loop is None:
+            return
+        snapshot = job.snapshot()
+        for queue in list(self._subscribers.get(job.id, ())):
+            self._loop.call_soon_threadsafe(queue.put_nowait, snapshot)
+
+    def _persist(self, job: Job):
+        db = self.session_factory()
+        try:
+            row = db.get(AnalysisJob, job.id)
+            if row is None:
+                row = AnalysisJob(
+                    id=job.id,
+                    repo_id=job.repo_id,
+                    repo_url=job.repo_url,
+                    branch=job.branch,
+                    created_at=job.created_at,
+                )
+                db.add(row)
+            row.status = job.status
+            row.stages = json.dumps(job.stages)
+            row.error = job.error
+            db.commit()
+        finally:
+            db.close()
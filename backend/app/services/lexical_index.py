@@ -0,0 +1,367 @@
+"""
+Inverted-index lexical and identifier search
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import re
+import shutil
+import sqlite3
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.lazy import lazy_import
+from app.services.code_chunker import CodeChunk
+
+np = lazy_import('numpy')
+
+IDENTIFIER = re.compile(r'[A-Za-z_$][A-Za-z0-9_$]*|\d+')
+CAMEL_PART = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased identifier tokens plus their camelCase and snake_case parts.
+
+    `parseHTTPResponse_v2` yields parsehttpresponse_v2, parse, http and
+    response, so both the whole identifier and its words match; parts of
+    one character (the v and 2 of v2) are dropped.
+    """
+    tokens = []
+    for identifier in IDENTIFIER.findall(text):
+        lowered = identifier.lower()
+        if len(lowered) > 1:
+            tokens.append(lowered)
+        parts = [p for piece in identifier.split('_') for p in CAMEL_PART.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(p.lower() for p in parts if len(p) > 1)
+    return tokens
+
+
+def trigrams(term: str) -> List[str]:
+    return [term[i:i + 3] for i in range(len(term) - 2)]
+
+
+def _tokenize_batch(batch: List[Tuple[int, str]]) -> Tuple[array, Dict[str, Tuple[array, array]]]:
+    """
+    Worker entry point: document lengths plus the batch's postings grouped
+    by term, so the parent merges one array per term instead of one entry
+    per occurrence.
+    """
+    lengths = array('I')
+    postings: Dict[str, Tuple[array, array]] = {}
+    for doc_id, text in batch:
+        tokens = tokenize(text)
+        lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array('I'), array('H'))
+            entry[0].append(doc_id)
+            entry[1].append(min(tf, 65535))
+    return lengths, postings
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Dict]], k: int = 60,
+                           key=lambda hit: (hit['path'], hit['start_line'], hit['end_line'])) -> List[Dict]:
+    """
+    Fuse ranked hit lists (e.g. BM25 and vector results) by reciprocal rank.
+
+    Hits are matched on (path, start_line, end_line); the first list a hit
+    appears in supplies its fields.
+    """
+    fused: Dict = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking):
+            entry = fused.get(key(hit))
+            if entry is None:
+                entry = fused[key(hit)] = dict(hit, fused_score=0.0)
+            entry['fused_score'] += 1.0 / (k + rank + 1)
+    return sorted(fused.values(), key=lambda hit: hit['fused_score'], reverse=True)
+
+
+class LexicalIndex:
+    """
+    On-disk BM25 index over code chunks.
+
+    Postings are packed into two flat memory-mapped arrays (doc ids and
+    precomputed BM25 impacts) with per-term offsets in a SQLite lexicon,
+    so a query reads a few contiguous slices and scores them with NumPy. A
+    trigram index over the vocabulary answers substring queries by
+    expanding them to the matching terms first.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        self._docs = None
+        self._impacts = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{self._path('lexicon.sqlite')}?mode=ro", uri=True)
+
+    @classmethod
+    def build(cls, directory: str, chunks: Iterable[CodeChunk], max_workers: Optional[int] = None,
+              batch_size: int = 2000) -> 'LexicalIndex':
+        """Stream chunks through a process pool and write the index to `directory`"""
+        tmp_dir = f'{directory}.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        conn = sqlite3.connect(os.path.join(tmp_dir, 'lexicon.sqlite'))
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute(
+            'CREATE TABLE docs (id INTEGER PRIMARY KEY, path TEXT, language TEXT, start_line INTEGER, '
+            'end_line INTEGER, symbols TEXT, content_hash TEXT)'
+        )
+
+        # term -> (doc ids, term frequencies), kept as compact typed arrays
+        postings: Dict[str, Tuple[array, array]] = {}
+        lengths = array('I')
+
+        def batches() -> Iterator[List[Tuple[int, str]]]:
+            batch = []
+            for doc_id, chunk in enumerate(chunks):
+                conn.execute(
+                    'INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (doc_id, chunk.path, chunk.language, chunk.start_line, chunk.end_line,
+                     json.dumps(chunk.symbols), chunk.content_hash),
+                )
+                batch.append((doc_id, f'{chunk.path}\n{chunk.content}'))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        def collect(results):
+            batch_lengths, batch_postings = results
+            lengths.extend(batch_lengths)
+            for term, (doc_ids, tfs) in batch_postings.items():
+                entry = postings.get(term)
+                if entry is None:
+                    postings[term] = (doc_ids, tfs)
+                else:
+                    entry[0].extend(doc_ids)
+                    entry[1].extend(tfs)
+
+        stream = batches()
+        head = list(itertools.islice(stream, 2))
+        if max_workers == 1 or len(head) < 2:
+            # Small repositories are not worth a process pool
+            for batch in itertools.chain(head, stream):
+                collect(_tokenize_batch(batch))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                # Bounded in-flight window instead of pool.map, which would
+                # materialize every batch up front; results are collected in
+                # submission order so doc ids stay ascending within postings
+                in_flight = deque()
+                window = 2 * (max_workers or os.cpu_count() or 1)
+                for batch in itertools.chain(head, stream):
+                    in_flight.append(pool.submit(_tokenize_batch, batch))
+                    if len(in_flight) >= window:
+                        collect(in_flight.popleft().result())
+                while in_flight:
+                    collect(in_flight.popleft().result())
+
+        # BM25's term-frequency component depends only on (tf, doc length),
+        # so it is precomputed per posting and queries just add idf * impact
+        doc_lengths = np.frombuffer(lengths, dtype=np.uint32) if lengths else np.zeros(0, np.uint32)
+        avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        norm = (cls.K1 * (1 - cls.B + cls.B * doc_lengths / max(avg_length, 1e-9))).astype(np.float32)
+
+        conn.execute('CREATE TABLE terms (id INTEGER PRIMARY KEY, term TEXT UNIQUE, df INTEGER, offset INTEGER)')
+        conn.execute('CREATE TABLE grams (gram TEXT PRIMARY KEY, term_ids BLOB) WITHOUT ROWID')
+        # trigram -> ascending term ids, stored as one packed array per gram
+        grams: Dict[str, array] = {}
+        offset = 0
+        with open(os.path.join(tmp_dir, 'postings.docs'), 'wb') as docs_file, \
+                open(os.path.join(tmp_dir, 'postings.impacts'), 'wb') as impacts_file:
+            term_rows = []
+            for term_id, term in enumerate(sorted(postings)):
+                doc_ids, tfs = postings.pop(term)
+                doc_ids.tofile(docs_file)
+                tf = np.frombuffer(tfs, dtype=np.uint16).astype(np.float32)
+                impact = tf * (cls.K1 + 1) / (tf + norm[np.frombuffer(doc_ids, dtype=np.uint32)])
+                impact.astype(np.float32).tofile(impacts_file)
+                term_rows.append((term_id, term, len(doc_ids), offset))
+                for gram in set(trigrams(term)):
+                    ids = grams.get(gram)
+                    if ids is None:
+                        ids = grams[gram] = array('I')
+                    ids.append(term_id)
+                offset += len(doc_ids)
+                if len(term_rows) >= 50000:
+                    conn.executemany('INSERT INTO terms VALUES (?, ?, ?, ?)', term_rows)
+                    term_rows = []
+            conn.executemany('INSERT INTO terms VALUES (?, ?, ?, ?)', term_rows)
+        conn.executemany('INSERT INTO grams VALUES (?, ?)', ((gram, ids.tobytes()) for gram, ids in grams.items()))
+        conn.commit()
+        conn.close()
+
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump({
+                'documents': len(lengths),
+                'postings': offset,
+                'avg_length': avg_length,
+            }, f)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_dir, directory)
+        return cls(directory)
+
+    def _arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._docs is None:
+            if self.meta['postings']:
+                self._docs = np.memmap(self._path('postings.docs'), dtype=np.uint32, mode='r')
+                self._impacts = np.memmap(self._path('postings.impacts'), dtype=np.float32, mode='r')
+            else:
+                self._docs = np.zeros(0, np.uint32)
+                self._impacts = np.zeros(0, np.float32)
+        return self._docs, self._impacts
+
+    def _lookup(self, conn: sqlite3.Connection, terms: Sequence[str]) -> List[Tuple[str, int, int]]:
+        if not terms:
+            return []
+        placeholders = ','.join('?' * len(terms))
+        return conn.execute(
+            f'SELECT term, df, offset FROM terms WHERE term IN ({placeholders})', list(terms)
+        ).fetchall()
+
+    def _score(self, entries: List[Tuple[str, int, int]], weights: Optional[Counter] = None) -> np.ndarray:
+        docs, impacts = self._arrays()
+        n = self.meta['documents']
+        scores = np.zeros(n, dtype=np.float32)
+        for term, df, offset in entries:
+            idf = np.log(1 + (n - df + 0.5) / (df + 0.5)) * (weights[term] if weights else 1)
+            # A term's doc ids are unique, so fancy-index accumulation is safe
+            scores[docs[offset:offset + df]] += np.float32(idf) * impacts[offset:offset + df]
+        return scores
+
+    def _top(self, conn: sqlite3.Connection, scores: np.ndarray, k: int) -> List[Dict]:
+        if not len(scores):
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = [int(doc) for doc in top if scores[doc] > 0]
+        if not top:
+            return []
+        placeholders = ','.join('?' * len(top))
+        rows = {
+            row[0]: row for row in conn.execute(
+                f'SELECT id, path, language, start_line, end_line, symbols, content_hash '
+                f'FROM docs WHERE id IN ({placeholders})', top,
+            )
+        }
+        return [
+            {
+                'path': rows[doc][1],
+                'language': rows[doc][2],
+                'start_line': rows[doc][3],
+                'end_line': rows[doc][4],
+                'symbols': json.loads(rows[doc][5]),
+                'content_hash': rows[doc][6],
+                'score': float(scores[doc]),
+            }
+            for doc in top
+        ]
+
+    def search(self, query: str, k: int = 10) -> List[Dict]:
+        """BM25 over identifier tokens of the query"""
+        weights = Counter(tokenize(query))
+        conn = self._connect()
+        try:
+            return self._top(conn, self._score(self._lookup(conn, list(weights)), weights), k)
+        finally:
+            conn.close()
+
+    def expand_substring(self, conn: sqlite3.Connection, needle: str, max_terms: int = 200,
+                         max_candidates: int = 20000) -> List[Tuple[str, int, int]]:
+        """
+        Lexicon entries (term, df, offset) for terms containing `needle`.
+
+        Candidate term ids are the intersection of the needle's trigram
+        lists, rarest first; candidates are then verified against the term
+        text. Needles shorter than three characters fall back to a scan.
+        """
+        needle = needle.lower()
+        grams = sorted(set(trigrams(needle)))
+        if not grams:
+            return conn.execute(
+                'SELECT term, df, offset FROM terms WHERE instr(term, ?) > 0 LIMIT ?',
+                (needle, max_terms),
+            ).fetchall()
+
+        placeholders = ','.join('?' * len(grams))
+        lists = [
+            np.frombuffer(blob, dtype=np.uint32)
+            for (blob,) in conn.execute(f'SELECT term_ids FROM grams WHERE gram IN ({placeholders})', grams)
+        ]
+        if len(lists) < len(grams):
+            return []
+        lists.sort(key=len)
+        candidates = lists[0]
+        for ids in lists[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+
+        entries = []
+        candidates = candidates[:max_candidates].tolist()
+        for i in range(0, len(candidates), 500):
+            batch = candidates[i:i + 500]
+            entries.extend(
+                row for row in conn.execute(
+                    f"SELECT term, df, offset FROM terms WHERE id IN ({','.join('?' * len(batch))})", batch
+                )
+                if needle in row[0]
+            )
+        # Prefer the most common spellings when the needle is very unselective
+        entries.sort(key=lambda entry: -entry[1])
+        return entries[:max_terms]
+
+    def search_substring(self, needle: str, k: int = 10) -> List[Dict]:
+        """Rank documents containing any identifier that contains `needle`"""
+        conn = self._connect()
+        try:
+            return self._top(conn, self._score(self.expand_substring(conn, needle)), k)
+        finally:
+            conn.close()
+
+
+def lexical_index_for_commit(store, repo_id: str, commit: str) -> Optional[LexicalIndex]:
+    directory = store.artifact_path(repo_id, commit, 'lexical')
+    if not os.path.exists(os.path.join(directory, 'meta.json')):
+        return None
+    return LexicalIndex(directory)
+
+
+_open_indexes: Dict[str, LexicalIndex] = {}
+
+
+def open_lexical_index(store, repo_id: str) -> Optional[LexicalIndex]:
+    """Shared lexical index for the repository's latest analyzed commit, or None if not built"""
+    commit = store.latest_commit(repo_id)
+    if commit is None:
+        return None
+    index = _open_indexes.get(repo_id)
+    if index is None or index.directory != store.artifact_path(repo_id, commit, 'lexical'):
+        index = lexical_index_for_commit(store, repo_id, commit)
+        if index is None:
+            return None
+        _open_indexes[repo_id] = index
+    return index
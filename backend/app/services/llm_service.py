@@ -0,0 +1,94 @@
+"""
+Chat models behind one streaming interface, with an offline fake
+"""
+import asyncio
+import re
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+
+SYSTEM_PROMPT = (
+    'You are an onboarding assistant for a software repository. Answer the '
+    'question using only the code excerpts provided, cite files as `path:line`, '
+    'and say so when the excerpts do not contain the answer.'
+)
+
+
+def render_excerpt(hit: Dict) -> str:
+    return f"### {hit['path']}:{hit['start_line']}-{hit['end_line']}\n```\n{hit['content']}\n```"
+
+
+def build_messages(question: str, hits: Sequence[Dict], history: Sequence[Dict] = ()) -> List[Dict[str, str]]:
+    """Chat messages for a question, its retrieved chunks and the prior turns"""
+    context = '\n\n'.join(render_excerpt(hit) for hit in hits)
+    messages = [{'role': 'system', 'content': SYSTEM_PROMPT}]
+    messages.extend({'role': turn['role'], 'content': turn['content']} for turn in history)
+    messages.append({'role': 'user', 'content': f'Code excerpts:\n\n{context}\n\nQuestion: {question}'})
+    return messages
+
+
+class OpenAIChatModel:
+    """Streaming chat completions from the OpenAI API"""
+
+    def __init__(self, model: str, api_key: str, temperature: float = 0.2):
+        from openai import AsyncOpenAI
+        self.model = model
+        self.temperature = temperature
+        self.client = AsyncOpenAI(api_key=api_key)
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(
+            model=self.model, messages=messages, temperature=self.temperature, stream=True,
+        )
+        async for event in response:
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+
+
+class FakeChatModel:
+    """
+    Deterministic offline model for tests and benchmarks.
+
+    Answers by naming the files in the prompt's excerpts, one word per
+    token, after `first_token_latency` and `token_latency` delays.
+    """
+
+    HEADER = re.compile(r'^### (\S+?):(\d+)-(\d+)$', re.MULTILINE)
+
+    def __init__(self, model: str = 'fake', first_token_latency: float = 0.0, token_latency: float = 0.0):
+        self.model = model
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.calls = 0
+
+    def answer(self, messages: List[Dict[str, str]]) -> str:
+        spans = self.HEADER.findall(messages[-1]['content'])
+        if not spans:
+            return 'The provided excerpts do not cover this question.'
+        cited = ', '.join(f'`{path}:{start}`' for path, start, _ in dict.fromkeys(spans))
+        return f'This is handled in {cited}.'
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        self.calls += 1
+        if self.first_token_latency:
+            await asyncio.sleep(self.first_token_latency)
+        for i, word in enumerate(self.answer(messages).split(' ')):
+            if i and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield word if i == 0 else f' {word}'
+
+
+def build_chat_model(backend: str, model: str, api_key: Optional[str] = None):
+    """Chat model for LLM_BACKEND ("openai" or "fake")"""
+    if backend == 'fake':
+        return FakeChatModel()
+    if backend == 'openai':
+        return OpenAIChatModel(model, api_key)
+    raise ValueError(f'Unknown LLM backend: {backend}')
+
+
+@lru_cache()
+def get_chat_model():
+    """Process-wide chat model configured from settings"""
+    return build_chat_model(settings.LLM_BACKEND, settings.LLM_MODEL, settings.OPENAI_API_KEY)
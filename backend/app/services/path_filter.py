@@ -0,0 +1,323 @@
+"""
+Compiled path filters applied while walking a repository
+"""
+import hashlib
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+GITIGNORE = '.gitignore'
+GITATTRIBUTES = '.gitattributes'
+CONTROL_FILES = {GITIGNORE, GITATTRIBUTES}
+
+# Bump when matching changes, so manifests built under the old rules are rescanned
+FILTER_VERSION = 1
+
+# .gitattributes attribute -> exclusion reason
+LINGUIST_ATTRIBUTES = {'linguist-generated': 'generated', 'linguist-vendored': 'vendored'}
+
+# Tool output recognizable by name alone (gitignore syntax)
+GENERATED_PATTERNS = [
+    '*.min.js', '*.min.css', '*-min.js', '*.bundle.js', '*.map',
+    '*.pb.go', '*.pb.cc', '*.pb.h', '*_pb2.py', '*_pb2_grpc.py',
+    '*.generated.*', '*.g.dart', '*.designer.cs', '*.Designer.cs',
+]
+
+# Minified files are only looked for among these, and only above SNIFF_BYTES
+MINIFIABLE = {'.js', '.mjs', '.cjs', '.css'}
+SNIFF_BYTES = 4096
+# A sniffed head averaging longer lines than this is minified
+MINIFIED_LINE_LENGTH = 250
+
+TRAILING_SPACES = re.compile(r'(?<!\\) +$')
+
+
+def translate(pattern: str, anchored: Optional[bool] = None) -> str:
+    """
+    Regex source for one gitignore-style pattern, stripped of `!` and any
+    trailing slash, matching paths relative to the ignore file's directory.
+
+    A pattern with a slash is anchored there; one without matches at any
+    depth.
+    """
+    if anchored is None:
+        anchored = '/' in pattern
+    pattern = pattern[1:] if pattern.startswith('/') else pattern
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/'):
+                if i + 2 == n:
+                    out.append('.*')
+                    break
+                if pattern[i + 2] == '/':
+                    out.append('(?:.*/)?')
+                    i += 3
+                    continue
+            while i + 1 < n and pattern[i + 1] == '*':
+                i += 1
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[' and pattern.find(']', i + 2) != -1:
+            end = pattern.find(']', i + 2)
+            body = pattern[i + 1:end]
+            if body[0] in '!^':
+                body = '^' + body[1:]
+            out.append('[' + body.replace('\\', '\\\\').replace('[', '\\[') + ']')
+            i = end
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    body = ''.join(out)
+    return body if anchored else f'(?:.*/)?{body}'
+
+
+def parse_ignore(lines: Iterable[str]) -> List[Tuple[str, bool, bool]]:
+    """(regex source, negated, directories only) per rule of a gitignore file"""
+    rules = []
+    for line in lines:
+        if not line or line.startswith('#'):
+            continue
+        line = TRAILING_SPACES.sub('', line.rstrip('\r'))
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        if line:
+            rules.append((translate(line), negate, dir_only))
+    return rules
+
+
+class IgnoreRules:
+    """
+    The rules of one ignore file, matched against paths relative to its
+    directory. The last matching rule decides; one combined regex rejects
+    the common no-match case in a single call.
+    """
+
+    def __init__(self, rules: Sequence[Tuple[str, bool, bool]]):
+        self.rules = [(re.compile(source), negate, dir_only) for source, negate, dir_only in rules]
+        self.any = re.compile('|'.join(f'(?:{source})' for source, _, _ in rules)) if rules else None
+
+    @classmethod
+    def parse(cls, text: str) -> 'IgnoreRules':
+        return cls(parse_ignore(text.splitlines()))
+
+    def match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """True if ignored, False if re-included, None if no rule matches"""
+        if self.any is None or not self.any.fullmatch(path):
+            return None
+        for regex, negate, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.fullmatch(path):
+                return not negate
+        return None
+
+
+class AttributeRules:
+    """
+    The linguist-generated and linguist-vendored lines of one
+    .gitattributes file; later lines override earlier ones.
+
+    A `dir/**` line also matches `dir` itself, which lets the walk prune
+    the whole directory unless a later line unsets the attribute;
+    attribute files inside a pruned directory are not read.
+    """
+
+    def __init__(self, text: str):
+        # (regex, regex for the directory of a `dir/**` pattern or None, {reason: set/unset/reset})
+        self.rules: List[Tuple[re.Pattern, Optional[re.Pattern], Dict[str, Optional[bool]]]] = []
+        for line in text.splitlines():
+            parts = line.split()
+            if len(parts) < 2 or parts[0].startswith(('#', '!')) or parts[0].endswith('/'):
+                continue
+            values = {}
+            for attribute in parts[1:]:
+                value: Optional[bool] = True
+                if attribute.startswith('-'):
+                    attribute, value = attribute[1:], False
+                elif attribute.startswith('!'):
+                    attribute, value = attribute[1:], None
+                elif '=' in attribute:
+                    attribute, _, raw = attribute.partition('=')
+                    value = raw.lower() not in ('false', '0')
+                if attribute in LINGUIST_ATTRIBUTES:
+                    values[LINGUIST_ATTRIBUTES[attribute]] = value
+            if not values:
+                continue
+            pattern = parts[0]
+            directory = None
+            if pattern.endswith('/**') and len(pattern) > 3:
+                directory = re.compile(translate(pattern[:-3], anchored=True))
+            self.rules.append((re.compile(translate(pattern)), directory, values))
+
+
+# (base directory, rules) from the nearest directory outwards, and from the root inwards
+IgnoreChain = Tuple[Tuple[str, IgnoreRules], ...]
+AttributeChain = Tuple[Tuple[str, AttributeRules], ...]
+
+
+def _relative(path: str, base: str) -> str:
+    return path[len(base) + 1:] if base else path
+
+
+class PathFilter:
+    """
+    Decides which paths of a repository are analyzed.
+
+    Directories are checked as the walk reaches them, so an excluded
+    subtree is never listed, statted or opened. In order:
+
+    - `ignore_dirs` names, then custom `patterns` (gitignore syntax, from
+      the root), then every `.gitignore` from the nearest directory up
+    - with `skip_generated`: generated file names, and linguist-generated
+      or linguist-vendored from `.gitattributes`
+    - per-file and whole-repository size caps, applied by the walk
+    - with `skip_generated`: minified JS and CSS, by the average line
+      length of the first SNIFF_BYTES
+
+    `exempt` names (manifests and lockfiles) skip the last three checks;
+    a large lockfile is still needed for dependency analysis.
+    """
+
+    def __init__(self, root: str, ignore_dirs: Iterable[str] = (), patterns: Sequence[str] = (),
+                 max_file_bytes: Optional[int] = None, max_repo_bytes: Optional[int] = None,
+                 skip_generated: bool = True, exempt: Iterable[str] = ()):
+        self.root = os.path.abspath(root)
+        self.ignore_dirs = set(ignore_dirs)
+        self.patterns = IgnoreRules(parse_ignore(patterns))
+        self.max_file_bytes = max_file_bytes
+        self.max_repo_bytes = max_repo_bytes
+        self.skip_generated = skip_generated
+        self.generated = IgnoreRules(parse_ignore(GENERATED_PATTERNS))
+        self.exempt = set(exempt)
+        self._chains: Dict[str, Tuple[IgnoreChain, AttributeChain]] = {}
+        self._directories: Dict[str, Optional[str]] = {}
+        # Manifests record this; a different filter means a full rescan
+        self.fingerprint = hashlib.sha1(repr((
+            FILTER_VERSION, sorted(self.ignore_dirs), list(patterns), max_file_bytes, max_repo_bytes,
+            skip_generated, sorted(self.exempt),
+        )).encode('utf-8')).hexdigest()[:16]
+
+    def _read(self, rel_dir: str, name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, rel_dir, name), 'r', encoding='utf-8', errors='replace') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def enter(self, rel_dir: str, names: Optional[Set[str]] = None) -> Tuple[IgnoreChain, AttributeChain]:
+        """
+        Rules in force inside a directory, loading its own ignore and
+        attribute files. Pass the directory's entry names when they are
+        already known, so absent files are not opened.
+        """
+        chains = self._chains.get(rel_dir)
+        if chains is not None:
+            return chains
+        ignores, attributes = self.enter(rel_dir.rpartition('/')[0]) if rel_dir else ((), ())
+        if names is None or GITIGNORE in names:
+            text = self._read(rel_dir, GITIGNORE)
+            if text:
+                ignores = ((rel_dir, IgnoreRules.parse(text)),) + ignores
+        if self.skip_generated and (names is None or GITATTRIBUTES in names):
+            text = self._read(rel_dir, GITATTRIBUTES)
+            if text:
+                rules = AttributeRules(text)
+                if rules.rules:
+                    attributes = attributes + ((rel_dir, rules),)
+        chains = self._chains[rel_dir] = (ignores, attributes)
+        return chains
+
+    def _ignored(self, path: str, is_dir: bool, ignores: IgnoreChain) -> Optional[str]:
+        if self.patterns.match(path, is_dir):
+            return 'pattern'
+        for base, rules in ignores:
+            decision = rules.match(_relative(path, base), is_dir)
+            if decision is not None:
+                return 'gitignore' if decision else None
+        return None
+
+    def exclude_dir(self, path: str) -> Optional[str]:
+        """Reason to prune the directory at `path`, or None to descend into it"""
+        if path in self._directories:
+            return self._directories[path]
+        parent, _, name = path.rpartition('/')
+        reason = None
+        if name in self.ignore_dirs:
+            reason = 'ignored_dir'
+        else:
+            ignores, attributes = self.enter(parent)
+            reason = self._ignored(path, True, ignores)
+            if reason is None and attributes:
+                reason = self._attribute_dir(path, attributes)
+        self._directories[path] = reason
+        return reason
+
+    def _attribute_dir(self, path: str, attributes: AttributeChain) -> Optional[str]:
+        # Prune only when no later line could unset the attribute for something inside
+        marked: Dict[str, bool] = {}
+        for base, rules in attributes:
+            relative = _relative(path, base)
+            for _, directory, values in rules.rules:
+                covers = directory is not None and directory.fullmatch(relative)
+                for reason, value in values.items():
+                    if value and covers:
+                        marked[reason] = True
+                    elif not value and reason in marked:
+                        marked[reason] = False
+        return next((reason for reason, pruned in marked.items() if pruned), None)
+
+    def exclude_file(self, path: str) -> Optional[str]:
+        """Reason to leave out the file at `path` by its path alone, or None"""
+        parent, _, name = path.rpartition('/')
+        ignores, attributes = self.enter(parent)
+        reason = self._ignored(path, False, ignores)
+        if reason or not self.skip_generated or name in self.exempt:
+            return reason
+        if self.generated.match(name, False):
+            return 'generated'
+        values: Dict[str, Optional[bool]] = {}
+        for base, rules in attributes:
+            relative = _relative(path, base)
+            for regex, _, assigned in rules.rules:
+                if regex.fullmatch(relative):
+                    values.update(assigned)
+        return next((reason for reason, value in values.items() if value), None)
+
+    def exclude_content(self, path: str, size: int) -> Optional[str]:
+        """Reason to leave out a file by its size or, for JS and CSS, its first bytes"""
+        name = path.rpartition('/')[2]
+        if name in self.exempt:
+            return None
+        if self.max_file_bytes and size > self.max_file_bytes:
+            return 'file_size'
+        if self.skip_generated and size >= SNIFF_BYTES and os.path.splitext(name)[1] in MINIFIABLE:
+            try:
+                with open(os.path.join(self.root, path), 'rb') as f:
+                    head = f.read(SNIFF_BYTES)
+            except OSError:
+                return None
+            if len(head) / (head.count(b'\n') + 1) > MINIFIED_LINE_LENGTH:
+                return 'minified'
+        return None
+
+    def exclude_path(self, path: str) -> Optional[str]:
+        """
+        `exclude_dir` for every ancestor, then `exclude_file`: the verdict
+        the walk would reach, for a single path (e.g. from a git diff).
+        """
+        parts = path.split('/')
+        for depth in range(1, len(parts)):
+            reason = self.exclude_dir('/'.join(parts[:depth]))
+            if reason:
+                return reason
+        return self.exclude_file(path)
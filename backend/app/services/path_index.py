@@ -0,0 +1,179 @@
+"""
+Precomputed path index for lazy, paginated file-tree browsing
+"""
+import base64
+import os
+import sqlite3
+import tempfile
+from typing import Dict, Iterable, Optional, Tuple
+
+
+def encode_cursor(name: str) -> str:
+    return base64.urlsafe_b64encode(name.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+class PathIndex:
+    """
+    SQLite-backed index of every directory's direct children.
+
+    Rows are keyed by (parent, name), so listing one directory is a single
+    range scan and pagination is keyset-based: the cursor is the last name
+    returned. There is no depth limit; deep paths cost the same as shallow
+    ones. Directory rows carry recursive file counts and byte totals so the
+    UI can size nodes without expanding them.
+    """
+
+    SCHEMA = """
+    CREATE TABLE entries (
+        parent TEXT NOT NULL,
+        name TEXT NOT NULL,
+        is_dir INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        language TEXT,
+        file_count INTEGER NOT NULL,
+        child_count INTEGER NOT NULL,
+        PRIMARY KEY (parent, name)
+    ) WITHOUT ROWID
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    @classmethod
+    def build(cls, db_path: str, files: Iterable[Tuple[str, int, Optional[str]]]) -> 'PathIndex':
+        """Build the index from (relative path, size, language) triples"""
+        # dir path -> [file_count, total_bytes, child names]
+        dirs: Dict[str, list] = {'': [0, 0, set()]}
+        file_rows = []
+
+        for path, size, language in files:
+            parent, _, name = path.rpartition('/')
+            file_rows.append((parent, name, 0, size, language, 1, 0))
+
+            child = name
+            current = parent
+            while True:
+                node = dirs.get(current)
+                if node is None:
+                    node = dirs[current] = [0, 0, set()]
+                node[0] += 1
+                node[1] += size
+                node[2].add(child)
+                if not current:
+                    break
+                current, _, child = current.rpartition('/')
+
+        dir_rows = []
+        for path, (file_count, total_bytes, children) in dirs.items():
+            if not path:
+                continue
+            parent, _, name = path.rpartition('/')
+            dir_rows.append((parent, name, 1, total_bytes, None, file_count, len(children)))
+
+        root = dirs['']
+        # Built lazily on the request path: concurrent first requests each
+        # write their own file, and whichever finishes last replaces the other
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(db_path) or '.',
+                                        prefix=f'{os.path.basename(db_path)}.', suffix='.tmp')
+        os.close(fd)
+        try:
+            conn = sqlite3.connect(tmp_path)
+            try:
+                conn.execute('PRAGMA journal_mode = OFF')
+                conn.execute('PRAGMA synchronous = OFF')
+                conn.execute(cls.SCHEMA)
+                conn.execute('CREATE TABLE root (file_count INTEGER, size INTEGER, child_count INTEGER)')
+                conn.execute('INSERT INTO root VALUES (?, ?, ?)', (root[0], root[1], len(root[2])))
+                conn.executemany('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)', file_rows)
+                conn.executemany('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)', dir_rows)
+                conn.commit()
+            finally:
+                conn.close()
+            os.replace(tmp_path, db_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return cls(db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True)
+
+    def list_directory(self, path: str = '', cursor: Optional[str] = None, limit: int = 200) -> Optional[Dict]:
+        """
+        List one page of a directory's children in name order.
+
+        Returns None when `path` is not a directory in the index.
+        """
+        path = path.strip('/')
+        after = decode_cursor(cursor) if cursor else ''
+
+        conn = self._connect()
+        try:
+            if path:
+                parent, _, name = path.rpartition('/')
+                row = conn.execute(
+                    'SELECT is_dir, size, file_count, child_count FROM entries WHERE parent = ? AND name = ?',
+                    (parent, name),
+                ).fetchone()
+                if row is None or not row[0]:
+                    return None
+                _, size, file_count, child_count = row
+            else:
+                file_count, size, child_count = conn.execute('SELECT * FROM root').fetchone()
+
+            rows = conn.execute(
+                'SELECT name, is_dir, size, language, file_count, child_count FROM entries '
+                'WHERE parent = ? AND name > ? ORDER BY name LIMIT ?',
+                (path, after, limit + 1),
+            ).fetchall()
+        finally:
+            conn.close()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        entries = []
+        for name, is_dir, entry_size, language, entry_files, entry_children in rows:
+            entry = {
+                'name': name,
+                'path': f'{path}/{name}' if path else name,
+                'type': 'directory' if is_dir else 'file',
+                'size': entry_size,
+            }
+            if is_dir:
+                entry['file_count'] = entry_files
+                entry['child_count'] = entry_children
+            else:
+                entry['language'] = language or 'unknown'
+            entries.append(entry)
+
+        return {
+            'path': path,
+            'size': size,
+            'file_count': file_count,
+            'child_count': child_count,
+            'entries': entries,
+            'next_cursor': encode_cursor(rows[-1][0]) if has_more else None,
+        }
+
+
+def path_index_for_commit(store, repo_id: str, commit: str) -> Optional[PathIndex]:
+    """Open the path index for an analyzed commit, building it from the manifest if missing"""
+    db_path = store.artifact_path(repo_id, commit, 'tree.sqlite')
+    if os.path.exists(db_path):
+        return PathIndex(db_path)
+
+    manifest = store.load(repo_id, commit)
+    if manifest is None:
+        return None
+    return PathIndex.build(db_path, (
+        (path, record['size'], record['language'])
+        for path, record in manifest['files'].items()
+    ))
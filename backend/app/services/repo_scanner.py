@@ -0,0 +1,185 @@
+"""
+Single-pass repository scanner
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.services.path_filter import PathFilter
+
+
+@dataclass
+class ScannedFile:
+    """A file discovered during a repository scan"""
+    path: str
+    name: str
+    ext: str
+    size: int
+    language: Optional[str]
+
+
+@dataclass
+class ScanResult:
+    """Everything a single walk of the repository produces"""
+    root: str
+    files: List[ScannedFile] = field(default_factory=list)
+    # Relative directory path ('' for the root) -> sorted child names
+    directories: Dict[str, List[str]] = field(default_factory=dict)
+    entry_points: List[Dict] = field(default_factory=list)
+    config_files: Dict[str, str] = field(default_factory=dict)
+    languages: Dict[str, int] = field(default_factory=dict)
+    file_types: Dict[str, int] = field(default_factory=dict)
+    total_bytes: int = 0
+    # Reason -> files and pruned directories left out by the path filter
+    excluded: Dict[str, int] = field(default_factory=dict)
+    # Files were dropped once the repository size cap was reached
+    truncated: bool = False
+
+    def file_map(self) -> Dict[str, ScannedFile]:
+        """Index scanned files by relative path"""
+        return {f.path: f for f in self.files}
+
+
+class RepoScanner:
+    """
+    Walks a repository once with os.scandir, pruning excluded directories
+    as it descends. The tree, per-language counts, entry points and config
+    files are all derived from that single walk.
+
+    `path_filter` decides what is excluded; by default that is `ignore_dirs`
+    names and whatever `.gitignore` files exclude.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        extensions: Dict[str, str],
+        ignore_dirs: Set[str],
+        entry_files: List[Tuple[str, str, str]],
+        config_files: Dict[str, str],
+        path_filter: Optional[PathFilter] = None,
+    ):
+        self.root = os.path.abspath(root)
+        self.extensions = extensions
+        self.ignore_dirs = ignore_dirs
+        self.path_filter = path_filter or PathFilter(
+            self.root, ignore_dirs, skip_generated=False, exempt=config_files,
+        )
+        self.entry_files = {name: (lang, desc) for name, lang, desc in entry_files}
+        self.entry_order = {name: i for i, (name, _, _) in enumerate(entry_files)}
+        self.config_names = config_files
+
+    def scan(self) -> ScanResult:
+        """Walk the repository and return the shared scan result"""
+        result = ScanResult(root=self.root)
+        path_filter = self.path_filter
+        max_repo_bytes = path_filter.max_repo_bytes
+        total_bytes = 0
+
+        def exclude(reason: str):
+            result.excluded[reason] = result.excluded.get(reason, 0) + 1
+
+        # Iterative DFS so deep trees cannot hit the recursion limit
+        stack = ['']
+        while stack:
+            rel_dir = stack.pop()
+            abs_dir = os.path.join(self.root, rel_dir) if rel_dir else self.root
+
+            try:
+                with os.scandir(abs_dir) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except (PermissionError, FileNotFoundError, NotADirectoryError):
+                result.directories[rel_dir] = []
+                continue
+            path_filter.enter(rel_dir, {entry.name for entry in entries})
+
+            children = []
+            subdirs = []
+            for entry in entries:
+                name = entry.name
+                rel_path = f'{rel_dir}/{name}' if rel_dir else name
+
+                # d_type from the directory listing: nothing is statted before the path checks
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        reason = path_filter.exclude_dir(rel_path)
+                        if reason:
+                            exclude(reason)
+                            continue
+                        children.append(name)
+                        subdirs.append(rel_path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                    reason = path_filter.exclude_file(rel_path)
+                    if reason:
+                        exclude(reason)
+                        continue
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
+
+                reason = path_filter.exclude_content(rel_path, size)
+                if reason is None and max_repo_bytes and name not in path_filter.exempt:
+                    # Once over the cap, everything later in the walk is dropped too
+                    if result.truncated or total_bytes + size > max_repo_bytes:
+                        result.truncated = True
+                        reason = 'repo_size'
+                if reason:
+                    exclude(reason)
+                    continue
+                total_bytes += size
+
+                ext = os.path.splitext(name)[1]
+                children.append(name)
+                result.files.append(
+                    ScannedFile(rel_path, name, ext, size, self.extensions.get(ext))
+                )
+
+            result.directories[rel_dir] = children
+            # Reverse so the stack pops subdirectories in sorted order
+            stack.extend(reversed(subdirs))
+
+        self._summarize(result)
+        return result
+
+    def from_files(self, files: List[ScannedFile]) -> ScanResult:
+        """Rebuild a scan result from known file records without touching disk"""
+        result = ScanResult(root=self.root)
+        directories: Dict[str, Set[str]] = {'': set()}
+        for scanned in sorted(files, key=lambda f: f.path):
+            parent = ''
+            parts = scanned.path.split('/')
+            for part in parts[:-1]:
+                directories[parent].add(part)
+                parent = f'{parent}/{part}' if parent else part
+                directories.setdefault(parent, set())
+            directories[parent].add(parts[-1])
+            result.files.append(scanned)
+
+        result.directories = {path: sorted(names) for path, names in directories.items()}
+        self._summarize(result)
+        return result
+
+    def _summarize(self, result: ScanResult):
+        """Fill per-language counts, entry points and config hits from the file list"""
+        entry_hits = []
+        for scanned in result.files:
+            result.total_bytes += scanned.size
+            lang_key = scanned.language or 'other'
+            result.languages[lang_key] = result.languages.get(lang_key, 0) + 1
+            result.file_types[scanned.ext] = result.file_types.get(scanned.ext, 0) + 1
+
+            if scanned.name in self.entry_files:
+                entry_hits.append((self.entry_order[scanned.name], scanned.path, scanned.name))
+            if scanned.name in self.config_names:
+                result.config_files[scanned.path] = self.config_names[scanned.name]
+
+        for _, rel_path, name in sorted(entry_hits):
+            language, description = self.entry_files[name]
+            result.entry_points.append({
+                'file': rel_path,
+                'type': 'application_entry',
+                'language': language,
+                'description': description
+            })
@@ -0,0 +1,505 @@
+"""
+Sharded map-reduce execution of repository analyzers
+"""
+import os
+import queue
+import struct
+import subprocess
+import sys
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from itertools import accumulate
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import orjson
+
+from app.core.config import settings
+
+# (relative path, size in bytes, language or None)
+FileEntry = Tuple[str, int, Optional[str]]
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FRAME = struct.Struct('>I')
+
+
+def path_key(path: str) -> List[str]:
+    """Depth-first order of a tree walk with sorted children; shards are contiguous in it"""
+    return path.split('/')
+
+
+@dataclass
+class Shard:
+    """A run of whole subtrees, contiguous in depth-first path order"""
+    index: int
+    roots: List[str] = field(default_factory=list)
+    files: List[FileEntry] = field(default_factory=list)
+    bytes: int = 0
+
+
+def partition(files: Sequence[FileEntry], shards: int) -> List[Shard]:
+    """
+    Split files into at most `shards` balanced subtree shards.
+
+    Each file weighs half by count and half by bytes, so a directory of a
+    few huge files and one of many small ones cost alike. Subtrees heavier
+    than one shard's share are split into their children until every unit
+    fits, then units are cut into shards in path order at equal cumulative
+    weight. The result depends only on the files and `shards`.
+    """
+    ordered = sorted(files, key=lambda entry: path_key(entry[0]))
+    if not ordered:
+        return []
+    shards = max(1, min(shards, len(ordered)))
+    total_bytes = sum(size for _, size, _ in ordered) or 1
+    weights = [0.5 / len(ordered) + 0.5 * size / total_bytes for _, size, _ in ordered]
+    prefix = [0.0, *accumulate(weights)]
+    target = prefix[-1] / shards
+    parts = [path_key(path) for path, _, _ in ordered]
+
+    # (lo, hi, subtree root) units in path order
+    units: List[Tuple[int, int, str]] = []
+    stack = [(0, len(ordered), 0)]
+    while stack:
+        lo, hi, depth = stack.pop()
+        if prefix[hi] - prefix[lo] <= target or hi - lo == 1:
+            root = ordered[lo][0] if hi - lo == 1 else '/'.join(parts[lo][:depth])
+            units.append((lo, hi, root))
+            continue
+        groups = []
+        start = lo
+        while start < hi:
+            end = start + 1
+            if len(parts[start]) > depth + 1:
+                name = parts[start][depth]
+                while end < hi and len(parts[end]) > depth + 1 and parts[end][depth] == name:
+                    end += 1
+            groups.append((start, end, depth + 1))
+            start = end
+        stack.extend(reversed(groups))
+
+    result: List[Shard] = []
+    for lo, hi, root in units:
+        middle = (prefix[lo] + prefix[hi]) / 2
+        index = min(shards - 1, int(middle / target))
+        if not result or result[-1].index != index:
+            result.append(Shard(index))
+        shard = result[-1]
+        shard.roots.append(root)
+        shard.files.extend(ordered[lo:hi])
+        shard.bytes += sum(size for _, size, _ in ordered[lo:hi])
+    for i, shard in enumerate(result):
+        shard.index = i
+    return result
+
+
+# Map tasks -------------------------------------------------------------------
+#
+# A task is a plain dict, {id, analyzer, repo_path, files, options}, and a
+# result is JSON-serializable, so the same task runs in a pool process or
+# on a remote worker. Remote workers must see the checkout at `repo_path`.
+
+@lru_cache(maxsize=4)
+def _chunker(max_tokens: int, model: Optional[str]):
+    from app.services.code_chunker import CodeChunker, default_token_counter
+    return CodeChunker(max_tokens=max_tokens, token_counter=default_token_counter(model))
+
+
+def map_stats(repo_path: str, files: List[FileEntry], options: Dict) -> Dict:
+    from app.services.line_counter import count_file_lines
+    lines, languages, file_types = {}, {}, {}
+    for path, size, language in files:
+        try:
+            lines[path] = count_file_lines(os.path.join(repo_path, path))
+        except OSError:
+            # Unreadable files are left out rather than counted as binary
+            continue
+        key = language or 'other'
+        languages[key] = languages.get(key, 0) + 1
+        ext = os.path.splitext(path)[1]
+        file_types[ext] = file_types.get(ext, 0) + 1
+    return {'lines': lines, 'languages': languages, 'file_types': file_types,
+            'bytes': sum(size for _, size, _ in files)}
+
+
+def map_imports(repo_path: str, files: List[FileEntry], options: Dict) -> Dict:
+    from app.services.import_graph import EXTRACTORS, _extract_batch
+    sources = [(path, language) for path, _, language in files if language in EXTRACTORS]
+    return dict(_extract_batch((repo_path, sources)))
+
+
+def map_symbols(repo_path: str, files: List[FileEntry], options: Dict) -> List:
+    from app.services.symbol_index import _extract_batch
+    sources = [(path, language) for path, _, language in files if language]
+    return [
+        [path, language, [asdict(symbol) for symbol in symbols]]
+        for path, language, symbols in _extract_batch((repo_path, sources))
+    ]
+
+
+def map_chunks(repo_path: str, files: List[FileEntry], options: Dict) -> List[Dict]:
+    from app.services.repo_scanner import ScannedFile
+    chunker = _chunker(options.get('max_tokens', 800), options.get('model'))
+    scanned = [ScannedFile(path, path.rsplit('/', 1)[-1], os.path.splitext(path)[1], size, language)
+               for path, size, language in files]
+    return [chunk.to_dict() for chunk in chunker.iter_chunks(repo_path, scanned)]
+
+
+def reduce_stats(partials: List[Dict]) -> Dict:
+    lines: Dict[str, Optional[int]] = {}
+    languages: Dict[str, int] = {}
+    file_types: Dict[str, int] = {}
+    total_bytes = 0
+    for partial in partials:
+        lines.update(partial['lines'])
+        for key, count in partial['languages'].items():
+            languages[key] = languages.get(key, 0) + count
+        for key, count in partial['file_types'].items():
+            file_types[key] = file_types.get(key, 0) + count
+        total_bytes += partial['bytes']
+    return {
+        'total_files': len(lines),
+        'total_lines': sum(count for count in lines.values() if count is not None),
+        'binary_files': sum(1 for count in lines.values() if count is None),
+        'total_bytes': total_bytes,
+        'languages': dict(sorted(languages.items())),
+        'file_types': dict(sorted(file_types.items())),
+        'lines': lines,
+    }
+
+
+def _concatenate(partials: List) -> List:
+    return [item for partial in partials for item in partial]
+
+
+def _merge(partials: List[Dict]) -> Dict:
+    merged = {}
+    for partial in partials:
+        merged.update(partial)
+    return merged
+
+
+# Analyzer name -> (map function, reduce over partials in shard order)
+ANALYZERS: Dict[str, Tuple[Callable, Callable]] = {
+    'stats': (map_stats, reduce_stats),
+    'imports': (map_imports, _merge),
+    'symbols': (map_symbols, _concatenate),
+    'chunks': (map_chunks, _concatenate),
+}
+
+
+def run_task(task: Dict):
+    """Run one map task; the entry point in pool processes and remote workers"""
+    map_fn, _ = ANALYZERS[task['analyzer']]
+    return map_fn(task['repo_path'], [tuple(entry) for entry in task['files']], task.get('options') or {})
+
+
+class ShardTaskError(RuntimeError):
+    """A map task failed on a worker"""
+
+
+# Transports ------------------------------------------------------------------
+
+class Transport:
+    """Runs map tasks somewhere and yields (task id, result) as they finish"""
+
+    workers = 1
+
+    def run(self, tasks: List[Dict]) -> Iterator[Tuple[int, object]]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class InlineTransport(Transport):
+    """Runs tasks in the calling thread; for small inputs and tests"""
+
+    def run(self, tasks: List[Dict]) -> Iterator[Tuple[int, object]]:
+        for task in tasks:
+            yield task['id'], run_task(task)
+
+
+class ProcessPoolTransport(Transport):
+    """Tasks on a local process pool, kept across runs"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def run(self, tasks: List[Dict]) -> Iterator[Tuple[int, object]]:
+        pool = self._executor()
+        pending = {pool.submit(run_task, task): task for task in tasks}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        raise ShardTaskError(f"{task['analyzer']} task {task['id']} failed: {e!r}") from e
+                    yield task['id'], result
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+class Channel:
+    """
+    One connection to a worker: send a framed task, get its framed result.
+
+    Implement `request` over HTTP, a socket or a queue to run tasks on
+    other nodes; `SubprocessChannel` is the local stand-in.
+    """
+
+    def request(self, payload: bytes) -> bytes:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SubprocessChannel(Channel):
+    """A worker process speaking length-prefixed JSON frames over its stdin and stdout"""
+
+    COMMAND = 'from app.services.shard_executor import serve_worker; serve_worker()'
+
+    def __init__(self):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [BACKEND_DIR, env.get('PYTHONPATH')]))
+        self.process = subprocess.Popen([sys.executable, '-c', self.COMMAND], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, cwd=BACKEND_DIR, env=env)
+
+    def request(self, payload: bytes) -> bytes:
+        write_frame(self.process.stdin, payload)
+        response = read_frame(self.process.stdout)
+        if response is None:
+            raise ShardTaskError(f'Worker process exited with status {self.process.wait()}')
+        return response
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait(timeout=10)
+
+
+def write_frame(stream, payload: bytes):
+    stream.write(FRAME.pack(len(payload)))
+    stream.write(payload)
+    stream.flush()
+
+
+def read_frame(stream) -> Optional[bytes]:
+    header = stream.read(FRAME.size)
+    if len(header) < FRAME.size:
+        return None
+    (length,) = FRAME.unpack(header)
+    return stream.read(length)
+
+
+def serve_worker(stdin=None, stdout=None):
+    """Worker loop: read task frames until EOF, answer each with a result or error frame"""
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+    while True:
+        payload = read_frame(stdin)
+        if payload is None:
+            return
+        task = orjson.loads(payload)
+        try:
+            response = {'id': task['id'], 'result': run_task(task)}
+        except Exception:
+            response = {'id': task['id'], 'error': traceback.format_exc()}
+        write_frame(stdout, orjson.dumps(response))
+
+
+class WorkerTransport(Transport):
+    """
+    Tasks on remote workers, one in flight per channel.
+
+    Each channel gets a dispatcher thread pulling from a shared queue, so
+    a slow worker takes fewer tasks. Concurrent runs share the workers.
+    """
+
+    def __init__(self, channel_factory: Callable[[], Channel], workers: int):
+        self.channel_factory = channel_factory
+        self.workers = workers
+        self._queue: queue.Queue = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._channels: List[Channel] = []
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for _ in range(self.workers):
+                channel = self.channel_factory()
+                thread = threading.Thread(target=self._dispatch, args=(channel,), daemon=True,
+                                          name='shard-dispatch')
+                self._channels.append(channel)
+                self._threads.append(thread)
+                thread.start()
+
+    def _dispatch(self, channel: Channel):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            task, results = item
+            try:
+                response = orjson.loads(channel.request(orjson.dumps(task)))
+            except Exception as e:
+                response = {'id': task['id'], 'error': f'{type(e).__name__}: {e}'}
+            results.put((task, response))
+
+    def run(self, tasks: List[Dict]) -> Iterator[Tuple[int, object]]:
+        self._start()
+        results: queue.Queue = queue.Queue()
+        for task in tasks:
+            self._queue.put((task, results))
+        for _ in tasks:
+            task, response = results.get()
+            if 'error' in response:
+                raise ShardTaskError(f"{task['analyzer']} task {task['id']} failed: {response['error']}")
+            yield response['id'], response['result']
+
+    def close(self):
+        with self._lock:
+            for _ in self._threads:
+                self._queue.put(None)
+            for thread in self._threads:
+                thread.join()
+            for channel in self._channels:
+                channel.close()
+            self._threads, self._channels = [], []
+
+
+# Executor --------------------------------------------------------------------
+
+class ShardedExecutor:
+    """
+    Runs analyzers as map tasks over subtree shards and merges the results.
+
+    There are `shards_per_worker` shards per worker so that an unlucky
+    heavy shard does not leave the other workers idle at the end. Partials
+    are merged in shard order, which is path order, so the output is the
+    same whatever the worker count and completion order.
+    """
+
+    def __init__(self, transport: Transport, shards_per_worker: int = 4, min_parallel_files: int = 200):
+        self.transport = transport
+        self.shards_per_worker = shards_per_worker
+        self.min_parallel_files = min_parallel_files
+        self._inline = InlineTransport()
+
+    def shards(self, files: Sequence[FileEntry]) -> List[Shard]:
+        if len(files) < self.min_parallel_files:
+            return partition(files, 1)
+        return partition(files, self.transport.workers * self.shards_per_worker)
+
+    def _transport(self, shards: List[Shard]) -> Transport:
+        # A single shard is a small input: shipping it out costs more than running it
+        return self._inline if len(shards) <= 1 else self.transport
+
+    def _tasks(self, analyzers: Sequence[str], repo_path: str, shards: List[Shard],
+               options: Optional[Dict]) -> List[Dict]:
+        return [
+            {'id': len(analyzers) * shard.index + i, 'analyzer': analyzer, 'repo_path': repo_path,
+             'files': shard.files, 'options': options or {}}
+            for shard in shards for i, analyzer in enumerate(analyzers)
+        ]
+
+    def run(self, repo_path: str, files: Sequence[FileEntry], analyzers: Sequence[str] = tuple(ANALYZERS),
+            options: Optional[Dict] = None) -> Dict[str, object]:
+        """Every analyzer over every shard at once, reduced per analyzer"""
+        shards = self.shards(files)
+        partials = {analyzer: [None] * len(shards) for analyzer in analyzers}
+        for task_id, result in self._transport(shards).run(self._tasks(analyzers, repo_path, shards, options)):
+            shard, i = divmod(task_id, len(analyzers))
+            partials[analyzers[i]][shard] = result
+        return {analyzer: ANALYZERS[analyzer][1](partials[analyzer]) for analyzer in analyzers}
+
+    def map(self, analyzer: str, repo_path: str, files: Sequence[FileEntry],
+            options: Optional[Dict] = None) -> Iterator:
+        """
+        One analyzer's partials in shard order, as soon as each is next in
+        line; only results that finish early are held back.
+        """
+        shards = self.shards(files)
+        held = {}
+        next_shard = 0
+        for task_id, result in self._transport(shards).run(self._tasks([analyzer], repo_path, shards, options)):
+            held[task_id] = result
+            while next_shard in held:
+                yield held.pop(next_shard)
+                next_shard += 1
+
+    def reduce(self, analyzer: str, repo_path: str, files: Sequence[FileEntry], options: Optional[Dict] = None):
+        """One analyzer over all shards, merged"""
+        return ANALYZERS[analyzer][1](list(self.map(analyzer, repo_path, files, options)))
+
+    # Drop-in extractors for the pipeline stages; `sizes` maps paths to bytes for balancing
+
+    def extract_imports(self, repo_path: str, sources: Sequence[Tuple[str, str]],
+                        sizes: Dict[str, int]) -> Dict[str, Dict]:
+        """Same result as import_graph.extract_repository"""
+        return self.reduce('imports', repo_path, [(path, sizes.get(path, 0), language) for path, language in sources])
+
+    def extract_symbols(self, repo_path: str, sources: Sequence[Tuple[str, str]], sizes: Dict[str, int]):
+        """Same results as symbol_index.extract_repository, streamed shard by shard"""
+        from app.services.symbol_index import Symbol
+        entries = [(path, sizes.get(path, 0), language) for path, language in sources]
+        for partial in self.map('symbols', repo_path, entries):
+            for path, language, symbols in partial:
+                yield path, language, [Symbol(**symbol) for symbol in symbols]
+
+    def iter_chunks(self, repo_path: str, files: Sequence, max_tokens: int, model: Optional[str] = None):
+        """Chunks of ScannedFiles, as CodeChunker.iter_chunks would yield them, shard by shard"""
+        from app.services.code_chunker import CodeChunk
+        entries = [(scanned.path, scanned.size, scanned.language) for scanned in files]
+        for partial in self.map('chunks', repo_path, entries, {'max_tokens': max_tokens, 'model': model}):
+            for chunk in partial:
+                yield CodeChunk(**chunk)
+
+    def close(self):
+        self.transport.close()
+
+
+def balance(shards: List[Shard]) -> float:
+    """Heaviest shard over the mean, by the partition's own weights (1.0 is perfect)"""
+    if not shards:
+        return 1.0
+    total_files = sum(len(shard.files) for shard in shards)
+    total_bytes = sum(shard.bytes for shard in shards) or 1
+    weights = [0.5 * len(shard.files) / total_files + 0.5 * shard.bytes / total_bytes for shard in shards]
+    return max(weights) / (sum(weights) / len(weights))
+
+
+@lru_cache()
+def get_shard_executor() -> Optional[ShardedExecutor]:
+    """Process-wide executor, or None when ANALYSIS_SHARD_WORKERS is 0"""
+    workers = settings.ANALYSIS_SHARD_WORKERS
+    if workers <= 0:
+        return None
+    if settings.ANALYSIS_SHARD_TRANSPORT == 'workers':
+        transport = WorkerTransport(SubprocessChannel, workers)
+    else:
+        transport = ProcessPoolTransport(workers)
+    return ShardedExecutor(transport)
@@ -0,0 +1,412 @@
+"""
+Persistent index of functions, classes and methods per file
+"""
+import ast
+import os
+import re
+import shutil
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.services.code_chunker import (
+    BRACE_LANGUAGES,
+    DECLARATION,
+    LEADING_TRIVIA,
+    _brace_depths,
+    _brace_units,
+    _ruby_units,
+)
+
+MAX_SOURCE_BYTES = 1024 * 1024
+# Bump when extraction output changes; results stored per blob are keyed by it
+SYMBOLS_VERSION = 1
+MAX_SIGNATURE_CHARS = 300
+
+GO_RECEIVER = re.compile(r'^\s*func\s*\(\s*\w*\s*\*?\s*(?P<type>\w+)')
+ARROW_SUFFIX = re.compile(r'\s*=>\s*$')
+COMMENT_MARKERS = re.compile(r'^\s*(?:///?|/\*\*?|\*/?|#)\s?')
+DECLARATION_KINDS = {
+    'class': 'class', 'interface': 'interface', 'trait': 'trait', 'struct': 'struct',
+    'enum': 'enum', 'namespace': 'namespace', 'module': 'namespace',
+}
+
+
+@dataclass
+class Symbol:
+    """A named definition and where it lives"""
+    path: str
+    name: str
+    qualified_name: str
+    kind: str
+    start_line: int
+    end_line: int
+    signature: str
+    doc: Optional[str]
+
+
+def _first_line(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return None
+    for line in text.strip().splitlines():
+        if line.strip():
+            return line.strip()[:MAX_SIGNATURE_CHARS]
+    return None
+
+
+def _python_signature(node) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = ', '.join(ast.unparse(base) for base in node.bases + node.keywords)
+        return f'class {node.name}({bases})' if bases else f'class {node.name}'
+    prefix = 'async def' if isinstance(node, ast.AsyncFunctionDef) else 'def'
+    signature = f'{prefix} {node.name}({ast.unparse(node.args)})'
+    if node.returns is not None:
+        signature += f' -> {ast.unparse(node.returns)}'
+    return signature[:MAX_SIGNATURE_CHARS]
+
+
+def _python_symbols(path: str, source: str) -> List[Symbol]:
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+
+    symbols = []
+
+    def visit(body: List[ast.stmt], parent: Optional[str]):
+        for node in body:
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            qualified = f'{parent}.{node.name}' if parent else node.name
+            is_class = isinstance(node, ast.ClassDef)
+            kind = 'class' if is_class else ('method' if parent else 'function')
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            symbols.append(Symbol(
+                path, node.name, qualified, kind, start, node.end_lineno,
+                _python_signature(node), _first_line(ast.get_docstring(node)),
+            ))
+            # Nested functions are implementation detail; nested classes are API
+            if is_class:
+                visit(node.body, qualified)
+
+    visit(tree.body, None)
+    return symbols
+
+
+def _leading_doc(lines: List[str], start: int, declaration: int) -> Optional[str]:
+    """First line of the comment block between a unit's start and its declaration"""
+    text = []
+    for line_no in range(start, declaration):
+        line = lines[line_no - 1]
+        if line.lstrip().startswith(('@', '#[')):
+            continue
+        stripped = COMMENT_MARKERS.sub('', line).strip()
+        if stripped.endswith('*/'):
+            stripped = stripped[:-2].rstrip()
+        if stripped:
+            text.append(stripped)
+    return _first_line('\n'.join(text))
+
+
+def _declaration_line(lines: List[str], start: int, end: int) -> int:
+    for line_no in range(start, end + 1):
+        line = lines[line_no - 1]
+        if line.strip() and not LEADING_TRIVIA.match(line):
+            return line_no
+    return start
+
+
+def _brace_signature(lines: List[str], line_no: int, end: int) -> str:
+    parts = []
+    for current in range(line_no, min(end, line_no + 4) + 1):
+        line = lines[current - 1].strip()
+        brace = line.find('{')
+        if brace >= 0:
+            parts.append(line[:brace])
+            break
+        parts.append(line)
+        if line.endswith((';', ')')) and current > line_no:
+            break
+    signature = ' '.join(' '.join(parts).split())
+    return ARROW_SUFFIX.sub('', signature)[:MAX_SIGNATURE_CHARS]
+
+
+def _brace_symbols(path: str, language: str, lines: List[str]) -> List[Symbol]:
+    depths = _brace_depths(lines, language)
+    symbols = []
+
+    def visit(units, parent: Optional[str], parent_kind: Optional[str]):
+        for unit in units:
+            declaration = _declaration_line(lines, unit.start, unit.end)
+            line = lines[declaration - 1]
+            kind = unit.kind
+            name = unit.name
+            qualified_parent = parent
+            if kind == 'class':
+                match = DECLARATION.match(line)
+                keyword = (match.group('cls') or '') if match else ''
+                if keyword.startswith('impl'):
+                    kind = 'impl'
+                else:
+                    kind = DECLARATION_KINDS.get(keyword, 'class')
+            else:
+                receiver = GO_RECEIVER.match(line) if language == 'go' else None
+                if receiver:
+                    kind = 'method'
+                    qualified_parent = receiver.group('type')
+                elif parent_kind not in (None, 'namespace'):
+                    kind = 'method'
+                else:
+                    kind = 'function'
+
+            qualified = f'{qualified_parent}.{name}' if qualified_parent else name
+            # Rust impl blocks only group methods; they are not a separate symbol
+            if kind != 'impl':
+                symbols.append(Symbol(
+                    path, name, qualified, kind, unit.start, unit.end,
+                    _brace_signature(lines, declaration, unit.end),
+                    _leading_doc(lines, unit.start, declaration),
+                ))
+            if unit.children is not None:
+                visit(unit.children(), qualified, kind)
+
+    visit(_brace_units(lines, depths, 1, len(lines), 0), None, None)
+    return symbols
+
+
+def _ruby_symbols(path: str, lines: List[str]) -> List[Symbol]:
+    symbols = []
+
+    def visit(units, parent: Optional[str]):
+        for unit in units:
+            kind = unit.kind
+            if kind == 'function' and parent:
+                kind = 'method'
+            elif kind == 'class' and lines[unit.start - 1].lstrip().startswith('module'):
+                kind = 'namespace'
+            qualified = f'{parent}::{unit.name}' if parent else unit.name
+            doc_start = unit.start
+            while doc_start > 1 and lines[doc_start - 2].lstrip().startswith('#'):
+                doc_start -= 1
+            symbols.append(Symbol(
+                path, unit.name, qualified, kind, unit.start, unit.end,
+                lines[unit.start - 1].strip()[:MAX_SIGNATURE_CHARS],
+                _leading_doc(lines, doc_start, unit.start),
+            ))
+            if unit.children is not None:
+                visit(unit.children(), qualified)
+
+    visit(_ruby_units(lines, 1, len(lines), ''), None)
+    return symbols
+
+
+def extract_symbols(path: str, language: Optional[str], source: str) -> List[Symbol]:
+    """
+    Functions, classes and methods defined in one file.
+
+    Python is parsed with `ast`; brace languages reuse the chunker's
+    string- and comment-aware brace lexer; Ruby uses def/class ... end.
+    """
+    if language == 'python':
+        return _python_symbols(path, source)
+    lines = source.splitlines()
+    if not lines:
+        return []
+    if language in BRACE_LANGUAGES:
+        return _brace_symbols(path, language, lines)
+    if language == 'ruby':
+        return _ruby_symbols(path, lines)
+    return []
+
+
+def _extract_batch(args: Tuple[str, List[Tuple[str, str]]]) -> List[Tuple[str, str, List[Symbol]]]:
+    """Worker entry point: symbols for a batch of (relative path, language)"""
+    repo_path, files = args
+    results = []
+    for rel_path, language in files:
+        try:
+            with open(os.path.join(repo_path, rel_path), 'rb') as f:
+                raw = f.read(MAX_SOURCE_BYTES + 1)
+        except OSError:
+            continue
+        if len(raw) > MAX_SOURCE_BYTES or b'\x00' in raw[:8192]:
+            results.append((rel_path, language, []))
+            continue
+        source = raw.decode('utf-8', errors='replace')
+        results.append((rel_path, language, extract_symbols(rel_path, language, source)))
+    return results
+
+
+def extract_repository(repo_path: str, files: Sequence[Tuple[str, str]], max_workers: Optional[int] = None,
+                       batch_files: int = 200, min_parallel_files: int = 1000):
+    """Yield (path, language, symbols) for (relative path, language) pairs, in parallel when large"""
+    batches = [(repo_path, list(files[i:i + batch_files])) for i in range(0, len(files), batch_files)]
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers <= 1 or len(files) < min_parallel_files:
+        for batch in batches:
+            yield from _extract_batch(batch)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for results in pool.map(_extract_batch, batches):
+            yield from results
+
+
+class SymbolIndex:
+    """
+    SQLite symbol table for one analyzed commit.
+
+    Symbols are keyed by file id and line, so a file's outline is one
+    range scan; a lowercase name column with its own index serves
+    case-insensitive lookups and prefix search across the repository.
+    """
+
+    SCHEMA = """
+    CREATE TABLE files (
+        id INTEGER PRIMARY KEY,
+        path TEXT NOT NULL UNIQUE,
+        language TEXT
+    );
+    CREATE TABLE symbols (
+        file_id INTEGER NOT NULL,
+        start_line INTEGER NOT NULL,
+        end_line INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        name_key TEXT NOT NULL,
+        qualified_name TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        signature TEXT NOT NULL,
+        doc TEXT,
+        PRIMARY KEY (file_id, start_line, qualified_name)
+    ) WITHOUT ROWID;
+    CREATE INDEX symbols_name ON symbols (name_key);
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True)
+
+    @classmethod
+    def build(cls, db_path: str, repo_path: str, files: Sequence[Tuple[str, str]],
+              previous: Optional[str] = None, removed: Iterable[str] = (),
+              extract: Callable[[str, Sequence[Tuple[str, str]]], Iterable] = extract_repository) -> 'SymbolIndex':
+        """
+        Write the index for (relative path, language) pairs.
+
+        With `previous` (an older commit's database), that database is
+        copied and only `files` plus `removed` are rewritten, so unchanged
+        files are never re-parsed. `extract` yields (path, language,
+        symbols) in place of `extract_repository`.
+        """
+        tmp_path = f'{db_path}.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if previous:
+            shutil.copyfile(previous, tmp_path)
+
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute('PRAGMA journal_mode = OFF')
+            conn.execute('PRAGMA synchronous = OFF')
+            if not previous:
+                conn.executescript(cls.SCHEMA)
+
+            stale = list(removed) + [path for path, _ in files]
+            for i in range(0, len(stale), 500):
+                batch = stale[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                conn.execute(
+                    f'DELETE FROM symbols WHERE file_id IN (SELECT id FROM files WHERE path IN ({placeholders}))',
+                    batch,
+                )
+                conn.execute(f'DELETE FROM files WHERE path IN ({placeholders})', batch)
+
+            rows = []
+            for path, language, symbols in extract(repo_path, files):
+                file_id = conn.execute('INSERT INTO files (path, language) VALUES (?, ?)', (path, language)).lastrowid
+                rows.extend(
+                    (file_id, s.start_line, s.end_line, s.name, s.name.lower(), s.qualified_name,
+                     s.kind, s.signature, s.doc)
+                    for s in symbols
+                )
+                if len(rows) >= 10000:
+                    conn.executemany('INSERT OR REPLACE INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                    rows = []
+            conn.executemany('INSERT OR REPLACE INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, db_path)
+        return cls(db_path)
+
+    COLUMNS = (
+        'f.path, s.name, s.qualified_name, s.kind, s.start_line, s.end_line, s.signature, s.doc'
+    )
+
+    @staticmethod
+    def _symbol(row) -> Symbol:
+        return Symbol(*row)
+
+    def for_file(self, path: str) -> Optional[List[Symbol]]:
+        """Symbols of one file in line order, or None if the file is not indexed"""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT id FROM files WHERE path = ?', (path,)).fetchone()
+            if row is None:
+                return None
+            return [
+                self._symbol(record) for record in conn.execute(
+                    f'SELECT {self.COLUMNS} FROM symbols s JOIN files f ON f.id = s.file_id '
+                    'WHERE s.file_id = ? ORDER BY s.start_line', (row[0],),
+                )
+            ]
+        finally:
+            conn.close()
+
+    def iter_all(self) -> Iterator[Symbol]:
+        """Every symbol, grouped by file"""
+        conn = self._connect()
+        try:
+            yield from (
+                self._symbol(record) for record in conn.execute(
+                    f'SELECT {self.COLUMNS} FROM symbols s JOIN files f ON f.id = s.file_id '
+                    'ORDER BY s.file_id, s.start_line',
+                )
+            )
+        finally:
+            conn.close()
+
+    def lookup(self, name: str, limit: int = 50) -> List[Symbol]:
+        """Definitions named `name` (case-insensitive) anywhere in the repository"""
+        return self._query('s.name_key = ?', name.lower(), limit)
+
+    def search_prefix(self, prefix: str, limit: int = 50) -> List[Symbol]:
+        """Definitions whose name starts with `prefix` (case-insensitive)"""
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+        # A half-open range keeps this on the name index, unlike LIKE
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return self._query('s.name_key >= ? AND s.name_key < ?', (prefix, upper), limit)
+
+    def _query(self, where: str, params, limit: int) -> List[Symbol]:
+        params = params if isinstance(params, tuple) else (params,)
+        conn = self._connect()
+        try:
+            return [
+                self._symbol(record) for record in conn.execute(
+                    f'SELECT {self.COLUMNS} FROM symbols s JOIN files f ON f.id = s.file_id '
+                    f'WHERE {where} ORDER BY s.name_key, f.path LIMIT ?', (*params, limit),
+                )
+            ]
+        finally:
+            conn.close()
+
+
+def symbol_index_for_commit(store, repo_id: str, commit: str) -> Optional[SymbolIndex]:
+    db_path = store.artifact_path(repo_id, commit, 'symbols.sqlite')
+    if not os.path.exists(db_path):
+        return None
+    return SymbolIndex(db_path)
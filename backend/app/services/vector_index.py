@@ -0,0 +1,606 @@
+"""
+In-process vector index over memory-mapped embeddings
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.lazy import lazy_import
+from app.services.code_chunker import CodeChunk
+
+np = lazy_import('numpy')
+
+
+class VectorIndex:
+    """
+    Per-repository vector index stored in a directory:
+
+        meta.json      count, capacity, dimensions, dtype, IVF state
+        vectors.bin    float32 or int8 rows, memory-mapped and grown by doubling
+        scales.bin     per-row dequantization scale (int8 only)
+        deleted.bin    tombstone byte per row
+        chunks.sqlite  row -> chunk metadata and content, path lookup for deletes
+        ivf.*          optional inverted-file index, vectors regrouped by list
+
+    Vectors are L2-normalized on insert so inner product is cosine
+    similarity. Small indexes are searched exactly in fixed-size blocks;
+    once an IVF index is built, queries probe the nearest lists and rows
+    appended since the build are scanned exactly until the next rebuild.
+
+    A full rebuild is written to a staging directory and swapped in with
+    `publish`; readers notice the directory's new inode and reopen.
+    """
+
+    BLOCK_ROWS = 65536
+
+    def __init__(self, directory: str, dimensions: Optional[int] = None, dtype: str = 'float32'):
+        self.directory = directory
+        self._meta_mtime = None
+        self._directory_inode = None
+        # (vectors, scales, deleted), swapped as one so a query running on
+        # another thread never pairs new vectors with old tombstones
+        self._maps = None
+        self._ivf = None
+
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            self._load_meta()
+        else:
+            if dimensions is None:
+                raise ValueError('dimensions are required to create a new index')
+            if dtype not in ('float32', 'int8'):
+                raise ValueError(f'Unsupported dtype: {dtype}')
+            os.makedirs(directory, exist_ok=True)
+            self.meta = {
+                'dimensions': dimensions,
+                'dtype': dtype,
+                'count': 0,
+                'capacity': 0,
+                'live': 0,
+                'commit': None,
+                'ivf_rows': 0,
+                'ivf_lists': 0,
+            }
+            self._init_db()
+            self._write_meta()
+        self._directory_inode = os.stat(directory).st_ino
+
+    @property
+    def dimensions(self) -> int:
+        return self.meta['dimensions']
+
+    @property
+    def count(self) -> int:
+        return self.meta['live']
+
+    @property
+    def commit(self) -> Optional[str]:
+        return self.meta['commit']
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._path('chunks.sqlite'), timeout=30)
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS chunks ('
+                'row INTEGER PRIMARY KEY, path TEXT NOT NULL, language TEXT, '
+                'start_line INTEGER, end_line INTEGER, kind TEXT, symbols TEXT, '
+                'token_count INTEGER, content_hash TEXT, content TEXT)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path)')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _load_meta(self):
+        meta_path = self._path('meta.json')
+        with open(meta_path, 'r') as f:
+            self.meta = json.load(f)
+        self._meta_mtime = os.stat(meta_path).st_mtime_ns
+        self._maps = None
+        self._ivf = None
+
+    def _write_meta(self):
+        tmp_path = self._path('meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._path('meta.json'))
+        self._meta_mtime = os.stat(self._path('meta.json')).st_mtime_ns
+
+    def refresh(self):
+        """Pick up writes made by another process or index instance, or a published rebuild"""
+        try:
+            inode = os.stat(self.directory).st_ino
+            mtime = os.stat(self._path('meta.json')).st_mtime_ns
+        except FileNotFoundError:
+            # Mid-swap: keep serving from the maps already open
+            return
+        if inode != self._directory_inode or mtime != self._meta_mtime:
+            self._load_meta()
+            self._directory_inode = inode
+
+    def _np_dtype(self):
+        return np.int8 if self.meta['dtype'] == 'int8' else np.float32
+
+    def _map(self, name: str, dtype, shape: Tuple[int, ...], mode: str = 'r+'):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode=mode, shape=shape)
+
+    def _arrays(self):
+        maps = self._maps
+        if maps is None:
+            capacity = self.meta['capacity']
+            maps = (
+                self._map('vectors.bin', self._np_dtype(), (capacity, self.dimensions)),
+                self._map('scales.bin', np.float32, (capacity,)) if self.meta['dtype'] == 'int8' else None,
+                self._map('deleted.bin', np.uint8, (capacity,)),
+            )
+            self._maps = maps
+        return maps
+
+    def _grow(self, needed: int):
+        capacity = self.meta['capacity']
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        itemsize = np.dtype(self._np_dtype()).itemsize
+        files = [('vectors.bin', itemsize * self.dimensions), ('deleted.bin', 1)]
+        if self.meta['dtype'] == 'int8':
+            files.append(('scales.bin', 4))
+        self._maps = None
+        for name, row_bytes in files:
+            with open(self._path(name), 'ab') as f:
+                f.truncate(new_capacity * row_bytes)
+        self.meta['capacity'] = new_capacity
+
+    def add(self, vectors: np.ndarray, chunks: Sequence[CodeChunk]) -> List[int]:
+        """Append vectors with their chunk metadata; returns the new row ids"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimensions)
+        if len(vectors) != len(chunks):
+            raise ValueError('vectors and chunks must have the same length')
+        if not len(vectors):
+            return []
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        start = self.meta['count']
+        end = start + len(vectors)
+        self._grow(end)
+        stored, scales, deleted = self._arrays()
+
+        if self.meta['dtype'] == 'int8':
+            row_scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+            stored[start:end] = np.round(vectors / row_scales[:, None]).astype(np.int8)
+            scales[start:end] = row_scales
+        else:
+            stored[start:end] = vectors
+        deleted[start:end] = 0
+        stored.flush()
+        deleted.flush()
+        if scales is not None:
+            scales.flush()
+
+        rows = list(range(start, end))
+        conn = self._connect()
+        try:
+            conn.executemany(
+                'INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (row, c.path, c.language, c.start_line, c.end_line, c.kind,
+                     json.dumps(c.symbols), c.token_count, c.content_hash, c.content)
+                    for row, c in zip(rows, chunks)
+                ],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        if self.meta['ivf_lists']:
+            self._append_to_ivf(start, end)
+
+        self.meta['count'] = end
+        self.meta['live'] += len(rows)
+        self._write_meta()
+        return rows
+
+    def delete_paths(self, paths: Iterable[str]) -> int:
+        """Tombstone every row belonging to the given files"""
+        paths = list(paths)
+        if not paths:
+            return 0
+        conn = self._connect()
+        try:
+            rows = []
+            for i in range(0, len(paths), 500):
+                batch = paths[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows.extend(row for (row,) in conn.execute(
+                    f'SELECT row FROM chunks WHERE path IN ({placeholders})', batch
+                ))
+                conn.execute(f'DELETE FROM chunks WHERE path IN ({placeholders})', batch)
+            conn.commit()
+        finally:
+            conn.close()
+
+        if rows:
+            _, _, deleted = self._arrays()
+            deleted[np.asarray(rows, dtype=np.int64)] = 1
+            deleted.flush()
+            self.meta['live'] -= len(rows)
+            self._write_meta()
+        return len(rows)
+
+    def set_commit(self, commit: str):
+        self.meta['commit'] = commit
+        self._write_meta()
+
+    CHUNK_COLUMNS = 'row, path, language, start_line, end_line, kind, symbols, token_count, content_hash, content'
+
+    @staticmethod
+    def _chunk_record(record) -> Dict:
+        _, path, language, start, end, kind, symbols, tokens, digest, content = record
+        return {
+            'path': path,
+            'language': language,
+            'start_line': start,
+            'end_line': end,
+            'kind': kind,
+            'symbols': json.loads(symbols),
+            'token_count': tokens,
+            'content_hash': digest,
+            'content': content,
+        }
+
+    def chunks_for_rows(self, rows: Sequence[int]) -> Dict[int, Dict]:
+        if not rows:
+            return {}
+        conn = self._connect()
+        try:
+            placeholders = ','.join('?' * len(rows))
+            return {
+                record[0]: self._chunk_record(record)
+                for record in conn.execute(
+                    f'SELECT {self.CHUNK_COLUMNS} FROM chunks WHERE row IN ({placeholders})', list(rows)
+                )
+            }
+        finally:
+            conn.close()
+
+    def chunks_for_spans(self, spans: Sequence[Tuple[str, int, int]]) -> Dict[Tuple[str, int, int], Dict]:
+        """Live chunks by (path, start_line, end_line), e.g. to hydrate lexical search hits"""
+        result = {}
+        conn = self._connect()
+        try:
+            for span in spans:
+                record = conn.execute(
+                    f'SELECT {self.CHUNK_COLUMNS} FROM chunks WHERE path = ? AND start_line = ? AND end_line = ?',
+                    span,
+                ).fetchone()
+                if record is not None:
+                    result[tuple(span)] = self._chunk_record(record)
+        finally:
+            conn.close()
+        return result
+
+    def _score_block(self, queries: np.ndarray, lo: int, hi: int) -> np.ndarray:
+        stored, scales, deleted = self._arrays()
+        block = stored[lo:hi]
+        if self.meta['dtype'] == 'int8':
+            scores = (queries @ block.T.astype(np.float32)) * scales[lo:hi]
+        else:
+            scores = queries @ block.T
+        scores[:, deleted[lo:hi] != 0] = -np.inf
+        return scores
+
+    @staticmethod
+    def _merge_top_k(best_scores: np.ndarray, best_rows: np.ndarray, scores: np.ndarray,
+                     rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Merge a block's scores into the running per-query top-k"""
+        all_scores = np.concatenate([best_scores, scores], axis=1)
+        all_rows = np.concatenate([best_rows, np.broadcast_to(rows, scores.shape)], axis=1)
+        if all_scores.shape[1] > k:
+            keep = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+            all_scores = np.take_along_axis(all_scores, keep, axis=1)
+            all_rows = np.take_along_axis(all_rows, keep, axis=1)
+        return all_scores, all_rows
+
+    def _exact(self, queries: np.ndarray, k: int, lo: int = 0, hi: Optional[int] = None):
+        hi = self.meta['count'] if hi is None else hi
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(lo, hi, self.BLOCK_ROWS):
+            end = min(start + self.BLOCK_ROWS, hi)
+            scores = self._score_block(queries, start, end)
+            best_scores, best_rows = self._merge_top_k(
+                best_scores, best_rows, scores, np.arange(start, end, dtype=np.int64), k
+            )
+        return best_scores, best_rows
+
+    def search(self, queries, k: int = 10, nprobe: int = 16) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k rows by cosine similarity for one query vector or a batch.
+
+        Returns, per query, (row, score) pairs sorted best first.
+        """
+        self.refresh()
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dimensions)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        if self.meta['count'] == 0:
+            return [[] for _ in queries]
+
+        if self.meta['ivf_lists']:
+            scores, rows = self._ivf_search(queries, k, nprobe)
+        else:
+            scores, rows = self._exact(queries, k)
+
+        results = []
+        for query_scores, query_rows in zip(scores, rows):
+            order = np.argsort(-query_scores)
+            results.append([
+                (int(query_rows[i]), float(query_scores[i]))
+                for i in order if np.isfinite(query_scores[i])
+            ][:k])
+        return results
+
+    def query(self, vector, k: int = 10, nprobe: int = 16) -> List[Dict]:
+        """Top-k chunks for one query vector, with their metadata and score"""
+        hits = self.search(vector, k, nprobe)[0]
+        chunks = self.chunks_for_rows([row for row, _ in hits])
+        return [
+            dict(chunks[row], score=score)
+            for row, score in hits if row in chunks
+        ]
+
+    def build_ivf(self, nlist: Optional[int] = None, iterations: int = 10, sample_size: int = 65536, seed: int = 0):
+        """
+        Cluster current rows with k-means and regroup them by nearest centroid.
+
+        Vectors are copied into list order so each probed list is one
+        contiguous memmap slice.
+        """
+        count = self.meta['count']
+        if count == 0:
+            return
+        nlist = nlist or max(1, min(4096, int(np.sqrt(count))))
+        rng = np.random.default_rng(seed)
+
+        sample_rows = np.sort(rng.choice(count, size=min(sample_size, count), replace=False))
+        sample = self._dequantize(sample_rows)
+        centroids = sample[rng.choice(len(sample), size=min(nlist, len(sample)), replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(len(centroids)):
+                members = sample[assign == c]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        assign = np.empty(count, dtype=np.int32)
+        for start in range(0, count, self.BLOCK_ROWS):
+            end = min(start + self.BLOCK_ROWS, count)
+            assign[start:end] = np.argmax(self._dequantize(np.arange(start, end)) @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind='stable').astype(np.int64)
+        offsets = np.searchsorted(assign[order], np.arange(len(centroids) + 1)).astype(np.int64)
+
+        # Readers may have the current IVF files mapped: write new ones
+        # under temporary names and swap each in whole
+        stored, scales, _ = self._arrays()
+        staged = {}
+        grouped_path = staged['ivf.vectors.bin'] = self._staging_path('ivf.vectors.bin')
+        grouped = np.memmap(grouped_path, dtype=self._np_dtype(), mode='w+', shape=(count, self.dimensions))
+        for start in range(0, count, self.BLOCK_ROWS):
+            end = min(start + self.BLOCK_ROWS, count)
+            grouped[start:end] = stored[order[start:end]]
+        grouped.flush()
+        del grouped
+        arrays = {'ivf.centroids.npy': centroids.astype(np.float32), 'ivf.rows.npy': order,
+                  'ivf.offsets.npy': offsets}
+        if scales is not None:
+            arrays['ivf.scales.npy'] = np.asarray(scales[order])
+        for name, array in arrays.items():
+            staged[name] = self._staging_path(name)
+            with open(staged[name], 'wb') as f:
+                np.save(f, array)
+        for name, path in staged.items():
+            os.replace(path, self._path(name))
+
+        self.meta['ivf_rows'] = count
+        self.meta['ivf_lists'] = len(centroids)
+        self._ivf = None
+        self._write_meta()
+
+    def _staging_path(self, name: str) -> str:
+        fd, path = tempfile.mkstemp(dir=self.directory, prefix=f'{name}.', suffix='.tmp')
+        os.close(fd)
+        return path
+
+    def _dequantize(self, rows: np.ndarray) -> np.ndarray:
+        stored, scales, _ = self._arrays()
+        vectors = np.asarray(stored[rows], dtype=np.float32)
+        if scales is not None:
+            vectors *= scales[rows][:, None]
+        return vectors
+
+    def _append_to_ivf(self, start: int, end: int):
+        """New rows stay in the exact-scan tail; rebuild once the tail grows large"""
+        ivf_rows = self.meta['ivf_rows']
+        if end - ivf_rows > max(10000, ivf_rows // 10):
+            self.meta['count'] = end
+            self.build_ivf()
+
+    def _load_ivf(self):
+        if self._ivf is None:
+            count = self.meta['ivf_rows']
+            self._ivf = {
+                'centroids': np.load(self._path('ivf.centroids.npy')),
+                'rows': np.load(self._path('ivf.rows.npy'), mmap_mode='r'),
+                'offsets': np.load(self._path('ivf.offsets.npy')),
+                'vectors': np.memmap(self._path('ivf.vectors.bin'), dtype=self._np_dtype(), mode='r',
+                                     shape=(count, self.dimensions)),
+                'scales': (np.load(self._path('ivf.scales.npy'), mmap_mode='r')
+                           if self.meta['dtype'] == 'int8' else None),
+            }
+        return self._ivf
+
+    def _ivf_search(self, queries: np.ndarray, k: int, nprobe: int):
+        ivf = self._load_ivf()
+        _, _, deleted = self._arrays()
+        nprobe = min(nprobe, len(ivf['centroids']))
+        probes = np.argpartition(-(queries @ ivf['centroids'].T), nprobe - 1, axis=1)[:, :nprobe]
+
+        all_scores, all_rows = [], []
+        for query, lists in zip(queries, probes):
+            best_scores = np.empty((1, 0), dtype=np.float32)
+            best_rows = np.empty((1, 0), dtype=np.int64)
+            for c in lists:
+                lo, hi = ivf['offsets'][c], ivf['offsets'][c + 1]
+                if lo == hi:
+                    continue
+                block = ivf['vectors'][lo:hi]
+                rows = np.asarray(ivf['rows'][lo:hi])
+                if ivf['scales'] is not None:
+                    scores = (block.astype(np.float32) @ query) * ivf['scales'][lo:hi]
+                else:
+                    scores = block @ query
+                scores = np.where(deleted[rows] != 0, -np.inf, scores)
+                best_scores, best_rows = self._merge_top_k(best_scores, best_rows, scores[None, :], rows, k)
+            all_scores.append(best_scores[0])
+            all_rows.append(best_rows[0])
+
+        width = max(len(s) for s in all_scores)
+        scores = np.full((len(queries), width), -np.inf, dtype=np.float32)
+        rows = np.zeros((len(queries), width), dtype=np.int64)
+        for i, (s, r) in enumerate(zip(all_scores, all_rows)):
+            scores[i, :len(s)] = s
+            rows[i, :len(r)] = r
+
+        # Rows appended after the last build are not in any list yet
+        if self.meta['count'] > self.meta['ivf_rows']:
+            tail_scores, tail_rows = self._exact(queries, k, lo=self.meta['ivf_rows'])
+            scores, rows = self._merge_top_k(scores, rows, tail_scores, tail_rows, k)
+        return scores, rows
+
+
+class PgVectorIndex:
+    """
+    Optional pgvector backend with the same add/delete_paths/query
+    surface, for deployments that prefer keeping vectors in Postgres.
+    """
+
+    def __init__(self, engine, repo_id: str, dimensions: int, table: str = 'chunk_vectors'):
+        self.engine = engine
+        self.repo_id = repo_id
+        self.dimensions = dimensions
+        self.table = table
+
+    def ensure_schema(self):
+        from sqlalchemy import text
+        with self.engine.begin() as conn:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS vector'))
+            conn.execute(text(
+                f'CREATE TABLE IF NOT EXISTS {self.table} ('
+                'id BIGSERIAL PRIMARY KEY, repo_id TEXT NOT NULL, path TEXT NOT NULL, '
+                'start_line INT, end_line INT, content_hash TEXT, content TEXT, '
+                f'embedding vector({self.dimensions}))'
+            ))
+            conn.execute(text(f'CREATE INDEX IF NOT EXISTS {self.table}_repo_path ON {self.table} (repo_id, path)'))
+
+    def add(self, vectors: np.ndarray, chunks: Sequence[CodeChunk]):
+        from sqlalchemy import text
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(
+                    f'INSERT INTO {self.table} (repo_id, path, start_line, end_line, content_hash, content, embedding) '
+                    'VALUES (:repo_id, :path, :start, :end, :hash, :content, CAST(:embedding AS vector))'
+                ),
+                [
+                    {
+                        'repo_id': self.repo_id, 'path': c.path, 'start': c.start_line, 'end': c.end_line,
+                        'hash': c.content_hash, 'content': c.content,
+                        'embedding': '[' + ','.join(f'{x:.7g}' for x in vector) + ']',
+                    }
+                    for vector, c in zip(np.asarray(vectors, dtype=np.float32), chunks)
+                ],
+            )
+
+    def delete_paths(self, paths: Iterable[str]) -> int:
+        from sqlalchemy import bindparam, text
+        paths = list(paths)
+        if not paths:
+            return 0
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                text(f'DELETE FROM {self.table} WHERE repo_id = :repo_id AND path IN :paths')
+                .bindparams(bindparam('paths', expanding=True)),
+                {'repo_id': self.repo_id, 'paths': paths},
+            )
+            return result.rowcount
+
+    def query(self, query, k: int = 10) -> List[Dict]:
+        from sqlalchemy import text
+        literal = '[' + ','.join(f'{x:.7g}' for x in np.asarray(query, dtype=np.float32).ravel()) + ']'
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    f'SELECT path, start_line, end_line, content_hash, content, '
+                    f'1 - (embedding <=> CAST(:q AS vector)) AS score FROM {self.table} '
+                    'WHERE repo_id = :repo_id ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k'
+                ),
+                {'q': literal, 'repo_id': self.repo_id, 'k': k},
+            )
+            return [dict(row._mapping) for row in rows]
+
+
+def staging_directory(directory: str) -> str:
+    """Empty sibling of `directory` to build a replacement index in"""
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    return tempfile.mkdtemp(dir=parent, prefix=f'{os.path.basename(directory)}.build-')
+
+
+def publish(staging: str, directory: str):
+    """
+    Swap a fully built index directory into place. Open indexes keep the
+    files they have mapped and reopen on the new inode.
+    """
+    retired = None
+    if os.path.exists(directory):
+        retired = tempfile.mkdtemp(dir=os.path.dirname(directory), prefix=f'{os.path.basename(directory)}.old-')
+        os.replace(directory, retired)
+    os.replace(staging, directory)
+    if retired:
+        shutil.rmtree(retired, ignore_errors=True)
+
+
+_open_indexes: Dict[str, VectorIndex] = {}
+
+
+def open_repo_index(store, repo_id: str) -> Optional[VectorIndex]:
+    """Shared, lazily opened vector index for a repository, or None if not built"""
+    directory = os.path.join(store.repo_dir(repo_id), 'vectors')
+    index = _open_indexes.get(directory)
+    try:
+        inode = os.stat(directory).st_ino
+    except FileNotFoundError:
+        # Not built yet, or mid-swap while a rebuild is published
+        return index
+    if index is None or index._directory_inode != inode:
+        _open_indexes.pop(directory, None)
+        if not os.path.exists(os.path.join(directory, 'meta.json')):
+            return None
+        index = _open_indexes[directory] = VectorIndex(directory)
+    return index
@@ -0,0 +1,214 @@
+"""
+Analysis benchmarks on a synthetic repository
+
+    python benchmarks/bench_analysis.py --files 20000 --output results.json
+    python benchmarks/bench_analysis.py --baseline benchmarks/baselines/analysis-small.json
+    python benchmarks/bench_analysis.py --save-baseline benchmarks/baselines/analysis-small.json
+
+Times (median of --repeat runs) and measures peak traced memory for
+CodeParserService.parse_structure, get_statistics, identify_entry_points
+and parse_dependencies, each on a fresh service so the scan is included.
+Unless --skip-api is given, the repository is then analyzed end to end
+through an in-process client and the read endpoints are timed cold (first
+call) and warm.
+
+With --baseline, every timing and memory figure is compared with the
+stored run; the script exits with status 1 if any is more than
+--tolerance slower or larger (and above a small absolute noise floor).
+Baselines are machine-specific: record them on the hardware that checks
+them.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from synthetic_repo import add_spec_arguments, generate, spec_from_args  # noqa: E402
+
+# Absolute changes below these are noise, whatever the ratio
+FLOOR_SECONDS = 0.005
+FLOOR_MB = 1.0
+
+
+def measure(fn: Callable[[], object], repeat: int, trace_memory: bool = True) -> Dict:
+    """Median and best wall time over `repeat` runs, plus peak traced memory of one run"""
+    result = {}
+    if trace_memory:
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['peak_mb'] = round(peak / (1024 * 1024), 2)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    result['seconds'] = round(statistics.median(timings), 4)
+    result['best_seconds'] = round(min(timings), 4)
+    return result
+
+
+def bench_parser(root: str, repeat: int) -> Dict[str, Dict]:
+    from app.services.code_parser import CodeParserService
+
+    results = {'scan': measure(lambda: CodeParserService(root).scan(), repeat)}
+    for method in ('parse_structure', 'get_statistics', 'identify_entry_points', 'parse_dependencies'):
+        results[method] = measure(lambda: getattr(CodeParserService(root), method)(), repeat)
+    return results
+
+
+def bench_api(root: str, repeat: int) -> Dict[str, Dict]:
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    results: Dict[str, Dict] = {}
+    with TestClient(app) as client:
+        started = time.perf_counter()
+        job_id = client.post('/api/v1/repos/analyze', json={
+            'repo_url': f'file://{root}', 'branch': 'main', 'repo_id': 'synthetic',
+        }).json()['job_id']
+        with client.stream('GET', f'/api/v1/repos/jobs/{job_id}/events') as events:
+            for _ in events.iter_lines():
+                pass
+        job = client.get(f'/api/v1/repos/jobs/{job_id}').json()
+        if job['status'] != 'completed':
+            raise RuntimeError(f"Analysis failed: {job['error']}")
+        results['analyze'] = {'seconds': round(time.perf_counter() - started, 3)}
+
+        sample = client.get('/api/v1/repos/synthetic/symbols', params={'prefix': 'payment'}).json()
+        context_path = sample['symbols'][0]['path'] if sample.get('symbols') else 'main.py'
+        requests = {
+            'GET overview': lambda: client.get('/api/v1/analysis/synthetic/overview'),
+            'GET data-flow': lambda: client.get('/api/v1/analysis/synthetic/data-flow'),
+            'GET structure': lambda: client.get('/api/v1/repos/synthetic/structure'),
+            'GET search': lambda: client.get('/api/v1/repos/synthetic/search', params={'q': 'payment queue'}),
+            'GET symbols': lambda: client.get('/api/v1/repos/synthetic/symbols', params={'prefix': 'order'}),
+            'GET file context': lambda: client.get(f'/api/v1/chat/synthetic/context/{context_path}'),
+            'POST chat query': lambda: client.post('/api/v1/chat/query', json={
+                'repo_id': 'synthetic', 'message': 'How is the payment queue computed?',
+            }),
+        }
+        for name, call in requests.items():
+            started = time.perf_counter()
+            response = call()
+            cold = time.perf_counter() - started
+            if response.status_code != 200:
+                raise RuntimeError(f'{name} returned {response.status_code}: {response.text[:200]}')
+            results[name] = dict(measure(call, repeat, trace_memory=False), cold_seconds=round(cold, 4))
+    return results
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Human-readable regressions of `current` against `baseline`"""
+    regressions = []
+    for section in ('parser', 'api'):
+        for name, stored in baseline.get(section, {}).items():
+            measured = current.get(section, {}).get(name)
+            if measured is None:
+                continue
+            for metric, floor in (('seconds', FLOOR_SECONDS), ('cold_seconds', FLOOR_SECONDS), ('peak_mb', FLOOR_MB)):
+                if metric not in stored or metric not in measured:
+                    continue
+                before, after = stored[metric], measured[metric]
+                if after > before * (1 + tolerance) and after - before > floor:
+                    change = f' (+{(after / before - 1) * 100:.0f}%)' if before else ''
+                    regressions.append(f'{section}.{name}.{metric}: {before} -> {after}{change}')
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main(args) -> int:
+    spec = spec_from_args(args)
+    with tempfile.TemporaryDirectory() as scratch:
+        root = os.path.join(scratch, 'repo')
+        started = time.perf_counter()
+        summary = generate(root, spec, git=not args.skip_api)
+        generate_seconds = time.perf_counter() - started
+
+        # Settings are read on first import of the app, so configure it first
+        os.environ.update({
+            'DATABASE_URL': f'sqlite:///{scratch}/bench.db',
+            'ANALYSIS_DATA_DIR': os.path.join(scratch, 'analysis'),
+            'CLONE_CACHE_DIR': os.path.join(scratch, 'clones'),
+            'DEPENDENCY_CACHE_DIR': os.path.join(scratch, 'dependencies'),
+            'EMBEDDING_CACHE_PATH': os.path.join(scratch, 'embeddings.sqlite'),
+            'BLOB_STORE_PATH': os.path.join(scratch, 'blobs.sqlite'),
+            'EMBEDDING_BACKEND': 'fake',
+            'LLM_BACKEND': 'fake',
+            'REDIS_URL': 'memory://',
+        })
+        for name in ('GITHUB_CLIENT_ID', 'GITHUB_CLIENT_SECRET', 'GITHUB_REDIRECT_URI', 'OPENAI_API_KEY', 'SECRET_KEY'):
+            os.environ.setdefault(name, 'benchmark')
+
+        results = {
+            'meta': {
+                'spec': spec.to_dict(),
+                'repository': summary,
+                'generate_seconds': round(generate_seconds, 2),
+                'repeat': args.repeat,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'commit': _git_commit(),
+            },
+            'parser': bench_parser(root, args.repeat),
+        }
+        if not args.skip_api:
+            results['api'] = bench_api(root, args.repeat)
+        # ru_maxrss is KiB on Linux
+        results['meta']['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w') as f:
+            f.write(output + '\n')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta']['spec'] != results['meta']['spec']:
+            print('warning: baseline was recorded for a different repository spec', file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        if regressions:
+            return 1
+        print(f'No regressions against {args.baseline}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_spec_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-api', action='store_true', help='Only benchmark CodeParserService')
+    parser.add_argument('--output', help='Write results JSON here as well as to stdout')
+    parser.add_argument('--baseline', help='Compare against this results file')
+    parser.add_argument('--save-baseline', help='Store these results as a baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown ratio (0.25 = 25%%)')
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,124 @@
+"""
+Prompt tokens and recall: ContextPacker against naive top-k concatenation
+
+    python benchmarks/bench_context.py
+    python benchmarks/bench_context.py --repo /path/to/checkout --budgets 4000,8000 --k 12
+
+Questions are the first doc line of each documented function or method in
+the fixture repository (this backend by default); the expected answer is
+that definition's line span. Retrieval is the chat endpoint's fusion of
+fake-embedding cosine and BM25 results, so the run is fully offline. A
+question counts as recalled when at least half of its span is in the
+prompt.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for name in ('DATABASE_URL', 'GITHUB_CLIENT_ID', 'GITHUB_CLIENT_SECRET', 'GITHUB_REDIRECT_URI',
+             'OPENAI_API_KEY', 'SECRET_KEY'):
+    os.environ.setdefault(name, 'benchmark')
+os.environ.setdefault('REDIS_URL', 'memory://')
+
+from app.services.code_chunker import CodeChunker, default_token_counter  # noqa: E402
+from app.services.code_parser import CodeParserService  # noqa: E402
+from app.services.context_packer import ContextPacker  # noqa: E402
+from app.services.embedding_service import FakeEmbedder  # noqa: E402
+from app.services.lexical_index import LexicalIndex, reciprocal_rank_fusion  # noqa: E402
+from app.services.llm_service import build_messages  # noqa: E402
+from app.services.symbol_index import extract_repository  # noqa: E402
+
+DEFAULT_REPO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+
+
+def covered(blocks, path: str, start: int, end: int) -> bool:
+    lines = set()
+    for block in blocks:
+        if block['path'] == path:
+            lines.update(range(max(start, block['start_line']), min(end, block['end_line']) + 1))
+    return len(lines) * 2 >= end - start + 1
+
+
+def main(args):
+    count_tokens = default_token_counter(args.model)
+    files = CodeParserService(args.repo).scan().files
+    chunks = list(CodeChunker(max_tokens=args.chunk_tokens, token_counter=count_tokens).iter_chunks(args.repo, files))
+    by_span = {(c.path, c.start_line, c.end_line): dict(c.to_dict(), score=0.0) for c in chunks}
+    spans = list(by_span)
+
+    embedder = FakeEmbedder(dimensions=256)
+    matrix = np.array([embedder.embed_one(c.content) for c in chunks], dtype=np.float32)
+
+    questions = []
+    for path, _, symbols in extract_repository(args.repo, [(f.path, f.language) for f in files if f.language]):
+        for symbol in symbols:
+            if symbol.kind in ('function', 'method') and symbol.doc and len(symbol.doc.split()) >= 4:
+                questions.append((symbol.doc, path, symbol.start_line, symbol.end_line))
+    questions = questions[:args.questions]
+
+    packers = {budget: ContextPacker(max_tokens=budget, token_counter=count_tokens) for budget in args.budgets}
+    naive_tokens = naive_recall = 0
+    totals = {budget: dict.fromkeys(('tokens', 'recall', 'merged', 'duplicates', 'dropped', 'truncated', 'seconds'), 0)
+              for budget in args.budgets}
+    with tempfile.TemporaryDirectory() as scratch:
+        lexical = LexicalIndex.build(os.path.join(scratch, 'lexical'), chunks)
+        for question, path, start, end in questions:
+            scores = matrix @ np.asarray(embedder.embed_one(question), dtype=np.float32)
+            vector_hits = [dict(by_span[spans[i]], score=float(scores[i])) for i in np.argsort(-scores)[:args.k * 3]]
+            lexical_hits = lexical.search(question, args.k * 3)
+            hits = [
+                dict(by_span[(hit['path'], hit['start_line'], hit['end_line'])], score=hit['fused_score'])
+                for hit in reciprocal_rank_fusion([vector_hits, lexical_hits])[:args.k]
+            ]
+            naive_tokens += packers[args.budgets[0]].count_messages(build_messages(question, hits))
+            naive_recall += covered(hits, path, start, end)
+
+            for budget, packer in packers.items():
+                started = time.perf_counter()
+                packed = packer.pack(question, hits)
+                total = totals[budget]
+                total['seconds'] += time.perf_counter() - started
+                total['tokens'] += packed.tokens
+                total['recall'] += covered(packed.blocks, path, start, end)
+                for key in ('merged', 'duplicates', 'dropped', 'truncated'):
+                    total[key] += packed.stats[key]
+
+    n = max(len(questions), 1)
+    print(json.dumps({
+        'repo': args.repo,
+        'chunks': len(chunks),
+        'questions': len(questions),
+        'k': args.k,
+        'naive': {'mean_prompt_tokens': round(naive_tokens / n), 'recall': round(naive_recall / n, 3)},
+        'packed': [
+            {
+                'budget': budget,
+                'mean_prompt_tokens': round(total['tokens'] / n),
+                'tokens_saved_pct': round(100 * (1 - total['tokens'] / max(naive_tokens, 1)), 1),
+                'recall': round(total['recall'] / n, 3),
+                'per_question': {
+                    key: round(total[key] / n, 2) for key in ('merged', 'duplicates', 'dropped', 'truncated')
+                },
+                'pack_ms': round(1000 * total['seconds'] / n, 2),
+            }
+            for budget, total in totals.items()
+        ],
+    }, indent=2))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repo', default=DEFAULT_REPO, help='Fixture repository (default: this backend)')
+    parser.add_argument('--budgets', type=lambda value: [int(b) for b in value.split(',')],
+                        default=[3000, 4000, 5000, 6000], help='Comma-separated prompt token budgets')
+    parser.add_argument('--k', type=int, default=8, help='Retrieved chunks per question')
+    parser.add_argument('--questions', type=int, default=200)
+    parser.add_argument('--chunk-tokens', type=int, default=800)
+    parser.add_argument('--model', default='gpt-4o-mini')
+    main(parser.parse_args())
@@ -0,0 +1,114 @@
+"""
+Dependency engine on a large synthetic package-lock.json
+
+    python benchmarks/bench_dependencies.py --packages 100000
+
+Writes a v3 lockfile with nested installs and reports, for the streaming
+parser against `json.load` of the whole file, the parse time and peak
+traced memory, then the time to analyze the repository again once the
+lockfile is in the content-hash cache.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Tuple
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# Settings are validated on import; none of them are used here
+for name in ('DATABASE_URL', 'GITHUB_CLIENT_ID', 'GITHUB_CLIENT_SECRET', 'GITHUB_REDIRECT_URI',
+             'OPENAI_API_KEY', 'SECRET_KEY', 'REDIS_URL'):
+    os.environ.setdefault(name, 'benchmark')
+
+
+def write_lockfile(path: str, packages: int, seed: int):
+    """A hoisted tree of `packages` installs, 1 in 10 nested under another package"""
+    rng = random.Random(seed)
+    names = [f'pkg-{i}' for i in range(packages)]
+    entries = {'': {'name': 'synthetic', 'version': '1.0.0',
+                    'dependencies': {name: '^1.0.0' for name in names[:50]}}}
+    for i, name in enumerate(names):
+        deps = {dep: '^1.0.0' for dep in rng.sample(names, 3) if dep != name}
+        install_path = f'node_modules/{name}'
+        if i % 10 == 9:
+            install_path = f'node_modules/{names[i - 1]}/node_modules/{name}'
+        entries[install_path] = {
+            'version': f'1.{i % 7}.{i % 13}',
+            'resolved': f'https://registry.npmjs.org/{name}/-/{name}-1.0.0.tgz',
+            'integrity': 'sha512-' + 'x' * 86,
+            'dependencies': deps,
+        }
+    with open(path, 'w') as f:
+        json.dump({'name': 'synthetic', 'lockfileVersion': 3, 'requires': True, 'packages': entries}, f, indent=2)
+    with open(os.path.join(os.path.dirname(path), 'package.json'), 'w') as f:
+        json.dump({'name': 'synthetic', 'dependencies': entries['']['dependencies']}, f)
+
+
+def peak(fn: Callable[[], object]) -> Tuple[object, float, float]:
+    """Result, seconds and peak traced MB of fn(); timed in a separate, untraced run"""
+    started = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    result = fn()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak_bytes / (1024 * 1024)
+
+
+def main(args) -> Dict:
+    from app.services.code_parser import CodeParserService
+    from app.services.dependency_engine import DependencyEngine, LockfileCache
+    from app.services.dependency_parsers import parse_package_lock
+
+    with tempfile.TemporaryDirectory() as scratch:
+        repo = os.path.join(scratch, 'repo')
+        os.makedirs(repo)
+        lock_path = os.path.join(repo, 'package-lock.json')
+        write_lockfile(lock_path, args.packages, args.seed)
+
+        def load_whole():
+            with open(lock_path) as f:
+                return json.load(f)
+
+        lock, stream_seconds, stream_mb = peak(lambda: parse_package_lock(lock_path))
+        _, load_seconds, load_mb = peak(load_whole)
+
+        files = dict.fromkeys(['package.json', 'package-lock.json'])
+        engine = DependencyEngine(repo, CodeParserService.CONFIG_FILES, LockfileCache(os.path.join(scratch, 'cache')))
+        started = time.perf_counter()
+        report = engine.analyze(files)
+        cold_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        engine.analyze(files)
+        warm_seconds = time.perf_counter() - started
+
+        return {
+            'meta': {'packages': args.packages, 'lockfile_mb': round(os.path.getsize(lock_path) / (1024 * 1024), 1)},
+            'parse': {
+                'stream_seconds': round(stream_seconds, 3),
+                'stream_peak_mb': round(stream_mb, 1),
+                'json_load_seconds': round(load_seconds, 3),
+                'json_load_peak_mb': round(load_mb, 1),
+                'memory_ratio': round(load_mb / stream_mb, 1),
+                'edges': sum(len(targets) for targets in lock['requires']),
+            },
+            'analyze': {
+                'cold_seconds': round(cold_seconds, 3),
+                'cached_seconds': round(warm_seconds, 3),
+                'graph': report['graph'].statistics(),
+            },
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--packages', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    print(json.dumps(main(parser.parse_args()), indent=2))
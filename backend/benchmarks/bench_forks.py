@@ -0,0 +1,169 @@
+"""
+Analyzing a fork with the shared blob store
+
+    python benchmarks/bench_forks.py --files 5000 --changed 0.02
+
+Generates a synthetic git repository and a fork of it (a clone with a
+commit changing --changed of its files and adding a few), then analyzes
+the origin and the fork end to end through an in-process client, once
+with the blob store and once with it disabled (`BLOB_STORE_MAX_BYTES=0`).
+Each configuration runs in its own process with its own data directories.
+Reports per-stage wall time for both repositories, blob store hits and
+misses, and whether the fork's chunks are identical with and without the
+store.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from synthetic_repo import add_spec_arguments, generate, spec_from_args  # noqa: E402
+
+# Stage name -> seconds, for the analysis in progress
+STAGE_SECONDS: Dict[str, float] = {}
+
+GIT_ENV = {'GIT_AUTHOR_NAME': 'bench', 'GIT_AUTHOR_EMAIL': 'bench@example.com',
+           'GIT_COMMITTER_NAME': 'bench', 'GIT_COMMITTER_EMAIL': 'bench@example.com'}
+
+
+def make_fork(origin: str, fork: str, changed: float, seed: int) -> int:
+    """Clone `origin` and commit edits to a `changed` fraction of its files; returns files touched"""
+    env = {**os.environ, **GIT_ENV}
+    subprocess.run(['git', 'clone', '-q', origin, fork], env=env, check=True)
+    tracked = subprocess.run(['git', 'ls-files'], cwd=fork, capture_output=True, text=True,
+                             check=True).stdout.split()
+    rng = random.Random(seed)
+    edited = rng.sample(tracked, max(1, int(len(tracked) * changed)))
+    for path in edited:
+        with open(os.path.join(fork, path), 'a') as f:
+            f.write('\n# fork\n' if path.endswith('.py') else '\n// fork\n')
+    for i in range(10):
+        with open(os.path.join(fork, f'fork_feature_{i}.py'), 'w') as f:
+            f.write(f'def fork_feature_{i}(value):\n    return value * {i}\n')
+    for args in (['add', '-A'], ['commit', '-q', '-m', 'fork changes']):
+        subprocess.run(['git', *args], cwd=fork, env=env, check=True)
+    return len(edited) + 10
+
+
+def analyze(client, repo: str, repo_id: str) -> Dict:
+    """Run one analysis to completion"""
+    started = time.perf_counter()
+    job_id = client.post('/api/v1/repos/analyze', json={
+        'repo_url': f'file://{repo}', 'branch': 'main', 'repo_id': repo_id,
+    }).json()['job_id']
+    STAGE_SECONDS.clear()
+    with client.stream('GET', f'/api/v1/repos/jobs/{job_id}/events') as events:
+        for _ in events.iter_lines():
+            pass
+    job = client.get(f'/api/v1/repos/jobs/{job_id}').json()
+    if job['status'] != 'completed':
+        raise RuntimeError(f"Analysis of {repo_id} failed: {job['error']}")
+    return {'seconds': round(time.perf_counter() - started, 3), 'stages': dict(STAGE_SECONDS),
+            'messages': {name: stage['message'] for name, stage in job['stages'].items()}}
+
+
+def time_stages():
+    """Record each pipeline stage's wall time in STAGE_SECONDS"""
+    from app.services.analysis_pipeline import AnalysisPipeline
+
+    run_stage = AnalysisPipeline.run_stage
+
+    def timed(self, name, ctx):
+        started = time.perf_counter()
+        try:
+            return run_stage(self, name, ctx)
+        finally:
+            STAGE_SECONDS[name] = round(time.perf_counter() - started, 3)
+
+    AnalysisPipeline.run_stage = timed
+
+
+def run(scratch: str) -> Dict:
+    """One configuration, in a process whose settings were set by `measure`"""
+    from fastapi.testclient import TestClient
+    from app.core.config import settings
+    from app.main import app
+    from app.services.blob_store import get_blob_store
+    from app.services.incremental_analyzer import ManifestStore
+
+    time_stages()
+    results = {}
+    with TestClient(app) as client:
+        for repo_id in ('origin', 'fork'):
+            results[repo_id] = analyze(client, os.path.join(scratch, repo_id), repo_id)
+            store = get_blob_store()
+            results[repo_id]['store'] = store.statistics() if store else None
+
+    store = ManifestStore(settings.ANALYSIS_DATA_DIR)
+    commit = store.latest_commit('fork')
+    with open(os.path.join(store.repo_dir('fork'), f'{commit}.chunks.jsonl'), 'rb') as f:
+        results['fork_chunks_digest'] = hashlib.sha256(f.read()).hexdigest()[:16]
+    return results
+
+
+def measure(scratch: str, name: str, max_bytes: int) -> Dict:
+    data = os.path.join(scratch, name)
+    env = {
+        **os.environ,
+        'DATABASE_URL': f'sqlite:///{data}/bench.db',
+        'ANALYSIS_DATA_DIR': os.path.join(data, 'analysis'),
+        'CLONE_CACHE_DIR': os.path.join(data, 'clones'),
+        'DEPENDENCY_CACHE_DIR': os.path.join(data, 'dependencies'),
+        'EMBEDDING_CACHE_PATH': os.path.join(data, 'embeddings.sqlite'),
+        'BLOB_STORE_PATH': os.path.join(data, 'blobs.sqlite'),
+        'BLOB_STORE_MAX_BYTES': str(max_bytes),
+        'EMBEDDING_BACKEND': 'fake',
+        'LLM_BACKEND': 'fake',
+        'REDIS_URL': 'memory://',
+    }
+    for variable in ('GITHUB_CLIENT_ID', 'GITHUB_CLIENT_SECRET', 'GITHUB_REDIRECT_URI', 'OPENAI_API_KEY', 'SECRET_KEY'):
+        env.setdefault(variable, 'benchmark')
+    os.makedirs(data, exist_ok=True)
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', scratch], env=env,
+                            stdout=subprocess.PIPE, text=True, check=True).stdout
+    # The app prints its own startup lines; the report is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(args) -> Dict:
+    with tempfile.TemporaryDirectory() as scratch:
+        summary = generate(os.path.join(scratch, 'origin'), spec_from_args(args), git=True)
+        touched = make_fork(os.path.join(scratch, 'origin'), os.path.join(scratch, 'fork'), args.changed, args.seed)
+        shared = measure(scratch, 'shared', 2 * 1024 ** 3)
+        separate = measure(scratch, 'separate', 0)
+
+    fork_speedup = {
+        name: round(separate['fork']['stages'][name] / max(seconds, 0.001), 2)
+        for name, seconds in shared['fork']['stages'].items() if name in separate['fork']['stages']
+    }
+    return {
+        'meta': {'files': summary['files'], 'fork_files_touched': touched, 'cpus': os.cpu_count()},
+        'with_store': shared,
+        'without_store': separate,
+        'fork_seconds_speedup': round(separate['fork']['seconds'] / shared['fork']['seconds'], 2),
+        'fork_stage_speedup': fork_speedup,
+        'identical': shared['fork_chunks_digest'] == separate['fork_chunks_digest'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_spec_arguments(parser)
+    parser.add_argument('--changed', type=float, default=0.02, help='Fraction of files the fork edits')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        print(json.dumps(run(args.run)))
+        sys.exit(0)
+    report = main(args)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['identical'] else 1)
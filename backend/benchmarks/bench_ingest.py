@@ -0,0 +1,121 @@
+"""
+Ingest throughput: BulkIngestor against ORM row-by-row adds
+
+    python benchmarks/bench_ingest.py --files 2000 --chunks-per-file 5
+    python benchmarks/bench_ingest.py --database-url postgresql://user:pw@localhost/bench
+
+Runs against a throwaway SQLite file unless --database-url is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings are validated on import; only the database matters here
+for name in ('GITHUB_CLIENT_ID', 'GITHUB_CLIENT_SECRET', 'GITHUB_REDIRECT_URI', 'OPENAI_API_KEY', 'SECRET_KEY'):
+    os.environ.setdefault(name, 'benchmark')
+os.environ.setdefault('REDIS_URL', 'memory://')
+
+
+def synthetic(files: int, chunks_per_file: int, symbols_per_file: int, dimensions: int, seed: int = 0):
+    from app.services.code_chunker import CodeChunk
+    from app.services.symbol_index import Symbol
+
+    rng = random.Random(seed)
+    body = '\n'.join(f'    value_{i} = compute(value_{i - 1}, {i})' for i in range(1, 40))
+    manifest, chunks, symbols, vectors = [], [], [], []
+    for f in range(files):
+        path = f'src/pkg_{f % 50}/module_{f}.py'
+        manifest.append((path, {'size': 4000 + f, 'language': 'python', 'lines': 120}))
+        for c in range(chunks_per_file):
+            digest = f'{f:08x}{c:08x}'.ljust(64, '0')
+            chunks.append(CodeChunk(path, 'python', c * 40 + 1, c * 40 + 40, f'def f_{c}():\n{body}',
+                                    'function', [f'f_{c}'], 350, digest))
+            vectors.append((digest, array('f', (rng.random() for _ in range(dimensions))).tobytes()))
+        for s in range(symbols_per_file):
+            symbols.append(Symbol(path, f'f_{s}', f'module_{f}.f_{s}', 'function', s * 10 + 1, s * 10 + 9,
+                                  f'def f_{s}(a, b)', 'Compute things.'))
+    return manifest, chunks, symbols, vectors
+
+
+async def bench_bulk(engine, data, batch_rows: int) -> float:
+    from app.services.bulk_ingest import BulkIngestor
+
+    manifest, chunks, symbols, vectors = data
+    start = time.perf_counter()
+    await BulkIngestor(engine, batch_rows).ingest(
+        'bench', 'bulk', files=manifest, chunks=chunks, symbols=symbols, vectors=vectors, model='bench',
+    )
+    return time.perf_counter() - start
+
+
+async def bench_orm(session_factory, data) -> float:
+    from app.models.analysis import AnalyzedFile, ChunkRecord, ChunkVector, SymbolRecord
+
+    manifest, chunks, symbols, vectors = data
+    start = time.perf_counter()
+    async with session_factory() as db:
+        for path, record in manifest:
+            db.add(AnalyzedFile(repo_id='bench', commit='orm', path=path, language=record['language'],
+                                size=record['size'], lines=record['lines']))
+            await db.flush()
+        for c in chunks:
+            db.add(ChunkRecord(repo_id='bench', commit='orm', path=c.path, language=c.language,
+                               start_line=c.start_line, end_line=c.end_line, kind=c.kind,
+                               symbols=json.dumps(c.symbols), token_count=c.token_count,
+                               content_hash=c.content_hash, content=c.content))
+            await db.flush()
+        for s in symbols:
+            db.add(SymbolRecord(repo_id='bench', commit='orm', path=s.path, name=s.name,
+                                qualified_name=s.qualified_name, kind=s.kind, start_line=s.start_line,
+                                end_line=s.end_line, signature=s.signature, doc=s.doc))
+            await db.flush()
+        for digest, blob in vectors:
+            db.add(ChunkVector(model='bench-orm', content_hash=digest, dimensions=len(blob) // 4, vector=blob))
+            await db.flush()
+        await db.commit()
+    return time.perf_counter() - start
+
+
+async def main(args):
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from app.core.database import Base, get_async_engine, get_engine
+    import app.models.analysis  # noqa: F401  (registers the tables)
+
+    Base.metadata.create_all(bind=get_engine())
+    async_engine = get_async_engine()
+    data = synthetic(args.files, args.chunks_per_file, args.symbols_per_file, args.dimensions)
+    rows = sum(len(part) for part in data)
+    results = {'rows': rows, 'dialect': async_engine.dialect.name}
+
+    elapsed = await bench_bulk(async_engine, data, args.batch_rows)
+    results['bulk'] = {'seconds': round(elapsed, 3), 'rows_per_second': round(rows / elapsed)}
+    if not args.skip_orm:
+        elapsed = await bench_orm(async_sessionmaker(async_engine, expire_on_commit=False), data)
+        results['orm'] = {'seconds': round(elapsed, 3), 'rows_per_second': round(rows / elapsed)}
+        results['speedup'] = round(results['orm']['seconds'] / results['bulk']['seconds'], 1)
+    await async_engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='SQLAlchemy URL (default: a temporary SQLite file)')
+    parser.add_argument('--files', type=int, default=1000)
+    parser.add_argument('--chunks-per-file', type=int, default=4)
+    parser.add_argument('--symbols-per-file', type=int, default=8)
+    parser.add_argument('--dimensions', type=int, default=1536)
+    parser.add_argument('--batch-rows', type=int, default=5000)
+    parser.add_argument('--skip-orm', action='store_true', help='Only time the bulk path')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{scratch}/bench.db'
+        asyncio.run(main(args))
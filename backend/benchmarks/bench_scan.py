@@ -0,0 +1,137 @@
+"""
+Path filtering during the repository walk
+
+    python benchmarks/bench_scan.py --files 20000 --junk 20000
+
+Generates a synthetic repository and adds the junk real repositories
+carry: a git-ignored build tree, a linguist-vendored third_party tree,
+minified bundles, generated protobuf modules and oversized data files.
+Scans it with the configured path filter and with the old filter
+(`IGNORE_DIRS` names only), then counts lines of what each scan kept, as
+the analysis would. Reports files and bytes kept, directories listed and
+files opened (via audit hooks), and wall time. The filtered scan must
+list no directory inside an excluded subtree.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# Settings are validated on import; none of them are used here
+for name in ('DATABASE_URL', 'GITHUB_CLIENT_ID', 'GITHUB_CLIENT_SECRET', 'GITHUB_REDIRECT_URI',
+             'OPENAI_API_KEY', 'SECRET_KEY', 'REDIS_URL'):
+    os.environ.setdefault(name, 'benchmark')
+
+from synthetic_repo import add_spec_arguments, generate, spec_from_args  # noqa: E402
+
+EXCLUDED_ROOTS = ('build-output/', 'third_party/')
+
+
+def add_junk(root: str, files: int, seed: int):
+    """Excluded content, split between ignored trees and stray files"""
+    rng = random.Random(seed)
+    with open(os.path.join(root, '.gitignore'), 'w') as f:
+        f.write('/build-output/\n*.log\n')
+    with open(os.path.join(root, '.gitattributes'), 'w') as f:
+        f.write('third_party/** linguist-vendored\n')
+    line = 'var a=function(b){return b*2},c=[1,2,3].map(a);' * 40 + '\n'
+    for i in range(files):
+        kind = i % 5
+        if kind == 0:
+            path = f'build-output/{i % 50}/chunk_{i}.js'
+            content = line * rng.randint(1, 20)
+        elif kind == 1:
+            path = f'third_party/lib{i % 40}/src/file_{i}.c'
+            content = 'int f(void) { return 0; }\n' * rng.randint(10, 400)
+        elif kind == 2:
+            path = f'web/dist_{i % 30}/bundle_{i}.js'
+            content = line * rng.randint(3, 20)
+        elif kind == 3:
+            path = f'proto/gen_{i % 30}/service_{i}_pb2.py'
+            content = 'DESCRIPTOR = None\n' * rng.randint(10, 400)
+        else:
+            path = f'data/{i % 30}/dump_{i}.log'
+            content = 'x' * rng.randint(100, 4000) + '\n'
+        full_path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as f:
+            f.write(content)
+    # A few files over the per-file cap
+    for i in range(10):
+        with open(os.path.join(root, f'fixture_{i}.json'), 'w') as f:
+            f.write('[' + '0,' * (1024 * 1024) + '0]\n')
+
+
+def main(args) -> Dict:
+    from app.core.config import settings
+    from app.services.code_parser import CodeParserService
+    from app.services.path_filter import PathFilter
+
+    listed, opened = [], []
+
+    def audit(event, event_args):
+        if event not in ('os.scandir', 'open') or not isinstance(event_args[0], (str, bytes)):
+            return
+        (listed if event == 'os.scandir' else opened).append(os.fsdecode(event_args[0]))
+
+    sys.addaudithook(audit)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        repo = os.path.join(scratch, 'repo')
+        generate(repo, spec_from_args(args))
+        add_junk(repo, args.junk, args.seed)
+
+        def run(path_filter: PathFilter) -> Dict:
+            parser = CodeParserService(repo)
+            parser._path_filter = path_filter
+            listed.clear()
+            opened.clear()
+            started = time.perf_counter()
+            scan = parser.scan()
+            scan_seconds = time.perf_counter() - started
+            scan_listed, scan_opened = len(listed), len(opened)
+            relative = [os.path.relpath(directory, repo).replace(os.sep, '/') + '/' for directory in listed]
+            inside_excluded = sum(1 for path in relative if path.startswith(EXCLUDED_ROOTS))
+            parser.get_statistics()
+            return {
+                'files': len(scan.files),
+                'mb': round(scan.total_bytes / (1024 * 1024), 1),
+                'scan_seconds': round(scan_seconds, 3),
+                'analysis_seconds': round(time.perf_counter() - started, 3),
+                'directories_listed': scan_listed,
+                'files_opened_by_scan': scan_opened,
+                'directories_listed_inside_excluded': inside_excluded,
+                'excluded': scan.excluded,
+            }
+
+        # The names-only filter still honors .gitignore; hide it for the old behavior
+        os.rename(os.path.join(repo, '.gitignore'), os.path.join(repo, 'gitignore.off'))
+        names_only = run(PathFilter(repo, CodeParserService.IGNORE_DIRS, skip_generated=False,
+                                    exempt=CodeParserService.CONFIG_FILES))
+        os.rename(os.path.join(repo, 'gitignore.off'), os.path.join(repo, '.gitignore'))
+        filtered = run(CodeParserService(repo).path_filter())
+
+    return {
+        'meta': {'files': args.files, 'junk': args.junk, 'max_file_bytes': settings.ANALYSIS_MAX_FILE_BYTES},
+        'names_only': names_only,
+        'filtered': filtered,
+        'bytes_ratio': round(names_only['mb'] / max(filtered['mb'], 0.1), 1),
+        'analysis_speedup': round(names_only['analysis_seconds'] / filtered['analysis_seconds'], 2),
+        'pruned': filtered['directories_listed_inside_excluded'] == 0,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_spec_arguments(parser)
+    parser.add_argument('--junk', type=int, default=20000)
+    report = main(parser.parse_args())
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['pruned'] else 1)
@@ -0,0 +1,91 @@
+"""
+Sharded map-reduce analysis: scaling, shard balance and determinism
+
+    python benchmarks/bench_shards.py --files 20000 --workers 1,2,4
+
+Generates a synthetic repository and runs the stats, imports, symbols and
+chunks analyzers through `ShardedExecutor` serially and on 1..N workers of
+each transport (local process pool, and worker processes behind framed
+channels). Reports files per second, speedup over the serial run, the
+heaviest shard against the mean, and a hash of every merged result, which
+must be identical across all runs. Speedup is bounded by the machine's
+cores, reported as `cpus`.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# Settings are validated on import; none of them are used here
+for name in ('DATABASE_URL', 'GITHUB_CLIENT_ID', 'GITHUB_CLIENT_SECRET', 'GITHUB_REDIRECT_URI',
+             'OPENAI_API_KEY', 'SECRET_KEY', 'REDIS_URL'):
+    os.environ.setdefault(name, 'benchmark')
+
+from synthetic_repo import add_spec_arguments, generate, spec_from_args  # noqa: E402
+
+
+def digest(results: Dict) -> str:
+    import orjson
+    return hashlib.sha256(orjson.dumps(results, option=orjson.OPT_SORT_KEYS)).hexdigest()[:16]
+
+
+def main(args) -> Dict:
+    from app.services.code_parser import CodeParserService
+    from app.services.shard_executor import (InlineTransport, ProcessPoolTransport, ShardedExecutor,
+                                             SubprocessChannel, WorkerTransport, balance)
+
+    analyzers = args.analyzers.split(',')
+    options = {'max_tokens': 800}
+    with tempfile.TemporaryDirectory() as scratch:
+        repo = os.path.join(scratch, 'repo')
+        generate(repo, spec_from_args(args))
+        files = [(f.path, f.size, f.language) for f in CodeParserService(repo).scan().files]
+
+        def measure(transport) -> Dict:
+            executor = ShardedExecutor(transport, shards_per_worker=args.shards_per_worker)
+            try:
+                # The first run starts the workers; time the second
+                executor.run(repo, files, analyzers, options)
+                started = time.perf_counter()
+                results = executor.run(repo, files, analyzers, options)
+                seconds = time.perf_counter() - started
+            finally:
+                executor.close()
+            shards = executor.shards(files)
+            return {'seconds': round(seconds, 3), 'files_per_second': round(len(files) / seconds),
+                    'shards': len(shards), 'balance': round(balance(shards), 2), 'digest': digest(results)}
+
+        serial = measure(InlineTransport())
+        runs: List[Dict] = [{'transport': 'inline', 'workers': 1, **serial}]
+        for workers in map(int, args.workers.split(',')):
+            for transport, factory in (
+                ('process', lambda: ProcessPoolTransport(workers)),
+                ('workers', lambda: WorkerTransport(SubprocessChannel, workers)),
+            ):
+                run = measure(factory())
+                run['speedup'] = round(serial['seconds'] / run['seconds'], 2)
+                runs.append({'transport': transport, 'workers': workers, **run})
+
+    return {
+        'meta': {'files': len(files), 'analyzers': analyzers, 'cpus': os.cpu_count()},
+        'deterministic': len({run['digest'] for run in runs}) == 1,
+        'runs': runs,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_spec_arguments(parser)
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--shards-per-worker', type=int, default=4)
+    parser.add_argument('--analyzers', default='stats,imports,symbols,chunks')
+    report = main(parser.parse_args())
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['deterministic'] else 1)
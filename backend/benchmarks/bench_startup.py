@@ -0,0 +1,189 @@
+"""
+Cold-start benchmark for the API process
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --baseline benchmarks/baselines/startup.json
+    python benchmarks/bench_startup.py --save-baseline benchmarks/baselines/startup.json
+
+Each run is a fresh interpreter that imports app.main, runs the startup
+event and serves one /health request, timing each phase; a bare
+interpreter start is timed alongside for reference. Medians of --repeat
+runs are reported, with the slowest direct imports of app.main
+(`python -X importtime`).
+
+The script exits with status 1 if a module that should be deferred
+(numpy, GitPython, httpx, the database async drivers, ...) is imported by
+`import app.main`, whatever the machine, or, with --baseline, if a phase
+is more than --tolerance slower than the stored run.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use or by warm-up, never by `import app.main`
+DEFERRED = [
+    'numpy', 'git', 'httpx', 'openai', 'tiktoken', 'redis', 'aiosqlite', 'asyncpg',
+    'sqlalchemy.ext.asyncio', 'sqlalchemy.dialects.postgresql',
+]
+
+PHASES = ('interpreter', 'import', 'startup', 'first_request')
+
+# Absolute changes below this are noise, whatever the ratio
+FLOOR_SECONDS = 0.02
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+deferred = [name for name in sys.argv[1].split(",") if name in sys.modules]
+from fastapi.testclient import TestClient
+client = TestClient(app.main.app)
+before_startup = time.perf_counter()
+client.__enter__()
+started_up = time.perf_counter()
+status = client.get("/api/v1/health").status_code
+served = time.perf_counter()
+warmup = app.main.warm_up() if sys.argv[2] == "1" else None
+client.__exit__(None, None, None)
+print(json.dumps({
+    "import": imported - started,
+    "startup": started_up - before_startup,
+    "first_request": served - started_up,
+    "status": status,
+    "deferred_loaded": deferred,
+    "warmup": warmup,
+}))
+'''
+
+
+def _env(scratch: str) -> Dict[str, str]:
+    env = {
+        'PATH': os.environ.get('PATH', ''),
+        'HOME': os.environ.get('HOME', ''),
+        'PYTHONPATH': BACKEND,
+        'DATABASE_URL': f'sqlite:///{scratch}/startup.db',
+        'ANALYSIS_DATA_DIR': os.path.join(scratch, 'analysis'),
+        'CLONE_CACHE_DIR': os.path.join(scratch, 'clones'),
+        'DEPENDENCY_CACHE_DIR': os.path.join(scratch, 'dependencies'),
+        'EMBEDDING_CACHE_PATH': os.path.join(scratch, 'embeddings.sqlite'),
+        'BLOB_STORE_PATH': os.path.join(scratch, 'blobs.sqlite'),
+        'EMBEDDING_BACKEND': 'fake',
+        'LLM_BACKEND': 'fake',
+        'REDIS_URL': 'memory://',
+    }
+    for name in ('GITHUB_CLIENT_ID', 'GITHUB_CLIENT_SECRET', 'GITHUB_REDIRECT_URI', 'OPENAI_API_KEY', 'SECRET_KEY'):
+        env[name] = 'benchmark'
+    return env
+
+
+def _run(args: List[str], env: Dict[str, str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=BACKEND, env=env, capture_output=True, text=True, check=True)
+
+
+def _slowest_imports(env: Dict[str, str], top: int) -> List[Dict]:
+    stderr = _run(['-X', 'importtime', '-c', 'import app.main'], env).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Only direct imports of app.main (indented one level), so nested
+        # imports are not counted twice
+        if len(name) - len(name.lstrip(' ')) != 3:
+            continue
+        rows.append({'module': name.strip(), 'seconds': round(int(cumulative) / 1e6, 4)})
+    return sorted(rows, key=lambda row: -row['seconds'])[:top]
+
+
+def measure(repeat: int, warmup: bool) -> Dict:
+    runs: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    deferred_loaded = set()
+    warmup_timings = None
+    with tempfile.TemporaryDirectory() as scratch:
+        env = _env(scratch)
+        for _ in range(repeat):
+            started = time.perf_counter()
+            _run(['-c', 'pass'], env)
+            runs['interpreter'].append(time.perf_counter() - started)
+            # The startup event prints to stdout; the probe's result is the last line
+            stdout = _run(['-c', PROBE, ','.join(DEFERRED), '1' if warmup else '0'], env).stdout
+            probe = json.loads(stdout.strip().splitlines()[-1])
+            if probe['status'] != 200:
+                raise RuntimeError(f"/health returned {probe['status']}")
+            for phase in ('import', 'startup', 'first_request'):
+                runs[phase].append(probe[phase])
+            deferred_loaded.update(probe['deferred_loaded'])
+            warmup_timings = probe['warmup']
+        slowest = _slowest_imports(env, 10)
+
+    results = {
+        'phases': {
+            phase: {'seconds': round(statistics.median(values), 4), 'best_seconds': round(min(values), 4)}
+            for phase, values in runs.items()
+        },
+        'deferred_loaded': sorted(deferred_loaded),
+        'slowest_imports': slowest,
+    }
+    if warmup_timings is not None:
+        results['warmup'] = warmup_timings
+    return results
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Human-readable regressions of `current` against `baseline`"""
+    regressions = []
+    for phase in ('import', 'startup', 'first_request'):
+        before = baseline['phases'].get(phase, {}).get('seconds')
+        after = current['phases'][phase]['seconds']
+        if before is not None and after > before * (1 + tolerance) and after - before > FLOOR_SECONDS:
+            regressions.append(f'{phase}: {before}s -> {after}s (+{(after / before - 1) * 100:.0f}%)')
+    return regressions
+
+
+def main(args) -> int:
+    results = measure(args.repeat, args.warmup)
+    results['meta'] = {
+        'repeat': args.repeat,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+    output = json.dumps(results, indent=2)
+    print(output)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w') as f:
+            f.write(output + '\n')
+
+    failures = [f'{name} is imported by app.main' for name in results['deferred_loaded']]
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures += compare(results, json.load(f), args.tolerance)
+    for line in failures:
+        print(f'REGRESSION {line}', file=sys.stderr)
+    if failures:
+        return 1
+    if args.baseline:
+        print(f'No regressions against {args.baseline}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--warmup', action='store_true', help='Also time warm_up() after the first request')
+    parser.add_argument('--baseline', help='Compare against this results file')
+    parser.add_argument('--save-baseline', help='Store these results as a baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown ratio (0.25 = 25%%)')
+    sys.exit(main(parser.parse_args()))
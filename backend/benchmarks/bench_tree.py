@@ -0,0 +1,100 @@
+"""
+File-tree memory and serialization: nested dicts against FileTree
+
+    python benchmarks/bench_tree.py --files 100000
+
+Builds the tree of a synthetic path list both ways and reports traced
+memory, build time and response encoding time: the nested dicts through
+the standard json encoder (FastAPI's default path), the FileTree columns
+through orjson, plus packing and loading the FileTree artifact.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from synthetic_repo import EXTENSIONS, WORDS  # noqa: E402
+
+
+def synthetic_paths(files: int, depth: int, seed: int) -> List[Tuple[str, int, str]]:
+    rng = random.Random(seed)
+    directories = ['']
+    while len(directories) * 20 < files:
+        parent = rng.choice(directories)
+        if parent.count('/') < depth:
+            directories.append(f'{parent}/{rng.choice(WORDS)}{rng.randint(0, 99)}'.lstrip('/'))
+    languages = list(EXTENSIONS)
+    result = []
+    for i in range(files):
+        language = rng.choice(languages)
+        directory = rng.choice(directories)
+        name = f'{rng.choice(WORDS)}_{rng.choice(WORDS)}_{i}{EXTENSIONS[language]}'
+        result.append((f'{directory}/{name}' if directory else name, rng.randint(100, 50000), language))
+    return result
+
+
+def traced(fn: Callable[[], object]) -> Tuple[object, float, float]:
+    """Result, seconds and retained traced MB of fn()"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, retained / (1024 * 1024)
+
+
+def timed(fn: Callable[[], object], repeat: int) -> Tuple[object, float]:
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main(args) -> Dict:
+    import orjson
+    from app.services.file_tree import FileTree
+
+    paths = synthetic_paths(args.files, args.depth, args.seed)
+    results: Dict[str, Dict] = {'meta': {'files': args.files, 'depth': args.depth}}
+
+    tree, build_seconds, tree_mb = traced(lambda: FileTree.build(paths, root_name='synthetic'))
+    nested, nested_seconds, nested_mb = traced(lambda: tree.to_nested())
+    results['memory_mb'] = {'nested': round(nested_mb, 1), 'file_tree': round(tree_mb, 1),
+                            'ratio': round(nested_mb / tree_mb, 1)}
+    results['build_seconds'] = {'nested_from_tree': round(nested_seconds, 3), 'file_tree': round(build_seconds, 3)}
+
+    nested_json, nested_encode = timed(lambda: json.dumps(nested).encode(), args.repeat)
+    columns_json, columns_encode = timed(lambda: orjson.dumps(tree.to_columns()), args.repeat)
+    results['encode'] = {
+        'nested_json_seconds': round(nested_encode, 4),
+        'columns_orjson_seconds': round(columns_encode, 4),
+        'ratio': round(nested_encode / columns_encode, 1),
+        'nested_json_mb': round(len(nested_json) / (1024 * 1024), 1),
+        'columns_json_mb': round(len(columns_json) / (1024 * 1024), 1),
+    }
+
+    packed, pack_seconds = timed(tree.to_bytes, args.repeat)
+    _, load_seconds = timed(lambda: FileTree.from_bytes(packed), args.repeat)
+    results['packed'] = {'mb': round(len(packed) / (1024 * 1024), 2), 'pack_seconds': round(pack_seconds, 4),
+                         'load_seconds': round(load_seconds, 4)}
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=100000)
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    print(json.dumps(main(parser.parse_args()), indent=2))
@@ -0,0 +1,235 @@
+"""
+Synthetic repositories for benchmarks
+
+    python benchmarks/synthetic_repo.py /tmp/synthetic --files 20000 --depth 5
+
+Generates a tree of source files in a configurable language mix, with
+log-normally distributed file sizes, cross-file imports, entry points,
+dependency manifests and files under ignored directories (node_modules,
+dist, ...) that a scan must skip. Output is deterministic for a seed.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+DEFAULT_LANGUAGES = {'python': 0.35, 'typescript': 0.25, 'javascript': 0.15, 'go': 0.1, 'java': 0.1, 'rust': 0.05}
+
+EXTENSIONS = {
+    'python': '.py', 'typescript': '.ts', 'javascript': '.js', 'go': '.go', 'java': '.java',
+    'rust': '.rs', 'ruby': '.rb', 'php': '.php', 'c': '.c', 'cpp': '.cpp', 'csharp': '.cs',
+}
+
+NOISE_DIRS = ['node_modules', 'dist', 'build', '__pycache__', 'vendor', '.next']
+
+WORDS = (
+    'user account order invoice payment session token cache index parser graph node edge '
+    'config loader writer reader stream buffer queue worker job task event handler router '
+    'service client server request response schema model record batch chunk vector symbol'
+).split()
+
+
+@dataclass
+class RepoSpec:
+    """Shape of a synthetic repository"""
+    files: int = 2000
+    depth: int = 4
+    fanout: int = 8
+    languages: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_LANGUAGES))
+    # Log-normal file sizes: median bytes and spread (sigma of the log)
+    median_bytes: int = 2500
+    size_sigma: float = 1.0
+    max_bytes: int = 512 * 1024
+    # Extra files under ignored directories, as a fraction of `files`
+    noise: float = 0.2
+    seed: int = 0
+
+    def to_dict(self) -> Dict:
+        return dict(self.__dict__)
+
+
+def _name(rng: random.Random, parts: int = 2) -> str:
+    return '_'.join(rng.choice(WORDS) for _ in range(parts))
+
+
+def _camel(name: str) -> str:
+    return ''.join(part.title() for part in name.split('_'))
+
+
+def _function(language: str, name: str, rng: random.Random) -> str:
+    body = [f'value_{i} = step(value_{i - 1}, {rng.randint(0, 999)})' for i in range(1, rng.randint(3, 12))]
+    if language == 'python':
+        lines = [f'def {name}(value_0, step):', f'    """Compute the {name.replace("_", " ")}."""']
+        return '\n'.join(lines + [f'    {line}' for line in body] + [f'    return value_{len(body)}', ''])
+    if language in ('typescript', 'javascript'):
+        lines = [f'/** Compute the {name.replace("_", " ")}. */', f'export function {_camel(name)}(value_0, step) {{']
+        return '\n'.join(lines + [f'  const {line};' for line in body] + [f'  return value_{len(body)};', '}', ''])
+    if language == 'go':
+        lines = [f'// {_camel(name)} computes the {name.replace("_", " ")}.', f'func {_camel(name)}(value_0 int, step func(int, int) int) int {{']
+        return '\n'.join(lines + [f'\t{line.replace("=", ":=", 1)}' for line in body] + [f'\treturn value_{len(body)}', '}', ''])
+    if language == 'rust':
+        lines = [f'/// Compute the {name.replace("_", " ")}.', f'pub fn {name}(value_0: i64, step: fn(i64, i64) -> i64) -> i64 {{']
+        return '\n'.join(lines + [f'    let {line};' for line in body] + [f'    value_{len(body)}', '}', ''])
+    lines = [f'    /** Compute the {name.replace("_", " ")}. */', f'    public static int {_camel(name)}(int value_0, Step step) {{']
+    return '\n'.join(lines + [f'        int {line};' for line in body] + [f'        return value_{len(body)};', '    }', ''])
+
+
+def _imports(language: str, path: str, targets: List[str]) -> List[str]:
+    lines = []
+    for target in targets:
+        stem = os.path.splitext(target)[0]
+        if language == 'python':
+            lines.append(f"from {stem.replace('/', '.')} import *")
+        elif language in ('typescript', 'javascript'):
+            relative = os.path.relpath(stem, os.path.dirname(path) or '.')
+            lines.append(f"import * as m{len(lines)} from '{relative if relative.startswith('.') else './' + relative}';")
+        elif language == 'go':
+            lines.append(f'import "example.com/synthetic/{os.path.dirname(target)}"')
+        elif language == 'rust':
+            lines.append(f"use crate::{stem.replace('/', '::')};")
+        elif language == 'java':
+            lines.append(f"import {stem.replace('/', '.')};")
+    return lines
+
+
+def _source(language: str, path: str, size: int, peers: List[str], rng: random.Random) -> str:
+    header = _imports(language, path, rng.sample(peers, min(len(peers), rng.randint(0, 4))))
+    if language == 'java':
+        header.append(f'public class {_camel(os.path.splitext(os.path.basename(path))[0])} {{')
+    elif language == 'go':
+        header.insert(0, f'package {os.path.basename(os.path.dirname(path)) or "main"}')
+    parts = ['\n'.join(header), '']
+    length = sum(len(part) + 1 for part in parts)
+    while length < size:
+        part = _function(language, f'{_name(rng)}_{rng.randint(0, 9999)}', rng)
+        parts.append(part)
+        length += len(part) + 1
+    if language == 'java':
+        parts.append('}')
+    return '\n'.join(parts) + '\n'
+
+
+def _directories(spec: RepoSpec, rng: random.Random) -> List[str]:
+    directories = ['']
+    frontier = ['']
+    for level in range(spec.depth):
+        next_frontier = []
+        for parent in frontier:
+            for _ in range(rng.randint(1, spec.fanout)):
+                child = f'{parent}/{_name(rng, 1)}{rng.randint(0, 99)}'.lstrip('/')
+                next_frontier.append(child)
+        directories.extend(next_frontier)
+        frontier = next_frontier
+        # Enough directories for ~16 files each is plenty
+        if len(directories) * 16 > spec.files:
+            break
+    return sorted(set(directories))
+
+
+def generate(root: str, spec: Optional[RepoSpec] = None, git: bool = False) -> Dict:
+    """Write a repository for `spec` under `root`; returns a summary of what was written"""
+    spec = spec or RepoSpec()
+    rng = random.Random(spec.seed)
+    os.makedirs(root, exist_ok=True)
+    directories = _directories(spec, rng)
+    languages = list(spec.languages)
+    weights = [spec.languages[language] for language in languages]
+    mu = math.log(spec.median_bytes)
+
+    written: List[str] = []
+    total_bytes = 0
+    by_language: Dict[str, int] = {}
+    for i in range(spec.files):
+        language = rng.choices(languages, weights)[0]
+        directory = rng.choice(directories)
+        path = os.path.join(directory, f'{_name(rng)}_{i}{EXTENSIONS[language]}')
+        size = min(spec.max_bytes, int(rng.lognormvariate(mu, spec.size_sigma)))
+        peers = [p for p in written[-50:] if p.endswith(EXTENSIONS[language])]
+        content = _source(language, path, size, peers, rng)
+        full_path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as f:
+            f.write(content)
+        written.append(path)
+        total_bytes += len(content)
+        by_language[language] = by_language.get(language, 0) + 1
+
+    noise = int(spec.files * spec.noise)
+    for i in range(noise):
+        directory = rng.choice(directories)
+        ignored = os.path.join(root, directory, rng.choice(NOISE_DIRS), f'pkg{i % 20}')
+        os.makedirs(ignored, exist_ok=True)
+        with open(os.path.join(ignored, f'bundle_{i}.js'), 'w') as f:
+            f.write(f'module.exports = {{ id: {i} }};\n' * rng.randint(1, 40))
+
+    with open(os.path.join(root, 'main.py'), 'w') as f:
+        f.write('from app import run\n\nif __name__ == "__main__":\n    run()\n')
+    with open(os.path.join(root, 'index.ts'), 'w') as f:
+        f.write("import { start } from './server';\n\nstart();\n")
+    with open(os.path.join(root, 'package.json'), 'w') as f:
+        json.dump({
+            'name': 'synthetic',
+            'dependencies': {f'{_name(rng, 1)}-{i}': f'^{i}.0.0' for i in range(40)},
+            'devDependencies': {f'dev-{_name(rng, 1)}-{i}': f'~{i}.1.0' for i in range(20)},
+        }, f, indent=2)
+    with open(os.path.join(root, 'requirements.txt'), 'w') as f:
+        f.write(''.join(f'{_name(rng, 1)}-lib-{i}=={i}.0.{i % 7}\n' for i in range(40)))
+
+    if git:
+        env = {**os.environ, 'GIT_AUTHOR_NAME': 'bench', 'GIT_AUTHOR_EMAIL': 'bench@example.com',
+               'GIT_COMMITTER_NAME': 'bench', 'GIT_COMMITTER_EMAIL': 'bench@example.com'}
+        for args in (['init', '-q', '-b', 'main'], ['add', '-A'], ['commit', '-q', '-m', 'synthetic']):
+            subprocess.run(['git', *args], cwd=root, env=env, check=True)
+
+    return {
+        'files': spec.files,
+        'noise_files': noise,
+        'directories': len(directories),
+        'bytes': total_bytes,
+        'languages': by_language,
+    }
+
+
+def parse_languages(value: str) -> Dict[str, float]:
+    """`python=0.5,go=0.5` -> {'python': 0.5, 'go': 0.5}"""
+    languages = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name not in EXTENSIONS:
+            raise argparse.ArgumentTypeError(f'Unknown language: {name}')
+        languages[name] = float(weight or 1)
+    return languages
+
+
+def add_spec_arguments(parser: argparse.ArgumentParser):
+    defaults = RepoSpec()
+    parser.add_argument('--files', type=int, default=defaults.files)
+    parser.add_argument('--depth', type=int, default=defaults.depth)
+    parser.add_argument('--fanout', type=int, default=defaults.fanout)
+    parser.add_argument('--languages', type=parse_languages, default=defaults.languages,
+                        help='Language mix, e.g. python=0.5,typescript=0.3,go=0.2')
+    parser.add_argument('--median-bytes', type=int, default=defaults.median_bytes)
+    parser.add_argument('--size-sigma', type=float, default=defaults.size_sigma)
+    parser.add_argument('--noise', type=float, default=defaults.noise,
+                        help='Files under ignored directories, as a fraction of --files')
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+
+
+def spec_from_args(args) -> RepoSpec:
+    return RepoSpec(
+        files=args.files, depth=args.depth, fanout=args.fanout, languages=args.languages,
+        median_bytes=args.median_bytes, size_sigma=args.size_sigma, noise=args.noise, seed=args.seed,
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root')
+    parser.add_argument('--git', action='store_true', help='Commit the tree to a new git repository')
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+    print(json.dumps(generate(args.root, spec_from_args(args), git=args.git), indent=2))
@@ -0,0 +1,73 @@
+"""
+Shared fixtures. Settings are validated on import, so the environment is
+filled in before anything from `app` is imported.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for name in ('GITHUB_CLIENT_ID', 'GITHUB_CLIENT_SECRET', 'GITHUB_REDIRECT_URI', 'OPENAI_API_KEY', 'SECRET_KEY'):
+    os.environ.setdefault(name, 'test')
+
+# Everything the app writes goes to one scratch directory, and models are the offline fakes
+DATA_DIR = tempfile.mkdtemp(prefix='codebase-tests-')
+for name, value in {
+    'DATABASE_URL': f'sqlite:///{DATA_DIR}/test.db',
+    'ANALYSIS_DATA_DIR': os.path.join(DATA_DIR, 'analysis'),
+    'CLONE_CACHE_DIR': os.path.join(DATA_DIR, 'clones'),
+    'DEPENDENCY_CACHE_DIR': os.path.join(DATA_DIR, 'dependencies'),
+    'EMBEDDING_CACHE_PATH': os.path.join(DATA_DIR, 'embeddings.sqlite'),
+    'BLOB_STORE_PATH': os.path.join(DATA_DIR, 'blobs.sqlite'),
+    'PROFILING_DIR': os.path.join(DATA_DIR, 'profiles'),
+    'EMBEDDING_BACKEND': 'fake',
+    'LLM_BACKEND': 'fake',
+    'REDIS_URL': 'memory://',
+}.items():
+    os.environ.setdefault(name, value)
+
+GIT_ENV = {'GIT_AUTHOR_NAME': 'test', 'GIT_AUTHOR_EMAIL': 'test@example.com',
+           'GIT_COMMITTER_NAME': 'test', 'GIT_COMMITTER_EMAIL': 'test@example.com'}
+
+
+def git(cwd: str, *args: str) -> str:
+    return subprocess.run(['git', *args], cwd=cwd, env={**os.environ, **GIT_ENV},
+                          capture_output=True, text=True, check=True).stdout.strip()
+
+
+class BareRepo:
+    """A local bare repository standing in for a GitHub remote, with a work tree to commit from"""
+
+    def __init__(self, root: str):
+        self.work = os.path.join(root, 'work')
+        self.path = os.path.join(root, 'remote.git')
+        self.url = f'file://{self.path}'
+        os.makedirs(self.work)
+        git(self.work, 'init', '-q', '-b', 'main')
+        git(root, 'init', '-q', '--bare', '-b', 'main', self.path)
+        # Partial clones over file:// need the remote to allow filters
+        git(self.path, 'config', 'uploadpack.allowFilter', 'true')
+        git(self.work, 'remote', 'add', 'origin', self.path)
+
+    def commit(self, files: dict, message: str = 'change', remove: tuple = ()) -> str:
+        """Write `files` ({path: str or bytes}), delete `remove`, commit and push; returns the SHA"""
+        for path, content in files.items():
+            full_path = os.path.join(self.work, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'wb') as f:
+                f.write(content.encode() if isinstance(content, str) else content)
+        for path in remove:
+            git(self.work, 'rm', '-q', path)
+        git(self.work, 'add', '-A')
+        git(self.work, 'commit', '-q', '--allow-empty', '-m', message)
+        git(self.work, 'push', '-q', 'origin', 'main')
+        return git(self.work, 'rev-parse', 'HEAD')
+
+
+@pytest.fixture
+def bare_repo(tmp_path):
+    return BareRepo(str(tmp_path / 'origin'))
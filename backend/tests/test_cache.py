@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import InMemoryBackend, LRUCache, TwoTierCache
+
+
+def make_cache() -> TwoTierCache:
+    return TwoTierCache(LRUCache(1024 * 1024), InMemoryBackend())
+
+
+def test_concurrent_misses_compute_once():
+    cache = make_cache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'value': 1}
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute('key', compute) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{'value': 1}] * 5
+    assert len(calls) == 1 and cache.computations == 1
+
+
+def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    cache = make_cache()
+
+    async def main():
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return {'value': 1}
+
+        first = asyncio.create_task(cache.get_or_compute('key', compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute('key', compute))
+        await asyncio.sleep(0)
+        # The first caller's client disconnects mid-compute
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await waiter, await cache.get('key')
+
+    assert asyncio.run(main()) == ({'value': 1}, {'value': 1})
+    assert cache.computations == 1
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    cache = make_cache()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError('broken')
+
+    async def main():
+        results = await asyncio.gather(*(cache.get_or_compute('key', compute) for _ in range(3)),
+                                       return_exceptions=True)
+        return results, cache._inflight
+
+    results, inflight = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert inflight == {}
+    assert asyncio.run(cache.get('key')) is None
@@ -0,0 +1,168 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.cache import InMemoryBackend, LRUCache, TwoTierCache
+from app.main import app
+from app.services.answer_cache import AnswerCache, get_answer_cache
+from app.services.llm_service import FakeChatModel, get_chat_model
+
+FILES = {
+    'shop/orders.py': (
+        'from shop.pricing import apply_discount\n\n\n'
+        'def order_total(items, coupon=None):\n'
+        '    """Sum item prices and apply the coupon discount"""\n'
+        '    total = sum(item.price * item.quantity for item in items)\n'
+        '    return apply_discount(total, coupon)\n'
+    ),
+    'shop/pricing.py': (
+        'def apply_discount(total, coupon):\n'
+        '    """Coupons take a percentage off the order total"""\n'
+        '    if coupon is None:\n'
+        '        return total\n'
+        '    return total * (100 - coupon.percent) / 100\n'
+    ),
+    'shop/__init__.py': '',
+    'README.md': '# Shop\n\nOrder totals and coupon discounts.\n',
+}
+
+QUESTION = 'How is the order total computed with a coupon discount?'
+
+
+@pytest.fixture(scope='module')
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def chat():
+    """A fresh answer cache and fake model per test, so hits and model calls are counted from zero"""
+    model = FakeChatModel()
+    answers = AnswerCache(TwoTierCache(LRUCache(1024 * 1024), InMemoryBackend()))
+    app.dependency_overrides[get_chat_model] = lambda: model
+    app.dependency_overrides[get_answer_cache] = lambda: answers
+    yield model, answers
+    app.dependency_overrides.clear()
+
+
+def analyze(client, repo, repo_id: str):
+    job_id = client.post('/api/v1/repos/analyze', json={
+        'repo_url': repo.url, 'branch': 'main', 'repo_id': repo_id,
+    }).json()['job_id']
+    with client.stream('GET', f'/api/v1/repos/jobs/{job_id}/events') as events:
+        for _ in events.iter_lines():
+            pass
+    job = client.get(f'/api/v1/repos/jobs/{job_id}').json()
+    assert job['status'] == 'completed', job['error']
+
+
+def ask(client, repo_id: str, message: str = QUESTION, **options) -> dict:
+    response = client.post('/api/v1/chat/query', json={'repo_id': repo_id, 'message': message, **options})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def events(client, repo_id: str, message: str = QUESTION) -> list:
+    """(event, data) pairs of a streamed answer"""
+    with client.stream('POST', '/api/v1/chat/query',
+                       json={'repo_id': repo_id, 'message': message, 'stream': True}) as response:
+        assert response.headers['content-type'].startswith('text/event-stream')
+        body = response.read().decode()
+    parsed = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        parsed.append((fields['event'], json.loads(fields['data'])))
+    return parsed
+
+
+def test_repeated_question_is_answered_from_the_cache(client, chat, bare_repo):
+    model, answers = chat
+    bare_repo.commit(FILES)
+    analyze(client, bare_repo, 'chat-hit')
+
+    first = ask(client, 'chat-hit')
+    # Case, spacing and trailing punctuation do not make a new question
+    second = ask(client, 'chat-hit', QUESTION.upper().rstrip('?') + '  ')
+
+    assert not first['cached'] and second['cached']
+    assert second['message'] == first['message']
+    assert 'shop/' in first['message']
+    assert model.calls == 1
+    assert (answers.hits, answers.misses) == (1, 1)
+
+
+def test_different_question_misses(client, chat, bare_repo):
+    model, answers = chat
+    bare_repo.commit(FILES)
+    analyze(client, bare_repo, 'chat-miss')
+
+    ask(client, 'chat-miss')
+    other = ask(client, 'chat-miss', 'Where are coupons validated before checkout?')
+
+    assert not other['cached']
+    assert model.calls == 2
+
+
+def test_follow_ups_with_history_always_reach_the_model(client, chat, bare_repo):
+    model, _ = chat
+    bare_repo.commit(FILES)
+    analyze(client, bare_repo, 'chat-history')
+
+    ask(client, 'chat-history')
+    follow_up = ask(client, 'chat-history', history=[
+        {'role': 'user', 'content': 'What is a coupon?'},
+        {'role': 'assistant', 'content': 'A percentage discount.'},
+    ])
+
+    assert not follow_up['cached']
+    assert model.calls == 2
+
+
+def test_reanalysis_at_a_new_commit_invalidates_answers(client, chat, bare_repo):
+    model, _ = chat
+    bare_repo.commit(FILES)
+    analyze(client, bare_repo, 'chat-reanalyzed')
+    before = ask(client, 'chat-reanalyzed')
+
+    # The retrieved chunks are unchanged; only the commit moves
+    bare_repo.commit({'README.md': FILES['README.md'] + '\nSee shop/orders.py.\n'})
+    analyze(client, bare_repo, 'chat-reanalyzed')
+    after = ask(client, 'chat-reanalyzed')
+
+    assert not before['cached'] and not after['cached']
+    assert model.calls == 2
+    assert ask(client, 'chat-reanalyzed')['cached']
+
+
+def test_streamed_answer_sends_sources_then_tokens_then_done(client, chat, bare_repo):
+    model, _ = chat
+    bare_repo.commit(FILES)
+    analyze(client, bare_repo, 'chat-stream')
+
+    streamed = events(client, 'chat-stream')
+
+    names = [name for name, _ in streamed]
+    assert names[0] == 'sources' and names[-1] == 'done'
+    assert set(names[1:-1]) == {'token'} and len(names) > 3
+    assert streamed[0][1]['sources']
+    text = ''.join(data['text'] for name, data in streamed if name == 'token')
+    assert streamed[-1][1] == {'message': text, 'cached': False}
+
+    # The streamed answer was cached and comes back whole, as one token
+    replay = events(client, 'chat-stream')
+    assert [name for name, _ in replay] == ['sources', 'token', 'done']
+    assert replay[-1][1] == {'message': text, 'cached': True}
+    assert ask(client, 'chat-stream')['message'] == text
+    assert model.calls == 1
+
+
+def test_unindexed_repository_is_not_found(client, chat):
+    response = client.post('/api/v1/chat/query', json={'repo_id': 'never-analyzed', 'message': QUESTION})
+    assert response.status_code == 404
+
+
+def test_repo_id_outside_the_store_is_rejected(client, chat):
+    response = client.post('/api/v1/chat/query', json={'repo_id': '..', 'message': QUESTION})
+    assert response.status_code == 422
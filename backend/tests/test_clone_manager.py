@@ -0,0 +1,162 @@
+import json
+import os
+
+import pytest
+
+from app.services.clone_manager import CloneManager, RepoTooLarge
+from app.services.code_parser import CodeParserService
+
+MB = 1024 * 1024
+
+
+def make_manager(tmp_path, **options) -> CloneManager:
+    options = {'max_bytes': 100 * MB, 'max_repo_bytes': 10 * MB, 'max_file_bytes': 1000, **options}
+    return CloneManager(str(tmp_path / 'cache'), **options)
+
+
+def record_git(manager: CloneManager) -> list:
+    """Record the subcommand of every git call the manager makes"""
+    calls = []
+    run = manager._git
+
+    def recording(cwd, args, env=None, stdin=None):
+        calls.append(args[0])
+        return run(cwd, args, env, stdin)
+
+    manager._git = recording
+    return calls
+
+
+def test_checkout_reuses_mirror_and_worktree(tmp_path, bare_repo):
+    commit = bare_repo.commit({'app/main.py': 'print("hi")\n'})
+    manager = make_manager(tmp_path)
+    calls = record_git(manager)
+
+    first = manager.checkout(bare_repo.url, 'main')
+    assert first.commit == commit
+    with open(os.path.join(first.path, 'app/main.py')) as f:
+        assert f.read() == 'print("hi")\n'
+    assert calls.count('clone') == 1
+
+    calls.clear()
+    second = manager.checkout(bare_repo.url, 'main')
+    assert second.path == first.path
+    assert 'clone' not in calls
+    assert 'worktree' not in calls
+
+
+def test_new_commits_are_fetched_into_the_existing_mirror(tmp_path, bare_repo):
+    bare_repo.commit({'a.py': 'a = 1\n'})
+    manager = make_manager(tmp_path)
+    first = manager.checkout(bare_repo.url, 'main')
+
+    calls = record_git(manager)
+    commit = bare_repo.commit({'b.py': 'b = 2\n'})
+    second = manager.checkout(bare_repo.url, 'main')
+
+    assert second.commit == commit
+    assert second.path != first.path
+    assert 'clone' not in calls and 'fetch' in calls
+    assert os.path.exists(os.path.join(second.path, 'b.py'))
+    # The older commit's worktree is still there to reuse
+    assert not os.path.exists(os.path.join(first.path, 'b.py'))
+
+
+def test_oversized_blobs_are_never_fetched_or_checked_out(tmp_path, bare_repo):
+    bare_repo.commit({'small.py': 'x = 1\n', 'data/huge.bin': os.urandom(50000)})
+    manager = make_manager(tmp_path, max_file_bytes=1000)
+
+    checkout = manager.checkout(bare_repo.url, 'main')
+
+    assert os.path.exists(os.path.join(checkout.path, 'small.py'))
+    assert not os.path.exists(os.path.join(checkout.path, 'data/huge.bin'))
+    size, excluded = manager._tree_plan(manager.mirror_path(bare_repo.url), checkout.commit)
+    assert excluded == ['data/huge.bin']
+    assert size == len('x = 1\n')
+
+
+def test_lockfiles_over_the_file_limit_are_still_checked_out(tmp_path, bare_repo):
+    lockfile = json.dumps({
+        'lockfileVersion': 3,
+        'packages': {'': {'dependencies': {'left-pad': '^1.0.0'}},
+                     'node_modules/left-pad': {'version': '1.3.0', 'padding': 'x' * 3000}},
+    })
+    bare_repo.commit({
+        'a.js': 'module.exports = 1\n',
+        'package.json': json.dumps({'dependencies': {'left-pad': '^1.0.0'}}),
+        'package-lock.json': lockfile,
+        'vendor/bundle.js': 'x' * 3000,
+    })
+    manager = make_manager(tmp_path, max_file_bytes=2000)
+
+    checkout = manager.checkout(bare_repo.url, 'main')
+
+    with open(os.path.join(checkout.path, 'package-lock.json')) as f:
+        assert f.read() == lockfile
+    assert not os.path.exists(os.path.join(checkout.path, 'vendor/bundle.js'))
+    dependencies = CodeParserService(checkout.path).parse_dependencies()
+    assert [(d['name'], d['version'], d['lockfile']) for d in dependencies if d['name'] == 'left-pad'] == [
+        ('left-pad', '1.3.0', 'package-lock.json'),
+    ]
+
+
+def test_tree_plan_ignores_blobs_only_in_history(tmp_path, bare_repo):
+    bare_repo.commit({'old.bin': os.urandom(50000), 'keep.py': 'k = 1\n'})
+    commit = bare_repo.commit({}, remove=('old.bin',))
+    manager = make_manager(tmp_path, max_file_bytes=1000)
+    mirror = manager.mirror(bare_repo.url)
+
+    assert manager._tree_plan(mirror, commit) == (len('k = 1\n'), [])
+
+
+def test_repo_over_the_size_limit_is_refused(tmp_path, bare_repo):
+    # Identical files share one blob but are each written out
+    bare_repo.commit({f'file_{i}.py': 'x' * 900 for i in range(10)})
+    manager = make_manager(tmp_path, max_repo_bytes=5000)
+
+    with pytest.raises(RepoTooLarge):
+        manager.checkout(bare_repo.url, 'main')
+    worktrees = os.path.join(manager.base_dir, 'worktrees', manager.repo_key(bare_repo.url))
+    assert not os.path.exists(worktrees) or os.listdir(worktrees) == []
+
+
+def test_eviction_skips_leased_worktrees(tmp_path, bare_repo):
+    bare_repo.commit({'a.py': 'a' * 500})
+    manager = make_manager(tmp_path)
+    old = manager.checkout(bare_repo.url, 'main')
+    bare_repo.commit({'b.py': 'b' * 500})
+    new = manager.checkout(bare_repo.url, 'main')
+    manager.release(old)
+
+    # Nothing fits: only what is unleased can go, and the mirror stays for the leased worktree
+    manager.max_bytes = 0
+    evicted = manager.evict()
+
+    assert evicted == [old.path]
+    assert not os.path.exists(old.path)
+    assert os.path.exists(new.path)
+    assert os.path.exists(manager.mirror_path(bare_repo.url))
+
+    manager.release(new)
+    evicted = manager.evict()
+    assert set(evicted) == {new.path, manager.mirror_path(bare_repo.url)}
+    assert manager.used_bytes == 0
+
+
+def test_least_recently_used_worktree_goes_first(tmp_path, bare_repo):
+    first_commit = bare_repo.commit({'a.py': 'a' * 500})
+    manager = make_manager(tmp_path)
+    manager.release(manager.checkout(bare_repo.url, first_commit))
+    bare_repo.commit({'b.py': 'b' * 500})
+    second = manager.checkout(bare_repo.url, 'main')
+    manager.release(second)
+    # Reusing the first worktree makes the second the least recently used
+    first = manager.checkout(bare_repo.url, first_commit)
+    manager.release(first)
+
+    mirror_size = manager._entries[manager.mirror_path(bare_repo.url)]['size']
+    manager.max_bytes = manager.used_bytes - 1
+    assert manager.evict() == [second.path]
+    assert os.path.exists(first.path)
+    assert manager.used_bytes <= manager.max_bytes
+    assert manager.used_bytes >= mirror_size
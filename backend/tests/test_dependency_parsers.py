@@ -0,0 +1,369 @@
+import io
+import json
+
+import pytest
+
+from app.services import dependency_parsers
+from app.services.dependency_parsers import PARSERS, JsonStream
+
+
+def parse(tmp_path, name: str, content: str) -> dict:
+    path = tmp_path / name
+    path.write_text(content)
+    return PARSERS[name](str(path))
+
+
+def direct(result: dict) -> list:
+    return [(dep['name'], dep['spec'], dep['type']) for dep in result['direct']]
+
+
+def locked(result: dict) -> dict:
+    return {name: version for name, version in result['packages']}
+
+
+def edges(result: dict) -> dict:
+    packages = result['packages']
+    return {
+        packages[index][0]: sorted(packages[target][0] for target in targets)
+        for index, targets in enumerate(result['requires']) if targets
+    }
+
+
+def members(result: dict) -> list:
+    return sorted(result['members'])
+
+
+# Manifests ------------------------------------------------------------------
+
+def test_package_json(tmp_path):
+    result = parse(tmp_path, 'package.json', json.dumps({
+        'name': 'web',
+        'dependencies': {'react': '^18.0.0'},
+        'devDependencies': {'jest': '29'},
+        'peerDependencies': {'react-dom': '*'},
+        'workspaces': {'packages': ['packages/*']},
+    }))
+
+    assert result['name'] == 'web'
+    assert direct(result) == [('react', '^18.0.0', 'production'), ('jest', '29', 'development'),
+                              ('react-dom', '*', 'peer')]
+    assert result['workspaces'] == ['packages/*']
+
+
+def test_requirements_txt_follows_includes(tmp_path):
+    (tmp_path / 'base.txt').write_text('requests>=2.0  # HTTP\n')
+    result = parse(tmp_path, 'requirements.txt', (
+        '-r base.txt\n'
+        'fastapi==0.110.0\n'
+        'uvicorn[standard]>=0.20,<1 ; python_version >= "3.8"\n'
+        '-e .\n'
+        'git+https://github.com/o/r.git\n'
+        '# comment\n'
+    ))
+
+    assert direct(result) == [('requests', '>=2.0', 'production'), ('fastapi', '0.110.0', 'production'),
+                              ('uvicorn', '>=0.20,<1', 'production')]
+    assert result['includes'] == ['base.txt']
+
+
+def test_pyproject_toml(tmp_path):
+    result = parse(tmp_path, 'pyproject.toml', (
+        '[project]\n'
+        'name = "svc"\n'
+        'dependencies = ["httpx>=0.27", "pydantic"]\n'
+        '[project.optional-dependencies]\n'
+        'fast = ["orjson"]\n'
+        '[dependency-groups]\n'
+        'test = ["pytest>=8", {include-group = "lint"}]\n'
+        '[tool.poetry.dependencies]\n'
+        'python = "^3.11"\n'
+        'rich = {version = "^13"}\n'
+        '[tool.uv.workspace]\n'
+        'members = ["libs/*"]\n'
+    ))
+
+    assert result['name'] == 'svc'
+    assert direct(result) == [('httpx', '>=0.27', 'production'), ('pydantic', '*', 'production'),
+                              ('orjson', '*', 'optional'), ('pytest', '>=8', 'development'),
+                              ('rich', '^13', 'production')]
+    assert result['workspaces'] == ['libs/*']
+
+
+def test_pipfile(tmp_path):
+    result = parse(tmp_path, 'Pipfile', (
+        '[packages]\nflask = "*"\nsqlalchemy = {version = ">=2"}\n'
+        '[dev-packages]\npytest = "==8.0"\n'
+    ))
+
+    assert direct(result) == [('flask', '*', 'production'), ('sqlalchemy', '>=2', 'production'),
+                              ('pytest', '==8.0', 'development')]
+
+
+def test_cargo_toml(tmp_path):
+    result = parse(tmp_path, 'Cargo.toml', (
+        '[package]\nname = "tool"\n'
+        '[dependencies]\nserde = "1"\nrand_core = { package = "rand", version = "0.8" }\n'
+        'shared = { workspace = true }\n'
+        '[dev-dependencies]\ninsta = "1.34"\n'
+        '[target.\'cfg(unix)\'.dependencies]\nlibc = "0.2"\n'
+        '[workspace]\nmembers = ["crates/*"]\n'
+    ))
+
+    assert result['name'] == 'tool'
+    assert direct(result) == [('serde', '1', 'production'), ('rand', '0.8', 'production'),
+                              ('shared', 'workspace', 'production'), ('insta', '1.34', 'development'),
+                              ('libc', '0.2', 'production')]
+    assert result['workspaces'] == ['crates/*']
+
+
+def test_go_mod_skips_indirect_requirements(tmp_path):
+    result = parse(tmp_path, 'go.mod', (
+        'module example.com/app\n\n'
+        'require github.com/pkg/errors v0.9.1\n'
+        'require (\n'
+        '\tgolang.org/x/sync v0.6.0\n'
+        '\tgolang.org/x/text v0.14.0 // indirect\n'
+        ')\n'
+    ))
+
+    assert result['name'] == 'example.com/app'
+    assert direct(result) == [('github.com/pkg/errors', 'v0.9.1', 'production'),
+                              ('golang.org/x/sync', 'v0.6.0', 'production')]
+
+
+def test_pom_xml(tmp_path):
+    result = parse(tmp_path, 'pom.xml', (
+        '<project xmlns="http://maven.apache.org/POM/4.0.0">'
+        '<artifactId>service</artifactId>'
+        '<modules><module>core</module></modules>'
+        '<dependencyManagement><dependencies><dependency>'
+        '<groupId>org.managed</groupId><artifactId>bom</artifactId><version>1</version>'
+        '</dependency></dependencies></dependencyManagement>'
+        '<dependencies>'
+        '<dependency><groupId>com.google.guava</groupId><artifactId>guava</artifactId>'
+        '<version>33.0</version></dependency>'
+        '<dependency><groupId>junit</groupId><artifactId>junit</artifactId><scope>test</scope></dependency>'
+        '</dependencies>'
+        '</project>'
+    ))
+
+    assert result['name'] == 'service'
+    assert direct(result) == [('com.google.guava:guava', '33.0', 'production'),
+                              ('junit:junit', '*', 'development')]
+    assert result['workspaces'] == ['core']
+
+
+def test_gemfile_groups(tmp_path):
+    result = parse(tmp_path, 'Gemfile', (
+        "source 'https://rubygems.org'\n"
+        "gem 'rails', '~> 7.1', '>= 7.1.2'\n"
+        "group :development, :test do\n"
+        "  gem 'rspec-rails'\n"
+        "end\n"
+        "gem 'pry', group: :development\n"
+    ))
+
+    assert direct(result) == [('rails', '~> 7.1, >= 7.1.2', 'production'), ('rspec-rails', '*', 'development'),
+                              ('pry', '*', 'development')]
+
+
+# Lockfiles ------------------------------------------------------------------
+
+PACKAGE_LOCK_V1 = {
+    'name': 'app',
+    'lockfileVersion': 1,
+    'dependencies': {
+        'express': {'version': '4.18.2', 'requires': {'debug': '2.6.9', 'ms': '2.0.0'}},
+        'debug': {'version': '2.6.9', 'requires': {'ms': '2.0.0'},
+                  'dependencies': {'ms': {'version': '2.0.0'}}},
+        'ms': {'version': '2.1.3'},
+    },
+}
+
+PACKAGE_LOCK_V3 = {
+    'name': 'app',
+    'lockfileVersion': 3,
+    'packages': {
+        '': {'name': 'app', 'version': '1.0.0', 'dependencies': {'express': '^4.18.0', 'ui': '*'},
+             'workspaces': ['packages/ui']},
+        'node_modules/express': {'version': '4.18.2', 'dependencies': {'debug': '2.6.9', 'ms': '2.0.0'}},
+        'node_modules/express/node_modules/ms': {'version': '2.0.0'},
+        'node_modules/debug': {'version': '2.6.9', 'dependencies': {'ms': '2.1.3'}},
+        'node_modules/ms': {'version': '2.1.3', 'integrity': 'sha512-' + 'x' * 40, 'size': 12.5},
+        'node_modules/ui': {'resolved': 'packages/ui', 'link': True},
+        'packages/ui': {'name': 'ui', 'version': '0.1.0', 'dependencies': {'ms': '^2.1.0'}},
+    },
+}
+
+
+def test_package_lock_v1_nesting(tmp_path):
+    result = parse(tmp_path, 'package-lock.json', json.dumps(PACKAGE_LOCK_V1))
+
+    assert sorted(result['packages']) == [['debug', '2.6.9'], ['express', '4.18.2'],
+                                          ['ms', '2.0.0'], ['ms', '2.1.3']]
+    versions = {tuple(result['packages'][i]): [result['packages'][t][1] for t in targets]
+                for i, targets in enumerate(result['requires'])}
+    # debug gets its own nested ms; express falls back to the hoisted one
+    assert versions[('debug', '2.6.9')] == ['2.0.0']
+    assert sorted(versions[('express', '4.18.2')]) == ['2.1.3', '2.6.9']
+    assert result['packages'][result['hoisted']['ms']] == ['ms', '2.1.3']
+
+
+def test_package_lock_v3_packages_links_and_workspaces(tmp_path):
+    result = parse(tmp_path, 'package-lock.json', json.dumps(PACKAGE_LOCK_V3))
+
+    packages = result['packages']
+    assert members(result) == ['app', 'ui']
+    assert edges(result)['app'] == ['express', 'ui']
+    assert packages[result['hoisted']['ms']] == ['ms', '2.1.3']
+    express = result['hoisted']['express']
+    assert sorted(packages[t][1] for t in result['requires'][express]) == ['2.0.0', '2.6.9']
+    assert edges(result)['ui'] == ['ms']
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 64])
+def test_package_lock_streams_across_any_chunk_boundary(tmp_path, monkeypatch, chunk_size):
+    expected = parse(tmp_path, 'package-lock.json', json.dumps(PACKAGE_LOCK_V3, indent=2))
+    monkeypatch.setattr(JsonStream.__init__, '__defaults__', (chunk_size,))
+
+    assert parse(tmp_path, 'package-lock.json', json.dumps(PACKAGE_LOCK_V3, indent=2)) == expected
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 12))
+def test_json_stream_numbers_split_by_a_chunk(chunk_size):
+    text = '{"a": 12.5, "b": 12e3, "c": [1.25e-3, -7, 0], "d": {"x": true}, "e": 3}'
+    stream = JsonStream(io.StringIO(text), chunk_size=chunk_size)
+
+    decoded = {key: stream.value() for key in stream.members()}
+
+    assert decoded == json.loads(text)
+
+
+YARN_CLASSIC = '''\
+# THIS IS AN AUTOGENERATED FILE. DO NOT EDIT THIS FILE DIRECTLY.
+# yarn lockfile v1
+
+
+"debug@2.6.9", debug@^2.6.0:
+  version "2.6.9"
+  resolved "https://registry.yarnpkg.com/debug/-/debug-2.6.9.tgz"
+  dependencies:
+    ms "2.0.0"
+
+ms@2.0.0:
+  version "2.0.0"
+
+"@scope/pkg@^1.0.0":
+  version "1.2.0"
+  dependencies:
+    debug "^2.6.0"
+'''
+
+YARN_BERRY = '''\
+__metadata:
+  version: 6
+  cacheKey: 8
+
+"app@workspace:.":
+  version: 0.0.0-use.local
+  resolution: "app@workspace:."
+  dependencies:
+    lodash: ^4.17.21
+  languageName: unknown
+  linkType: soft
+
+"lodash@npm:^4.17.0, lodash@npm:^4.17.21":
+  version: 4.17.21
+  resolution: "lodash@npm:4.17.21"
+  checksum: abc
+  languageName: node
+  linkType: hard
+'''
+
+
+def test_yarn_classic(tmp_path):
+    result = parse(tmp_path, 'yarn.lock', YARN_CLASSIC)
+
+    assert locked(result) == {'debug': '2.6.9', 'ms': '2.0.0', '@scope/pkg': '1.2.0'}
+    assert edges(result) == {'debug': ['ms'], '@scope/pkg': ['debug']}
+
+
+def test_yarn_berry(tmp_path):
+    result = parse(tmp_path, 'yarn.lock', YARN_BERRY)
+
+    assert locked(result) == {'app': '0.0.0-use.local', 'lodash': '4.17.21'}
+    assert edges(result) == {'app': ['lodash']}
+    assert members(result) == ['app']
+
+
+def test_poetry_lock(tmp_path):
+    result = parse(tmp_path, 'poetry.lock', (
+        '[[package]]\nname = "requests"\nversion = "2.31.0"\n\n'
+        '[package.dependencies]\ncharset-normalizer = ">=2,<4"\nurllib3 = ">=1.21.1,<3"\n\n'
+        '[[package]]\nname = "charset-normalizer"\nversion = "3.3.2"\n\n'
+        '[[package]]\nname = "urllib3"\nversion = "2.2.1"\n\n'
+        '[metadata]\nlock-version = "2.0"\n'
+    ))
+
+    assert locked(result) == {'requests': '2.31.0', 'charset-normalizer': '3.3.2', 'urllib3': '2.2.1'}
+    assert edges(result) == {'requests': ['charset-normalizer', 'urllib3']}
+
+
+def test_uv_lock(tmp_path):
+    result = parse(tmp_path, 'uv.lock', (
+        'version = 1\n\n'
+        '[[package]]\nname = "svc"\nversion = "0.1.0"\nsource = { editable = "." }\n'
+        'dependencies = [{ name = "httpx" }]\n\n'
+        '[package.optional-dependencies]\nfast = [{ name = "Orjson" }]\n\n'
+        '[[package]]\nname = "httpx"\nversion = "0.27.0"\nsource = { registry = "https://pypi.org/simple" }\n\n'
+        '[[package]]\nname = "orjson"\nversion = "3.10.0"\nsource = { registry = "https://pypi.org/simple" }\n'
+    ))
+
+    assert locked(result) == {'svc': '0.1.0', 'httpx': '0.27.0', 'orjson': '3.10.0'}
+    assert edges(result) == {'svc': ['httpx', 'orjson']}
+    assert members(result) == ['svc']
+
+
+def test_cargo_lock_with_two_versions_of_a_crate(tmp_path):
+    result = parse(tmp_path, 'Cargo.lock', (
+        'version = 3\n\n'
+        '[[package]]\nname = "tool"\nversion = "0.1.0"\ndependencies = ["rand 0.8.5", "serde"]\n\n'
+        '[[package]]\nname = "rand"\nversion = "0.7.3"\nsource = "registry+https://github.com/rust-lang/crates.io-index"\n\n'
+        '[[package]]\nname = "rand"\nversion = "0.8.5"\nsource = "registry+https://github.com/rust-lang/crates.io-index"\n\n'
+        '[[package]]\nname = "serde"\nversion = "1.0.197"\nsource = "registry+https://github.com/rust-lang/crates.io-index"\n'
+    ))
+
+    tool = result['members']['tool']
+    assert sorted(tuple(result['packages'][t]) for t in result['requires'][tool]) == [
+        ('rand', '0.8.5'), ('serde', '1.0.197'),
+    ]
+
+
+def test_pipfile_lock(tmp_path):
+    result = parse(tmp_path, 'Pipfile.lock', json.dumps({
+        '_meta': {'hash': {'sha256': 'abc'}, 'pipfile-spec': 6},
+        'default': {'flask': {'version': '==3.0.2', 'hashes': ['sha256:x']}},
+        'develop': {'pytest': {'version': '==8.1.1'}},
+    }))
+
+    assert locked(result) == {'flask': '3.0.2', 'pytest': '8.1.1'}
+
+
+def test_gemfile_lock(tmp_path):
+    result = parse(tmp_path, 'Gemfile.lock', (
+        'PATH\n  remote: .\n  specs:\n    mygem (0.1.0)\n      rack (>= 2)\n\n'
+        'GEM\n  remote: https://rubygems.org/\n  specs:\n'
+        '    rack (3.0.9)\n    rack-test (2.1.0)\n      rack (>= 1.3)\n\n'
+        'DEPENDENCIES\n  mygem!\n  rack-test\n'
+    ))
+
+    assert locked(result) == {'mygem': '0.1.0', 'rack': '3.0.9', 'rack-test': '2.1.0'}
+    assert edges(result) == {'mygem': ['rack'], 'rack-test': ['rack']}
+    assert members(result) == ['mygem']
+
+
+def test_every_config_file_has_a_parser():
+    from app.services.code_parser import CodeParserService
+
+    assert set(PARSERS) == set(CodeParserService.CONFIG_FILES)
+    assert set(dependency_parsers.LOCKFILE_PREFERENCE) < set(PARSERS)
@@ -0,0 +1,181 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.core.cache import LRUCache
+from app.services import github_client
+from app.services.github_client import GitHubAPIError, GitHubClient, GitHubRateLimited, RateLimiter
+
+BASE = 'https://api.github.test'
+
+
+class FakeGitHub:
+    """Request handler for httpx.MockTransport serving numbered pages of `items`, with ETags"""
+
+    def __init__(self, items=(), per_page_limit=100):
+        self.items = list(items)
+        self.per_page_limit = per_page_limit
+        self.requests = []
+        # Responses to hand out before the normal ones, e.g. throttling
+        self.queued = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.queued:
+            return self.queued.pop(0)
+        if request.url.path == '/missing':
+            return httpx.Response(404, json={'message': 'Not Found'})
+        page = int(request.url.params.get('page', 1))
+        per_page = min(int(request.url.params.get('per_page', 30)), self.per_page_limit)
+        body = self.items[(page - 1) * per_page:page * per_page]
+        etag = f'"{request.url.path}-{page}-{per_page}"'
+        headers = {'etag': etag, 'x-ratelimit-remaining': '4000', 'x-ratelimit-reset': str(int(time.time()) + 3600)}
+        last = max(1, -(-len(self.items) // per_page))
+        if last > 1:
+            headers['link'] = f'<{BASE}{request.url.path}?per_page={per_page}&page={last}>; rel="last"'
+        if request.headers.get('if-none-match') == etag:
+            return httpx.Response(304, headers=headers)
+        return httpx.Response(200, json=body, headers=headers)
+
+    def pages(self):
+        return sorted(int(r.url.params.get('page', 1)) for r in self.requests)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record asyncio.sleep calls made by the client and advance a fake clock instead of waiting"""
+    delays = []
+    clock = [time.time()]
+
+    async def sleep(delay):
+        delays.append(delay)
+        clock[0] += delay
+
+    monkeypatch.setattr(github_client.asyncio, 'sleep', sleep)
+    monkeypatch.setattr(github_client.time, 'time', lambda: clock[0])
+    return delays
+
+
+def run(server: FakeGitHub, call, token='token', cache=None, limiter=None):
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as http:
+            client = GitHubClient(token, http, cache=cache, limiter=limiter, base_url=BASE)
+            return await call(client)
+    return asyncio.run(main())
+
+
+def test_etag_revalidation_serves_304_from_cache():
+    server = FakeGitHub(items=[{'id': 1}])
+    cache = LRUCache(1024 * 1024)
+
+    first = run(server, lambda client: client.get('/repos/o/r/items'), cache=cache)
+    second = run(server, lambda client: client.get('/repos/o/r/items'), cache=cache)
+
+    assert first == second == [{'id': 1}]
+    assert 'if-none-match' not in server.requests[0].headers
+    assert server.requests[1].headers['if-none-match'] == '"/repos/o/r/items-1-30"'
+
+
+def test_cached_responses_are_not_shared_between_tokens():
+    server = FakeGitHub(items=[{'id': 1}])
+    cache = LRUCache(1024 * 1024)
+
+    run(server, lambda client: client.get('/repos/o/r/items'), token='alice', cache=cache)
+    run(server, lambda client: client.get('/repos/o/r/items'), token='bob', cache=cache)
+
+    assert 'if-none-match' not in server.requests[1].headers
+
+
+def test_paginate_fetches_pages_named_by_the_link_header():
+    server = FakeGitHub(items=[{'id': i} for i in range(450)])
+
+    items = run(server, lambda client: client.paginate('/repos/o/r/items'))
+
+    assert [item['id'] for item in items] == list(range(450))
+    assert server.pages() == [1, 2, 3, 4, 5]
+
+
+def test_paginate_stops_at_limit():
+    server = FakeGitHub(items=[{'id': i} for i in range(450)])
+
+    items = run(server, lambda client: client.paginate('/repos/o/r/items', limit=250))
+
+    assert [item['id'] for item in items] == list(range(250))
+    assert server.pages() == [1, 2, 3]
+
+
+def test_small_limit_shrinks_the_page_size():
+    server = FakeGitHub(items=[{'id': i} for i in range(450)])
+
+    items = run(server, lambda client: client.paginate('/repos/o/r/items', limit=5))
+
+    assert len(items) == 5
+    assert server.requests[0].url.params['per_page'] == '5'
+    assert server.pages() == [1]
+
+
+def test_paginate_revalidates_every_page_and_keeps_the_link_header():
+    server = FakeGitHub(items=[{'id': i} for i in range(250)])
+    cache = LRUCache(1024 * 1024)
+
+    first = run(server, lambda client: client.paginate('/repos/o/r/items'), cache=cache)
+    server.requests.clear()
+    second = run(server, lambda client: client.paginate('/repos/o/r/items'), cache=cache)
+
+    assert first == second
+    assert server.pages() == [1, 2, 3]
+    assert all(request.headers.get('if-none-match') for request in server.requests)
+
+
+def test_retry_after_is_honored(sleeps):
+    server = FakeGitHub(items=[{'id': 1}])
+    server.queued.append(httpx.Response(429, headers={'retry-after': '3'}, json={'message': 'slow down'}))
+
+    assert run(server, lambda client: client.get('/repos/o/r/items')) == [{'id': 1}]
+    assert len(server.requests) == 2
+    assert 3.0 in sleeps
+
+
+def test_retry_after_beyond_max_wait_raises(sleeps):
+    server = FakeGitHub(items=[{'id': 1}])
+    server.queued.append(httpx.Response(429, headers={'retry-after': '3600'}, json={'message': 'slow down'}))
+
+    with pytest.raises(GitHubRateLimited):
+        run(server, lambda client: client.get('/repos/o/r/items'), limiter=RateLimiter(max_wait=60))
+    assert len(server.requests) == 1
+
+
+def test_requests_wait_for_reset_once_down_to_the_reserve(sleeps):
+    server = FakeGitHub(items=[{'id': 1}])
+    limiter = RateLimiter(reserve=10, max_wait=60)
+    server.queued.append(httpx.Response(200, json=[{'id': 1}], headers={
+        'x-ratelimit-remaining': '10', 'x-ratelimit-reset': str(int(time.time()) + 30),
+    }))
+
+    async def two_calls(client):
+        await client.get('/repos/o/r/items')
+        return await client.get('/repos/o/r/items')
+
+    assert run(server, two_calls, limiter=limiter) == [{'id': 1}]
+    assert len(sleeps) == 1 and 25 <= sleeps[0] <= 30
+
+
+def test_exhausted_reserve_with_a_distant_reset_raises_without_sending(sleeps):
+    server = FakeGitHub(items=[{'id': 1}])
+    limiter = RateLimiter(reserve=10, max_wait=60)
+    limiter.remaining, limiter.reset_at = 5, time.time() + 3600
+
+    with pytest.raises(GitHubRateLimited):
+        run(server, lambda client: client.get('/repos/o/r/items'), limiter=limiter)
+    assert server.requests == []
+
+
+def test_error_status_raises_with_the_github_message():
+    server = FakeGitHub()
+
+    with pytest.raises(GitHubAPIError) as error:
+        run(server, lambda client: client.get('/missing'))
+    assert error.value.status_code == 404
+    assert 'Not Found' in str(error.value)
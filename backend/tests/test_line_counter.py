@@ -0,0 +1,37 @@
+from app.services import line_counter
+from app.services.incremental_analyzer import IncrementalAnalyzer, ManifestStore
+from app.services.line_counter import LineCounter
+
+
+def write(path, content: bytes):
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def test_binary_files_map_to_none_and_unreadable_ones_are_left_out(tmp_path):
+    write(tmp_path / 'text.py', b'a = 1\nb = 2')
+    write(tmp_path / 'image.png', b'\x89PNG\x00\x00')
+    paths = [str(tmp_path / name) for name in ('text.py', 'image.png', 'gone.py')]
+
+    counts = LineCounter(max_workers=1).count([(path, 10) for path in paths])
+
+    assert counts == {paths[0]: 2, paths[1]: None}
+
+
+def test_unreadable_files_are_not_counted_as_binary(tmp_path, bare_repo, monkeypatch):
+    bare_repo.commit({'main.py': 'print(1)\n', 'secret.py': 'key = 1\n', 'logo.png': b'\x89PNG\x00\x00'})
+    count_file_lines = line_counter.count_file_lines
+
+    def unreadable_secret(path):
+        if path.endswith('secret.py'):
+            raise PermissionError(path)
+        return count_file_lines(path)
+
+    monkeypatch.setattr(line_counter, 'count_file_lines', unreadable_secret)
+    result = IncrementalAnalyzer(bare_repo.work, 'repo', ManifestStore(str(tmp_path / 'store'))).analyze()
+
+    assert result['statistics']['binary_files'] == 1
+    assert result['statistics']['total_lines'] == 1
+    manifest = ManifestStore(str(tmp_path / 'store')).latest('repo')
+    assert 'secret.py' not in manifest['files']
+    assert manifest['files']['logo.png']['lines'] is None
@@ -0,0 +1,99 @@
+import itertools
+import os
+import threading
+import time
+
+import pytest
+
+from app.services.incremental_analyzer import ManifestStore
+
+
+def manifest(commit: str) -> dict:
+    return {'commit': commit, 'files': {}}
+
+
+# Pruning orders by mtime: saved manifests are backdated to distinct, increasing
+# times, all older than the next save
+MTIMES = itertools.count(time.time() - 3600)
+
+
+def save_in_order(store: ManifestStore, repo_id: str, commits):
+    for commit in commits:
+        store.save(repo_id, manifest(commit))
+        mtime = next(MTIMES)
+        os.utime(os.path.join(store.repo_dir(repo_id), f'{commit}.json'), (mtime, mtime))
+
+
+def test_concurrent_saves_leave_whole_files_and_no_temporaries(tmp_path):
+    store = ManifestStore(str(tmp_path), keep=100)
+    commits = [f'{i:040x}' for i in range(40)]
+    errors = []
+
+    def save(commit):
+        try:
+            store.save('repo', manifest(commit))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(commit,)) for commit in commits]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert store.latest_commit('repo') in commits
+    assert all(store.load('repo', commit) == manifest(commit) for commit in commits)
+    assert [name for name in os.listdir(store.repo_dir('repo')) if name.endswith('.tmp')] == []
+
+
+def test_prune_keeps_the_newest_manifests_and_their_artifacts(tmp_path):
+    store = ManifestStore(str(tmp_path), keep=2)
+    for commit in ('a', 'b', 'c'):
+        os.makedirs(store.artifact_path('repo', commit, 'vectors'))
+
+    save_in_order(store, 'repo', ['a', 'b', 'c'])
+
+    assert store.load('repo', 'a') is None
+    assert not os.path.exists(store.artifact_path('repo', 'a', 'vectors'))
+    assert store.load('repo', 'b') and store.load('repo', 'c')
+
+
+def test_pinned_baseline_survives_pruning_until_unpinned(tmp_path):
+    store = ManifestStore(str(tmp_path), keep=1)
+    save_in_order(store, 'repo', ['a'])
+    os.makedirs(store.artifact_path('repo', 'a', 'vectors'))
+
+    baseline = store.pin_latest('repo')
+    # Another analysis of the same repository moves LATEST on meanwhile
+    save_in_order(store, 'repo', ['b', 'c'])
+
+    assert baseline == 'a'
+    assert store.load('repo', 'a') == manifest('a')
+    assert os.path.exists(store.artifact_path('repo', 'a', 'vectors'))
+    assert store.load('repo', 'b') is None
+
+    store.unpin('repo', baseline)
+    save_in_order(store, 'repo', ['d'])
+    assert store.load('repo', 'a') is None
+    assert sorted(os.listdir(store.repo_dir('repo'))) == ['LATEST', 'd.json']
+
+
+def test_latest_is_never_pruned(tmp_path):
+    store = ManifestStore(str(tmp_path), keep=1)
+    save_in_order(store, 'repo', ['a', 'b'])
+    # Re-saving an older commit makes it LATEST even though its mtime is older
+    store.save('repo', manifest('a'))
+    os.utime(os.path.join(store.repo_dir('repo'), 'a.json'), (0, 0))
+    store._prune(store.repo_dir('repo'))
+
+    assert store.latest('repo') == manifest('a')
+
+
+def test_repo_ids_cannot_leave_the_base_directory(tmp_path):
+    store = ManifestStore(str(tmp_path / 'store'))
+
+    for repo_id in ('..', '.', 'a..b', '../outside'):
+        with pytest.raises(ValueError):
+            store.repo_dir(repo_id)
+    assert store.repo_dir('owner--name.js') == str(tmp_path / 'store' / 'owner--name.js')
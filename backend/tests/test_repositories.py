@@ -0,0 +1,30 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+@pytest.fixture(scope='module')
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+def test_analyze_rejects_a_url_without_owner_and_name(client):
+    response = client.post('/api/v1/repos/analyze', json={'repo_url': 'foo'})
+
+    assert response.status_code == 422
+    assert 'owner/name' in response.json()['detail']
+
+
+@pytest.mark.parametrize('repo_id', ['..', '.', '...', 'a/../b', ''])
+def test_analyze_rejects_repo_ids_that_leave_the_store(client, repo_id):
+    response = client.post('/api/v1/repos/analyze', json={'repo_url': 'https://github.com/o/r', 'repo_id': repo_id})
+
+    assert response.status_code == 422
+
+
+def test_analyze_rejects_a_derived_id_that_leaves_the_store(client):
+    response = client.post('/api/v1/repos/analyze', json={'repo_url': 'https://example.com/../..'})
+
+    assert response.status_code == 422